@@ -70,51 +70,51 @@ def main_routine(selected_artifacts):
     # 서브루틴에서 추출된 CSV 파일들의 경로를 지정
     SUBROUTINE_PATHS = {
         "web": {
-            "path": r"output\artifact\web\web_output.csv",
+            "path": os.path.join("output", "artifact", "web", "web_output.csv"),
             "folder": "web"
         },
         "web_sus": {
-            "path": r"output\suspicious_artifact\web\web_sus.csv",
+            "path": os.path.join("output", "suspicious_artifact", "web", "web_sus.csv"),
             "folder": "web"
         },
         "mft": {
-            "path": r"output\artifact\MFTJ\mft_output.csv",
+            "path": os.path.join("output", "artifact", "MFTJ", "mft_output.csv"),
             "folder": "MFTJ"
         },
         "mft_sus": {
-            "path": r"output\suspicious_artifact\MFTJ\mft_filtered.csv",
+            "path": os.path.join("output", "suspicious_artifact", "MFTJ", "mft_filtered.csv"),
             "folder": "MFTJ"
         },
         "usn": {
-            "path": r"output\artifact\MFTJ\usn_output.csv",
+            "path": os.path.join("output", "artifact", "MFTJ", "usn_output.csv"),
             "folder": "MFTJ"
         },
         "usn_sus": {
-            "path": r"output\suspicious_artifact\MFTJ\usn_filtered.csv",
+            "path": os.path.join("output", "suspicious_artifact", "MFTJ", "usn_filtered.csv"),
             "folder": "MFTJ"
         },
         "lnk": {
-            "path": r"output\artifact\LNK\lnk_files_ccno.csv",
+            "path": os.path.join("output", "artifact", "LNK", "lnk_files_ccno.csv"),
             "folder": "LNK"
         },
         "lnk_sus": {
-            "path": r"output\suspicious_artifact\LNK\suspicious_antiforensic_lnk_files_ccno.csv",
+            "path": os.path.join("output", "suspicious_artifact", "LNK", "suspicious_antiforensic_lnk_files_ccno.csv"),
             "folder": "LNK"
         },
         "prefetch":{
-           "path": r"output\artifact\prefetch\prefetch.csv",
+           "path": os.path.join("output", "artifact", "prefetch", "prefetch.csv"),
            "folder": "prefetch"
         },
         "prefetch_sus":{
-           "path": r"output\suspicious_artifact\prefetch\prefetch_sus.csv",
+           "path": os.path.join("output", "suspicious_artifact", "prefetch", "prefetch_sus.csv"),
            "folder": "prefetch"
         }, 
         "evt_log": {
-            "path": r"output\artifact\event_log\event_logs.csv",
+            "path": os.path.join("output", "artifact", "event_log", "event_logs.csv"),
             "folder": "event_log"
         },
         "evt_log_sus": {
-            "path": r"output\suspicious_artifact\event_log\anti_forensic_events.csv",
+            "path": os.path.join("output", "suspicious_artifact", "event_log", "anti_forensic_events.csv"),
             "folder": "event_log"
         }
     }
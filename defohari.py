@@ -4,11 +4,19 @@ import subprocess
 import threading
 import queue
 import json
+import collections
 import tkinter as tk
 from tkinter import ttk, messagebox
 from PIL import Image, ImageTk
 import time
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'subroutine', 'common'))
+from progress import (parse_progress_line, child_env, start_stream_readers, drain_process,
+                      BufferedLogWriter, ProgressTracker, format_duration)
+
+# 작업이 실패했을 때 오류 메시지로 보여줄 stderr 줄 수
+STDERR_TAIL_LINES = 20
+
 # 리소스 파일 경로 찾기 함수
 def resource_path(relative_path):
     """ PyInstaller와 같은 빌드 환경에서 리소스 파일 경로를 가져옴 """
@@ -49,17 +57,13 @@ def run_hive_if_selected():
 def run_hive(image_path):
     """파싱한 하이브 파일을 저장"""
     hives_dir = os.path.join(os.getcwd(), r'subroutine\web\extracted_hives')
-    if not os.path.exists(hives_dir):
-        try:
-            os.makedirs(hives_dir)
-            print(f"'{hives_dir}' 폴더가 생성되었습니다.")
-            subprocess.run(['python', r'subroutine\web\web_hive_parsing_Log_num.py', '-o', r'subroutine\web\extracted_hives', image_path], check=True)
-        except Exception as e:
-            print(f"폴더 생성 중 오류 발생: {e}")
-    else:
-        print(f"'{hives_dir}' 폴더가 이미 존재합니다.")
+    os.makedirs(hives_dir, exist_ok=True)
+    # 이미 추출한 하이브는 매니페스트 기준으로 건너뛰므로 폴더가 있어도 한 번만 실행하면 됨
+    try:
         subprocess.run(['python', r'subroutine\web\web_hive_parsing_Log_num.py', '-o', r'subroutine\web\extracted_hives', image_path], check=True)
-    
+    except subprocess.CalledProcessError as e:
+        print(f"하이브 추출 중 오류 발생: {e}")
+
 
 # PrintLogger 클래스 정의
 class PrintLogger:
@@ -86,8 +90,16 @@ class PrintLogger:
                 self.text_widget.config(state=tk.DISABLED)
         self.text_widget.after(100, self.update_text)
 
+# 하위 프로세스까지 함께 종료하는 함수
+def stop_process_tree(process):
+    """*_complete.py가 띄운 분석 스크립트까지 종료 (남아 있으면 재실행 시 같은 출력 파일에 동시에 기록함)"""
+    if sys.platform == 'win32':
+        subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)], capture_output=True)
+    else:
+        process.terminate()
+
 # 서브프로세스 실행 함수
-def run_subroutine(task_name, task_name_for_info, command, args, log_file_path, progress_queue, message_queue, index, stop_event, file_lock):
+def run_subroutine(task_name, task_name_for_info, command, args, log_file_path, progress_queue, message_queue, index, stop_event):
     creationflags = 0
     if sys.platform == 'win32':
         creationflags = subprocess.CREATE_NO_WINDOW
@@ -108,44 +120,48 @@ def run_subroutine(task_name, task_name_for_info, command, args, log_file_path,
     # 현재 작업 라벨 업데이트 요청
     message_queue.put(('current_task', f"{task_name_for_info}"))
 
+    # 오류 메시지로 보여줄 마지막 stderr 줄들
+    stderr_tail = collections.deque(maxlen=STDERR_TAIL_LINES)
+
+    def on_line(stream, line):
+        # 진행 이벤트는 GUI로, 나머지 줄은 로그 파일로
+        event = parse_progress_line(line)
+        if event is not None:
+            message_queue.put(('progress', (index, event)))
+            return
+        if stream == 'stderr':
+            stderr_tail.append(line)
+        log.write(line)
+
     try:
         command_with_args = command + args
+        log = BufferedLogWriter(log_file_path)
+        log.write(f"===== {task_name} 시작 =====\n")
         process = subprocess.Popen(
             command_with_args,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=True,
             universal_newlines=True,
+            env=child_env(),
             creationflags=creationflags
         )
-        with file_lock:
-            with open(log_file_path, 'a', encoding='utf-8') as f:
-                f.write(f"===== {task_name} 시작 =====\n")
-        while True:
-            if stop_event.is_set():
-                process.terminate()
-                task_message_queue.append(f"{task_name} 중지됨\n")
+        # stdout/stderr를 별도 스레드에서 함께 읽어 한쪽 파이프가 가득 차도 멈추지 않게 함
+        line_queue = queue.Queue()
+        start_stream_readers(process, line_queue)
+        with log:
+            if not drain_process(process, line_queue, on_line, stop_event):
+                stop_process_tree(process)
+                task_message_queue.append(f"{task_name} 중지됨 (다시 실행하면 완료된 단계 다음부터 이어서 진행)\n")
                 progress_queue.put((index, time.time() - start_time, task_message_queue))
                 return time.time() - start_time
-            line = process.stdout.readline()
-            if not line:
-                break
-            with file_lock:
-                with open(log_file_path, 'a', encoding='utf-8') as f:
-                    f.write(line)
-        process.stdout.close()
-        process.wait()
-        if process.returncode != 0:
-            error_message = process.stderr.read()
-            with file_lock:
-                with open(log_file_path, 'a', encoding='utf-8') as f:
-                    f.write(f"Error: {error_message}\n")
-            task_message_queue.append(f"{task_name}에서 오류 발생: {error_message}\n")
-        else:
-            task_message_queue.append(f"{task_name} 완료\n\n")
-            with file_lock:
-                with open(log_file_path, 'a', encoding='utf-8') as f:
-                    f.write(f"===== {task_name} 종료 =====\n\n")
+            if process.returncode != 0:
+                error_message = ''.join(stderr_tail)
+                log.write(f"Error: 종료 코드 {process.returncode}\n")
+                task_message_queue.append(f"{task_name}에서 오류 발생: {error_message}\n")
+            else:
+                task_message_queue.append(f"{task_name} 완료\n\n")
+                log.write(f"===== {task_name} 종료 =====\n\n")
     except Exception as e:
         task_message_queue.append(f"{task_name} 실행 중 오류 발생: {e}\n")
     elapsed_time = time.time() - start_time
@@ -276,7 +292,8 @@ class ArtifactExtractorApp:
         self.elapsed_times = []
         self.completed_tasks = 0
         self.lock = threading.Lock()
-        self.file_lock = threading.Lock()
+        # 작업별 진행 이벤트(단계, 처리 항목 수, 처리 속도)로 진행률과 남은 시간을 계산
+        self.tracker = ProgressTracker()
         self.current_task_index = 0
         self.stop_event = threading.Event()
 
@@ -312,6 +329,9 @@ class ArtifactExtractorApp:
                     self.start_button.config(state=tk.NORMAL)
                     self.stop_button.config(state=tk.DISABLED)
                     self.exit_button.config(state=tk.NORMAL)
+                elif command == 'progress':
+                    index, event = data
+                    self.tracker.update(index, event)
                 elif command == 'log':
                     # 로그 메시지 처리
                     msg_content = data
@@ -338,6 +358,7 @@ class ArtifactExtractorApp:
             with self.lock:
                 self.elapsed_times[index] = elapsed_time
                 self.completed_tasks += 1
+                self.tracker.finish_task(index)
                 # 작업의 메시지를 순차적으로 출력
                 for msg in task_messages:
                     self.output_text.config(state=tk.NORMAL)
@@ -397,6 +418,8 @@ class ArtifactExtractorApp:
                         task_name += " (의심스러운 아티팩트 포함)"
                         task_name_for_info = f"아티팩트 (의심스러운 아티팩트 포함) 추출 중..."
                         selected_artifacts[susp_identifier] = True  # 의심스러운 아티팩트 추가
+                    else:
+                        args.append('--no-suspicious')  # 의심스러운 흔적 분석 단계는 실행하지 않음
 
                     # 각 아티팩트별로 로그 파일 경로를 지정
                     log_file_path = f"process_logs_{identifier}.txt"
@@ -410,9 +433,12 @@ class ArtifactExtractorApp:
             messagebox.showwarning("경고", "최소한 하나의 아티팩트를 선택해야 합니다.")
             return
         
-        # 작업 상태 초기화
-        self.total_tasks = len(self.subroutines)
+        # 작업 상태 초기화 (CSV 결합도 하나의 작업으로 계산)
+        self.total_tasks = len(self.subroutines) + (1 if self.csv_var.get() and selected_artifacts else 0)
         self.elapsed_times = [0] * self.total_tasks
+        self.tracker = ProgressTracker()
+        for index in range(self.total_tasks):
+            self.tracker.add_task(index)
         self.completed_tasks = 0
         self.current_task_index = 0
         self.stop_event.clear()
@@ -438,8 +464,7 @@ class ArtifactExtractorApp:
                 self.progress_queue,
                 self.message_queue,
                 index,
-                self.stop_event,
-                self.file_lock
+                self.stop_event
             ))
             t.start()
             self.threads.append(t)
@@ -476,14 +501,15 @@ class ArtifactExtractorApp:
     def wait_for_completion_and_run_csv(self):
         for t in self.threads:
             t.join()
-        # CSV 결합 작업 실행
-        index = self.total_tasks  # 다음 인덱스 사용
-        self.total_tasks += 1
-        self.elapsed_times.append(0)
-        if not self.stop_event.is_set():
+        # CSV 결합 작업 실행 (인덱스는 아티팩트 작업 다음)
+        index = len(self.subroutines)
+        if self.stop_event.is_set():
+            self.progress_queue.put((index, 0))  # 실행하지 않은 작업도 완료로 처리해서 진행률 갱신을 끝냄
+        else:
             self.message_queue.put(('current_task', "CSV 파일 결합 중..."))
             csv_task_name, csv_task_for_info, csv_command, csv_args, csv_log_file = self.csv_subroutine
-            elapsed_time = run_subroutine(
+            # 완료 처리는 run_subroutine이 진행률 큐에 넣은 결과로 process_queues에서 함
+            run_subroutine(
                 csv_task_name,
                 csv_task_for_info,
                 csv_command,
@@ -492,12 +518,8 @@ class ArtifactExtractorApp:
                 self.progress_queue,
                 self.message_queue,
                 index,
-                self.stop_event,
-                self.file_lock
+                self.stop_event
             )
-            with self.lock:
-                self.elapsed_times[index] = elapsed_time
-                self.completed_tasks += 1
         total_time = time.time() - self.start_time
         if self.stop_event.is_set():
             self.message_queue.put(('current_task', "작업이 중지되었습니다."))
@@ -512,6 +534,12 @@ class ArtifactExtractorApp:
         # sys.stdout 원래대로 복구
         sys.stdout = self.original_stdout
 
+    def task_label(self, index):
+        """진행 표시에 쓰는 작업 이름"""
+        if index < len(self.subroutines):
+            return self.subroutines[index][0]
+        return 'CSV 파일 결합'
+
     def stop_extraction(self):
         self.stop_event.set()
         self.stop_button.config(state=tk.DISABLED)
@@ -521,19 +549,22 @@ class ArtifactExtractorApp:
         with self.lock:
             elapsed = time.time() - self.start_time
             if self.total_tasks > 0:
-                progress = (self.completed_tasks / self.total_tasks) * 100
+                # 진행률은 작업별 단계 진행 이벤트 기준 (끝난 작업 수만 세지 않음)
+                progress = self.tracker.overall_fraction() * 100
                 if progress > 100:
                     progress = 100
                 self.progress_bar['value'] = progress
                 self.progress_percent_label.config(text=f"진행률: {int(progress)}%")
 
                 if self.completed_tasks < self.total_tasks:
-                    # 남은 작업 시간 계산
-                    average_time_per_task = elapsed / max(self.completed_tasks, 1)
-                    remaining_tasks = self.total_tasks - self.completed_tasks
-                    remaining_time = average_time_per_task * remaining_tasks
-                    eta_formatted = time.strftime("%M분 %S초", time.gmtime(remaining_time))
-                    self.eta_label.config(text=f"예상 남은 시간: {eta_formatted}")
+                    # 남은 시간은 진행 중인 단계의 처리 속도와 끝난 단계들의 소요 시간으로 계산
+                    self.eta_label.config(text=f"예상 남은 시간: {format_duration(self.tracker.eta())}")
+
+                    # 진행 중인 작업의 현재 단계와 처리 속도 표시
+                    running = [f"{self.task_label(index)}: {self.tracker.describe(index)}"
+                               for index in range(self.total_tasks) if self.tracker.describe(index)]
+                    if running and not self.stop_event.is_set():
+                        self.current_task_label.config(text=' / '.join(running))
                 else:
                     self.eta_label.config(text="예상 남은 시간: 0분 0초")
 
@@ -597,6 +628,11 @@ class ArtifactExtractorApp:
             messagebox.showwarning("경고", "제거할 경로가 없습니다.")
 
 if __name__ == "__main__":
+    # 'defohari run ...'은 GUI 없이 실행 (defohari_cli.py 참고)
+    if len(sys.argv) > 1 and sys.argv[1] == 'run':
+        from defohari_cli import main
+        sys.exit(main(sys.argv[1:]))
+
     root = tk.Tk()
     app = ArtifactExtractorApp(root)
     root.mainloop()
@@ -0,0 +1,299 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import contextlib
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'subroutine', 'common'))
+from image_session import IMAGE_ENV
+from checkpoint import get_checkpoint, clear_checkpoints, load_json, write_json_atomic
+from volume_layout import image_fingerprint
+from path_index import process_alive
+from scheduler import make_stage, DagScheduler, DEFAULT_MAX_PARALLEL, summarize
+
+# 프로젝트 루트 (defohari.py와 같은 위치, 빌드된 exe는 exe가 있는 폴더)
+if getattr(sys, 'frozen', False):
+    ROOT_DIR = os.path.dirname(sys.executable)
+else:
+    ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 아티팩트 식별자 (csv_totaler.py의 키와 동일)
+ARTIFACTS = ['web', 'prefetch', 'evt_log', 'mft', 'lnk']
+
+# 아티팩트별 파이프라인 (서브루틴 폴더, 파이프라인 스크립트)
+# 파이프라인 안의 단계(추출 → 파싱 → CSV → 의심 흔적)는 한 프로세스에서 차례로 실행되며
+# 각 단계의 완료는 파이프라인 체크포인트가 따로 기록함
+PIPELINES = {
+    'web': ('web', 'web_complete.py'),
+    'prefetch': ('prefetch', 'prefetch_complete.py'),
+    'evt_log': ('event_log', 'evt_complete.py'),
+    'mft': ('MFTJ', 'mftJ_complete.py'),
+    'lnk': ('LNK', 'LNK_complete.py'),
+}
+
+# 웹/LNK는 하이브에서 찾은 사용자 정보를 사용함
+HIVE_ARTIFACTS = ('web', 'lnk')
+
+# 서브루틴들이 이미지와 관계없이 함께 쓰는 결과 폴더 (다른 이미지의 결과이거나 --clean이면 비움)
+SHARED_RESULT_DIRS = [
+    os.path.join(ROOT_DIR, 'output'),
+    os.path.join(ROOT_DIR, 'subroutine', 'web', 'extracted_hives'),
+]
+COMBINED_RESULT = os.path.join(ROOT_DIR, 'combined_analysis.xlsx')
+
+# output 폴더가 어느 이미지의 결과인지 기록하는 파일
+OUTPUT_OWNER_PATH = os.path.join(ROOT_DIR, 'output', '.defohari_image.json')
+
+# 공유 결과 폴더를 쓰는 실행은 하나뿐이도록 잡는 잠금 파일 (주인 PID를 기록, output 폴더를 비워도 남도록 밖에 둠)
+SHARED_RESULTS_LOCK_PATH = os.path.join(ROOT_DIR, 'output.lock')
+
+# 다른 실행이 잠금을 잡고 있을 때 다시 확인하는 간격 (초)
+SHARED_RESULTS_LOCK_POLL = 5
+
+# 메모리를 많이 쓰는 단계의 예상 사용량 (MB)
+HEAVY_STAGE_MEMORY_MB = {
+    'mft': 2048,
+    'combine': 1024,
+}
+
+
+def subroutine_dir(name):
+    return os.path.join(ROOT_DIR, 'subroutine', name)
+
+
+def pipeline_stage(artifact, suspicious=True, deps=(), extra_args=()):
+    """아티팩트 파이프라인(subroutine/<폴더>/<*_complete.py>)을 그 폴더에서 실행하는 단계"""
+    folder, script = PIPELINES[artifact]
+    cwd = subroutine_dir(folder)
+    command = ['python', script] + ([] if suspicious else ['--no-suspicious']) + list(extra_args)
+    # 폴더 안의 스크립트가 하나라도 바뀌면 다시 실행
+    return make_stage(artifact, command, cwd, deps, HEAVY_STAGE_MEMORY_MB.get(artifact, 512), [cwd])
+
+
+def web_filter_args(args):
+    """웹 타임라인 기간/URL 키워드 옵션을 web_complete.py 인자로 변환"""
+    extra = []
+    if args.since:
+        extra += ['--since', args.since]
+    if args.until:
+        extra += ['--until', args.until]
+    for keyword in args.url_keyword:
+        extra += ['--url-keyword', keyword]
+    return extra
+
+
+def build_artifact_dag(image_path, artifacts, suspicious=True, combine=True, web_args=()):
+    """선택한 아티팩트의 단계 DAG (하이브 추출 → 아티팩트별 파이프라인 → CSV 결합)"""
+    stages = []
+
+    if any(artifact in HIVE_ARTIFACTS for artifact in artifacts):
+        hive_script = os.path.join('subroutine', 'web', 'web_hive_parsing_Log_num.py')
+        stages.append(make_stage('hive', ['python', hive_script, '-o', os.path.join('subroutine', 'web', 'extracted_hives'), image_path],
+                                 ROOT_DIR, inputs=[os.path.join(ROOT_DIR, hive_script)]))
+
+    for artifact in artifacts:
+        deps = ['hive'] if artifact in HIVE_ARTIFACTS else []
+        stages.append(pipeline_stage(artifact, suspicious, deps, web_args if artifact == 'web' else ()))
+
+    if combine and artifacts:
+        selected = {artifact: True for artifact in artifacts}
+        if suspicious:
+            selected.update({artifact + '_sus': True for artifact in artifacts})
+        stages.append(make_stage('combine', ['python', 'csv_totaler.py', json.dumps(selected)], ROOT_DIR, list(artifacts),
+                                 HEAVY_STAGE_MEMORY_MB['combine'], [os.path.join(ROOT_DIR, 'csv_totaler.py')]))
+    return stages
+
+
+def collect_images(args):
+    """--image / --image-dir / --queue로 지정한 이미지 목록 (순서 유지, 중복 제거)"""
+    images = list(args.image or [])
+    for directory in args.image_dir or []:
+        images += sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                         if name.lower().endswith('.e01'))
+    for queue_file in args.queue or []:
+        with open(queue_file, 'r', encoding='utf-8') as f:
+            images += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    seen = set()
+    result = []
+    for image in images:
+        key = os.path.abspath(image)
+        if key not in seen:
+            seen.add(key)
+            result.append(key)
+    return result
+
+
+def _lock_owner(lock_path):
+    """잠금 파일에 적힌 PID (읽지 못했거나 아직 쓰기 전이면 None)"""
+    try:
+        with open(lock_path, 'r', encoding='ascii', errors='replace') as f:
+            content = f.read().split()
+    except OSError:
+        return None
+    return int(content[0]) if content and content[0].isdigit() else None
+
+
+@contextlib.contextmanager
+def shared_results_lock():
+    """공유 결과 폴더(output, extracted_hives)에 대한 배타 잠금 (다른 실행이 잡고 있으면 끝날 때까지 기다림)
+
+    이미지 분석은 몇 시간씩 걸릴 수 있으므로 수정 시간이 아니라 주인 프로세스가 살아 있는지로 중단된 잠금을 판단한다.
+    """
+    waiting = False
+    while True:
+        try:
+            fd = os.open(SHARED_RESULTS_LOCK_PATH, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            pid = _lock_owner(SHARED_RESULTS_LOCK_PATH)
+            if pid is not None and not process_alive(pid):
+                print(f"결과 폴더를 잠근 실행(PID {pid})이 종료되어 잠금을 지웁니다.")
+                try:
+                    os.remove(SHARED_RESULTS_LOCK_PATH)
+                except FileNotFoundError:
+                    pass
+                continue
+            if not waiting:
+                print(f"다른 실행(PID {pid})이 결과 폴더를 사용 중이어서 끝날 때까지 기다립니다.")
+                waiting = True
+            time.sleep(SHARED_RESULTS_LOCK_POLL)
+    try:
+        os.write(fd, f"{os.getpid()} {time.time():.0f}\n".encode('ascii'))
+        os.close(fd)
+        yield
+    finally:
+        os.remove(SHARED_RESULTS_LOCK_PATH)
+
+
+def prepare_shared_results(image_path, clean=False):
+    """공유 결과 폴더가 다른 이미지의 것이거나 clean이면 비우고 이 이미지의 것으로 표시 (비웠으면 True)
+
+    같은 이미지를 다시 분석하거나 어느 이미지의 것인지 기록이 없으면(GUI로 만든 결과 등) 그대로 두어
+    체크포인트와 매니페스트로 이어서/증분 실행한다.
+    """
+    owner = {'image': os.path.abspath(image_path), 'fingerprint': image_fingerprint(image_path)}
+    previous = load_json(OUTPUT_OWNER_PATH)
+    if not clean and previous in (None, owner):
+        os.makedirs(os.path.dirname(OUTPUT_OWNER_PATH), exist_ok=True)
+        write_json_atomic(OUTPUT_OWNER_PATH, owner)
+        return False
+    if clean:
+        print("--clean 옵션에 따라 output 폴더와 추출한 하이브를 비웁니다.")
+    else:
+        previous_image = previous.get('image') if isinstance(previous, dict) else None
+        print(f"이전 결과가 다른 이미지({previous_image})의 것이어서 output 폴더와 추출한 하이브를 비웁니다.")
+    for directory in SHARED_RESULT_DIRS:
+        if os.path.exists(directory):
+            shutil.rmtree(directory)
+        os.makedirs(directory)
+    if os.path.exists(COMBINED_RESULT):
+        os.remove(COMBINED_RESULT)
+    write_json_atomic(OUTPUT_OWNER_PATH, owner)
+    return True
+
+
+def archive_results(image_path, results_dir):
+    """이미지 하나의 결과(output 폴더와 결합 엑셀)를 results_dir/<이미지 이름>으로 복사"""
+    destination = os.path.join(results_dir, os.path.splitext(os.path.basename(image_path))[0])
+    os.makedirs(destination, exist_ok=True)
+    output_dir = os.path.join(ROOT_DIR, 'output')
+    archived_output = os.path.join(destination, 'output')
+    # 같은 이미지를 다시 분석한 경우 이전에 복사한 결과를 지우고 새로 복사 (지난 실행의 파일이 섞이지 않게)
+    if os.path.exists(archived_output):
+        shutil.rmtree(archived_output)
+    if os.path.exists(output_dir):
+        shutil.copytree(output_dir, archived_output, ignore=shutil.ignore_patterns(os.path.basename(OUTPUT_OWNER_PATH)))
+    if os.path.exists(COMBINED_RESULT):
+        shutil.copy2(COMBINED_RESULT, destination)
+    print(f"결과 복사 완료: {destination}")
+
+
+def run_image(image_path, args):
+    """이미지 하나에 대해 DAG를 실행하고 실패한 단계가 없으면 True 반환"""
+    print(f"===== 이미지 분석 시작: {image_path} =====")
+    started = time.time()
+    stages = build_artifact_dag(image_path, args.artifacts, not args.no_suspicious, not args.no_combine, web_filter_args(args))
+
+    # 서브루틴들이 image_here 대신 이 이미지를 사용하게 함
+    env = dict(os.environ)
+    env[IMAGE_ENV] = image_path
+
+    # 서브루틴들은 같은 output/extracted_hives 폴더에 쓰므로 이미지 하나의 분석(결과 복사까지)이 끝날 때까지 잠금
+    with shared_results_lock():
+        # 다른 이미지의 결과가 남아 있으면(또는 --clean이면) 비움
+        # (비웠으면 남아 있는 체크포인트로 단계를 건너뛰지 않도록 이 이미지의 체크포인트도 지움)
+        if prepare_shared_results(image_path, args.clean):
+            clear_checkpoints(image_path)
+
+        checkpoint = None if args.no_resume else get_checkpoint('run', image_path)
+        log_dir = os.path.join(args.log_dir, os.path.splitext(os.path.basename(image_path))[0])
+        scheduler = DagScheduler(stages, max_parallel=args.max_parallel, memory_limit_mb=args.memory_limit,
+                                 stage_memory_limit_mb=args.stage_memory_limit, log_dir=log_dir,
+                                 checkpoint=checkpoint, env=env)
+        results = scheduler.run()
+
+        ok = all(result.status in ('done', 'cached') for result in results.values())
+        if ok and checkpoint is not None:
+            checkpoint.finish()
+        print(f"===== 이미지 분석 종료: {image_path} ({summarize(results)}, {time.time() - started:.1f}초) =====")
+        if args.results_dir:
+            archive_results(image_path, args.results_dir)
+    return ok
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='defohari', description="Defohari 아티팩트 분석기 (GUI 없이 실행)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="디스크 이미지(들)를 분석")
+    run.add_argument('--image', action='append', help="분석할 이미지 경로 (여러 번 지정 가능)")
+    run.add_argument('--image-dir', action='append', help="이 폴더의 모든 .E01 이미지를 분석")
+    run.add_argument('--queue', action='append', help="이미지 경로 목록 파일 (한 줄에 하나, #은 주석)")
+    run.add_argument('--artifacts', nargs='+', choices=ARTIFACTS, default=ARTIFACTS, help="분석할 아티팩트 (기본: 전체)")
+    run.add_argument('--no-suspicious', action='store_true', help="의심스러운 흔적 분석 단계를 생략")
+    run.add_argument('--no-combine', action='store_true', help="CSV 결합 단계를 생략")
+    run.add_argument('--since', help="웹 타임라인: 이 시각 이후의 기록만 (예: 2024-05-01 또는 '2024-05-01 13:00')")
+    run.add_argument('--until', help="웹 타임라인: 이 시각 이전의 기록만 (날짜만 주면 그날 끝까지 포함)")
+    run.add_argument('--url-keyword', action='append', default=[], help="웹 타임라인: URL에 이 문자열이 있는 기록만")
+    run.add_argument('--max-parallel', type=int, default=DEFAULT_MAX_PARALLEL, help="동시에 실행하는 단계 수")
+    run.add_argument('--memory-limit', type=int, help="동시에 실행하는 단계들의 예상 메모리 합계 상한 (MB)")
+    run.add_argument('--stage-memory-limit', type=int, help="단계 하나의 메모리 상한 (MB, 넘으면 종료)")
+    run.add_argument('--log-dir', default=os.path.join(ROOT_DIR, 'logs'), help="단계별 로그 폴더")
+    run.add_argument('--results-dir', help="이미지별 결과를 복사할 폴더 (여러 이미지를 분석할 때 필요)")
+    run.add_argument('--no-resume', action='store_true', help="이전 실행의 체크포인트를 무시하고 처음부터 실행")
+    run.add_argument('--clean', action='store_true', help="이전 결과(output 폴더와 추출한 하이브)를 비우고 처음부터 실행")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    images = collect_images(args)
+    if not images:
+        default_image = os.path.join(ROOT_DIR, 'image_here')
+        args.image_dir = [default_image]
+        images = collect_images(args)[:1]
+    if not images:
+        parser.error("분석할 이미지가 없습니다. --image, --image-dir 또는 --queue를 지정하세요.")
+    if len(images) > 1 and not args.results_dir:
+        # 서브루틴들이 같은 output 폴더에 쓰고 다른 이미지의 결과는 비우므로 이미지별로 결과를 옮겨 두어야 함
+        parser.error("여러 이미지를 분석할 때는 --results-dir를 지정해야 합니다.")
+
+    missing = [image for image in images if not os.path.exists(image)]
+    for image in missing:
+        print(f"디스크 이미지 파일이 존재하지 않습니다: {image}")
+
+    failed = list(missing)
+    for image in images:
+        if image not in missing and not run_image(image, args):
+            failed.append(image)
+
+    print(f"전체 {len(images)}개 이미지 중 {len(images) - len(failed)}개 성공")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
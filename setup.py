@@ -49,6 +49,8 @@ build_exe_options = {
         'subprocess'
     ],
     'excludes': [],
+    # defohari_cli.py가 subroutine/common의 모듈을 가져오므로 빌드 시 경로에 추가
+    'path': sys.path + [os.path.join('subroutine', 'common')],
     'includes': [
         'tkinter',
         'tkinter.ttk',
@@ -74,6 +76,13 @@ executables = [
         base=base,
         target_name='ArtifactExtractor.exe',
         icon='computer_monitor_icon.ico'
+    ),
+    # GUI 없이 실행하는 콘솔 버전 (예: defohari run --image-dir image_here)
+    Executable(
+        script='defohari_cli.py',
+        base=None,
+        target_name='defohari.exe',
+        icon='computer_monitor_icon.ico'
     )
 ]
 
@@ -1,11 +1,28 @@
 # coding=UTF-8
-import subprocess
 import os
+import sys
+import argparse
 
 # 스크립트가 있는 디렉토리로 작업 디렉토리 변경
 script_dir = os.path.dirname(os.path.abspath(__file__))
 os.chdir(script_dir)
 
+sys.path.append(os.path.join(script_dir, '..', 'common'))
+from image_session import get_first_disk_image_path
+from checkpoint import get_checkpoint
+from manifest import file_digest, stage_key
+from keyword_rules import rules_path
+
+sys.path.append(os.path.join(script_dir, '..', 'web'))
+from user_manifest import get_users_data
+
+# 각 단계 스크립트를 모듈로 불러와 같은 프로세스에서 실행 (단계마다 python을 새로 띄우지 않음)
+# lnk1(win32com)과 CSV 복구(gspread)는 필요한 단계에서만 불러옴 (앞 단계는 모듈이 없어도 진행)
+import lnk_parsing
+import LnkTimeCalibrator
+import merge_lnk_file
+import lnk_pardon
+
 '''
 def run_hive(image_path):
     """파싱한 하이브 파일을 저장"""
@@ -23,71 +40,101 @@ def run_hive(image_path):
         subprocess.run(['python', r'..\web\web_hive_parsing_Log_num.py', '-o', r'subroutine\web\extracted_hives', image_path], check=True)
 '''
 
-def run_LNK_parsing():
-    """Step 1: lnk_parsing.py 실행, 파싱한 LNK파일을 저장"""
-    subprocess.run(['python', 'lnk_parsing.py'], check=True)
+def run_LNK_parsing(image_path, users_data):
+    """Step 1: lnk_parsing 실행, 파싱한 LNK파일을 저장"""
+    lnk_parsing.main(image_path, users_data)
 
-def run_LNK_analysis():
-    """Step 2: lnk1.py 실행, 리스트를 CSV와 xml 출력"""
-    subprocess.run(['python', 'lnk1.py'], check=True)
+def run_LNK_analysis(users_data):
+    """Step 2: lnk1 실행, 리스트를 CSV와 xml 출력"""
+    import lnk1
+    lnk1.main(users_data)
 
 def run_time_calibrator():
     """Step 2-1: 시간보정"""
-    subprocess.run(['python', 'LnkTimeCalibrator.py'], check=True)
-    
+    LnkTimeCalibrator.main()
+
 def run_merge_calibrator():
     """Step 2-2: 시간보정 결과 합치기"""
-    subprocess.run(['python', 'merge_lnk_file.py'], check=True)
+    merge_lnk_file.main()
+
+def run_LNK_sus_analysis(usernames):
+    """Step 3: lnk_pardon 실행 후 의심스러운 리스트를 CSV와 xml 출력"""
+    lnk_pardon.main(usernames)
 
-def run_LNK_sus_analysis():
-    """Step 3: lnk pardon.py 실행 후 의심스러운 리스트를 CSV와 xml 출력"""
-    subprocess.run(['python', 'lnk_pardon.py'], check=True)
-    
 def run_LNK_broken_recovery():
     """Step 4: 만일 csv가 깨졌다면 실행 (일반)"""
-    subprocess.run(['python', 'if_csv_broken_lnk.py'], check=True)
-    
+    import if_csv_broken_lnk
+    if_csv_broken_lnk.main()
+
 def run_LNK_S_broken_recovery():
     """Step 4: 만일 csv가 깨졌다면 실행 (suspect)"""
-    subprocess.run(['python', 'if_csv_broken_lnk_s.py'], check=True)
+    import if_csv_broken_lnk_s
+    if_csv_broken_lnk_s.main()
 
 
-def main():
+def main(suspicious=True):
+    image_path = get_first_disk_image_path(r"..\..\image_here")
+    # 중지되거나 실패한 이전 실행이 있으면 완료된 단계는 건너뛰고 이어서 진행
+    checkpoint = get_checkpoint('LNK', image_path)
+    checkpoint.plan(['extract', 'parse', 'time_calibrate', 'merge', 'csv_recovery'] + (['suspicious', 'suspicious_csv_recovery'] if suspicious else []))
+
+    # 사용자 목록은 한 번만 조회해서 추출/분석/의심 흔적 단계에 같이 넘김
+    # (의심 흔적 단계는 분석 단계가 사용자별로 만든 lnk_files_<사용자>.xml을 읽음)
+    users_data = get_users_data()
+
     # 1. lnk_parsing.py 실행, LNK 파싱
     output_dir = os.path.join('..', '..', 'output', 'artifact', 'LNK')  # 상대 경로로 설정
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
-    run_LNK_parsing()
-    
+    checkpoint.run('extract', run_LNK_parsing, image_path, users_data, key=file_digest('lnk_parsing.py'))
+
+
 
-    
     # 2. 파싱한 LNK분석 (csv & XML 생성)
     # 디렉토리 존재 여부 검증 로직
     csv_output_dir = os.path.join('..', '..', 'output', 'artifact', 'LNK')  # CSV 파일 경로 변경
     if not os.path.exists(csv_output_dir):
         os.makedirs(csv_output_dir)
-        
+
     # 디렉토리 존재 여부 검증 로직
     xml_output_dir = os.path.join('..', '..', 'output', 'artifact', 'LNK')  # CSV 파일 경로 변경
     if not os.path.exists(csv_output_dir):
         os.makedirs(csv_output_dir)
-     
-    run_LNK_analysis()
-    run_time_calibrator()
-    run_merge_calibrator()
-    run_LNK_broken_recovery()
-    
-    
-    # 3. 의심가는 리스트 추출 (csv 생성)
-    # 디렉토리 존재 여부 검증 로직
-    csv_output_dir = os.path.join('..', '..', 'output', 'suspicious_artifact', 'LNK')  # CSV 파일 경로 변경
-    if not os.path.exists(csv_output_dir):
-        os.makedirs(csv_output_dir)
-    
-    run_LNK_sus_analysis()
-    run_LNK_S_broken_recovery()
-    
+
+    # 시간 보정 결과를 합치는 단계가 분석 결과(lnk_files_<사용자>.csv/xml)를 덮어쓰므로 세 단계를 한 묶음의 키로 판단
+    # (추출한 .lnk 파일의 해시, 사용자 목록, 세 스크립트가 모두 같으면 이전 실행의 결과를 그대로 사용)
+    parse_key = stage_key(file_digest('lnk1.py', 'LnkTimeCalibrator.py', 'merge_lnk_file.py'),
+                          checkpoint.input_key(output_dir), sorted(users_data))
+    parse_outputs = [os.path.join(output_dir, f'lnk_files_{user}.{ext}') for user in users_data for ext in ('csv', 'xml')]
+    checkpoint.run('parse', run_LNK_analysis, users_data, key=parse_key, outputs=parse_outputs)
+    checkpoint.run('time_calibrate', run_time_calibrator, key=parse_key)
+    checkpoint.run('merge', run_merge_calibrator, key=parse_key, outputs=parse_outputs)
+    checkpoint.run('csv_recovery', run_LNK_broken_recovery, key=stage_key(file_digest('if_csv_broken_lnk.py'), parse_key),
+                   outputs=[os.path.join(output_dir, 'lnk.xlsx')])
+
+
+    if suspicious:
+        # 3. 의심가는 리스트 추출 (csv 생성)
+        # 디렉토리 존재 여부 검증 로직
+        csv_output_dir = os.path.join('..', '..', 'output', 'suspicious_artifact', 'LNK')  # CSV 파일 경로 변경
+        if not os.path.exists(csv_output_dir):
+            os.makedirs(csv_output_dir)
+
+        sus_key = stage_key(file_digest('lnk_pardon.py', rules_path()), parse_key)
+        checkpoint.run('suspicious', run_LNK_sus_analysis, list(users_data), key=sus_key,
+                       outputs=[os.path.join(csv_output_dir, f'suspicious_antiforensic_lnk_files_{user}.csv') for user in users_data])
+        checkpoint.run('suspicious_csv_recovery', run_LNK_S_broken_recovery, key=stage_key(file_digest('if_csv_broken_lnk_s.py'), sus_key),
+                       outputs=[os.path.join(csv_output_dir, 'suspicious_antiforensic_lnk_files.xlsx')])
+
+    checkpoint.finish()
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--suspicious', action='store_true', help="의심스러운 흔적 분석 단계까지 실행 (기본값)")
+    group.add_argument('--no-suspicious', action='store_true', help="의심스러운 흔적 분석 단계를 생략")
+    args = parser.parse_args()
+
     # image_path = "F:\file_extract_torrent.E01"  # 분석할 이미지 파일 경로
-    main()
+    main(not args.no_suspicious)
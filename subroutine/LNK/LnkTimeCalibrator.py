@@ -1,13 +1,16 @@
 import os
-import subprocess
+import sys
 import datetime
 import csv
 import xml.etree.ElementTree as ET
 import xml.dom.minidom as minidom
-import re
 import logging
 from dateutil import parser as date_parser  # dateutil 추가
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from image_session import get_session, IMAGE_ENV
+from path_index import get_path_index, record_times
+
 # 로그 설정
 logging.basicConfig(
     filename='lnk_time_extraction.log',
@@ -24,33 +27,15 @@ def parse_time(time_str):
         logging.error(f"시간 문자열 파싱 실패: {time_str} | 오류: {e}")
         return None
 
-# 파티션 오프셋을 가져오는 함수
-def get_partition_offset(image_path, partition_type="Basic data partition"):
-    """mmls 도구로 특정 파티션의 오프셋을 가져오는 함수"""
-    try:
-        command = ['mmls', image_path]
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        
-        lines = result.stdout.splitlines()
-        for line in lines:
-            if partition_type.lower() in line.lower():
-                parts = line.split()
-                if len(parts) > 2:
-                    offset = parts[2]
-                    print(f"파티션 오프셋 찾음: {offset}")
-                    logging.info(f"파티션 오프셋 찾음: {offset}")
-                    return int(offset)
-        logging.error(f"지정된 파티션 타입 '{partition_type}'을 찾을 수 없습니다.")
-    except subprocess.CalledProcessError as e:
-        print(f"파티션 오프셋을 찾는 중 오류 발생: {e}")
-        logging.error(f"파티션 오프셋을 찾는 중 오류 발생: {e}")
-    return None
-
 # 디스크 이미지 파일 찾기
 def get_first_disk_image_path(image_directory):
     """지정된 디렉토리에서 첫 번째 디스크 이미지 파일(.e01)을 찾는 함수"""
     disk_image_extensions = ['.e01']
 
+    # headless 실행기에서 지정한 이미지
+    if os.environ.get(IMAGE_ENV):
+        return os.environ[IMAGE_ENV]
+
     try:
         for filename in os.listdir(image_directory):
             if any(filename.lower().endswith(ext) for ext in disk_image_extensions):
@@ -64,136 +49,6 @@ def get_first_disk_image_path(image_directory):
     
     return None
 
-# 특정 디렉토리의 inode를 찾는 함수
-def get_directory_inode(image_path, offset, parent_inode, target_directory):
-    """특정 inode 아래에서 디렉토리 inode를 검색"""
-    try:
-        # fls -D 옵션은 디렉토리 inode를 나열
-        command = ['fls', '-D', '-f', 'ntfs', '-o', str(offset), image_path, str(parent_inode)]
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        
-        # 각 줄은 'd/d inode_number: directory-name'
-        pattern = re.compile(r'^d/d\s+(\d+-\d+-\d+):\s+' + re.escape(target_directory) + r'$', re.IGNORECASE)
-        
-        for line in result.stdout.splitlines():
-            logging.debug(f"fls output line: {line}")  # 각 라인 로그 기록
-            match = pattern.match(line)
-            if match:
-                inode_number = match.group(1)
-                print(f"{target_directory}의 inode 번호: {inode_number}")
-                logging.info(f"{target_directory}의 inode 번호: {inode_number}")
-                return inode_number
-        logging.error(f"{target_directory} 디렉토리를 찾을 수 없습니다.")
-    except subprocess.CalledProcessError as e:
-        print(f"디렉토리 inode를 찾는 중 오류 발생: {e}")
-        logging.error(f"디렉토리 inode를 찾는 중 오류 발생: {e}")
-    return None
-
-# 중첩된 디렉토리 경로를 탐색하여 최종 디렉토리의 inode를 가져오는 함수
-def get_nested_directory_inode(image_path, offset, parent_inode, path_list):
-    """
-    주어진 경로 리스트를 따라 중첩된 디렉토리의 inode를 반환합니다.
-    path_list는 ['AppData', 'Roaming', 'Microsoft', 'Windows', 'Recent']와 같은 리스트입니다.
-    """
-    current_inode = parent_inode
-    for directory in path_list:
-        inode = get_directory_inode(image_path, offset, current_inode, directory)
-        if not inode:
-            logging.error(f"디렉토리 '{directory}'를 찾을 수 없습니다.")
-            return None
-        current_inode = inode
-    return current_inode
-
-# .lnk 파일 목록을 가져오는 함수
-def get_lnk_files(image_path, offset, start_inode=None):
-    """fls 도구를 사용하여 모든 .lnk 파일의 inode 번호와 경로를 가져오는 함수 (재귀적으로 검색)"""
-    try:
-        command = ['fls', '-f', 'ntfs', '-o', str(offset), '-r', image_path]
-        if start_inode:
-            command.append(str(start_inode))
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        lnk_files = []
-
-        # fls 명령어 전체 출력 로그 기록
-        logging.debug(f"fls 명령어 전체 출력:\n{result.stdout}")
-
-        # Regex 패턴을 사용하여 .lnk 파일의 inode와 경로를 정확하게 추출
-        # 수정된 패턴: 모든 접두사를 포괄
-        pattern = compile(r'^[^:]*\s+(\d+-\d+-\d+):\s+(.*\.lnk)$', re.IGNORECASE)
-        
-        for line in result.stdout.splitlines():
-            match = pattern.match(line)
-            if match:
-                inode = match.group(1)
-                file_path = match.group(2).replace('/', '\\')
-                lnk_files.append({'inode': inode, 'file_path': file_path})
-                logging.debug(f"찾은 .lnk 파일: {file_path}, inode: {inode}")
-                print(f"찾은 .lnk 파일: {file_path}, inode: {inode}")  # 실시간 출력
-        logging.info(f"찾은 .lnk 파일 수: {len(lnk_files)}")
-        return lnk_files
-    except subprocess.CalledProcessError as e:
-        logging.error(f"fls를 실행하는 중 오류 발생: {e}")
-        print(f"fls를 실행하는 중 오류 발생: {e}")
-        return []
-    except Exception as e:
-        logging.error(f".lnk 파일 목록을 가져오는 중 오류 발생: {e}")
-        print(f".lnk 파일 목록을 가져오는 중 오류 발생: {e}")
-        return []
-
-# istat를 사용하여 파일의 원본 시간 정보 추출
-def get_file_times(image_path, offset, inode_number):
-    """istat 도구를 사용하여 파일의 원본 생성, 접근, 수정 시간을 가져오는 함수"""
-    try:
-        command = ['istat', '-f', 'ntfs', '-o', str(offset), image_path, str(inode_number)]
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        creation_time = access_time = write_time = None
-
-        # istat 출력 전체를 로그에 기록
-        logging.debug(f"istat 명령어 출력 ({inode_number}):\n{result.stdout}")
-
-        # Created, File Modified, Accessed 정보를 추출하기 위한 정규 표현식 패턴
-        created_pattern = r'Created:\s+(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:\.\d+)?)'
-        mtime_pattern = r'File Modified:\s+(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:\.\d+)?)'
-        atime_pattern = r'Accessed:\s+(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:\.\d+)?)'
-
-        # Created 추출
-        created_match = re.search(created_pattern, result.stdout)
-        if created_match:
-            created_str = created_match.group(1)
-            creation_time = parse_time(created_str)
-            if creation_time:
-                logging.debug(f"Parsed Created: {creation_time}")
-        else:
-            logging.error(f"Created 정보를 찾을 수 없습니다: inode {inode_number}")
-
-        # File Modified (Mtime) 추출
-        mtime_match = re.search(mtime_pattern, result.stdout)
-        if mtime_match:
-            mtime_str = mtime_match.group(1)
-            write_time = parse_time(mtime_str)
-            if write_time:
-                logging.debug(f"Parsed Mtime: {write_time}")
-        else:
-            logging.error(f"Mtime 정보를 찾을 수 없습니다: inode {inode_number}")
-
-        # Accessed (Atime) 추출
-        atime_match = re.search(atime_pattern, result.stdout)
-        if atime_match:
-            atime_str = atime_match.group(1)
-            access_time = parse_time(atime_str)
-            if access_time:
-                logging.debug(f"Parsed Atime: {access_time}")
-        else:
-            logging.error(f"Atime 정보를 찾을 수 없습니다: inode {inode_number}")
-
-        return creation_time, access_time, write_time
-    except subprocess.CalledProcessError as e:
-        logging.error(f"istat를 실행하는 중 오류 발생: {e}")
-        return None, None, None
-    except Exception as e:
-        logging.error(f"시간 정보를 파싱하는 중 오류 발생: {e}")
-        return None, None, None
-
 # CSV로 저장하는 함수
 def write_to_csv(data_list, csv_file):
     fieldnames = ["file_path", "creation_time", "access_time", "write_time"]
@@ -241,42 +96,20 @@ def write_to_xml(data_list, xml_file):
         logging.error(f"XML 파일 작성 중 오류 발생: {e}")
         print(f"XML 파일 작성 중 오류 발생: {e}")
 
-# 모든 파일을 나열하여 디버깅하기 위한 함수
-def get_all_files(image_path, offset, start_inode=None):
-    """fls 도구를 사용하여 모든 파일의 inode 번호와 경로를 가져오는 함수 (재귀적으로 검색)"""
-    try:
-        command = ['fls', '-f', 'ntfs', '-o', str(offset), '-r', image_path]
-        if start_inode:
-            command.append(str(start_inode))
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        all_files = []
-
-        # fls 명령어 전체 출력 로그 기록
-        logging.debug(f"fls 명령어 전체 출력:\n{result.stdout}")
-
-        # 모든 파일을 캡처하는 정규 표현식 패턴
-        # 예시 fls 출력:
-        # r/r 112590-128-1: forensics.lnk
-        pattern = re.compile(r'^[^:]*\s+(\d+-\d+-\d+):\s+(.*)$', re.IGNORECASE)
-
-        for line in result.stdout.splitlines():
-            match = pattern.match(line)
-            if match:
-                inode = match.group(1)
-                file_path = match.group(2).replace('/', '\\')
-                all_files.append({'inode': inode, 'file_path': file_path})
-                logging.debug(f"찾은 파일: {file_path}, inode: {inode}")
-                print(f"찾은 파일: {file_path}, inode: {inode}")  # 실시간 출력
-        logging.info(f"찾은 파일 수: {len(all_files)}")
-        return all_files
-    except subprocess.CalledProcessError as e:
-        logging.error(f"fls를 실행하는 중 오류 발생: {e}")
-        print(f"fls를 실행하는 중 오류 발생: {e}")
-        return []
-    except Exception as e:
-        logging.error(f"파일 목록을 가져오는 중 오류 발생: {e}")
-        print(f"파일 목록을 가져오는 중 오류 발생: {e}")
-        return []
+# Recent 디렉토리 아래 모든 .lnk 파일을 경로 인덱스에서 가져오는 함수
+def get_lnk_records(index, recent_path):
+    """경로 인덱스에서 Recent 디렉토리 아래(하위 폴더 포함)의 .lnk 파일 목록을 가져오는 함수"""
+    lnk_files = []
+    for record in index.glob(recent_path + "\\**.lnk"):
+        if record.is_dir:
+            continue
+        # Recent 디렉토리 기준 상대 경로 (기존 출력 형식과 동일하게 '\\' 구분)
+        file_path = record.path[len(recent_path) + 1:].replace('/', '\\')
+        lnk_files.append({'record': record, 'file_path': file_path})
+        logging.debug(f"찾은 파일: {file_path}, inode: {record.inode}")
+        print(f"찾은 파일: {file_path}, inode: {record.inode}")  # 실시간 출력
+    logging.info(f"찾은 .lnk 파일 수: {len(lnk_files)}")
+    return lnk_files
 
 def main():
     # 기본 경로 설정 (스크립트의 현재 위치를 기준으로 상대 경로 설정)
@@ -298,43 +131,31 @@ def main():
     output_dir = default_output_dir  # 추출할 디렉토리 경로
     os.makedirs(output_dir, exist_ok=True)
 
-    # 파티션 오프셋 가져오기
-    partition_offset = get_partition_offset(first_disk_image_path, "Basic data partition")
+    # 이미지 세션 열기 (파티션 오프셋은 세션에서 한 번만 계산)
+    session = get_session(first_disk_image_path)
 
-    if partition_offset is None:
+    if session.partition_offset is None:
         logging.error("파티션 오프셋을 찾을 수 없습니다.")
         print("파티션 오프셋을 찾을 수 없습니다.")
         exit(1)
 
-    # 'Users' 디렉토리의 inode 번호 가져오기 (NTFS의 루트 inode는 5)
-    users_inode = get_directory_inode(first_disk_image_path, partition_offset, 5, 'Users')
+    # 이미지 경로 인덱스 (없으면 한 번 순회해서 생성)
+    index = get_path_index(session)
 
-    if not users_inode:
+    if index.inode('Users') is None:
         logging.error("'Users' 디렉토리를 찾을 수 없습니다.")
         print("'Users' 디렉토리를 찾을 수 없습니다.")
         exit(1)
 
     # 'Users' 디렉토리 내의 모든 사용자 폴더 검색
-    try:
-        command = ['fls', '-f', 'ntfs', '-o', str(partition_offset), first_disk_image_path, users_inode]
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        user_dirs = []
-        pattern = re.compile(r'^d/d\s+(\d+-\d+-\d+):\s+(.*)$', re.IGNORECASE)
-
-        for line in result.stdout.splitlines():
-            match = pattern.match(line)
-            if match:
-                inode = match.group(1)
-                username = match.group(2)
-                user_dirs.append({'inode': inode, 'username': username})
-                logging.debug(f"찾은 사용자 디렉토리: {username}, inode: {inode}")
-                print(f"찾은 사용자 디렉토리: {username}, inode: {inode}")
-
-        logging.info(f"찾은 사용자 수: {len(user_dirs)}")
-    except subprocess.CalledProcessError as e:
-        logging.error(f"'Users' 디렉토리 내 사용자 목록을 가져오는 중 오류 발생: {e}")
-        print(f"'Users' 디렉토리 내 사용자 목록을 가져오는 중 오류 발생: {e}")
-        user_dirs = []
+    user_dirs = []
+    for entry in index.list_dir('Users'):
+        if entry.is_dir:
+            user_dirs.append({'inode': entry.inode, 'username': entry.name})
+            logging.debug(f"찾은 사용자 디렉토리: {entry.name}, inode: {entry.inode}")
+            print(f"찾은 사용자 디렉토리: {entry.name}, inode: {entry.inode}")
+
+    logging.info(f"찾은 사용자 수: {len(user_dirs)}")
 
     if not user_dirs:
         logging.warning("'Users' 디렉토리 내에 사용자 폴더가 존재하지 않습니다.")
@@ -344,31 +165,20 @@ def main():
     # 사용자별로 데이터 분리
     for user in user_dirs:
         username = user['username']
-        user_inode = user['inode']
-        recent_path = ["AppData", "Roaming", "Microsoft", "Windows", "Recent"]
+        recent_path = f"Users/{username}/AppData/Roaming/Microsoft/Windows/Recent"
         logging.info(f"{username} 사용자에 대한 'Recent' 디렉토리 검색 시작")
         print(f"{username} 사용자에 대한 'Recent' 디렉토리 검색 시작")
 
-        # 'Recent' 디렉토리의 inode 번호 가져오기 (중첩된 경로 탐색)
-        recent_inode = get_nested_directory_inode(first_disk_image_path, partition_offset, user_inode, recent_path)
+        recent_record = index.lookup(recent_path)
 
-        if not recent_inode:
+        if recent_record is None or recent_record.deleted:
             logging.warning(f"{username} 사용자의 'Recent' 디렉토리를 찾을 수 없습니다.")
             print(f"{username} 사용자의 'Recent' 디렉토리를 찾을 수 없습니다.")
             continue
 
-        # 'Recent' 디렉토리 내의 모든 파일 목록 가져오기
-        all_files = get_all_files(first_disk_image_path, partition_offset, start_inode=recent_inode)
-
-        if not all_files:
-            logging.info(f"{username} 사용자의 'Recent' 디렉토리에 파일이 존재하지 않습니다.")
-            print(f"{username} 사용자의 'Recent' 디렉토리에 파일이 존재하지 않습니다.")
-            continue
-
-        # .lnk 파일만 필터링
-        lnk_files = [file for file in all_files if file['file_path'].lower().endswith('.lnk')]
+        # 'Recent' 디렉토리 내의 .lnk 파일 목록 가져오기 (인덱스에 저장된 실제 경로 기준)
+        lnk_files = get_lnk_records(index, recent_record.path)
 
-        logging.info(f"찾은 .lnk 파일 수: {len(lnk_files)}")
         if not lnk_files:
             logging.info(f"{username} 사용자의 'Recent' 디렉토리에 .lnk 파일이 존재하지 않습니다.")
             print(f"{username} 사용자의 'Recent' 디렉토리에 .lnk 파일이 존재하지 않습니다.")
@@ -379,9 +189,9 @@ def main():
 
         # 각 .lnk 파일의 MAC 타임 정보 추출
         for lnk in lnk_files:
-            inode = lnk['inode']
             file_path = lnk['file_path']
-            creation_time, access_time, write_time = get_file_times(first_disk_image_path, partition_offset, inode)
+            # 경로 인덱스에 저장된 $STANDARD_INFORMATION 시간 사용 (파일마다 istat 하지 않음)
+            creation_time, access_time, write_time = record_times(lnk['record'])
             user_extracted_data.append({
                 "file_path": file_path,
                 "creation_time": creation_time,
@@ -55,10 +55,14 @@ csv_file_path = r'..\..\output\artifact\LNK\lnk_files_ccno.csv'
 # Path to your service account JSON credentials file
 json_credentials_path = 'pycsvauto-df1c6762bab2.json'
 
-print("Job is working Please wait...")
+def main():
+    print("Job is working Please wait...")
 
-# Upload CSV to Google Sheets and get the sheet ID
-sheet_id = upload_to_google_sheets(csv_file_path, json_credentials_path)
+    # Upload CSV to Google Sheets and get the sheet ID
+    sheet_id = upload_to_google_sheets(csv_file_path, json_credentials_path)
 
-# Download the Google Sheet as Excel
-download_google_sheet_as_excel(sheet_id, json_credentials_path)
+    # Download the Google Sheet as Excel
+    download_google_sheet_as_excel(sheet_id, json_credentials_path)
+
+if __name__ == "__main__":
+    main()
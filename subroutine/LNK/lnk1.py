@@ -1,4 +1,5 @@
 import os
+import sys
 import win32com.client
 import datetime
 import pythoncom
@@ -6,39 +7,17 @@ import csv
 import xml.etree.ElementTree as ET
 import xml.dom.minidom as minidom
 import win32api
-import subprocess
 import re  # 정규식 사용을 위해 추가
 
+# 사용자 목록 매니페스트 (web/extracted_hives/users.json)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'web'))
+from user_manifest import get_users_data
+
 # 사용자 이름을 찾아 경로에서 치환할 수 있도록 동적 경로 생성
 def update_user_path(file_path, username):
     r"""C:\Users\berm2 부분을 동적으로 C:\Users\{username}으로 교체"""
     return re.sub(r'C:\\Users\\[^\\]+', fr'C:\\Users\\{username}', file_path)
 
-# 외부 스크립트에서 사용자 정보 가져오기
-def get_users_from_external_script(script_path):
-    """외부 스크립트 실행 후 유효한 사용자 정보만 가져오기"""
-    try:
-        command = ['python', script_path]
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        users_data = {}
-        print("외부 스크립트 실행 결과:")
-        print(result.stdout)  # 스크립트의 출력 결과 출력
-
-        # 결과를 기반으로 사용자 데이터 파싱
-        for line in result.stdout.splitlines():
-            if ":" in line and "Found valid username" not in line:
-                try:
-                    username, rest = line.split(":", 1)
-                    username = username.strip()
-                    if username and "Unknown" not in username and "RID" not in username:
-                        users_data[username] = rest.strip()  # 유효한 Username: RID 저장
-                except ValueError:
-                    continue  # 잘못된 형식 무시
-        return users_data
-    except subprocess.CalledProcessError as e:
-        print(f"외부 스크립트를 실행하는 중 오류 발생: {e}")
-        return {}
-
 # LNK 파일 분석
 def parse_lnk_file(file_path, shell, username):
     try:
@@ -123,10 +102,10 @@ def write_to_xml(data_list, xml_file):
     with open(xml_file, 'w', encoding='utf-8') as f:
         f.write(pretty_xml_str)
 
-if __name__ == "__main__":
-    
-    script_path = r"..\web\find_user_for_externel.py"  # 외부 스크립트 경로
-    users_data = get_users_from_external_script(script_path)
+def main(users_data=None):
+    """사용자별로 추출된 LNK 파일을 분석해서 CSV와 XML로 저장 (users_data가 없으면 사용자 목록 매니페스트에서 읽음)"""
+    if users_data is None:
+        users_data = get_users_data()
     
     for user in users_data:  # 여러 사용자가 있을 수 있으므로 반복 처리
         # 사용자별 LNK 디렉토리 경로 설정
@@ -144,3 +123,6 @@ if __name__ == "__main__":
         write_to_xml(lnk_data_list, xml_file)
 
         print(f"데이터가 {csv_file}와 {xml_file} 파일로 저장되었습니다.")
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,14 @@
 import pandas as pd
 import re
 import os
+import sys
 import logging
 from lxml import etree as LET
 from xml.sax.saxutils import escape
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from keyword_rules import get_matcher
+
 # 로깅 설정
 logging.basicConfig(
     filename='filter_and_convert.log',
@@ -13,15 +17,11 @@ logging.basicConfig(
     format='%(asctime)s:%(levelname)s:%(message)s'
 )
 
-# 안티포렌식 의심 키워드 리스트 (플래그 제거)
-anti_forensic_keywords = [
-    'ccleaner', 'cleaner', 'eraser',
-    'wiper', 'scrubber', 'delete',
-    'remove', 'destroy', 'bleachbit'
-]
+# 안티포렌식 의심 키워드 규칙 (common/anti_forensic_rules.json, 하나의 패턴으로 컴파일되어 대소문자 무시)
+matcher = get_matcher()
 
-# 하나의 패턴으로 결합하고 대소문자 무시 플래그 적용
-combined_pattern = re.compile('|'.join(anti_forensic_keywords), re.IGNORECASE)
+# 걸린 규칙 이름을 기록하는 열
+RULE_COLUMN = 'Matched Rule'
 
 def clean_text(text):
     """
@@ -54,7 +54,7 @@ def sanitize_tag(tag):
 def filter_csv(csv_file_path, filtered_csv_path, filter_columns, output_columns):
     """
     CSV 파일을 읽어 특정 열에서 안티포렌식 키워드를 포함하는 행을 필터링하고,
-    지정된 출력 컬럼만 포함하여 새로운 CSV로 저장합니다.
+    지정된 출력 컬럼과 걸린 규칙 이름만 포함하여 새로운 CSV로 저장합니다.
     """
     try:
         # CSV 파일 읽기
@@ -81,14 +81,12 @@ def filter_csv(csv_file_path, filtered_csv_path, filter_columns, output_columns)
         print(f"'{csv_file_path}' 파일의 필터링 전 샘플 데이터:")
         print(df[filter_columns].head(5))
         
-        # 필터링 조건 생성 (정규 표현식 사용)
-        mask = df[filter_columns].apply(
-            lambda row: bool(combined_pattern.search(' '.join(row.dropna().astype(str)))),
-            axis=1
-        )
+        # 필터링 조건 생성 (열 단위로 한 번에 매칭, 행마다 처음 걸린 규칙 이름)
+        rule_names = matcher.match_frame(df, filter_columns)
+        mask = rule_names.notna()
         
         # 필터링된 데이터프레임 생성
-        filtered_df = df[mask]
+        filtered_df = df[mask].assign(**{RULE_COLUMN: rule_names[mask]})
         logging.info(f"필터링된 행 수: {len(filtered_df)}")
         print(f"필터링된 행 수: {len(filtered_df)}")
         
@@ -101,7 +99,7 @@ def filter_csv(csv_file_path, filtered_csv_path, filter_columns, output_columns)
             print(f"'{csv_file_path}' 파일에 필터링된 데이터가 {len(filtered_df)}건 있습니다.")
         
         # 출력에 필요한 컬럼만 선택
-        filtered_df = filtered_df[output_columns]
+        filtered_df = filtered_df[output_columns + [RULE_COLUMN]]
         
         # 인코딩 이슈로 인해 NaN 값이 생길 수 있으므로 제거
         # filter_columns에 포함된 컬럼에만 NaN 제거를 적용
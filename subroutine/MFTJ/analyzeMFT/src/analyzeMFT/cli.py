@@ -43,6 +43,8 @@ async def main():
 
     parser.add_option("-H", "--hash", action="store_true", dest="compute_hashes",
                       help="Compute hashes (MD5, SHA256, SHA512, CRC32)", default=False)
+    parser.add_option("--resume", action="store_true", dest="resume",
+                      help="Resume CSV output from the last flushed record block", default=False)
 
     (options, args) = parser.parse_args()
 
@@ -61,7 +63,7 @@ async def main():
         options.export_format = "csv"  
 
     try:
-        analyzer = MftAnalyzer(options.filename, options.output_file, options.debug, options.verbosity, options.compute_hashes, options.export_format)
+        analyzer = MftAnalyzer(options.filename, options.output_file, options.debug, options.verbosity, options.compute_hashes, options.export_format, options.resume)
         
         await analyzer.analyze()
 
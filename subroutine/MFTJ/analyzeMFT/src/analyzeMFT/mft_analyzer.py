@@ -1,6 +1,7 @@
 import asyncio
 import csv
 import io
+import json
 import os
 import signal
 import sqlite3
@@ -13,13 +14,15 @@ from .file_writers import FileWriters
 
 class MftAnalyzer:
     def __init__(self, mft_file: str, output_file: str, debug: int = 0, verbosity: int = 0, 
-                 compute_hashes: bool = False, export_format: str = "csv") -> None:
+                 compute_hashes: bool = False, export_format: str = "csv", resume: bool = False) -> None:
         self.mft_file = mft_file
         self.output_file = output_file
         self.debug = debug
         self.verbosity = int(verbosity) 
         self.compute_hashes = compute_hashes
         self.export_format = export_format
+        self.resume = resume
+        self.cursor_file = output_file + '.cursor'
         self.csvfile = None
         self.csv_writer = None
         self.interrupt_flag = asyncio.Event()
@@ -60,9 +63,12 @@ class MftAnalyzer:
     async def analyze(self) -> None:
         try:
             self.log("Starting MFT analysis...", 1)
-            self.initialize_csv_writer()
-            await self.process_mft()
+            cursor = self.load_cursor() if self.resume else None
+            self.initialize_csv_writer(cursor)
+            await self.process_mft(cursor)
             await self.write_output()
+            if not self.interrupt_flag.is_set():
+                self.remove_cursor()
         except Exception as e:
             print(f"An unexpected error occurred: {e}")
             if self.debug:
@@ -77,10 +83,12 @@ class MftAnalyzer:
             self.print_statistics()
 
 
-    async def process_mft(self) -> None:
+    async def process_mft(self, cursor: Optional[Dict[str, Any]] = None) -> None:
         self.log(f"Processing MFT file: {self.mft_file}", 1)
         try:
             with open(self.mft_file, 'rb') as f:
+                if cursor:
+                    f.seek(cursor['mft_offset'])
                 while not self.interrupt_flag.is_set():
                     raw_record = await self.read_record(f) 
                     if not raw_record:
@@ -109,6 +117,7 @@ class MftAnalyzer:
                         if self.stats['total_records'] % 1000 == 0:
                             await self.write_csv_block()
                             self.mft_records.clear()
+                            self.save_cursor(f.tell())
                             
                         if self.interrupt_flag.is_set():
                             self.log("Interrupt detected. Stopping processing.", 1)
@@ -151,12 +160,59 @@ class MftAnalyzer:
                     getattr(signal, signame),
                     unix_handler)
 
-    def initialize_csv_writer(self):
+    def initialize_csv_writer(self, cursor: Optional[Dict[str, Any]] = None):
         if self.csvfile is None:
+            if cursor:
+                # Drop anything written after the last checkpointed block and append from there
+                self.csvfile = open(self.output_file, 'r+', newline='', encoding='utf-8')
+                self.csvfile.seek(cursor['csv_offset'])
+                self.csvfile.truncate()
+                self.csv_writer = csv.writer(self.csvfile)
+                return
             self.csvfile = open(self.output_file, 'w', newline='', encoding='utf-8')
             self.csv_writer = csv.writer(self.csvfile)
             self.csv_writer.writerow(CSV_HEADER)
 
+    def mft_signature(self) -> Dict[str, int]:
+        stat = os.stat(self.mft_file)
+        return {'mft_size': stat.st_size, 'mft_mtime_ns': stat.st_mtime_ns}
+
+    def load_cursor(self) -> Optional[Dict[str, Any]]:
+        """Return the saved cursor if it belongs to this MFT file and output, else None."""
+        if self.export_format != "csv" or self.compute_hashes:
+            # Hash sets are not checkpointed, so these runs always start over
+            return None
+        try:
+            with open(self.cursor_file, 'r', encoding='utf-8') as f:
+                cursor = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if any(cursor.get(key) != value for key, value in self.mft_signature().items()):
+            self.log("MFT file changed since the last run. Starting over.", 1)
+            return None
+        if not os.path.exists(self.output_file) or os.path.getsize(self.output_file) < cursor['csv_offset']:
+            self.log("Partial output is missing or shorter than the checkpoint. Starting over.", 1)
+            return None
+        self.stats.update(cursor['stats'])
+        self.log(f"Resuming after record {self.stats['total_records']} (MFT offset {cursor['mft_offset']})", 0)
+        return cursor
+
+    def save_cursor(self, mft_offset: int) -> None:
+        """Atomically record how far the MFT and the CSV output have been flushed."""
+        if not self.resume or self.export_format != "csv" or self.compute_hashes:
+            return
+        self.csvfile.flush()
+        os.fsync(self.csvfile.fileno())
+        cursor = dict(self.mft_signature(), mft_offset=mft_offset, csv_offset=self.csvfile.tell(), stats=self.stats)
+        temp_file = self.cursor_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(cursor, f)
+        os.replace(temp_file, self.cursor_file)
+
+    def remove_cursor(self) -> None:
+        if os.path.exists(self.cursor_file):
+            os.remove(self.cursor_file)
+
     async def write_csv_block(self) -> None:
         self.log(f"Writing CSV block. Records in block: {len(self.mft_records)}", 2)
         try:
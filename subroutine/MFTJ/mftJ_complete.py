@@ -1,43 +1,72 @@
 # coding=UTF-8
-import subprocess
 import os
+import sys
+import argparse
 
 # 스크립트가 있는 디렉토리로 작업 디렉토리 변경
 script_dir = os.path.dirname(os.path.abspath(__file__))
 os.chdir(script_dir)
 
-def run_MFTJ_parsing():
-    """Step 1: mftJ_csv.py 실행, 파싱한 MFT 및 유저저널 파일을 저장 및 분석 csv로 추출 (통합화된 xlsx 파일도 있음)"""
-    subprocess.run(['python', 'mftJ_csv.py'], check=True)
+sys.path.append(os.path.join(script_dir, '..', 'common'))
+from image_session import get_first_disk_image_path
+from checkpoint import get_checkpoint
+from manifest import file_digest, stage_key
+from keyword_rules import rules_path
+
+# 각 단계 스크립트를 모듈로 불러와 같은 프로세스에서 실행 (단계마다 python을 새로 띄우지 않음)
+# 결과 CSV가 수백 MB가 될 수 있어 단계 사이에는 메모리 대신 파일로 넘김
+import mftJ_csv
+import MFTJ_sus
+
+def run_MFTJ_parsing(image_path):
+    """Step 1: mftJ_csv 실행, 파싱한 MFT 및 유저저널 파일을 저장 및 분석 csv로 추출 (통합화된 xlsx 파일도 있음)"""
+    mftJ_csv.main(image_path)
 
 def run_MFTJ_sus_analysis():
-    """Step 2: MFT_sus.py 실행 후 의심스러운 흔적 리스트를 CSV로 및 xml 출력"""
-    subprocess.run(['python', 'MFTJ_sus.py'], check=True)
+    """Step 2: MFTJ_sus 실행 후 의심스러운 흔적 리스트를 CSV로 및 xml 출력"""
+    MFTJ_sus.main()
+
 
+def main(suspicious=True):
+    image_path = get_first_disk_image_path(r"..\..\image_here")
+    # 중지되거나 실패한 이전 실행이 있으면 완료된 단계는 건너뛰고 이어서 진행
+    checkpoint = get_checkpoint('MFTJ', image_path)
+    checkpoint.plan(['parse'] + (['suspicious'] if suspicious else []))
 
-def main():
     # 1. mftJ_csv.py 실행, 파싱한 MFT 및 유저저널 파일을 저장 및 분석 csv로 추출 (통합화된 xlsx 파일도 있음)
     output_dir = os.path.join('..', '..', 'output', 'artifact', 'MFTJ')  # 상대 경로로 설정
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
-    run_MFTJ_parsing()
+    # $MFT/$UsnJrnl 추출과 분석은 mftJ_csv가 입력 해시로 직접 판단하므로 여기서는 이미지 지문과 스크립트로만 판단
+    parse_key = stage_key(file_digest('mftJ_csv.py', 'analyzeMFT', 'USN-Journal-Parser'), checkpoint.input_key())
+    checkpoint.run('parse', run_MFTJ_parsing, image_path, key=parse_key,
+                   outputs=[os.path.join(output_dir, name) for name in ('mft_output.csv', 'usn_output.csv', 'disk_analysis_results.xlsx')])
     
 
     
-    # 2. 파싱한 MFT와 유저저널 분석 (csv & XML 생성)
-    # 디렉토리 존재 여부 검증 로직
-    csv_output_dir = os.path.join('..', '..', 'output', 'suspicious_artifact', 'MFTJ')  # CSV 파일 경로
-    if not os.path.exists(csv_output_dir):
-        os.makedirs(csv_output_dir)
-    
-    # 디렉토리 존재 여부 검증 로직
-    xml_output_dir = os.path.join('..', '..', 'output', 'suspicious_artifact', 'MFTJ')  # xml 파일 경로
-    if not os.path.exists(xml_output_dir):
-        os.makedirs(xml_output_dir)
-     
-    run_MFTJ_sus_analysis()
+    if suspicious:
+        # 2. 파싱한 MFT와 유저저널 분석 (csv & XML 생성)
+        # 디렉토리 존재 여부 검증 로직
+        csv_output_dir = os.path.join('..', '..', 'output', 'suspicious_artifact', 'MFTJ')  # CSV 파일 경로
+        if not os.path.exists(csv_output_dir):
+            os.makedirs(csv_output_dir)
+        
+        # 디렉토리 존재 여부 검증 로직
+        xml_output_dir = os.path.join('..', '..', 'output', 'suspicious_artifact', 'MFTJ')  # xml 파일 경로
+        if not os.path.exists(xml_output_dir):
+            os.makedirs(xml_output_dir)
+         
+        checkpoint.run('suspicious', run_MFTJ_sus_analysis, key=stage_key(file_digest('MFTJ_sus.py', rules_path()), parse_key),
+                       outputs=[os.path.join(csv_output_dir, 'mft_filtered.csv'), os.path.join(csv_output_dir, 'usn_filtered.csv')])
+
+    checkpoint.finish()
     
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--suspicious', action='store_true', help="의심스러운 흔적 분석 단계까지 실행 (기본값)")
+    group.add_argument('--no-suspicious', action='store_true', help="의심스러운 흔적 분석 단계를 생략")
+    args = parser.parse_args()
+    main(not args.no_suspicious)
\ No newline at end of file
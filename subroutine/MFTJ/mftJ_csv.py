@@ -1,4 +1,5 @@
 import os
+import sys
 import subprocess
 import csv
 import pandas as pd
@@ -7,77 +8,61 @@ import pdb
 import warnings
 from concurrent.futures import ThreadPoolExecutor
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from image_session import get_session, get_first_disk_image_path
+from extractor import extract_batch
+from manifest import get_manifest, file_digest, stage_key
+
 # FutureWarning 무시 설정
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
 mft_file = r'..\..\output\artifact\MFTJ\extracted_mft.bin'
 usn_journal_file = r'..\..\output\artifact\MFTJ\extracted_usnjrnl.bin'
 
-# mmls로 파티션 오프셋을 가져오는 함수
-def get_partition_offset(image_path, partition_type="Basic data partition"):
-    try:
-        command = ['mmls', image_path]
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        lines = result.stdout.splitlines()
-        for line in lines:
-            if partition_type in line:
-                parts = line.split()
-                if len(parts) > 2:
-                    offset = parts[2]
-                    print(f"파티션 오프셋 찾음: {offset}")
-                    return int(offset)
-    except subprocess.CalledProcessError as e:
-        print(f"파티션 오프셋을 찾는 중 오류 발생: {e}")
-    return None
-
-# Sleuth Kit의 fls 도구로 inode 번호를 확인하는 함수
-def get_inode_number(image_path, offset, file_name, inode=None):
-    try:
-        command = ['fls', '-f', 'ntfs', '-o', str(offset), image_path] if not inode else ['fls', '-f', 'ntfs', '-o', str(offset), image_path, inode]
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        for line in result.stdout.splitlines():
-            if file_name in line:
-                inode_number = line.split()[1].split(':')[0]
-                print(f"{file_name}의 inode 번호: {inode_number}")
-                return inode_number
-    except subprocess.CalledProcessError as e:
-        print(f"inode 번호를 찾는 중 오류 발생: {e}")
-    return None
-
-# Sleuth Kit의 icat 도구로 파일을 추출하는 함수
-def extract_file_using_icat(image_path, offset, inode_number, output_file):
-    command = ['icat', '-o', str(offset), image_path, inode_number]
-    try:
-        with open(output_file, 'wb') as f:
-            subprocess.run(command, check=True, stdout=f)
-        print(f"파일 추출 완료: {output_file}")
-    except subprocess.CalledProcessError as e:
-        print(f"파일 추출 중 오류 발생: {e}")
-
 # MFT 및 UsnJrnl 파일 추출하는 함수
 def parse_mft_and_usnjournal(image_path):
-    partition_offset = get_partition_offset(image_path)
-    if partition_offset is None:
+    session = get_session(image_path)
+    if session.partition_offset is None:
         print("파티션 오프셋을 찾을 수 없습니다.")
         return
     
+    # 추출 작업 목록 (매니페스트에 기록된 파일은 이미지가 같으면 다시 추출하지 않음)
+    jobs = []
+
     # MFT 파일 추출
-    mft_inode = get_inode_number(image_path, partition_offset, "$MFT")
+    mft_inode = session.lookup("$MFT")
     if mft_inode:
-        extract_file_using_icat(image_path, partition_offset, mft_inode, mft_file)
+        print(f"$MFT의 inode 번호: {mft_inode}")
+        jobs.append((mft_inode, mft_file))
     
-    # $Extend 디렉토리에서 UsnJrnl 확인
-    extend_inode = get_inode_number(image_path, partition_offset, "$Extend")
+    # $Extend 디렉토리에서 UsnJrnl의 $J 스트림 확인
+    extend_inode = session.lookup("$Extend", directory_only=True)
     if extend_inode:
-        usnjrnl_inode = get_inode_number(image_path, partition_offset, "$UsnJrnl", extend_inode)
+        usnjrnl_inode = session.lookup("$UsnJrnl:$J", extend_inode) or session.find_stream(session.lookup("$UsnJrnl", extend_inode), "$J")
         if usnjrnl_inode:
-            extract_file_using_icat(image_path, partition_offset, usnjrnl_inode, usn_journal_file)
+            print(f"$UsnJrnl:$J의 inode 번호: {usnjrnl_inode}")
+            jobs.append((usnjrnl_inode, usn_journal_file))
+
+    extract_batch(session, jobs)
+
+# 입력 파일 해시와 분석 스크립트가 같으면 분석 단계를 건너뛰는 함수
+def run_stage_if_changed(manifest, stage, input_file, parser_path, output_file, run):
+    """입력(추출 파일 SHA-256)과 분석 스크립트가 이전 실행과 같고 결과가 남아 있으면 건너뜀"""
+    input_sha256 = manifest.sha256_of(input_file) if manifest else None
+    key = stage_key(input_sha256, file_digest(parser_path)) if input_sha256 else None
+    if key and manifest.is_stage_current(stage, key):
+        print(f"{stage}: 입력이 바뀌지 않아 분석을 건너뜁니다. ({output_file})")
+        return
+    run(input_file, output_file)
+    if key:
+        manifest.record_stage(stage, key, [output_file])
 
 # MFT 분석 함수
 def analyze_mft(mft_file, output_file):
     if not os.path.exists(mft_file):
         raise FileNotFoundError(f"{mft_file} 파일을 찾을 수 없습니다.")
-    command = ['python', r'analyzeMFT/analyzeMFT.py', '-f', mft_file, '-o', output_file, '--csv']
+    # --resume: 중지된 이전 실행이 있으면 마지막으로 기록한 레코드 블록 다음부터 이어서 분석
+    command = ['python', r'analyzeMFT/analyzeMFT.py', '-f', mft_file, '-o', output_file, '--csv', '--resume']
     subprocess.run(command, shell=True, check=True)
     print(f"MFT 분석 완료. 출력 파일: {output_file}")
 
@@ -118,41 +103,31 @@ def save_to_excel_parallel(mft_data, usn_data, output_excel):
 
     print(f"엑셀 파일 저장 완료: {output_excel}")
     
-def get_first_disk_image_path(image_directory):
-    # 디스크 이미지 파일 확장자 목록
-    disk_image_extensions = ['.e01']
-    
-    # 지정된 디렉토리에서 모든 파일을 검색
-    for filename in os.listdir(image_directory):
-        # 파일 확장자를 소문자로 변환하여 확인
-        if any(filename.lower().endswith(ext) for ext in disk_image_extensions):
-            # 첫 번째 이미지 파일을 찾으면 그 경로 반환
-            return os.path.join(image_directory, filename)
-
-    # 이미지 파일이 없을 경우 None 반환
-    return None
 
-
-   
-
-if __name__ == "__main__":
-    # 이미지 파일 경로 및 출력 디렉토리 설정
-    image_path_directory = r"..\..\image_here"
-    first_disk_image_path = get_first_disk_image_path(image_path_directory)
-    
-    #image_path = r"..\..\image_here\file_extract.E01"
+def main(image_path):
+    """MFT/UsnJrnl 추출 → 각각 CSV로 분석 → 엑셀로 통합"""
     mft_output_csv = r'..\..\output\artifact\MFTJ\mft_output.csv'
     usn_output_csv = r'..\..\output\artifact\MFTJ\usn_output.csv'
     output_excel = r'..\..\output\artifact\MFTJ\disk_analysis_results.xlsx'
 
     # 1. MFT, UsnJrnl 추출
-    parse_mft_and_usnjournal(first_disk_image_path)
+    parse_mft_and_usnjournal(image_path)
+
+    manifest = get_manifest(image_path) if image_path else None
 
     # 2. MFT 분석
-    analyze_mft(mft_file, mft_output_csv)
+    run_stage_if_changed(manifest, 'mftJ.analyze_mft', mft_file, 'analyzeMFT', mft_output_csv, analyze_mft)
 
     # 3. USN Journal 분석
-    analyze_usn_journal(usn_journal_file, usn_output_csv)
+    run_stage_if_changed(manifest, 'mftJ.analyze_usn_journal', usn_journal_file, 'USN-Journal-Parser', usn_output_csv, analyze_usn_journal)
 
     # 4. 분석 결과를 엑셀 파일로 저장 (MFT와 USN Journal만)
     save_to_excel_parallel(mft_output_csv, usn_output_csv, output_excel)
+
+if __name__ == "__main__":
+    # 이미지 파일 경로 및 출력 디렉토리 설정
+    image_path_directory = r"..\..\image_here"
+    first_disk_image_path = get_first_disk_image_path(image_path_directory)
+    
+    #image_path = r"..\..\image_here\file_extract.E01"
+    main(first_disk_image_path)
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+파이프라인 체크포인트 모듈
+
+각 *_complete.py 파이프라인의 단계(추출 → 파싱 → XML/CSV → 의심 흔적 필터 → 결합)가 끝날 때마다
+완료 표시를 원자적으로 기록해서, 중지되거나 죽은 뒤 다시 실행하면 마지막으로 끝난 단계 다음부터 이어서 진행한다.
+레코드 단위 파서는 커서 파일(write_json_atomic / load_json)로 중간 결과 위치를 따로 남긴다.
+각 단계의 시작/종료는 진행 이벤트(progress 모듈)로도 알린다.
+출력 파일이 있는 단계는 매니페스트에도 (입력 키, 출력)을 남겨서, 모든 단계가 끝나 체크포인트를 지운 뒤
+같은 이미지를 다시 분석할 때도 입력(추출한 파일의 해시 + 스크립트)이 바뀌지 않은 단계는 건너뛴다.
+"""
+import os
+import json
+import time
+
+from volume_layout import get_cache_dir, image_fingerprint
+from manifest import INCREMENTAL, get_manifest
+from progress import ProgressReporter, set_reporter
+
+# 체크포인트 형식이 바뀌면 올려서 기존 기록을 무시하게 함
+CHECKPOINT_VERSION = 1
+
+
+def write_json_atomic(path, data):
+    """임시 파일에 쓴 뒤 교체해서, 중간에 죽어도 이전 내용이나 새 내용 중 하나만 남게 함"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def load_json(path):
+    """JSON 파일을 읽음 (없거나 깨졌으면 None)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class PipelineCheckpoint:
+    """이미지 하나에 대한 파이프라인 단계 완료 기록"""
+
+    def __init__(self, pipeline, image_path, checkpoint_path=None):
+        self.pipeline = pipeline
+        self.image_path = image_path
+        self.fingerprint = image_fingerprint(image_path)
+        self.checkpoint_path = checkpoint_path or os.path.join(
+            get_cache_dir(image_path), f"{os.path.basename(image_path)}.{pipeline}.checkpoint.json")
+        self.steps = self._load()
+        self.reporter = ProgressReporter(pipeline)
+        set_reporter(self.reporter)
+        if self.steps:
+            print(f"[{pipeline}] 이전 실행의 체크포인트가 있습니다. 완료된 단계({', '.join(self.steps)})는 건너뜁니다.")
+
+    def _load(self):
+        data = load_json(self.checkpoint_path)
+        # 다른 이미지(지문이 다름)에 대한 기록은 무시
+        if not data or data.get('version') != CHECKPOINT_VERSION or data.get('fingerprint') != self.fingerprint:
+            return {}
+        return data.get('steps', {})
+
+    def _save(self):
+        write_json_atomic(self.checkpoint_path, {
+            'version': CHECKPOINT_VERSION,
+            'pipeline': self.pipeline,
+            'fingerprint': self.fingerprint,
+            'steps': self.steps,
+        })
+
+    def _stage_name(self, step):
+        """매니페스트에 기록하는 단계 이름 (파이프라인.단계)"""
+        return f"{self.pipeline}.{step}"
+
+    def is_done(self, step, key=''):
+        """단계가 같은 입력(key)으로 끝났고 출력 파일이 모두 남아 있으면 True
+
+        이번 실행의 체크포인트에 없어도, 출력이 있는 단계가 같은 키로 매니페스트에 기록되어 있으면 완료로 봄
+        """
+        if not INCREMENTAL:
+            return False
+        marker = self.steps.get(step)
+        if marker is not None and marker['key'] == key:
+            return all(os.path.exists(path) for path in marker['outputs'])
+        return bool(key) and get_manifest(self.image_path).is_stage_current(self._stage_name(step), key)
+
+    def mark_done(self, step, key='', outputs=()):
+        """단계 완료를 기록 (outputs는 단계가 만든 파일 경로 목록, 있으면 매니페스트에도 기록)"""
+        self.steps[step] = {
+            'key': key,
+            'outputs': [os.path.abspath(p) for p in outputs],
+            'finished_at': time.time(),
+        }
+        self._save()
+        # 출력이 없는 단계(추출 등)는 파일마다 매니페스트가 따로 판단하므로 기록하지 않음
+        if key and outputs:
+            get_manifest(self.image_path).record_stage(self._stage_name(step), key, outputs)
+
+    def input_key(self, *directories):
+        """단계 입력 키: 이미지 지문 + directories 아래에 추출된 파일들의 해시 (매니페스트 기준)"""
+        return get_manifest(self.image_path).extracted_key(self.fingerprint, *directories)
+
+    def plan(self, steps):
+        """실행할 단계 목록을 알림 (GUI/CLI의 진행률 계산용)"""
+        self.reporter.plan(steps)
+
+    def run(self, step, func, *args, key='', outputs=()):
+        """완료되지 않은 단계만 실행하고 완료 표시를 남김 (실패하면 표시하지 않음)
+        func의 반환값을 돌려주고, 이미 완료되어 건너뛴 단계는 None을 반환 (다음 단계는 파일에서 읽음)"""
+        if self.is_done(step, key):
+            print(f"[{self.pipeline}] '{step}' 단계는 이미 완료되어 건너뜁니다.")
+            self.reporter.start_stage(step)
+            self.reporter.finish_stage('cached')
+            return None
+        result = _run_step(self.reporter, step, func, args)
+        self.mark_done(step, key, outputs)
+        return result
+
+    def finish(self):
+        """모든 단계가 끝나면 체크포인트를 지움 (다음 실행에서 입력이 같은 추출/분석 단계는 매니페스트가 건너뜀)"""
+        self.steps = {}
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        print(f"[{self.pipeline}] 모든 단계가 완료되었습니다.")
+
+
+class NullCheckpoint:
+    """이미지를 찾지 못했을 때 쓰는 체크포인트 (기록 없이 항상 실행)"""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.reporter = ProgressReporter(pipeline)
+        set_reporter(self.reporter)
+
+    def plan(self, steps):
+        self.reporter.plan(steps)
+
+    def is_done(self, step, key=''):
+        return False
+
+    def mark_done(self, step, key='', outputs=()):
+        pass
+
+    def input_key(self, *directories):
+        return ''
+
+    def run(self, step, func, *args, key='', outputs=()):
+        return _run_step(self.reporter, step, func, args)
+
+    def finish(self):
+        pass
+
+
+def _run_step(reporter, step, func, args):
+    """단계를 실행하면서 시작/종료 진행 이벤트를 남김"""
+    reporter.start_stage(step)
+    try:
+        result = func(*args)
+    except BaseException:
+        reporter.finish_stage('failed')
+        raise
+    reporter.finish_stage('done')
+    return result
+
+
+def clear_checkpoints(image_path):
+    """이미지의 모든 파이프라인 체크포인트를 지움 (결과 폴더를 비워서 이어서 실행할 수 없을 때)"""
+    cache_dir = get_cache_dir(image_path)
+    prefix = os.path.basename(image_path) + '.'
+    for name in os.listdir(cache_dir):
+        if name.startswith(prefix) and name.endswith('.checkpoint.json'):
+            os.remove(os.path.join(cache_dir, name))
+
+
+def get_checkpoint(pipeline, image_path):
+    """파이프라인 체크포인트를 반환 (이미지가 없으면 기록하지 않는 체크포인트)"""
+    if not image_path or not os.path.exists(image_path):
+        return NullCheckpoint(pipeline)
+    return PipelineCheckpoint(pipeline, image_path)
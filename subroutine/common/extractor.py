@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+병렬 아티팩트 추출 모듈
+
+(inode, 저장 경로) 작업 묶음을 제한된 크기의 작업자 풀에서 처리한다.
+같은 이미지에 대한 동시 읽기 수는 이미지별 세마포어로 제한하고,
+각 파일은 청크 단위로 디스크에 바로 기록하며 파일별 바이트 수와 소요 시간을 보고한다.
+pytsk3 백엔드는 세션 잠금 때문에 읽기가 직렬화되므로 작업자마다 이미지를 따로 연다.
+추출 결과는 매니페스트에 기록되어, 같은 이미지에서 이미 추출한 파일은 다시 추출하지 않는다.
+매니페스트의 시퀀스 번호는 묶음이 끝난 뒤 한 번에 조회한다 (CLI 백엔드에서 파일마다 istat을 띄우지 않음).
+파일 하나가 끝날 때마다 현재 단계의 진행 상황(파일 수, 바이트)을 보고한다.
+"""
+import os
+import time
+import hashlib
+import threading
+import subprocess
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from image_session import DEFAULT_CHUNK_SIZE, ImageSession
+from manifest import get_manifest
+from progress import report, report_total
+
+# 작업자 수 기본값 (CPU 코어 수 기준, 최대 8)
+DEFAULT_WORKERS = min(8, os.cpu_count() or 4)
+
+# 이미지 하나에 대해 동시에 진행하는 읽기 수 기본값
+DEFAULT_IO_SLOTS = 4
+
+# 원본 아티팩트를 output 폴더에 복사(보관)할지 여부 (DEFOHARI_ARCHIVE_RAW=0이면 생략)
+# 이미지에서 바로 읽는 파서(Prefetch, EVTX, 브라우저 히스토리)는 복사본이 없어도 동작함
+ARCHIVE_RAW_COPIES = os.environ.get('DEFOHARI_ARCHIVE_RAW', '1') != '0'
+
+ExtractionJob = namedtuple('ExtractionJob', ['inode', 'destination'])
+
+# error가 None이면 성공, skipped가 True면 매니페스트 기준으로 이미 추출된 파일
+# md5는 Extractor(md5=True)일 때만 계산 (아니면 None)
+ExtractionResult = namedtuple('ExtractionResult', ['inode', 'destination', 'bytes_written', 'elapsed', 'error', 'sha256', 'skipped', 'md5'])
+
+# 이미지별 I/O 세마포어 (같은 이미지를 읽는 추출기끼리 공유)
+_io_slots = {}
+_io_slots_lock = threading.Lock()
+
+
+def _image_io_slot(image_path, slots):
+    key = os.path.abspath(image_path)
+    with _io_slots_lock:
+        if key not in _io_slots:
+            _io_slots[key] = threading.BoundedSemaphore(slots)
+        return _io_slots[key]
+
+
+class Extractor:
+    """세션 하나에 대한 병렬 추출기"""
+
+    def __init__(self, session, max_workers=None, io_slots=None, chunk_size=DEFAULT_CHUNK_SIZE, verbose=True, manifest=True, md5=False):
+        self.session = session
+        self.md5 = md5
+        self.max_workers = max_workers or DEFAULT_WORKERS
+        self.chunk_size = chunk_size
+        self.verbose = verbose
+        self.manifest = get_manifest(session.image_path) if manifest else None
+        self._io_slot = _image_io_slot(session.image_path, io_slots or DEFAULT_IO_SLOTS)
+        self._local = threading.local()
+        self._worker_sessions = []
+        self._worker_sessions_lock = threading.Lock()
+        self._parallel = False
+
+    def _reader(self):
+        """파일을 읽을 세션 (pytsk3 백엔드를 여러 작업자로 돌릴 때는 작업자마다 따로 연 세션)"""
+        if not self._parallel or self.session.backend != 'tsk':
+            return self.session
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = ImageSession(self.session.image_path, partition_offset=self.session.partition_offset,
+                                   partition_type=self.session.partition_type, backend='tsk')
+            self._local.session = session
+            with self._worker_sessions_lock:
+                self._worker_sessions.append(session)
+        return session
+
+    def _close_worker_sessions(self):
+        with self._worker_sessions_lock:
+            for session in self._worker_sessions:
+                session.close()
+            self._worker_sessions = []
+
+    def _stream_to_disk(self, job):
+        # 청크 단위로 기록하면서 SHA-256(필요하면 MD5도)을 함께 계산 (파일을 메모리에 모으거나 두 번 읽지 않음)
+        digest = hashlib.sha256()
+        md5 = hashlib.md5() if self.md5 else None
+        written = 0
+        with open(job.destination, 'wb') as f:
+            for data in self._reader().stream_file(job.inode, self.chunk_size):
+                f.write(data)
+                digest.update(data)
+                if md5 is not None:
+                    md5.update(data)
+                written += len(data)
+        return written, digest.hexdigest(), md5.hexdigest() if md5 is not None else None
+
+    def _local_md5(self, path):
+        # 이미 추출된 파일은 이미지 대신 로컬 복사본에서 MD5 계산 (매니페스트에는 SHA-256만 있음)
+        md5 = hashlib.md5()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                md5.update(chunk)
+        return md5.hexdigest()
+
+    def _extract_one(self, job):
+        started = time.time()
+        fingerprint = self.session.fingerprint
+        if self.manifest is not None and self.manifest.is_current(fingerprint, job.inode, job.destination):
+            entry = self.manifest.lookup(job.destination)
+            if self.verbose:
+                print(f"이미 추출된 파일 (건너뜀): {job.destination}")
+            report(advance=1)
+            md5 = self._local_md5(job.destination) if self.md5 else None
+            return ExtractionResult(job.inode, job.destination, entry.size, time.time() - started, None, entry.sha256, True, md5)
+
+        written = 0
+        sha256 = None
+        md5 = None
+        try:
+            directory = os.path.dirname(job.destination)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._io_slot:
+                written, sha256, md5 = self._stream_to_disk(job)
+            error = None
+        except (subprocess.CalledProcessError, OSError) as e:
+            error = e
+        result = ExtractionResult(job.inode, job.destination, written, time.time() - started, error, sha256, False, md5)
+        report(advance=1, advance_bytes=written)
+        if self.verbose:
+            if error is None:
+                print(f"파일 추출 완료: {job.destination} ({written} 바이트, {result.elapsed:.2f}초)")
+            else:
+                print(f"파일 추출 중 오류 발생: {job.destination} - {error}")
+        return result
+
+    def _record_manifest(self, results):
+        """새로 추출한 파일을 시퀀스 번호와 함께 매니페스트에 기록 (시퀀스 번호는 한 번에 조회)"""
+        if self.manifest is None:
+            return
+        extracted = [r for r in results if r.error is None and not r.skipped]
+        if not extracted:
+            return
+        fingerprint = self.session.fingerprint
+        try:
+            sequences = self.session.sequence_numbers([r.inode for r in extracted])
+        except (subprocess.CalledProcessError, OSError) as e:
+            print(f"시퀀스 번호를 조회하지 못했습니다: {e}")
+            sequences = {}
+        for result in extracted:
+            try:
+                self.manifest.record(fingerprint, result.inode, sequences.get(result.inode),
+                                     result.bytes_written, result.sha256, result.destination)
+            except OSError as e:
+                print(f"매니페스트 기록 중 오류 발생: {result.destination} - {e}")
+
+    def run(self, jobs):
+        """작업 목록을 병렬로 추출하고 입력 순서대로 ExtractionResult 목록을 반환"""
+        jobs = [job if isinstance(job, ExtractionJob) else ExtractionJob(*job) for job in jobs]
+        if not jobs:
+            return []
+
+        started = time.time()
+        report_total(len(jobs))
+        workers = min(self.max_workers, len(jobs))
+        self._parallel = workers > 1
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(self._extract_one, jobs))
+        finally:
+            self._close_worker_sessions()
+        self._record_manifest(results)
+
+        elapsed = time.time() - started
+        total_bytes = sum(r.bytes_written for r in results if r.error is None and not r.skipped)
+        failed = sum(1 for r in results if r.error is not None)
+        skipped = sum(1 for r in results if r.skipped)
+        throughput = total_bytes / elapsed / (1024 * 1024) if elapsed > 0 else 0
+        print(f"추출 요약: {len(results) - failed}/{len(results)}개 성공 (변경 없음 {skipped}개 건너뜀), "
+              f"{total_bytes} 바이트, {elapsed:.2f}초 ({throughput:.1f} MB/s)")
+        return results
+
+
+def extract_batch(session, jobs, **kwargs):
+    """(inode, 저장 경로) 작업 목록을 병렬로 추출 (Extractor(session, **kwargs).run(jobs)와 동일)"""
+    return Extractor(session, **kwargs).run(jobs)
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+레지스트리 하이브 트랜잭션 로그 복구 모듈
+
+하이브 기본 블록(regf)의 시퀀스 번호/체크섬으로 더티 여부를 확인하고, 더티 하이브는 .LOG1/.LOG2(새 형식, HvLE 로그 항목)
+또는 .LOG(이전 형식, DIRT 더티 벡터)의 더티 페이지를 메모리에서 적용해 깨끗한 하이브 이미지를 만든다.
+새 형식 로그 항목은 Marvin32 해시 두 개로 검증하고, 시퀀스 번호가 이어지는 항목만 순서대로 적용한다.
+수집 단계가 만든 하이브 목록(hives.json)에는 하이브마다 다른 모듈이 읽을 깨끗한 하이브 경로를 기록한다.
+"""
+import os
+import struct
+from collections import namedtuple
+
+from checkpoint import write_json_atomic, load_json
+
+# 기본 블록 크기 (하이브 빈 데이터는 이 뒤부터 시작)
+BASE_BLOCK_SIZE = 4096
+
+# 로그 파일 앞의 기본 블록 크기 (로그 항목/더티 벡터는 이 뒤부터 시작)
+LOG_BASE_BLOCK_SIZE = 512
+
+# 기본 블록 체크섬 위치 (앞 508바이트의 XOR)
+CHECKSUM_OFFSET = 508
+
+# 파일 종류 (기본 블록 offset 28)
+FILE_TYPE_PRIMARY = 0
+FILE_TYPE_LOG_OLD = (1, 2)
+FILE_TYPE_LOG_NEW = 6
+
+# 새 형식 로그 항목 해시의 Marvin32 시드
+MARVIN32_SEED = 0x82EF4D887A4E55C5
+
+# 이전 형식 더티 벡터의 페이지(섹터) 크기
+OLD_LOG_PAGE_SIZE = 512
+
+_MASK32 = 0xFFFFFFFF
+
+# primary_sequence/secondary_sequence: 시퀀스 번호 (같지 않으면 쓰는 도중에 멈춘 더티 하이브),
+# file_type: 파일 종류, hive_bins_size: 하이브 빈 데이터 크기, checksum_valid: 기본 블록 체크섬 일치 여부
+BaseBlock = namedtuple('BaseBlock', ['primary_sequence', 'secondary_sequence', 'major_version', 'minor_version',
+                                     'file_type', 'hive_bins_size', 'checksum_valid'])
+
+# sequence: 로그 항목 시퀀스 번호, hive_bins_size: 적용 후 하이브 빈 데이터 크기, pages: [(하이브 빈 기준 오프셋, 데이터)]
+LogEntry = namedtuple('LogEntry', ['sequence', 'hive_bins_size', 'pages'])
+
+# dirty: 원본이 더티였는지, applied: 적용한 로그 항목 수 (이전 형식은 로그 파일 하나를 1로 셈), sequence: 복구 후 시퀀스 번호
+RecoveryResult = namedtuple('RecoveryResult', ['dirty', 'applied', 'sequence'])
+
+
+class HiveFormatError(ValueError):
+    """하이브/로그 파일 형식이 잘못됨"""
+
+
+def base_block_checksum(data):
+    """기본 블록 앞 508바이트를 4바이트씩 XOR한 체크섬 (0과 0xFFFFFFFF는 다른 값으로 바꿈)"""
+    checksum = 0
+    for value in struct.unpack_from('<127I', data, 0):
+        checksum ^= value
+    if checksum == _MASK32:
+        return 0xFFFFFFFE
+    if checksum == 0:
+        return 1
+    return checksum
+
+
+def read_base_block(data):
+    """기본 블록을 읽어 BaseBlock 반환 (regf 서명이 없으면 HiveFormatError)"""
+    if len(data) < LOG_BASE_BLOCK_SIZE or bytes(data[:4]) != b'regf':
+        raise HiveFormatError("regf 기본 블록이 아닙니다.")
+    primary, secondary = struct.unpack_from('<II', data, 4)
+    major, minor, file_type = struct.unpack_from('<III', data, 20)
+    hive_bins_size, = struct.unpack_from('<I', data, 40)
+    checksum, = struct.unpack_from('<I', data, CHECKSUM_OFFSET)
+    return BaseBlock(primary, secondary, major, minor, file_type, hive_bins_size,
+                     checksum == base_block_checksum(data))
+
+
+def is_dirty(base_block):
+    """쓰는 도중에 멈춰 로그를 적용해야 하는 하이브인지"""
+    return base_block.primary_sequence != base_block.secondary_sequence or not base_block.checksum_valid
+
+
+def _rotl(value, count):
+    return ((value << count) | (value >> (32 - count))) & _MASK32
+
+
+def marvin32(data, seed=MARVIN32_SEED):
+    """Marvin32 해시 (64비트, 새 형식 로그 항목 검증용)"""
+    lo = seed & _MASK32
+    hi = seed >> 32
+    length = len(data)
+    blocks = length // 4
+    for value in struct.unpack_from(f'<{blocks}I', data, 0):
+        lo = (lo + value) & _MASK32
+        hi ^= lo
+        lo = (_rotl(lo, 20) + hi) & _MASK32
+        hi = _rotl(hi, 9) ^ lo
+        lo = (_rotl(lo, 27) + hi) & _MASK32
+        hi = _rotl(hi, 19)
+
+    tail = bytes(data[blocks * 4:])
+    # 남은 1~3바이트는 0x80 종료 바이트와 함께 하나의 값으로 더함
+    final = int.from_bytes(tail + b'\x80', 'little')
+    lo = (lo + final) & _MASK32
+    for _ in range(2):
+        hi ^= lo
+        lo = (_rotl(lo, 20) + hi) & _MASK32
+        hi = _rotl(hi, 9) ^ lo
+        lo = (_rotl(lo, 27) + hi) & _MASK32
+        hi = _rotl(hi, 19)
+    return (hi << 32) | lo
+
+
+def iter_new_log_entries(log_data, first_sequence):
+    """새 형식 로그의 유효한 항목을 시퀀스 순서대로 반환 (서명/해시/시퀀스가 맞지 않는 곳에서 멈춤)"""
+    view = memoryview(log_data)
+    offset = LOG_BASE_BLOCK_SIZE
+    expected = first_sequence
+    while offset + 40 <= len(view):
+        if bytes(view[offset:offset + 4]) != b'HvLE':
+            return
+        size, _, sequence, hive_bins_size, page_count, hash1, hash2 = struct.unpack_from('<IIIIIQQ', view, offset + 4)
+        if size < 40 or size % 512 or offset + size > len(view) or sequence != expected:
+            return
+        entry = view[offset:offset + size]
+        if marvin32(entry[:32]) != hash2 or marvin32(entry[40:]) != hash1:
+            return
+
+        pages = []
+        data_offset = 40 + page_count * 8
+        for i in range(page_count):
+            page_offset, page_size = struct.unpack_from('<II', entry, 40 + i * 8)
+            if data_offset + page_size > size:
+                return
+            pages.append((page_offset, entry[data_offset:data_offset + page_size]))
+            data_offset += page_size
+        yield LogEntry(sequence, hive_bins_size, pages)
+        offset += size
+        expected += 1
+
+
+def read_old_log(log_data):
+    """이전 형식 로그의 (하이브 빈 데이터 크기, [(오프셋, 데이터)]) (더티 벡터가 없으면 None)"""
+    log_block = read_base_block(log_data)
+    if not log_block.checksum_valid or log_block.primary_sequence != log_block.secondary_sequence:
+        return None
+    view = memoryview(log_data)
+    if bytes(view[LOG_BASE_BLOCK_SIZE:LOG_BASE_BLOCK_SIZE + 4]) != b'DIRT':
+        return None
+    sector_count = log_block.hive_bins_size // OLD_LOG_PAGE_SIZE
+    bitmap_start = LOG_BASE_BLOCK_SIZE + 4
+    bitmap = view[bitmap_start:bitmap_start + (sector_count + 7) // 8]
+    # 더티 페이지는 더티 벡터 다음 512바이트 경계부터 차례로 저장됨
+    data_offset = -(-(bitmap_start + len(bitmap)) // OLD_LOG_PAGE_SIZE) * OLD_LOG_PAGE_SIZE
+    pages = []
+    for i in range(sector_count):
+        if bitmap[i // 8] & (1 << (i % 8)):
+            page = view[data_offset:data_offset + OLD_LOG_PAGE_SIZE]
+            if len(page) < OLD_LOG_PAGE_SIZE:
+                break
+            pages.append((i * OLD_LOG_PAGE_SIZE, page))
+            data_offset += OLD_LOG_PAGE_SIZE
+    return log_block, pages
+
+
+def _apply_pages(hive, hive_bins_size, pages):
+    end = BASE_BLOCK_SIZE + hive_bins_size
+    if len(hive) < end:
+        hive.extend(b'\x00' * (end - len(hive)))
+    for page_offset, page in pages:
+        start = BASE_BLOCK_SIZE + page_offset
+        hive[start:start + len(page)] = page
+
+
+def _finish(hive, sequence, hive_bins_size):
+    # 복구한 하이브는 깨끗한 상태(두 시퀀스 번호가 같음)로 기록하고 체크섬을 다시 계산
+    del hive[BASE_BLOCK_SIZE + hive_bins_size:]
+    struct.pack_into('<II', hive, 4, sequence, sequence)
+    struct.pack_into('<I', hive, 40, hive_bins_size)
+    struct.pack_into('<I', hive, CHECKSUM_OFFSET, base_block_checksum(hive))
+
+
+def recover_hive(hive_data, logs):
+    """하이브 내용과 로그 파일 내용 목록으로 (복구한 bytearray, RecoveryResult) 반환 (더티가 아니면 원본 그대로)"""
+    hive = bytearray(hive_data)
+    base_block = read_base_block(hive)
+    if not is_dirty(base_block):
+        return hive, RecoveryResult(False, 0, base_block.primary_sequence)
+
+    entries = {}
+    old_logs = []
+    for log_data in logs:
+        try:
+            log_block = read_base_block(log_data)
+        except HiveFormatError:
+            continue
+        if log_block.file_type == FILE_TYPE_LOG_NEW:
+            # 두 로그(LOG1/LOG2)의 항목을 시퀀스 번호로 합침
+            for entry in iter_new_log_entries(log_data, log_block.primary_sequence):
+                entries.setdefault(entry.sequence, entry)
+        elif log_block.file_type in FILE_TYPE_LOG_OLD:
+            old_log = read_old_log(log_data)
+            if old_log is not None:
+                old_logs.append(old_log)
+
+    if entries:
+        # 하이브에 마지막으로 완전히 쓰인 시퀀스부터 빠짐없이 이어지는 항목만 적용
+        sequence = min((s for s in entries if s >= base_block.secondary_sequence), default=None)
+        applied = 0
+        hive_bins_size = base_block.hive_bins_size
+        while sequence in entries:
+            entry = entries[sequence]
+            _apply_pages(hive, entry.hive_bins_size, entry.pages)
+            hive_bins_size = entry.hive_bins_size
+            applied += 1
+            sequence += 1
+        if applied:
+            _finish(hive, sequence, hive_bins_size)
+            return hive, RecoveryResult(True, applied, sequence)
+
+    if old_logs:
+        # 이전 형식은 가장 최근 로그 하나가 마지막 쓰기의 더티 페이지 전체
+        log_block, pages = max(old_logs, key=lambda old_log: old_log[0].primary_sequence)
+        _apply_pages(hive, log_block.hive_bins_size, pages)
+        _finish(hive, log_block.primary_sequence, log_block.hive_bins_size)
+        return hive, RecoveryResult(True, 1, log_block.primary_sequence)
+
+    return hive, RecoveryResult(True, 0, base_block.primary_sequence)
+
+
+# ----------------------------------------------------------------------
+# 하이브 목록 (수집 단계가 만들고 다른 모듈이 읽음)
+# ----------------------------------------------------------------------
+
+# 하이브 목록 파일 이름 (하이브 추출 디렉토리 안)
+CATALOG_NAME = 'hives.json'
+
+# 목록 형식이 바뀌면 올려서 기존 목록을 다시 만들게 함
+CATALOG_VERSION = 1
+
+# name: 하이브 이름 (SAM, SOFTWARE, NTUSER.DAT ...), user: 사용자 하이브의 프로필 디렉토리 이름 (시스템 하이브는 None),
+# path: 다른 모듈이 읽을 깨끗한 하이브 경로 (더티가 아니면 추출 원본, 더티면 로그를 적용한 복구본),
+# raw_path: 추출 원본 경로, log_paths: 추출한 로그 경로 목록, sha256/log_sha256: 원본/로그 해시 (복구본 재사용 판단),
+# dirty: 원본이 더티였는지, applied: 적용한 로그 항목 수
+# 목록 파일에는 경로를 하이브 추출 디렉토리 기준 상대 경로로 저장 (작업 디렉토리가 다른 단계에서도 같은 파일을 가리킴)
+HiveEntry = namedtuple('HiveEntry', ['name', 'user', 'path', 'raw_path', 'log_paths', 'sha256', 'log_sha256',
+                                     'dirty', 'applied'])
+
+
+def catalog_path(hives_dir):
+    return os.path.join(hives_dir, CATALOG_NAME)
+
+
+def load_hive_catalog(hives_dir):
+    """하이브 목록 [HiveEntry] (목록이 없거나 형식이 다르면 빈 목록)"""
+    data = load_json(catalog_path(hives_dir))
+    if not data or data.get('version') != CATALOG_VERSION:
+        return []
+    entries = []
+    for entry in data['hives']:
+        entry = HiveEntry(**entry)
+        entries.append(entry._replace(
+            path=os.path.join(hives_dir, entry.path),
+            raw_path=os.path.join(hives_dir, entry.raw_path),
+            log_paths=[os.path.join(hives_dir, path) for path in entry.log_paths]))
+    return entries
+
+
+def save_hive_catalog(hives_dir, entries):
+    write_json_atomic(catalog_path(hives_dir), {
+        'version': CATALOG_VERSION,
+        'hives': [entry._replace(
+            path=os.path.relpath(entry.path, hives_dir),
+            raw_path=os.path.relpath(entry.raw_path, hives_dir),
+            log_paths=[os.path.relpath(path, hives_dir) for path in entry.log_paths])._asdict()
+            for entry in entries],
+    })
+
+
+def hive_path(hives_dir, name, user=None):
+    """목록에 있는 깨끗한 하이브 경로 (목록에 없으면 추출 디렉토리의 같은 이름 파일)"""
+    for entry in load_hive_catalog(hives_dir):
+        if entry.name.lower() == name.lower() and entry.user == user:
+            return entry.path
+    if user is None:
+        return os.path.join(hives_dir, name)
+    return None
+
+
+def recover_hive_file(raw_path, log_paths, recovered_path):
+    """추출한 하이브가 더티면 로그를 적용해 recovered_path에 저장하고 (깨끗한 하이브 경로, RecoveryResult) 반환"""
+    with open(raw_path, 'rb') as f:
+        hive_data = f.read()
+    base_block = read_base_block(hive_data)
+    if not is_dirty(base_block):
+        return raw_path, RecoveryResult(False, 0, base_block.primary_sequence)
+
+    logs = []
+    for log_path in log_paths:
+        with open(log_path, 'rb') as f:
+            logs.append(f.read())
+    hive, result = recover_hive(hive_data, logs)
+    directory = os.path.dirname(recovered_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = recovered_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(hive)
+    os.replace(temp_path, recovered_path)
+    return recovered_path, result
@@ -0,0 +1,614 @@
+# -*- coding: utf-8 -*-
+"""
+디스크 이미지 세션 공용 모듈
+
+이미지(E01/raw)를 실행당 한 번만 열고 볼륨/파일시스템 핸들을 유지한 채
+디렉토리 조회와 파일 읽기를 프로세스 안에서 처리한다.
+pytsk3(+ E01은 pyewf)가 없으면 Sleuth Kit CLI(mmls/fls/icat/istat)로 대체한다.
+"""
+import io
+import os
+import re
+import struct
+import sqlite3
+import tempfile
+import subprocess
+import threading
+import datetime
+import contextlib
+from collections import namedtuple
+
+try:
+    import pytsk3
+except ImportError:
+    pytsk3 = None
+
+try:
+    import pyewf
+except ImportError:
+    pyewf = None
+
+from volume_layout import get_volume_layout, ntfs_partitions, select_partition
+
+# NTFS 루트 디렉토리의 inode
+NTFS_ROOT_INODE = 5
+
+# 분석할 이미지를 직접 지정하는 환경 변수 (headless 실행기 defohari_cli.py가 설정)
+IMAGE_ENV = 'DEFOHARI_IMAGE'
+
+# 스트리밍 시 한 번에 읽을 크기
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# CLI 백엔드에서 open_file이 메모리에 유지하는 최대 크기 (넘으면 임시 파일로 넘어감)
+SPOOL_MAX_SIZE = 64 * 1024 * 1024
+
+# $MFT 자체의 inode, MFT 레코드 헤더(시그니처 'FILE', 시퀀스 번호는 0x10, 레코드 크기는 0x1C)
+NTFS_MFT_INODE = 0
+MFT_RECORD_SIGNATURE = b'FILE'
+MFT_SEQUENCE = struct.Struct('<H')
+MFT_SEQUENCE_OFFSET = 0x10
+MFT_RECORD_SIZE = struct.Struct('<I')
+MFT_RECORD_SIZE_OFFSET = 0x1C
+
+# 디렉토리 항목 (inode는 fls 표기와 같은 문자열, 예: '12345-128-1')
+DirEntry = namedtuple('DirEntry', ['name', 'inode', 'is_dir', 'deleted'])
+
+# 전체 순회 결과 한 건 (경로는 '/'로 구분, 시간은 UTC epoch 초)
+FileRecord = namedtuple('FileRecord', ['path', 'name', 'inode', 'is_dir', 'deleted', 'size', 'atime', 'mtime', 'ctime', 'crtime'])
+
+# fls 출력 한 줄: 'r/r 12345-128-1:\tname', 삭제된 항목은 'r/r * 12345-128-1:\tname'
+FLS_LINE_PATTERN = re.compile(r'^(\S+)\s+(\*\s+)?(\d+(?:-\d+-\d+)?)(?:\(realloc\))?:\s+(.*)$')
+
+
+def split_inode(inode):
+    """'12345-128-1' 형식의 inode 문자열을 (번호, 속성 타입, 속성 ID)로 분리"""
+    parts = str(inode).split('-')
+    meta = int(parts[0])
+    attr_type = int(parts[1]) if len(parts) > 1 else None
+    attr_id = int(parts[2]) if len(parts) > 2 else None
+    return meta, attr_type, attr_id
+
+
+def parse_body_line(line):
+    """fls -m(body 형식) 출력 한 줄을 FileRecord로 변환 (대상이 아니면 None)
+
+    형식: MD5|name|inode|mode|UID|GID|size|atime|mtime|ctime|crtime
+    """
+    fields = line.rstrip('\r\n').split('|')
+    if len(fields) < 11:
+        return None
+    name = '|'.join(fields[1:-9])
+    inode, mode, _, _, size, atime, mtime, ctime, crtime = fields[-9:]
+    if name.endswith(' ($FILE_NAME)'):
+        return None
+    deleted = False
+    for suffix in (' (deleted-realloc)', ' (deleted)'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            deleted = True
+    path = name.strip('/')
+    base = path.rsplit('/', 1)[-1]
+    if not path or base in ('.', '..'):
+        return None
+    return FileRecord(path, base, inode, mode.startswith('d/'), deleted,
+                      int(size or 0), int(atime or 0), int(mtime or 0), int(ctime or 0), int(crtime or 0))
+
+
+def parse_fls_line(line):
+    """fls 출력 한 줄을 DirEntry로 변환 (형식이 맞지 않으면 None)"""
+    match = FLS_LINE_PATTERN.match(line.strip())
+    if not match:
+        return None
+    type_field, deleted, inode, name = match.groups()
+    return DirEntry(name.strip(), inode, type_field.startswith('d/'), bool(deleted))
+
+
+if pyewf is not None and pytsk3 is not None:
+    class EWFImgInfo(pytsk3.Img_Info):
+        """pyewf 핸들을 pytsk3 이미지로 감싸는 클래스"""
+
+        def __init__(self, ewf_handle):
+            self._ewf_handle = ewf_handle
+            super().__init__(url='', type=pytsk3.TSK_IMG_TYPE_EXTERNAL)
+
+        def close(self):
+            self._ewf_handle.close()
+
+        def read(self, offset, size):
+            self._ewf_handle.seek(offset)
+            return self._ewf_handle.read(size)
+
+        def get_size(self):
+            return self._ewf_handle.get_media_size()
+
+
+class ImageFile(io.RawIOBase):
+    """pytsk3 파일을 임의 위치에서 읽을 수 있는 파일 객체 (이미지에서 바로 읽음)"""
+
+    def __init__(self, session, inode):
+        self._session = session
+        with session._lock:
+            self._file, self._size, self._attr_type, self._attr_id = session._tsk_open(inode)
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._position = max(0, offset)
+        return self._position
+
+    def readinto(self, buffer):
+        length = min(len(buffer), self._size - self._position)
+        if length <= 0:
+            return 0
+        data = self._session._tsk_read(self._file, self._position, length, self._attr_type, self._attr_id)
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+class ImageSession:
+    """디스크 이미지 하나에 대한 세션 (파티션 오프셋, 디렉토리 조회, 파일 읽기)"""
+
+    def __init__(self, image_path, partition_offset=None, partition_type="Basic data partition", backend=None):
+        self.image_path = image_path
+        self.partition_type = partition_type
+        self.backend = backend or ('tsk' if self._tsk_available() else 'cli')
+        self._lock = threading.Lock()
+        self._dir_cache = {}
+        self._img = None
+        self._fs = None
+        self._partition_offset = partition_offset
+
+        if self.backend == 'tsk':
+            self._img = self._open_image()
+
+    # ------------------------------------------------------------------
+    # 이미지 / 파티션
+    # ------------------------------------------------------------------
+    def _tsk_available(self):
+        if pytsk3 is None:
+            return False
+        if self.image_path.lower().endswith('.e01') and pyewf is None:
+            return False
+        return True
+
+    def _open_image(self):
+        if self.image_path.lower().endswith('.e01'):
+            filenames = pyewf.glob(self.image_path)
+            ewf_handle = pyewf.handle()
+            ewf_handle.open(filenames)
+            return EWFImgInfo(ewf_handle)
+        return pytsk3.Img_Info(self.image_path)
+
+    @property
+    def partition_offset(self):
+        """대상 파티션의 시작 섹터 (mmls의 Start 값과 동일한 단위)"""
+        if self._partition_offset is None:
+            self._partition_offset = self._find_partition_offset()
+        return self._partition_offset
+
+    @property
+    def layout(self):
+        """이미지의 파티션 레이아웃 (이미지 지문 기준으로 캐시됨)"""
+        return get_volume_layout(self.image_path, self._img)
+
+    @property
+    def fingerprint(self):
+        return self.layout.fingerprint
+
+    def _find_partition_offset(self):
+        partition = select_partition(self.layout, self.partition_type)
+        if partition is None:
+            print("파티션 오프셋을 찾을 수 없습니다.")
+            return None
+        print(f"파티션 오프셋 찾음: {partition.start}")
+        return partition.start
+
+    @property
+    def fs(self):
+        """pytsk3 파일시스템 핸들 (처음 접근할 때 한 번만 연다)"""
+        if self._fs is None:
+            sector_size = self.layout.sector_size
+            self._fs = pytsk3.FS_Info(self._img, offset=(self.partition_offset or 0) * sector_size)
+        return self._fs
+
+    def _fls_command(self, *extra):
+        return ['fls', '-f', 'ntfs', '-o', str(self.partition_offset), *extra, self.image_path]
+
+    # ------------------------------------------------------------------
+    # 디렉토리 조회
+    # ------------------------------------------------------------------
+    def list_dir(self, inode=None):
+        """디렉토리 항목 목록을 반환 (inode가 없으면 루트). 결과는 세션 동안 캐시"""
+        key = str(inode) if inode else str(NTFS_ROOT_INODE)
+        if key in self._dir_cache:
+            return self._dir_cache[key]
+
+        if self.backend == 'tsk':
+            entries = self._tsk_list_dir(key)
+        else:
+            entries = self._cli_list_dir(key)
+        self._dir_cache[key] = entries
+        return entries
+
+    def _tsk_list_dir(self, inode):
+        meta, _, _ = split_inode(inode)
+        entries = []
+        with self._lock:
+            directory = self.fs.open_dir(inode=meta)
+            for f in directory:
+                name = f.info.name.name.decode('utf-8', errors='replace')
+                if name in ('.', '..') or f.info.meta is None:
+                    continue
+                is_dir = f.info.meta.type == pytsk3.TSK_FS_META_TYPE_DIR
+                deleted = bool(int(f.info.name.flags) & int(pytsk3.TSK_FS_NAME_FLAG_UNALLOC))
+                entries.append(DirEntry(name, str(f.info.meta.addr), is_dir, deleted))
+        return entries
+
+    def _cli_list_dir(self, inode):
+        command = self._fls_command()
+        if inode != str(NTFS_ROOT_INODE):
+            command.append(inode)
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, check=True)
+        except subprocess.CalledProcessError as e:
+            print(f"inode 번호를 찾는 중 오류 발생: {e}")
+            return []
+        entries = []
+        for line in result.stdout.splitlines():
+            entry = parse_fls_line(line)
+            if entry:
+                entries.append(entry)
+        return entries
+
+    def walk(self):
+        """파일시스템 전체를 한 번 순회하며 FileRecord를 내보내는 제너레이터"""
+        if self.backend == 'tsk':
+            yield from self._tsk_walk(NTFS_ROOT_INODE, '', set())
+            return
+
+        command = self._fls_command('-r', '-m', '/')
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                   text=True, encoding='utf-8', errors='replace')
+        try:
+            for line in process.stdout:
+                record = parse_body_line(line)
+                if record:
+                    yield record
+        finally:
+            process.stdout.close()
+            process.wait()
+
+    def _tsk_walk(self, inode, parent_path, visited):
+        # 디렉토리 항목은 잠금 안에서 모두 모은 뒤 잠금을 풀고 내보냄
+        # (소비자가 느리거나 같은 세션으로 파일을 읽어도 다른 읽기를 막지 않음)
+        visited.add(inode)
+        records = []
+        with self._lock:
+            for f in self.fs.open_dir(inode=inode):
+                name = f.info.name.name.decode('utf-8', errors='replace')
+                meta = f.info.meta
+                if name in ('.', '..') or meta is None:
+                    continue
+                path = f"{parent_path}/{name}" if parent_path else name
+                is_dir = meta.type == pytsk3.TSK_FS_META_TYPE_DIR
+                deleted = bool(int(f.info.name.flags) & int(pytsk3.TSK_FS_NAME_FLAG_UNALLOC))
+                records.append((FileRecord(path, name, str(meta.addr), is_dir, deleted, meta.size,
+                                           meta.atime, meta.mtime, meta.ctime, meta.crtime), meta.addr))
+        for record, addr in records:
+            yield record
+            if record.is_dir and not record.deleted and addr not in visited:
+                yield from self._tsk_walk(addr, record.path, visited)
+
+    def lookup(self, name, parent_inode=None, directory_only=False):
+        """부모 디렉토리에서 이름이 일치하는(대소문자 무시) 항목의 inode를 반환"""
+        for entry in self.list_dir(parent_inode):
+            if entry.deleted or (directory_only and not entry.is_dir):
+                continue
+            if entry.name.lower() == name.lower():
+                return entry.inode
+        return None
+
+    def resolve_path(self, path, parent_inode=None):
+        r"""'Windows\System32\config' 같은 경로를 따라 내려가 inode를 반환"""
+        current = parent_inode
+        for component in re.split(r'[\\/]+', path.strip('\\/')):
+            if not component:
+                continue
+            current = self.lookup(component, current)
+            if current is None:
+                return None
+        return current
+
+    def find_stream(self, inode, stream_name):
+        """파일의 이름 있는 $DATA 스트림(ADS, 예: $UsnJrnl의 $J)의 inode 문자열을 반환"""
+        if inode is None:
+            return None
+        meta, _, _ = split_inode(inode)
+        if self.backend == 'tsk':
+            with self._lock:
+                for attr in self.fs.open_meta(inode=meta):
+                    name = attr.info.name.decode('utf-8', errors='replace') if attr.info.name else ''
+                    if int(attr.info.type) == 128 and name == stream_name:
+                        return f"{meta}-128-{attr.info.id}"
+            return None
+
+        command = ['istat', '-f', 'ntfs', '-o', str(self.partition_offset), self.image_path, str(meta)]
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, check=True)
+        except subprocess.CalledProcessError as e:
+            print(f"스트림 정보를 찾는 중 오류 발생: {e}")
+            return None
+        pattern = re.compile(r'Type:\s+\$DATA\s+\((\d+)-(\d+)\)\s+Name:\s+(\S+)')
+        for line in result.stdout.splitlines():
+            match = pattern.search(line)
+            if match and match.group(3) == stream_name:
+                return f"{meta}-{match.group(1)}-{match.group(2)}"
+        return None
+
+    # ------------------------------------------------------------------
+    # 파일 읽기
+    # ------------------------------------------------------------------
+    def _tsk_open(self, inode):
+        meta, attr_type, attr_id = split_inode(inode)
+        f = self.fs.open_meta(inode=meta)
+        size = f.info.meta.size
+        if attr_type is not None:
+            # 속성이 지정된 경우(ADS 등) 해당 속성의 크기를 사용
+            for attr in f:
+                if attr.info.type == attr_type and (attr_id is None or attr.info.id == attr_id):
+                    size = attr.info.size
+                    break
+        return f, size, attr_type, attr_id
+
+    def _tsk_read(self, f, offset, length, attr_type, attr_id):
+        with self._lock:
+            if attr_type is not None:
+                return f.read_random(offset, length, pytsk3.TSK_FS_ATTR_TYPE_ENUM(attr_type), attr_id if attr_id is not None else -1)
+            return f.read_random(offset, length)
+
+    def stream_file(self, inode, chunk_size=DEFAULT_CHUNK_SIZE):
+        """파일 내용을 chunk_size 단위로 내보내는 제너레이터"""
+        if self.backend == 'tsk':
+            with self._lock:
+                f, size, attr_type, attr_id = self._tsk_open(inode)
+            offset = 0
+            while offset < size:
+                data = self._tsk_read(f, offset, min(chunk_size, size - offset), attr_type, attr_id)
+                if not data:
+                    break
+                offset += len(data)
+                yield data
+            return
+
+        command = ['icat', '-f', 'ntfs', '-o', str(self.partition_offset), self.image_path, str(inode)]
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            while True:
+                data = process.stdout.read(chunk_size)
+                if not data:
+                    break
+                yield data
+        finally:
+            process.stdout.close()
+            returncode = process.wait()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, command)
+
+    def read_file(self, inode):
+        """파일 전체 내용을 bytes로 반환"""
+        return b''.join(self.stream_file(inode))
+
+    def read_buffer(self, inode):
+        """파일 전체 내용을 memoryview로 반환 (파서에 복사 없이 넘길 때 사용)"""
+        return memoryview(self.read_file(inode))
+
+    def open_file(self, inode):
+        """파일을 읽기 전용 파일 객체로 연다 (임의 위치 읽기 가능)
+
+        pytsk3 백엔드는 이미지에서 바로 읽고, CLI 백엔드는 icat 출력을
+        SpooledTemporaryFile에 받아 둔다 (SPOOL_MAX_SIZE를 넘을 때만 디스크 사용).
+        """
+        if self.backend == 'tsk':
+            return io.BufferedReader(ImageFile(self, inode), buffer_size=DEFAULT_CHUNK_SIZE)
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        for data in self.stream_file(inode):
+            spool.write(data)
+        spool.seek(0)
+        return spool
+
+    @contextlib.contextmanager
+    def materialize(self, inode, suffix=''):
+        """경로만 받는 라이브러리용: 파일을 임시 파일로 저장하고 그 경로를 넘긴 뒤 삭제"""
+        fd, temp_path = tempfile.mkstemp(suffix=suffix, prefix='defohari_')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for data in self.stream_file(inode):
+                    f.write(data)
+            yield temp_path
+        finally:
+            os.remove(temp_path)
+
+    def open_sqlite(self, inode):
+        """SQLite 파일을 메모리 DB로 연다 (sqlite3.deserialize가 없으면 임시 파일을 거침)"""
+        conn = sqlite3.connect(':memory:')
+        if hasattr(conn, 'deserialize'):
+            data = bytearray(self.read_file(inode))
+            if data[18:20] == b'\x02\x02':
+                # WAL 모드 헤더는 메모리 DB에서 열 수 없으므로 롤백 저널 모드로 표시
+                data[18:20] = b'\x01\x01'
+            conn.deserialize(data)
+            return conn
+        with self.materialize(inode, '.sqlite') as temp_path:
+            source = sqlite3.connect(temp_path)
+            try:
+                source.backup(conn)
+            finally:
+                source.close()
+        return conn
+
+    def extract_file(self, inode, output_path, chunk_size=DEFAULT_CHUNK_SIZE):
+        """파일을 output_path에 스트리밍으로 저장하고 기록한 바이트 수를 반환"""
+        written = 0
+        with open(output_path, 'wb') as f:
+            for data in self.stream_file(inode, chunk_size):
+                f.write(data)
+                written += len(data)
+        return written
+
+    # ------------------------------------------------------------------
+    # 메타데이터
+    # ------------------------------------------------------------------
+    def file_times(self, inode):
+        """$STANDARD_INFORMATION의 생성/접근/수정 시간을 (creation, access, write)로 반환"""
+        if self.backend == 'tsk':
+            meta, _, _ = split_inode(inode)
+            with self._lock:
+                info = self.fs.open_meta(inode=meta).info.meta
+            return tuple(
+                datetime.datetime.fromtimestamp(t) if t else None
+                for t in (info.crtime, info.atime, info.mtime)
+            )
+
+        command = ['istat', '-f', 'ntfs', '-o', str(self.partition_offset), self.image_path, str(inode)]
+        result = subprocess.run(command, capture_output=True, text=True, check=True)
+        times = []
+        for label in ('Created', 'Accessed', 'File Modified'):
+            match = re.search(label + r':\s+(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})(?:\.\d+)?', result.stdout)
+            times.append(datetime.datetime.strptime(match.group(1), '%Y-%m-%d %H:%M:%S') if match else None)
+        return tuple(times)
+
+    def sequence_number(self, inode):
+        """MFT 엔트리의 시퀀스 번호 (알 수 없으면 None)"""
+        meta, _, _ = split_inode(inode)
+        if self.backend == 'tsk':
+            with self._lock:
+                return int(self.fs.open_meta(inode=meta).info.meta.seq)
+
+        command = ['istat', '-f', 'ntfs', '-o', str(self.partition_offset), self.image_path, str(meta)]
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, check=True)
+        except subprocess.CalledProcessError:
+            return None
+        match = re.search(r'Sequence:\s+(\d+)', result.stdout)
+        return int(match.group(1)) if match else None
+
+    def sequence_numbers(self, inodes):
+        """여러 MFT 엔트리의 시퀀스 번호를 한 번에 조회해 {inode: 시퀀스 번호 또는 None} 반환
+
+        CLI 백엔드는 파일마다 istat을 띄우지 않고 $MFT를 icat으로 한 번만 흘려 읽으면서
+        필요한 레코드 헤더의 시퀀스 번호만 취한다 (가장 큰 inode의 레코드까지만 읽고 멈춤).
+        """
+        metas = {inode: split_inode(inode)[0] for inode in inodes}
+        if self.backend == 'tsk':
+            sequences = {}
+            with self._lock:
+                for inode, meta in metas.items():
+                    try:
+                        sequences[inode] = int(self.fs.open_meta(inode=meta).info.meta.seq)
+                    except (IOError, OSError):
+                        sequences[inode] = None
+            return sequences
+
+        found = {}
+        if metas:
+            found = self._cli_mft_sequences(sorted(set(metas.values())))
+        return {inode: found.get(meta) for inode, meta in metas.items()}
+
+    def _cli_mft_sequences(self, wanted):
+        """정렬된 MFT 엔트리 번호 목록의 {번호: 시퀀스 번호}를 $MFT 한 번 읽기로 구함"""
+        command = ['icat', '-f', 'ntfs', '-o', str(self.partition_offset), self.image_path, str(NTFS_MFT_INODE)]
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        sequences = {}
+        try:
+            # 첫 레코드($MFT 자신)에서 레코드 크기를 읽음 (보통 1024, 4Kn 디스크는 4096)
+            first = process.stdout.read(MFT_RECORD_SIZE_OFFSET + MFT_RECORD_SIZE.size)
+            if len(first) < MFT_RECORD_SIZE_OFFSET + MFT_RECORD_SIZE.size or not first.startswith(MFT_RECORD_SIGNATURE):
+                print("$MFT 레코드 헤더를 읽지 못해 시퀀스 번호를 생략합니다.")
+                return sequences
+            record_size = MFT_RECORD_SIZE.unpack_from(first, MFT_RECORD_SIZE_OFFSET)[0] or 1024
+            position = len(first)
+            for meta in wanted:
+                target = meta * record_size
+                if target < position:
+                    # 레코드 0의 헤더는 이미 읽었음
+                    if meta == 0:
+                        sequences[meta] = MFT_SEQUENCE.unpack_from(first, MFT_SEQUENCE_OFFSET)[0]
+                    continue
+                while position < target:
+                    skipped = len(process.stdout.read(min(DEFAULT_CHUNK_SIZE, target - position)))
+                    if not skipped:
+                        return sequences
+                    position += skipped
+                header = process.stdout.read(MFT_SEQUENCE_OFFSET + MFT_SEQUENCE.size)
+                position += len(header)
+                if len(header) < MFT_SEQUENCE_OFFSET + MFT_SEQUENCE.size:
+                    return sequences
+                if header.startswith(MFT_RECORD_SIGNATURE):
+                    sequences[meta] = MFT_SEQUENCE.unpack_from(header, MFT_SEQUENCE_OFFSET)[0]
+            return sequences
+        finally:
+            # 필요한 레코드를 다 읽었으면 나머지 $MFT는 읽지 않고 종료
+            process.kill()
+            process.stdout.close()
+            process.wait()
+
+    def close(self):
+        self._fs = None
+        if self._img is not None:
+            self._img.close()
+            self._img = None
+
+
+# 실행(프로세스) 단위로 이미지당 세션을 하나만 유지
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(image_path, **kwargs):
+    """image_path(와 partition_offset)에 대한 세션을 반환 (같은 프로세스에서는 재사용)"""
+    key = (os.path.abspath(image_path), kwargs.get('partition_offset'))
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = ImageSession(image_path, **kwargs)
+            _sessions[key] = session
+        return session
+
+
+def get_partition_sessions(image_path, **kwargs):
+    """이미지의 모든 NTFS 파티션에 대한 세션 목록 (첫 번째 볼륨 외의 파티션도 분석할 때 사용)
+
+    기본 세션이 고른 파티션은 그 세션을 그대로 돌려줌 (같은 볼륨을 두 번 열지 않음)
+    """
+    default = get_session(image_path, **kwargs)
+    sessions = []
+    for partition in ntfs_partitions(default.layout):
+        if partition.start == default.partition_offset:
+            sessions.append(default)
+        else:
+            sessions.append(get_session(image_path, partition_offset=partition.start, **kwargs))
+    return sessions
+
+
+def get_first_disk_image_path(image_directory):
+    """지정된 디렉토리에서 첫 번째 디스크 이미지(.e01) 경로를 반환 (DEFOHARI_IMAGE가 있으면 그 이미지)"""
+    if os.environ.get(IMAGE_ENV):
+        return os.environ[IMAGE_ENV]
+    disk_image_extensions = ['.e01']
+    for filename in os.listdir(image_directory):
+        if any(filename.lower().endswith(ext) for ext in disk_image_extensions):
+            return os.path.join(image_directory, filename)
+    return None
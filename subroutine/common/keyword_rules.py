@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+의심 키워드 매칭 모듈
+
+안티포렌식 의심 키워드 규칙을 외부 규칙 파일(anti_forensic_rules.json, DEFOHARI_RULES로 다른 파일 지정 가능)에서 읽어
+규칙 집합마다 하나의 정규 표현식(규칙별 이름 있는 그룹의 alternation)으로 컴파일한다.
+각 문자열은 한 번만 검사하고 어떤 규칙에 걸렸는지 돌려주며, pandas Series/DataFrame은 str.extract로 열 단위로 검사한다.
+
+규칙은 문자열(대소문자를 구분하지 않는 부분 문자열) 또는 {"name": 이름, "regex": 정규 표현식}이다.
+한 위치에서 여러 규칙이 맞으면 파일에 먼저 적힌 규칙을 보고한다.
+"""
+import os
+import re
+import json
+
+# 규칙 파일 경로 (환경 변수로 사건별 규칙 파일을 지정할 수 있음)
+RULES_ENV = 'DEFOHARI_RULES'
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'anti_forensic_rules.json')
+
+# 기본 규칙 집합 이름
+DEFAULT_RULE_SET = 'anti_forensic'
+
+
+def rules_path():
+    return os.environ.get(RULES_ENV) or DEFAULT_RULES_PATH
+
+
+def load_rule_sets(path=None):
+    """규칙 파일을 읽어 {규칙 집합 이름: [(규칙 이름, 정규 표현식)]} 반환"""
+    with open(path or rules_path(), 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    rule_sets = {}
+    for name, rules in data.get('rule_sets', {}).items():
+        compiled = []
+        for rule in rules:
+            if isinstance(rule, str):
+                compiled.append((rule, re.escape(rule)))
+            else:
+                compiled.append((rule['name'], rule['regex']))
+        rule_sets[name] = compiled
+    return rule_sets
+
+
+class KeywordMatcher:
+    """규칙 목록을 하나의 정규 표현식으로 컴파일한 매처"""
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.names = [name for name, _ in self.rules]
+        # 규칙마다 이름 있는 그룹 (m.lastgroup으로 어떤 규칙인지 확인)
+        self.pattern = '|'.join(f"(?P<r{i}>{regex})" for i, (_, regex) in enumerate(self.rules)) or '(?!)'
+        self.regex = re.compile(self.pattern, re.IGNORECASE)
+
+    @classmethod
+    def from_keywords(cls, keywords):
+        return cls((keyword, re.escape(keyword)) for keyword in keywords)
+
+    def match(self, text):
+        """처음 맞은 규칙 이름 (맞은 규칙이 없거나 text가 None이면 None)"""
+        if not text:
+            return None
+        m = self.regex.search(text if isinstance(text, str) else str(text))
+        if m is None:
+            return None
+        return self.names[int(m.lastgroup[1:])]
+
+    def is_match(self, text):
+        return self.match(text) is not None
+
+    def match_any(self, *texts):
+        """여러 필드 중 처음 맞은 규칙 이름 (필드 순서대로 검사)"""
+        for text in texts:
+            rule = self.match(text)
+            if rule is not None:
+                return rule
+        return None
+
+    def match_many(self, texts):
+        """문자열 목록의 규칙 이름 목록 (맞지 않으면 None)"""
+        match = self.match
+        return [match(text) for text in texts]
+
+    def match_series(self, series):
+        """pandas Series의 각 값에 맞은 규칙 이름 Series (맞지 않으면 NaN)"""
+        extracted = series.astype('string').str.extract(self.pattern, flags=re.IGNORECASE, expand=True)
+        # 규칙 정규 표현식 안의 이름 없는 그룹 열은 제외
+        matched = extracted[[f"r{i}" for i in range(len(self.rules))]].notna()
+        rule_names = matched.idxmax(axis=1).map(lambda group: self.names[int(group[1:])])
+        return rule_names.where(matched.any(axis=1))
+
+    def match_frame(self, df, columns):
+        """DataFrame의 columns 중 처음 맞은 열의 규칙 이름 Series (맞지 않으면 NaN)"""
+        result = None
+        for column in columns:
+            rule_names = self.match_series(df[column])
+            result = rule_names if result is None else result.fillna(rule_names)
+        return result
+
+
+_matchers = {}
+
+
+def get_matcher(rule_set=DEFAULT_RULE_SET):
+    """규칙 집합의 매처 (규칙 파일은 프로세스에서 한 번만 읽음)"""
+    key = (rules_path(), rule_set)
+    if key not in _matchers:
+        rule_sets = load_rule_sets(key[0])
+        if rule_set not in rule_sets:
+            raise KeyError(f"규칙 파일 {key[0]}에 '{rule_set}' 규칙 집합이 없습니다.")
+        _matchers[key] = KeywordMatcher(rule_sets[rule_set])
+    return _matchers[key]
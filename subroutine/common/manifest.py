@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+추출 매니페스트 모듈
+
+추출한 파일마다 (이미지 지문, inode, 시퀀스 번호, 크기, SHA-256, 출력 경로)를 기록해서
+같은 이미지를 다시 분석할 때 입력이 바뀌지 않은 추출/분석 단계를 건너뛴다.
+"""
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import namedtuple
+
+from volume_layout import get_cache_dir
+
+# 증분 실행 여부 (DEFOHARI_INCREMENTAL=0이면 항상 다시 추출/분석)
+INCREMENTAL = os.environ.get('DEFOHARI_INCREMENTAL', '1') != '0'
+
+ManifestEntry = namedtuple('ManifestEntry', ['fingerprint', 'inode', 'sequence', 'size', 'sha256', 'output_path', 'output_mtime', 'extracted_at'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractions (
+    output_path TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    inode TEXT NOT NULL,
+    sequence INTEGER,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    output_mtime INTEGER NOT NULL,
+    extracted_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_extractions_source ON extractions (fingerprint, inode);
+CREATE TABLE IF NOT EXISTS stages (
+    stage TEXT PRIMARY KEY,
+    input_key TEXT NOT NULL,
+    outputs TEXT NOT NULL,
+    finished_at REAL NOT NULL
+);
+"""
+
+
+def file_digest(*paths):
+    """파일(디렉토리면 안의 .py 파일 전체) 내용의 SHA-256. 분석 스크립트가 바뀌었는지 판단할 때 사용"""
+    digest = hashlib.sha256()
+    for path in paths:
+        if not os.path.exists(path):
+            # 아직 준비되지 않은 스크립트(압축 해제 전 등)는 이름만 반영
+            digest.update(f"missing:{path}".encode('utf-8'))
+            continue
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(path)
+                           for name in names if name.endswith('.py'))
+        else:
+            files = [path]
+        for file_path in files:
+            digest.update(os.path.basename(file_path).encode('utf-8'))
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stage_key(*parts):
+    """단계 입력(해시, 설정 값 등)을 하나의 키로 합침"""
+    return hashlib.sha256('\n'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+
+def _normalize(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+class ExtractionManifest:
+    """이미지별 추출/분석 기록 (SQLite, 여러 서브루틴 프로세스가 함께 사용)"""
+
+    def __init__(self, image_path, manifest_path=None):
+        self.manifest_path = manifest_path or os.path.join(
+            get_cache_dir(image_path), os.path.basename(image_path) + '.manifest.sqlite')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.manifest_path, timeout=60, check_same_thread=False)
+        with self._lock:
+            # 여러 프로세스가 동시에 기록하므로 WAL 모드 사용
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    # ------------------------------------------------------------------
+    # 파일 추출
+    # ------------------------------------------------------------------
+    def lookup(self, output_path):
+        """출력 경로에 대한 기록을 반환 (없으면 None)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, inode, sequence, size, sha256, output_path, output_mtime, extracted_at "
+                "FROM extractions WHERE output_path = ?", (_normalize(output_path),)).fetchone()
+        return ManifestEntry(*row) if row else None
+
+    def is_current(self, fingerprint, inode, output_path):
+        """같은 이미지/inode에서 추출한 파일이 그대로 남아 있으면 True (다시 추출할 필요 없음)"""
+        if not INCREMENTAL:
+            return False
+        entry = self.lookup(output_path)
+        if entry is None or entry.fingerprint != fingerprint or entry.inode != str(inode):
+            return False
+        try:
+            stat = os.stat(output_path)
+        except OSError:
+            return False
+        # 추출 후 파일이 바뀌었으면(압축 해제 등) 다시 추출
+        return stat.st_size == entry.size and stat.st_mtime_ns == entry.output_mtime
+
+    def record(self, fingerprint, inode, sequence, size, sha256, output_path):
+        """추출 결과를 기록"""
+        stat = os.stat(output_path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extractions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (_normalize(output_path), fingerprint, str(inode), sequence, size, sha256, stat.st_mtime_ns, time.time()))
+            self._conn.commit()
+
+    def extracted_key(self, fingerprint, *directories):
+        """directories 아래에 이 이미지에서 추출해 그대로 남아 있는 파일들의 (상대 경로, SHA-256)을 합친 키
+
+        분석 단계의 입력 키로 사용 (추출한 입력이 같으면 키도 같음, 이미지 지문도 함께 반영)
+        """
+        prefixes = [_normalize(directory) + os.sep for directory in directories]
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT output_path, sha256, size, output_mtime FROM extractions WHERE fingerprint = ? ORDER BY output_path",
+                (fingerprint,)).fetchall()
+        parts = [fingerprint]
+        for output_path, sha256, size, output_mtime in rows:
+            prefix = next((p for p in prefixes if output_path.startswith(p)), None)
+            if prefix is None:
+                continue
+            try:
+                stat = os.stat(output_path)
+            except OSError:
+                continue
+            if stat.st_size == size and stat.st_mtime_ns == output_mtime:
+                parts.append(f"{output_path[len(prefix):]}:{sha256}")
+        return stage_key(*parts)
+
+    def sha256_of(self, output_path):
+        """기록된 출력 파일의 SHA-256 (기록이 없으면 None)"""
+        entry = self.lookup(output_path)
+        return entry.sha256 if entry else None
+
+    # ------------------------------------------------------------------
+    # 분석 단계
+    # ------------------------------------------------------------------
+    def is_stage_current(self, stage, input_key):
+        """단계가 같은 입력으로 이미 끝났고 출력 파일이 모두 남아 있으면 True"""
+        if not INCREMENTAL:
+            return False
+        with self._lock:
+            row = self._conn.execute("SELECT input_key, outputs FROM stages WHERE stage = ?", (stage,)).fetchone()
+        if row is None or row[0] != input_key:
+            return False
+        return all(os.path.exists(path) for path in json.loads(row[1]))
+
+    def record_stage(self, stage, input_key, outputs):
+        """단계 완료를 기록 (outputs는 생성한 파일 경로 목록)"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?)",
+                (stage, input_key, json.dumps([os.path.abspath(p) for p in outputs]), time.time()))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def get_manifest(image_path):
+    """이미지에 대한 매니페스트를 반환 (같은 프로세스에서는 재사용)"""
+    key = os.path.abspath(image_path)
+    with _manifests_lock:
+        if key not in _manifests:
+            _manifests[key] = ExtractionManifest(image_path)
+        return _manifests[key]
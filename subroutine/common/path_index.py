@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+이미지 경로 인덱스 모듈
+
+파일시스템을 한 번만 순회해서 전체 경로 -> inode/크기/MAC 시간을 이미지별 SQLite 인덱스로 캐시하고,
+서브루틴들은 디렉토리를 하나씩 내려가는 대신 경로 조회/목록/glob 질의로 아티팩트를 찾는다.
+"""
+import os
+import time
+import ctypes
+import sqlite3
+import datetime
+import threading
+
+from image_session import FileRecord
+from volume_layout import get_cache_dir
+
+# 스키마가 바뀌면 올려서 기존 인덱스를 다시 만들게 함
+INDEX_VERSION = '1'
+
+# 한 번에 INSERT 하는 레코드 수
+BATCH_SIZE = 5000
+
+# 인덱스를 만드는 프로세스는 잠금 파일에 PID를 적고 이 간격(초)마다 수정 시간을 갱신
+LOCK_HEARTBEAT = 30
+
+# 잠금 파일이 이 시간(초) 넘게 갱신되지 않았거나 PID의 프로세스가 없으면 중단된 빌드로 보고 잠금을 지움
+LOCK_STALE_AFTER = 10 * 60
+
+# Windows 프로세스 확인용 상수
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+STILL_ACTIVE = 259
+ERROR_ACCESS_DENIED = 5
+
+COLUMNS = 'path, name, inode, is_dir, deleted, size, atime, mtime, ctime, crtime'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT NOT NULL,
+    path_lc TEXT NOT NULL,
+    parent_lc TEXT NOT NULL,
+    name TEXT NOT NULL,
+    inode TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    deleted INTEGER NOT NULL,
+    size INTEGER,
+    atime INTEGER,
+    mtime INTEGER,
+    ctime INTEGER,
+    crtime INTEGER
+);
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_files_path ON files (path_lc);
+CREATE INDEX IF NOT EXISTS idx_files_parent ON files (parent_lc);
+"""
+
+
+def normalize_path(path):
+    """'Windows\\System32' / '/Windows/System32/' 등을 'Windows/System32' 형태로 통일"""
+    return path.replace('\\', '/').strip('/')
+
+
+def _row_to_record(row):
+    path, name, inode, is_dir, deleted, size, atime, mtime, ctime, crtime = row
+    return FileRecord(path, name, inode, bool(is_dir), bool(deleted), size, atime, mtime, ctime, crtime)
+
+
+def process_alive(pid):
+    """PID의 프로세스가 살아 있는지 확인 (Windows는 os.kill(pid, 0)이 프로세스를 종료하므로 OpenProcess 사용)"""
+    if pid <= 0:
+        return False
+    if os.name == 'nt':
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            # 권한이 없어 열지 못한 경우는 살아 있는 프로세스
+            return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+        try:
+            exit_code = ctypes.c_ulong()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+                return True
+            return exit_code.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def lock_is_stale(lock_path):
+    """잠금 파일의 주인(PID)이 죽었거나 잠금이 LOCK_STALE_AFTER 넘게 갱신되지 않았으면 True"""
+    try:
+        age = time.time() - os.path.getmtime(lock_path)
+        with open(lock_path, 'r', encoding='ascii', errors='replace') as f:
+            content = f.read().split()
+    except FileNotFoundError:
+        return False
+    if age > LOCK_STALE_AFTER:
+        return True
+    # PID를 쓰기 전(방금 생성된 잠금)이면 아직 살아 있는 것으로 봄
+    if not content or not content[0].isdigit():
+        return False
+    return not process_alive(int(content[0]))
+
+
+def record_times(record):
+    """FileRecord의 생성/접근/수정 시간을 (creation, access, write) datetime으로 반환 (세션의 file_times와 동일)"""
+    return tuple(
+        datetime.datetime.fromtimestamp(t) if t else None
+        for t in (record.crtime, record.atime, record.mtime)
+    )
+
+
+class PathIndex:
+    """이미지 전체 경로 -> inode/크기/MAC 시간 인덱스 (SQLite, 이미지별로 캐시)"""
+
+    def __init__(self, session, index_path=None):
+        self.session = session
+        # 파티션마다 인덱스를 따로 둠
+        self.index_path = index_path or os.path.join(
+            get_cache_dir(session.image_path),
+            f"{os.path.basename(session.image_path)}.{session.partition_offset}.paths.sqlite")
+        self._lock = threading.Lock()
+        self._conn = None
+        self._lock_path = self.index_path + '.lock'
+        self._holding_lock = False
+        self._heartbeat = 0
+
+    # ------------------------------------------------------------------
+    # 생성 / 검증
+    # ------------------------------------------------------------------
+    def _expected_meta(self):
+        return {
+            'version': INDEX_VERSION,
+            'fingerprint': self.session.fingerprint,
+            'partition_offset': str(self.session.partition_offset),
+        }
+
+    def _is_valid(self):
+        if not os.path.exists(self.index_path):
+            return False
+        try:
+            conn = sqlite3.connect(self.index_path)
+            try:
+                stored = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+            finally:
+                conn.close()
+        except sqlite3.DatabaseError:
+            return False
+        return all(stored.get(key) == value for key, value in self._expected_meta().items())
+
+    def open(self):
+        """유효한 인덱스가 있으면 재사용하고, 없으면 한 번 순회해서 만든다"""
+        if self._conn is not None:
+            return self
+        if not self._is_valid():
+            self._build_with_lock()
+        self._conn = sqlite3.connect(self.index_path, check_same_thread=False)
+        return self
+
+    def _build_with_lock(self):
+        # 여러 서브루틴이 동시에 실행되므로 한 프로세스만 인덱스를 만들고 나머지는 기다림
+        while True:
+            try:
+                fd = os.open(self._lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                if self._is_valid():
+                    return
+                if lock_is_stale(self._lock_path):
+                    print("경로 인덱스를 만들던 프로세스가 중단되어 잠금을 지우고 다시 생성합니다.")
+                    try:
+                        os.remove(self._lock_path)
+                    except FileNotFoundError:
+                        pass
+                    continue
+                time.sleep(1)
+        try:
+            os.write(fd, f"{os.getpid()} {time.time():.0f}\n".encode('ascii'))
+            os.close(fd)
+            self._holding_lock = True
+            self._heartbeat = time.time()
+            if not self._is_valid():
+                self.build()
+        finally:
+            self._holding_lock = False
+            os.remove(self._lock_path)
+
+    def _touch_lock(self):
+        """빌드 중임을 알리도록 LOCK_HEARTBEAT마다 잠금 파일의 수정 시간을 갱신"""
+        if not self._holding_lock or time.time() - self._heartbeat < LOCK_HEARTBEAT:
+            return
+        self._heartbeat = time.time()
+        try:
+            os.utime(self._lock_path)
+        except FileNotFoundError:
+            pass
+
+    def build(self):
+        """파일시스템을 한 번 순회해서 인덱스를 새로 만든다 (임시 파일에 쓴 뒤 교체)"""
+        print(f"경로 인덱스 생성 중: {self.index_path}")
+        started = time.time()
+        temp_path = self.index_path + '.tmp'
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+        conn = sqlite3.connect(temp_path)
+        count = 0
+        try:
+            conn.executescript(SCHEMA)
+            batch = []
+            for record in self.session.walk():
+                path_lc = record.path.lower()
+                parent_lc = path_lc.rsplit('/', 1)[0] if '/' in path_lc else ''
+                batch.append((record.path, path_lc, parent_lc, record.name, record.inode,
+                              int(record.is_dir), int(record.deleted), record.size,
+                              record.atime, record.mtime, record.ctime, record.crtime))
+                if len(batch) >= BATCH_SIZE:
+                    conn.executemany("INSERT INTO files VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", batch)
+                    count += len(batch)
+                    batch = []
+                    self._touch_lock()
+            if batch:
+                conn.executemany("INSERT INTO files VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", batch)
+                count += len(batch)
+            conn.executescript(INDEXES)
+            # 메타 정보는 마지막에 기록 (중간에 실패하면 무효한 인덱스로 취급)
+            conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", self._expected_meta().items())
+            conn.commit()
+        finally:
+            conn.close()
+
+        os.replace(temp_path, self.index_path)
+        print(f"경로 인덱스 생성 완료: {count}개 항목, {time.time() - started:.1f}초")
+
+    # ------------------------------------------------------------------
+    # 조회
+    # ------------------------------------------------------------------
+    def _query(self, sql, params):
+        self.open()
+        with self._lock:
+            return [_row_to_record(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def lookup(self, path):
+        """경로(대소문자 무시)에 해당하는 FileRecord 반환. 삭제되지 않은 항목을 우선"""
+        records = self._query(
+            f"SELECT {COLUMNS} FROM files WHERE path_lc = ? ORDER BY deleted LIMIT 1",
+            (normalize_path(path).lower(),))
+        return records[0] if records else None
+
+    def inode(self, path):
+        """경로에 해당하는 inode 반환 (없거나 삭제된 항목이면 None)"""
+        record = self.lookup(path)
+        if record is None or record.deleted:
+            return None
+        return record.inode
+
+    def list_dir(self, path, include_deleted=False):
+        """디렉토리 바로 아래 항목 목록"""
+        sql = f"SELECT {COLUMNS} FROM files WHERE parent_lc = ?"
+        if not include_deleted:
+            sql += " AND deleted = 0"
+        return self._query(sql + " ORDER BY path", (normalize_path(path).lower(),))
+
+    def glob(self, pattern, include_deleted=False):
+        """glob 패턴(대소문자 무시)에 맞는 항목 목록
+
+        '*'는 한 단계 경로 안에서만 매칭되고, '**'가 있으면 하위 디렉토리까지 매칭됨
+        """
+        pattern = normalize_path(pattern).lower()
+        sql = f"SELECT {COLUMNS} FROM files WHERE path_lc GLOB ?"
+        if not include_deleted:
+            sql += " AND deleted = 0"
+        records = self._query(sql + " ORDER BY path", (pattern.replace('**', '*'),))
+        if '**' not in pattern:
+            depth = pattern.count('/')
+            records = [record for record in records if record.path.count('/') == depth]
+        return records
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+# 프로세스 안에서는 세션당 인덱스를 하나만 유지
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_path_index(session):
+    """세션(이미지)에 대한 경로 인덱스를 반환 (필요하면 생성)"""
+    with _indexes_lock:
+        index = _indexes.get(id(session))
+        if index is None:
+            index = PathIndex(session).open()
+            _indexes[id(session)] = index
+        return index
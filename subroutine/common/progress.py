@@ -0,0 +1,379 @@
+# -*- coding: utf-8 -*-
+"""
+진행 상황 프로토콜 모듈
+
+파이프라인 단계가 표준 출력에 한 줄짜리 JSON 진행 이벤트(단계, 처리한 항목 수/전체, 처리한 바이트, 처리 속도)를 내보내고,
+GUI/CLI는 자식 프로세스의 stdout/stderr를 별도 스레드에서 읽어 일반 로그와 진행 이벤트를 나눈다.
+로그는 단계별 버퍼 기록기로 쓰고, 진행 이벤트는 ProgressTracker가 모아 처리 속도 기준의 남은 시간을 계산한다.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import threading
+
+# 진행 이벤트 줄의 접두어 (뒤에 JSON 한 줄)
+PROGRESS_PREFIX = '@@DEFOHARI_PROGRESS '
+
+# 진행 이벤트를 내보낼지 여부 (GUI/CLI가 자식 프로세스에 설정, 단독 실행 시에는 출력하지 않음)
+PROGRESS_ENV = 'DEFOHARI_PROGRESS'
+
+# 같은 단계의 progress 이벤트를 내보내는 최소 간격 (초)
+EMIT_INTERVAL = 0.5
+
+# 로그 버퍼를 파일에 내려쓰는 간격 (초)
+LOG_FLUSH_INTERVAL = 1.0
+
+
+def progress_enabled():
+    return os.environ.get(PROGRESS_ENV) == '1'
+
+
+def child_env(env=None):
+    """자식 프로세스 환경 변수 (진행 이벤트 출력, stdout 버퍼링 없음)"""
+    env = dict(os.environ if env is None else env)
+    env[PROGRESS_ENV] = '1'
+    env['PYTHONUNBUFFERED'] = '1'
+    return env
+
+
+def parse_progress_line(line):
+    """진행 이벤트 줄이면 이벤트 dict를, 일반 로그 줄이면 None을 반환"""
+    if not line.startswith(PROGRESS_PREFIX):
+        return None
+    try:
+        event = json.loads(line[len(PROGRESS_PREFIX):])
+    except ValueError:
+        return None
+    return event if isinstance(event, dict) else None
+
+
+# ----------------------------------------------------------------------
+# 단계 쪽: 진행 이벤트 내보내기
+# ----------------------------------------------------------------------
+class ProgressReporter:
+    """파이프라인 하나의 진행 이벤트를 표준 출력에 기록"""
+
+    def __init__(self, pipeline, enabled=None):
+        self.pipeline = pipeline
+        self.enabled = progress_enabled() if enabled is None else enabled
+        self.stage = None
+        self._lock = threading.Lock()
+        self._reset_stage(None)
+
+    def _reset_stage(self, stage):
+        self.stage = stage
+        self.started = time.time()
+        self.done = 0
+        self.total = None
+        self.bytes_done = 0
+        # 시작 직후의 몇 항목으로 계산한 속도는 부정확하므로 첫 이벤트도 간격을 둠
+        self._last_emit = self.started
+
+    def _emit(self, event, **fields):
+        if not self.enabled:
+            return
+        data = {'pipeline': self.pipeline, 'stage': self.stage, 'event': event, 'time': time.time()}
+        data.update(fields)
+        # 일반 print와 섞이지 않도록 한 번에 한 줄로 기록
+        sys.stdout.write(PROGRESS_PREFIX + json.dumps(data, ensure_ascii=True) + '\n')
+        sys.stdout.flush()
+
+    def plan(self, steps):
+        """파이프라인이 실행할 단계 목록을 알림 (전체 진행률 계산에 사용)"""
+        with self._lock:
+            self._emit('plan', steps=list(steps))
+
+    def start_stage(self, stage, total=None):
+        with self._lock:
+            self._reset_stage(stage)
+            self.total = total
+            self._emit('start', total=total)
+
+    def update(self, done=None, total=None, bytes_done=None, advance=0, advance_bytes=0, force=False):
+        """단계 진행 상황 갱신 (done/bytes_done은 누적값, advance/advance_bytes는 증가분)"""
+        with self._lock:
+            if total is not None:
+                self.total = total
+            self.done = done if done is not None else self.done + advance
+            self.bytes_done = bytes_done if bytes_done is not None else self.bytes_done + advance_bytes
+            now = time.time()
+            finished = self.total is not None and self.done >= self.total
+            if not (force or finished) and now - self._last_emit < EMIT_INTERVAL:
+                return
+            self._last_emit = now
+            elapsed = max(now - self.started, 1e-6)
+            self._emit('progress', done=self.done, total=self.total, bytes=self.bytes_done,
+                       elapsed=elapsed, items_per_sec=self.done / elapsed, bytes_per_sec=self.bytes_done / elapsed)
+
+    def add_total(self, count):
+        """처리할 항목 수를 늘림 (한 단계에서 여러 번 나누어 처리할 때)"""
+        with self._lock:
+            self.total = (self.total or 0) + count
+
+    def finish_stage(self, status='done'):
+        """단계 종료 ('done', 'failed', 'cached')"""
+        with self._lock:
+            self._emit(status, done=self.done, total=self.total, bytes=self.bytes_done,
+                       elapsed=time.time() - self.started)
+            self._reset_stage(None)
+
+
+# 현재 프로세스에서 진행 중인 파이프라인 (추출기 등 하위 모듈이 단계를 몰라도 진행 상황을 보고할 수 있게 함)
+_current = None
+
+
+def set_reporter(reporter):
+    global _current
+    _current = reporter
+
+
+def report(done=None, total=None, bytes_done=None, advance=0, advance_bytes=0, force=False):
+    """현재 단계의 진행 상황을 보고 (진행 중인 단계가 없으면 무시)"""
+    reporter = _current
+    if reporter is not None and reporter.stage is not None:
+        reporter.update(done, total, bytes_done, advance, advance_bytes, force)
+
+
+def report_total(count):
+    """현재 단계에서 처리할 항목 수를 count만큼 늘림 (진행 중인 단계가 없으면 무시)"""
+    reporter = _current
+    if reporter is not None and reporter.stage is not None:
+        reporter.add_total(count)
+
+
+# ----------------------------------------------------------------------
+# 실행기 쪽: 자식 프로세스 출력 읽기와 로그 기록
+# ----------------------------------------------------------------------
+def start_stream_readers(process, line_queue):
+    """stdout/stderr를 각각 별도 스레드에서 읽어 ('stdout'|'stderr', 줄)을 큐에 넣음
+
+    한쪽 파이프가 가득 차서 자식 프로세스가 멈추는 일이 없도록 두 스트림을 동시에 읽는다.
+    각 스트림이 끝나면 (이름, None)을 넣는다.
+    """
+    def pump(name, stream):
+        try:
+            for line in iter(stream.readline, ''):
+                line_queue.put((name, line))
+        except (OSError, ValueError):
+            pass
+        finally:
+            stream.close()
+            line_queue.put((name, None))
+
+    threads = []
+    for name, stream in (('stdout', process.stdout), ('stderr', process.stderr)):
+        if stream is None:
+            continue
+        t = threading.Thread(target=pump, args=(name, stream), daemon=True)
+        t.start()
+        threads.append(t)
+    return threads
+
+
+def drain_process(process, line_queue, on_line, stop_event=None, poll_interval=0.2):
+    """자식 프로세스가 끝날 때까지 출력 줄을 on_line(스트림 이름, 줄)로 넘김
+
+    stop_event가 설정되면 False를 반환 (프로세스 종료는 호출한 쪽에서 처리)
+    """
+    open_streams = sum(1 for s in (process.stdout, process.stderr) if s is not None)
+    while open_streams:
+        if stop_event is not None and stop_event.is_set():
+            return False
+        try:
+            name, line = line_queue.get(timeout=poll_interval)
+        except queue.Empty:
+            continue
+        if line is None:
+            open_streams -= 1
+            continue
+        on_line(name, line)
+    process.wait()
+    return True
+
+
+class BufferedLogWriter:
+    """단계 하나의 로그 파일 기록기 (파일을 한 번만 열고 모아서 내려씀)"""
+
+    def __init__(self, path, mode='a', flush_interval=LOG_FLUSH_INTERVAL):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.flush_interval = flush_interval
+        self._file = open(path, mode, encoding='utf-8', buffering=64 * 1024)
+        self._lock = threading.Lock()
+        self._last_flush = time.time()
+
+    def write(self, text):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(text)
+            # 실행 중에도 로그를 볼 수 있도록 일정 간격으로 내려씀
+            now = time.time()
+            if now - self._last_flush >= self.flush_interval:
+                self._file.flush()
+                self._last_flush = now
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ----------------------------------------------------------------------
+# 진행률과 남은 시간 계산
+# ----------------------------------------------------------------------
+class _TaskProgress:
+    def __init__(self):
+        self.started = None
+        self.finished = False
+        self.steps = []
+        self.finished_steps = {}  # 단계 이름: 소요 시간
+        self.stage = None
+        self.stage_started = None
+        self.done = 0
+        self.total = None
+        self.bytes = 0
+        self.items_per_sec = 0
+        self.bytes_per_sec = 0
+
+
+class ProgressTracker:
+    """작업(파이프라인)별 진행 이벤트를 모아 전체 진행률과 처리 속도 기준의 남은 시간을 계산"""
+
+    def __init__(self):
+        self.tasks = {}
+        self._lock = threading.Lock()
+
+    def add_task(self, name):
+        with self._lock:
+            self.tasks.setdefault(name, _TaskProgress())
+
+    def start_task(self, name):
+        with self._lock:
+            task = self.tasks.setdefault(name, _TaskProgress())
+            task.started = time.time()
+
+    def finish_task(self, name):
+        with self._lock:
+            task = self.tasks.setdefault(name, _TaskProgress())
+            task.finished = True
+            task.stage = None
+
+    def update(self, name, event):
+        """진행 이벤트(parse_progress_line 결과)를 반영"""
+        with self._lock:
+            task = self.tasks.setdefault(name, _TaskProgress())
+            if task.started is None:
+                task.started = time.time()
+            kind = event.get('event')
+            if kind == 'plan':
+                task.steps = list(event.get('steps') or [])
+            elif kind == 'start':
+                task.stage = event.get('stage')
+                task.stage_started = time.time()
+                task.done, task.total, task.bytes = 0, event.get('total'), 0
+                task.items_per_sec = task.bytes_per_sec = 0
+            elif kind == 'progress':
+                task.done = event.get('done') or 0
+                task.total = event.get('total')
+                task.bytes = event.get('bytes') or 0
+                task.items_per_sec = event.get('items_per_sec') or 0
+                task.bytes_per_sec = event.get('bytes_per_sec') or 0
+            elif kind in ('done', 'cached', 'failed'):
+                stage = event.get('stage')
+                task.finished_steps[stage] = 0 if kind == 'cached' else (event.get('elapsed') or 0)
+                task.stage = None
+
+    def _stage_fraction(self, task):
+        if task.stage is None or not task.total:
+            return 0.0
+        return min(task.done / task.total, 1.0)
+
+    def _fraction(self, task):
+        if task.finished:
+            return 1.0
+        if not task.steps:
+            return 0.0
+        finished = sum(1 for step in task.steps if step in task.finished_steps)
+        return min((finished + self._stage_fraction(task)) / len(task.steps), 1.0)
+
+    def _remaining(self, task, now):
+        """작업 하나의 남은 시간 (초, 알 수 없으면 None)"""
+        if task.finished:
+            return 0.0
+        if task.started is None or not task.steps:
+            return None
+        remaining_steps = [step for step in task.steps if step not in task.finished_steps and step != task.stage]
+        timed = [elapsed for elapsed in task.finished_steps.values() if elapsed > 0]
+
+        # 진행 중인 단계: 항목 처리 속도로 남은 항목을 처리하는 시간
+        current = 0.0
+        if task.stage is not None:
+            if task.total and task.items_per_sec > 0:
+                current = max(task.total - task.done, 0) / task.items_per_sec
+            elif timed:
+                current = max(sum(timed) / len(timed) - (now - task.stage_started), 0)
+            else:
+                current = None
+
+        # 남은 단계: 끝난 단계들의 평균 소요 시간, 없으면 지금까지의 진행률로 추정
+        if timed and current is not None:
+            return current + len(remaining_steps) * sum(timed) / len(timed)
+        fraction = self._fraction(task)
+        if fraction <= 0:
+            return None
+        elapsed = now - task.started
+        return elapsed * (1 - fraction) / fraction
+
+    def overall_fraction(self):
+        """전체 진행률 (0~1, 작업별 진행률의 평균)"""
+        with self._lock:
+            if not self.tasks:
+                return 0.0
+            return sum(self._fraction(task) for task in self.tasks.values()) / len(self.tasks)
+
+    def eta(self):
+        """전체 남은 시간 (초). 작업들은 병렬로 실행되므로 가장 오래 남은 작업 기준, 알 수 없으면 None"""
+        now = time.time()
+        with self._lock:
+            remaining = [self._remaining(task, now) for task in self.tasks.values() if not task.finished]
+        if not remaining:
+            return 0.0
+        known = [r for r in remaining if r is not None]
+        return max(known) if known else None
+
+    def describe(self, name):
+        """작업의 현재 단계와 처리 속도 요약 문자열"""
+        with self._lock:
+            task = self.tasks.get(name)
+            if task is None or task.stage is None:
+                return ''
+            text = task.stage
+            if task.total:
+                text += f" {task.done}/{task.total}"
+            if task.bytes_per_sec > 0:
+                text += f" ({task.bytes_per_sec / (1024 * 1024):.1f} MB/s)"
+            elif task.items_per_sec > 0:
+                text += f" ({task.items_per_sec:.1f}개/초)"
+            return text
+
+
+def format_duration(seconds):
+    """남은 시간 표시 문자열"""
+    if seconds is None:
+        return "계산 중..."
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}시간 {seconds % 3600 // 60}분"
+    return f"{seconds // 60}분 {seconds % 60}초"
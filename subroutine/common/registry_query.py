@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+"""
+레지스트리 조회 모듈
+
+하이브 파일을 프로세스에서 한 번만 mmap으로 열고(get_hive), 키 경로 → 셀 오프셋 캐시를 조회하면서 채운다.
+한 번 읽은 키의 하위 키 이름 목록도 캐시해서, 같은 부모 아래 키를 다시 찾을 때 루트부터 다시 탐색하지 않는다.
+값 데이터는 읽을 때만 형식에 맞게 변환한다.
+여러 키 경로를 한꺼번에 조회하면(query_values, batch_query) 경로를 정렬해 공통 부모를 한 번만 찾고, 하이브마다 한 번에 처리한다.
+"""
+import os
+import mmap
+import struct
+import datetime
+import threading
+from collections import namedtuple
+
+from hive_recovery import BASE_BLOCK_SIZE, read_base_block, load_hive_catalog
+
+# 값 형식
+REG_NONE = 0
+REG_SZ = 1
+REG_EXPAND_SZ = 2
+REG_BINARY = 3
+REG_DWORD = 4
+REG_DWORD_BIG_ENDIAN = 5
+REG_LINK = 6
+REG_MULTI_SZ = 7
+REG_QWORD = 11
+
+# 키 이름이 ASCII(Latin-1)로 저장되었음을 나타내는 플래그 (nk: flags, vk: flags)
+KEY_COMP_NAME = 0x0020
+VALUE_COMP_NAME = 0x0001
+
+# 이 크기보다 큰 값 데이터는 db(big data) 셀에 나뉘어 저장됨 (하이브 1.4 이상)
+BIG_DATA_SEGMENT_SIZE = 16344
+
+# 데이터 크기의 최상위 비트가 켜져 있으면 데이터가 오프셋 필드 안에 저장됨 (4바이트 이하)
+DATA_INLINE = 0x80000000
+
+# 셀 오프셋이 없음
+NO_CELL = 0xFFFFFFFF
+
+_FILETIME_EPOCH = datetime.datetime(1601, 1, 1)
+
+# name: 값 이름 (기본 값은 ''), type: 값 형식, data_size: 데이터 크기, hive/offset: 데이터를 읽을 하이브와 vk 셀 오프셋
+class RegistryValue(namedtuple('RegistryValue', ['name', 'type', 'data_size', 'hive', 'offset'])):
+    """레지스트리 값 (데이터는 raw/value를 읽을 때 변환)"""
+    __slots__ = ()
+
+    @property
+    def raw(self):
+        """값 데이터 bytes"""
+        return self.hive.value_data(self.offset)
+
+    @property
+    def value(self):
+        """값 형식에 맞게 변환한 데이터 (문자열, 정수, 문자열 목록, 그 밖의 형식은 bytes)"""
+        return decode_value(self.type, self.raw)
+
+
+class RegistryKey(namedtuple('RegistryKey', ['path', 'hive', 'offset'])):
+    """레지스트리 키 (path는 하이브 루트 기준 경로, 루트 키는 '')"""
+    __slots__ = ()
+
+    @property
+    def name(self):
+        return self.hive.key_name(self.offset)
+
+    @property
+    def timestamp(self):
+        """마지막으로 쓴 시각 (datetime, UTC)"""
+        return self.hive.key_timestamp(self.offset)
+
+    def subkeys(self):
+        """하위 키 목록 (하이브에 저장된 순서)"""
+        prefix = self.path + '\\' if self.path else ''
+        return [RegistryKey(prefix + name, self.hive, offset)
+                for name, offset in self.hive.subkey_offsets(self.offset)]
+
+    def subkey(self, name):
+        """이름(대소문자 무시)에 해당하는 하위 키 (없으면 None)"""
+        return self.hive.open(f"{self.path}\\{name}" if self.path else name)
+
+    def values(self):
+        return self.hive.values(self.offset)
+
+    def value(self, name):
+        """이름(대소문자 무시)에 해당하는 값 (없으면 None)"""
+        name_lc = name.lower()
+        for value in self.hive.values(self.offset):
+            if value.name.lower() == name_lc:
+                return value
+        return None
+
+    def value_dict(self, names=None):
+        """{값 이름: 변환한 데이터} (names가 있으면 그 이름만)"""
+        wanted = None if names is None else {name.lower() for name in names}
+        return {value.name: value.value for value in self.hive.values(self.offset)
+                if wanted is None or value.name.lower() in wanted}
+
+
+def filetime_to_datetime(filetime):
+    if not filetime:
+        return None
+    try:
+        return _FILETIME_EPOCH + datetime.timedelta(microseconds=filetime // 10)
+    except OverflowError:
+        return None
+
+
+def _decode_utf16(data):
+    text = bytes(data).decode('utf-16le', errors='replace')
+    return text.split('\x00', 1)[0]
+
+
+def decode_value(value_type, data):
+    """값 형식에 맞게 데이터 변환 (크기가 맞지 않는 정수 값 등은 bytes 그대로)"""
+    if value_type in (REG_SZ, REG_EXPAND_SZ, REG_LINK):
+        return _decode_utf16(data)
+    if value_type == REG_MULTI_SZ:
+        text = bytes(data).decode('utf-16le', errors='replace')
+        return [item for item in text.split('\x00') if item]
+    if value_type == REG_DWORD and len(data) >= 4:
+        return struct.unpack_from('<I', data)[0]
+    if value_type == REG_DWORD_BIG_ENDIAN and len(data) >= 4:
+        return struct.unpack_from('>I', data)[0]
+    if value_type == REG_QWORD and len(data) >= 8:
+        return struct.unpack_from('<Q', data)[0]
+    return bytes(data)
+
+
+def normalize_key_path(path):
+    r"""'\ROOT\Software\' / 'Software/Microsoft' 등을 'Software\Microsoft' 형태로 통일"""
+    return '\\'.join(part for part in path.replace('/', '\\').split('\\') if part)
+
+
+class RegistryHive:
+    """mmap으로 연 하이브 파일 하나 (키 경로 → 셀 오프셋 캐시와 하위 키 이름 캐시를 가짐)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise
+        self._view = memoryview(self._map)
+        self.base_block = read_base_block(self._view)
+        self.root_offset, = struct.unpack_from('<I', self._view, 36)
+        self._lock = threading.Lock()
+        # 키 경로(소문자) → nk 셀 오프셋 (없는 경로는 None)
+        self._paths = {'': self.root_offset}
+        # nk 셀 오프셋 → {하위 키 이름(소문자): nk 셀 오프셋}
+        self._children = {}
+
+    # ------------------------------------------------------------------
+    # 셀
+    # ------------------------------------------------------------------
+    def _cell(self, offset):
+        """셀 데이터 memoryview (셀 크기 필드 다음부터)"""
+        start = BASE_BLOCK_SIZE + offset
+        size, = struct.unpack_from('<i', self._view, start)
+        return self._view[start + 4:start + abs(size)]
+
+    def _subkey_list(self, list_offset, result):
+        cell = self._cell(list_offset)
+        signature = bytes(cell[:2])
+        count, = struct.unpack_from('<H', cell, 2)
+        if signature in (b'lf', b'lh'):
+            result.extend(struct.unpack_from(f'<{count * 2}I', cell, 4)[::2])
+        elif signature == b'li':
+            result.extend(struct.unpack_from(f'<{count}I', cell, 4))
+        elif signature == b'ri':
+            # 인덱스 루트: 하위 키 목록의 목록
+            for sub_list in struct.unpack_from(f'<{count}I', cell, 4):
+                self._subkey_list(sub_list, result)
+        return result
+
+    def _name(self, cell, length_offset, name_offset, compressed):
+        length, = struct.unpack_from('<H', cell, length_offset)
+        raw = bytes(cell[name_offset:name_offset + length])
+        return raw.decode('latin-1') if compressed else raw.decode('utf-16le', errors='replace')
+
+    # ------------------------------------------------------------------
+    # 키
+    # ------------------------------------------------------------------
+    def key_name(self, offset):
+        cell = self._cell(offset)
+        flags, = struct.unpack_from('<H', cell, 2)
+        return self._name(cell, 72, 76, flags & KEY_COMP_NAME)
+
+    def key_timestamp(self, offset):
+        return filetime_to_datetime(struct.unpack_from('<Q', self._cell(offset), 4)[0])
+
+    def subkey_offsets(self, offset):
+        """키의 [(하위 키 이름, nk 셀 오프셋)]"""
+        cell = self._cell(offset)
+        count, = struct.unpack_from('<I', cell, 20)
+        list_offset, = struct.unpack_from('<I', cell, 28)
+        if not count or list_offset == NO_CELL:
+            return []
+        return [(self.key_name(child), child) for child in self._subkey_list(list_offset, [])]
+
+    def _child_offsets(self, offset):
+        children = self._children.get(offset)
+        if children is None:
+            children = {}
+            for name, child in self.subkey_offsets(offset):
+                children.setdefault(name.lower(), child)
+            self._children[offset] = children
+        return children
+
+    def key_offset(self, path):
+        """키 경로(대소문자 무시)의 nk 셀 오프셋 (없으면 None). 캐시된 가장 가까운 부모 키부터 찾음"""
+        path_lc = normalize_key_path(path).lower()
+        with self._lock:
+            if path_lc in self._paths:
+                return self._paths[path_lc]
+            parts = path_lc.split('\\')
+            # 캐시에 있는 가장 긴 부모 경로
+            depth = len(parts) - 1
+            while depth > 0 and '\\'.join(parts[:depth]) not in self._paths:
+                depth -= 1
+            offset = self._paths['\\'.join(parts[:depth])]
+            for i in range(depth, len(parts)):
+                if offset is not None:
+                    offset = self._child_offsets(offset).get(parts[i])
+                self._paths['\\'.join(parts[:i + 1])] = offset
+            return offset
+
+    def open(self, path=''):
+        """키 경로의 RegistryKey (없으면 None)"""
+        path = normalize_key_path(path)
+        offset = self.key_offset(path)
+        if offset is None:
+            return None
+        return RegistryKey(path, self, offset)
+
+    def root(self):
+        return RegistryKey('', self, self.root_offset)
+
+    # ------------------------------------------------------------------
+    # 값
+    # ------------------------------------------------------------------
+    def values(self, offset):
+        """키의 RegistryValue 목록 (데이터는 읽지 않음)"""
+        cell = self._cell(offset)
+        count, = struct.unpack_from('<I', cell, 36)
+        list_offset, = struct.unpack_from('<I', cell, 40)
+        if not count or list_offset == NO_CELL:
+            return []
+        values = []
+        for value_offset in struct.unpack_from(f'<{count}I', self._cell(list_offset), 0):
+            vk = self._cell(value_offset)
+            if bytes(vk[:2]) != b'vk':
+                continue
+            data_size, = struct.unpack_from('<I', vk, 4)
+            value_type, flags = struct.unpack_from('<IH', vk, 12)
+            name = self._name(vk, 2, 20, flags & VALUE_COMP_NAME)
+            values.append(RegistryValue(name, value_type, data_size & ~DATA_INLINE, self, value_offset))
+        return values
+
+    def value_data(self, value_offset):
+        """vk 셀의 데이터 bytes (인라인/일반/big data 모두 처리)"""
+        vk = self._cell(value_offset)
+        data_size, data_offset = struct.unpack_from('<II', vk, 4)
+        if data_size & DATA_INLINE:
+            return bytes(vk[8:8 + (data_size & ~DATA_INLINE)])
+        if data_size == 0 or data_offset == NO_CELL:
+            return b''
+        cell = self._cell(data_offset)
+        if (data_size > BIG_DATA_SEGMENT_SIZE and self.base_block.minor_version >= 4
+                and bytes(cell[:2]) == b'db'):
+            count, segments_offset = struct.unpack_from('<HI', cell, 2)
+            segments = struct.unpack_from(f'<{count}I', self._cell(segments_offset), 0)
+            data = b''.join(bytes(self._cell(segment)[:BIG_DATA_SEGMENT_SIZE]) for segment in segments)
+            return data[:data_size]
+        return bytes(cell[:data_size])
+
+    # ------------------------------------------------------------------
+    # 일괄 조회
+    # ------------------------------------------------------------------
+    def query_values(self, key_paths, value_names=None):
+        """여러 키 경로의 {키 경로: {값 이름: 데이터}} (없는 키는 None). 경로를 정렬해 공통 부모는 한 번만 찾음"""
+        results = {}
+        for path in sorted(key_paths, key=lambda p: normalize_key_path(p).lower()):
+            key = self.open(path)
+            results[path] = None if key is None else key.value_dict(value_names)
+        return results
+
+    def close(self):
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+
+# 프로세스 안에서는 하이브 파일당 RegistryHive를 하나만 유지 (파일이 바뀌면 다시 엶)
+_hives = {}
+_hives_lock = threading.Lock()
+
+
+def get_hive(path):
+    """하이브 파일의 RegistryHive (같은 프로세스에서 다시 열지 않음)"""
+    key = os.path.abspath(path)
+    st = os.stat(key)
+    stamp = (st.st_size, st.st_mtime_ns)
+    with _hives_lock:
+        cached = _hives.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        hive = RegistryHive(key)
+        _hives[key] = (stamp, hive)
+    return hive
+
+
+def user_hives(hives_dir, name='NTUSER.DAT'):
+    """하이브 목록(hives.json)에 있는 사용자 하이브 {프로필 디렉토리 이름: 깨끗한 하이브 경로}"""
+    return {entry.user: entry.path for entry in load_hive_catalog(hives_dir)
+            if entry.user is not None and entry.name.lower() == name.lower()}
+
+
+def batch_query(hive_paths, key_paths, value_names=None):
+    """여러 하이브에서 같은 키 경로들을 조회해 {하이브 경로: {키 경로: {값 이름: 데이터}}} 반환 (하이브마다 한 번에 처리)"""
+    results = {}
+    for hive_path in hive_paths:
+        try:
+            hive = get_hive(hive_path)
+        except (OSError, ValueError) as e:
+            print(f"하이브를 열 수 없습니다: {hive_path} - {e}")
+            continue
+        results[hive_path] = hive.query_values(key_paths, value_names)
+    return results
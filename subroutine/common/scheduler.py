@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+단계 DAG 스케줄러 모듈
+
+의존 관계가 있는 분석 단계들을 프로세스 풀에서 실행한다.
+선행 단계가 모두 끝난 단계만 시작하고, 동시에 실행하는 단계 수와 예상 메모리 합계를 제한한다.
+선행 단계가 실패하면 그 뒤 단계는 실행하지 않는다.
+단계의 stdout/stderr는 별도 스레드에서 읽어 단계별 로그에 기록하고, 진행 이벤트로 전체 진행률과 남은 시간을 주기적으로 출력한다.
+"""
+import os
+import sys
+import time
+import queue
+import subprocess
+from collections import namedtuple
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from manifest import file_digest
+from progress import (parse_progress_line, child_env, start_stream_readers, BufferedLogWriter,
+                      ProgressTracker, format_duration)
+
+# 동시에 실행하는 단계 수 기본값
+DEFAULT_MAX_PARALLEL = max(1, min(4, os.cpu_count() or 2))
+
+# 단계별 예상 메모리 기본값 (MB)
+DEFAULT_STAGE_MEMORY_MB = 512
+
+# 실행 중인 단계를 확인하는 간격 (초)
+POLL_INTERVAL = 0.2
+
+# 전체 진행 상황을 출력하는 간격 (초)
+STATUS_INTERVAL = 10
+
+# name: 단계 이름, command: 실행할 명령 목록, cwd: 작업 디렉토리, deps: 선행 단계 이름 목록,
+# memory_mb: 예상 메모리 사용량(MB), inputs: 바뀌면 다시 실행해야 하는 파일(스크립트) 목록
+Stage = namedtuple('Stage', ['name', 'command', 'cwd', 'deps', 'memory_mb', 'inputs'])
+
+# status: 'done'(성공), 'failed'(실패), 'skipped'(선행 단계 실패/중지), 'cached'(체크포인트 기준 이미 완료)
+StageResult = namedtuple('StageResult', ['name', 'status', 'returncode', 'elapsed', 'log_path'])
+
+
+def make_stage(name, command, cwd, deps=(), memory_mb=DEFAULT_STAGE_MEMORY_MB, inputs=()):
+    """Stage 생성 헬퍼 (deps/inputs는 튜플로 고정)"""
+    return Stage(name, list(command), cwd, tuple(deps), memory_mb, tuple(inputs))
+
+
+def topological_order(stages):
+    """단계들을 의존 순서대로 정렬 (없는 선행 단계나 순환이 있으면 ValueError)"""
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        for dep in stage.deps:
+            if dep not in by_name:
+                raise ValueError(f"'{stage.name}' 단계의 선행 단계 '{dep}'가 없습니다.")
+
+    order = []
+    state = {}  # 1: 방문 중, 2: 완료
+
+    def visit(name, path):
+        if state.get(name) == 2:
+            return
+        if state.get(name) == 1:
+            raise ValueError(f"단계 의존 관계에 순환이 있습니다: {' -> '.join(path + [name])}")
+        state[name] = 1
+        for dep in by_name[name].deps:
+            visit(dep, path + [name])
+        state[name] = 2
+        order.append(by_name[name])
+
+    for stage in stages:
+        visit(stage.name, [])
+    return order
+
+
+class _RunningStage:
+    def __init__(self, stage, process, log, log_path):
+        self.stage = stage
+        self.process = process
+        self.log = log
+        self.log_path = log_path
+        self.started = time.time()
+        self.lines = queue.Queue()
+        self.open_streams = 2
+        start_stream_readers(process, self.lines)
+
+    def pump(self, tracker):
+        """읽어 둔 출력 줄을 로그와 진행 상황에 반영"""
+        while True:
+            try:
+                _, line = self.lines.get_nowait()
+            except queue.Empty:
+                return
+            if line is None:
+                self.open_streams -= 1
+                continue
+            event = parse_progress_line(line)
+            if event is not None:
+                tracker.update(self.stage.name, event)
+            else:
+                self.log.write(line)
+
+    def finished(self):
+        # 프로세스가 끝나고 두 스트림을 끝까지 읽었을 때 완료
+        return self.process.poll() is not None and self.open_streams == 0
+
+
+class DagScheduler:
+    """의존 관계에 따라 단계들을 병렬로 실행하는 스케줄러"""
+
+    def __init__(self, stages, max_parallel=None, memory_limit_mb=None, stage_memory_limit_mb=None,
+                 log_dir='.', checkpoint=None, env=None, stop_event=None):
+        self.stages = topological_order(stages)
+        self.max_parallel = max_parallel or DEFAULT_MAX_PARALLEL
+        self.memory_limit_mb = memory_limit_mb
+        self.stage_memory_limit_mb = stage_memory_limit_mb
+        self.log_dir = log_dir
+        self.checkpoint = checkpoint
+        self.env = env
+        self.stop_event = stop_event
+        self.tracker = ProgressTracker()
+        for stage in self.stages:
+            self.tracker.add_task(stage.name)
+        if stage_memory_limit_mb and psutil is None and (resource is None or sys.platform == 'win32'):
+            print("psutil이 없어 단계별 메모리 상한을 적용할 수 없습니다. (동시 실행 메모리 예산만 적용)")
+
+    # ------------------------------------------------------------------
+    # 실행
+    # ------------------------------------------------------------------
+    def _stage_key(self, stage):
+        return file_digest(*stage.inputs) if stage.inputs else ''
+
+    def _limit_memory(self):
+        # psutil이 없는 POSIX 환경에서는 자식 프로세스의 주소 공간 상한으로 대신함
+        limit = self.stage_memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    def _start(self, stage):
+        os.makedirs(self.log_dir, exist_ok=True)
+        log_path = os.path.join(self.log_dir, f"process_logs_{stage.name.replace('.', '_')}.txt")
+        log = BufferedLogWriter(log_path, 'w')
+        log.write(f"===== {stage.name} 시작 =====\n")
+
+        kwargs = {}
+        if sys.platform == 'win32':
+            kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW
+        elif self.stage_memory_limit_mb and psutil is None and resource is not None:
+            kwargs['preexec_fn'] = self._limit_memory
+
+        # stdout/stderr는 _RunningStage가 별도 스레드에서 읽음 (진행 이벤트는 로그 대신 진행 상황에 반영)
+        try:
+            process = subprocess.Popen(stage.command, cwd=stage.cwd, env=child_env(self.env),
+                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, **kwargs)
+        except OSError:
+            log.close()
+            raise
+        print(f"[시작] {stage.name}")
+        self.tracker.start_task(stage.name)
+        return _RunningStage(stage, process, log, log_path)
+
+    def _memory_usage_mb(self, running):
+        try:
+            parent = psutil.Process(running.process.pid)
+            processes = [parent] + parent.children(recursive=True)
+            return sum(p.memory_info().rss for p in processes) / (1024 * 1024)
+        except psutil.Error:
+            return 0
+
+    def _kill(self, running):
+        if sys.platform == 'win32':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(running.process.pid)], capture_output=True)
+        else:
+            if psutil is not None:
+                try:
+                    for child in psutil.Process(running.process.pid).children(recursive=True):
+                        child.kill()
+                except psutil.Error:
+                    pass
+            running.process.kill()
+        running.process.wait()
+
+    def _finish(self, running, status):
+        elapsed = time.time() - running.started
+        returncode = running.process.returncode
+        running.pump(self.tracker)
+        running.log.write(f"===== {running.stage.name} 종료 (코드 {returncode}) =====\n")
+        running.log.close()
+        self.tracker.finish_task(running.stage.name)
+        if status == 'done' and self.checkpoint is not None:
+            self.checkpoint.mark_done(running.stage.name, self._stage_key(running.stage))
+        label = {'done': '완료', 'failed': '실패', 'skipped': '중지'}[status]
+        print(f"[{label}] {running.stage.name} ({elapsed:.1f}초, 로그: {running.log_path})")
+        return StageResult(running.stage.name, status, returncode, elapsed, running.log_path)
+
+    def _can_start(self, stage, running):
+        if len(running) >= self.max_parallel:
+            return False
+        if self.memory_limit_mb is None or not running:
+            # 실행 중인 단계가 없으면 예산보다 큰 단계도 혼자 실행
+            return True
+        reserved = sum(r.stage.memory_mb for r in running)
+        return reserved + stage.memory_mb <= self.memory_limit_mb
+
+    def run(self):
+        """모든 단계를 실행하고 {단계 이름: StageResult}를 반환"""
+        results = {}
+        pending = list(self.stages)
+        running = []
+        last_status = time.time()
+
+        while pending or running:
+            stopping = self.stop_event is not None and self.stop_event.is_set()
+
+            # 끝난 단계 정리 (메모리 상한을 넘은 단계는 종료)
+            for r in list(running):
+                r.pump(self.tracker)
+                killed = stopping
+                if stopping:
+                    self._kill(r)
+                elif (self.stage_memory_limit_mb and psutil is not None and r.process.poll() is None
+                      and self._memory_usage_mb(r) > self.stage_memory_limit_mb):
+                    print(f"{r.stage.name} 단계가 메모리 상한({self.stage_memory_limit_mb}MB)을 넘어 종료합니다.")
+                    self._kill(r)
+                    killed = True
+                if killed:
+                    # 강제 종료한 단계는 남은 출력을 기다리지 않음 (손자 프로세스가 파이프를 잡고 있을 수 있음)
+                    r.open_streams = 0
+                if r.finished():
+                    running.remove(r)
+                    if stopping:
+                        status = 'skipped'
+                    else:
+                        status = 'done' if r.process.returncode == 0 else 'failed'
+                    results[r.stage.name] = self._finish(r, status)
+
+            # 시작할 수 있는 단계 시작 (의존 순서대로)
+            for stage in list(pending):
+                dep_status = [results[dep].status if dep in results else None for dep in stage.deps]
+                if stopping or any(s in ('failed', 'skipped') for s in dep_status):
+                    pending.remove(stage)
+                    self.tracker.finish_task(stage.name)
+                    results[stage.name] = StageResult(stage.name, 'skipped', None, 0, None)
+                    if not stopping:
+                        print(f"[건너뜀] {stage.name} (선행 단계 실패)")
+                    continue
+                if any(s is None for s in dep_status):
+                    continue
+                if self.checkpoint is not None and self.checkpoint.is_done(stage.name, self._stage_key(stage)):
+                    pending.remove(stage)
+                    self.tracker.finish_task(stage.name)
+                    results[stage.name] = StageResult(stage.name, 'cached', 0, 0, None)
+                    print(f"[완료됨] {stage.name} (체크포인트)")
+                    continue
+                if not self._can_start(stage, running):
+                    continue
+                pending.remove(stage)
+                try:
+                    running.append(self._start(stage))
+                except OSError as e:
+                    print(f"[실패] {stage.name} 실행 중 오류 발생: {e}")
+                    self.tracker.finish_task(stage.name)
+                    results[stage.name] = StageResult(stage.name, 'failed', None, 0, None)
+
+            if running:
+                if time.time() - last_status >= STATUS_INTERVAL:
+                    self._print_status(running)
+                    last_status = time.time()
+                time.sleep(POLL_INTERVAL)
+
+        return results
+
+    def _print_status(self, running):
+        """전체 진행률, 남은 시간, 실행 중인 단계의 현재 상태 출력"""
+        details = []
+        for r in running:
+            description = self.tracker.describe(r.stage.name)
+            details.append(f"{r.stage.name}: {description}" if description else r.stage.name)
+        print(f"[진행] {int(self.tracker.overall_fraction() * 100)}%, 예상 남은 시간 {format_duration(self.tracker.eta())} "
+              f"({', '.join(details)})")
+
+
+def summarize(results):
+    """실행 결과 요약 문자열"""
+    counts = {}
+    for result in results.values():
+        counts[result.status] = counts.get(result.status, 0) + 1
+    labels = [('done', '완료'), ('cached', '이미 완료'), ('failed', '실패'), ('skipped', '건너뜀')]
+    return ', '.join(f"{label} {counts[status]}개" for status, label in labels if counts.get(status))
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+볼륨(파티션) 레이아웃 캐시 모듈
+
+파티션 테이블을 이미지당 한 번만 분석해서 모든 파티션(시작 섹터, 길이, 파일시스템, 레이블)을
+이미지 지문(세그먼트 크기/수정 시간 + 헤더 해시) 기준으로 캐시한다.
+"""
+import os
+import re
+import glob
+import json
+import hashlib
+import subprocess
+import threading
+from collections import namedtuple
+
+try:
+    import pytsk3
+except ImportError:
+    pytsk3 = None
+
+try:
+    import pyewf
+except ImportError:
+    pyewf = None
+
+# 레이아웃 캐시 형식이 바뀌면 올려서 다시 분석하게 함
+LAYOUT_VERSION = 1
+
+# 지문 계산 시 해시하는 첫 세그먼트 앞부분 크기
+HEADER_HASH_SIZE = 64 * 1024
+
+DEFAULT_SECTOR_SIZE = 512
+
+# 파티션 한 개 (start/length는 섹터 단위, mmls 표기와 동일)
+Partition = namedtuple('Partition', ['slot', 'start', 'length', 'description', 'fs_type', 'label'])
+
+VolumeLayout = namedtuple('VolumeLayout', ['fingerprint', 'sector_size', 'partitions'])
+
+# mmls 출력 한 줄: '002:  000:000   0000002048   0001026047   0001024000   Basic data partition'
+MMLS_LINE_PATTERN = re.compile(r'^(\d+):\s+(\S+)\s+(\d+)\s+(\d+)\s+(\d+)\s+(.*)$')
+
+
+def get_cache_dir(image_path):
+    """이미지별 캐시(경로 인덱스 등)를 저장할 디렉토리 (이미지 옆 .defohari_cache)"""
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(image_path)), '.defohari_cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def image_segments(image_path):
+    """이미지를 구성하는 세그먼트 파일 목록 (E01이면 E02, E03 ... 포함)"""
+    if image_path.lower().endswith('.e01'):
+        if pyewf is not None:
+            return sorted(pyewf.glob(image_path))
+        segments = glob.glob(glob.escape(image_path[:-2]) + '[0-9A-Za-z][0-9A-Za-z]')
+        return sorted(segments) or [image_path]
+    return [image_path]
+
+
+def image_fingerprint(image_path):
+    """세그먼트 크기/수정 시간과 첫 세그먼트 헤더 해시로 만든 이미지 지문"""
+    digest = hashlib.sha256()
+    segments = image_segments(image_path)
+    for segment in segments:
+        stat = os.stat(segment)
+        digest.update(f"{os.path.basename(segment)}|{stat.st_size}|{stat.st_mtime_ns}\n".encode('utf-8'))
+    with open(segments[0], 'rb') as f:
+        digest.update(f.read(HEADER_HASH_SIZE))
+    return digest.hexdigest()
+
+
+# ----------------------------------------------------------------------
+# 파티션 분석 (pytsk3)
+# ----------------------------------------------------------------------
+def _tsk_fs_info(img, offset):
+    try:
+        fs = pytsk3.FS_Info(img, offset=offset)
+    except IOError:
+        return None, None
+    fs_type = str(fs.info.ftype).replace('TSK_FS_TYPE_', '')
+    if fs_type.startswith('NTFS'):
+        return 'NTFS', _tsk_ntfs_label(fs)
+    return fs_type, None
+
+
+def _tsk_ntfs_label(fs):
+    # $Volume(inode 3)의 $VOLUME_NAME 속성
+    try:
+        volume_file = fs.open_meta(inode=3)
+        for attr in volume_file:
+            if attr.info.type == pytsk3.TSK_FS_ATTR_TYPE_NTFS_VNAME:
+                data = volume_file.read_random(0, attr.info.size, attr.info.type, attr.info.id)
+                return data.decode('utf-16-le', errors='replace')
+    except IOError:
+        pass
+    return None
+
+
+def _tsk_partitions(img):
+    try:
+        volume = pytsk3.Volume_Info(img)
+    except IOError:
+        # 파티션 테이블이 없는 단일 볼륨 이미지
+        fs_type, label = _tsk_fs_info(img, 0)
+        length = img.get_size() // DEFAULT_SECTOR_SIZE
+        return DEFAULT_SECTOR_SIZE, [Partition(0, 0, length, 'Single volume', fs_type, label)]
+
+    sector_size = volume.info.block_size
+    partitions = []
+    for part in volume:
+        if int(part.flags) != int(pytsk3.TSK_VS_PART_FLAG_ALLOC):
+            continue
+        desc = part.desc.decode('utf-8', errors='ignore') if isinstance(part.desc, bytes) else part.desc
+        fs_type, label = _tsk_fs_info(img, part.start * sector_size)
+        partitions.append(Partition(int(part.addr), int(part.start), int(part.len), desc, fs_type, label))
+    return sector_size, partitions
+
+
+# ----------------------------------------------------------------------
+# 파티션 분석 (Sleuth Kit CLI)
+# ----------------------------------------------------------------------
+def _cli_fs_info(image_path, start):
+    try:
+        result = subprocess.run(['fsstat', '-o', str(start), image_path], capture_output=True, text=True, check=True)
+    except (subprocess.CalledProcessError, OSError):
+        return None, None
+    fs_type = label = None
+    for line in result.stdout.splitlines():
+        if line.startswith('File System Type:'):
+            fs_type = line.split(':', 1)[1].strip()
+        elif line.startswith('Volume Name:'):
+            label = line.split(':', 1)[1].strip() or None
+    return fs_type, label
+
+
+def _cli_partitions(image_path):
+    try:
+        result = subprocess.run(['mmls', image_path], capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError:
+        # 파티션 테이블이 없는 단일 볼륨 이미지
+        fs_type, label = _cli_fs_info(image_path, 0)
+        return DEFAULT_SECTOR_SIZE, [Partition(0, 0, 0, 'Single volume', fs_type, label)]
+
+    sector_size = DEFAULT_SECTOR_SIZE
+    match = re.search(r'Units are in (\d+)-byte sectors', result.stdout)
+    if match:
+        sector_size = int(match.group(1))
+
+    partitions = []
+    for line in result.stdout.splitlines():
+        match = MMLS_LINE_PATTERN.match(line.strip())
+        if not match:
+            continue
+        slot, kind, start, _, length, desc = match.groups()
+        # 'Meta'(파티션 테이블)와 '-------'(미할당 영역)는 제외
+        if kind == 'Meta' or kind.startswith('-'):
+            continue
+        fs_type, label = _cli_fs_info(image_path, int(start))
+        partitions.append(Partition(int(slot), int(start), int(length), desc.strip(), fs_type, label))
+    return sector_size, partitions
+
+
+# ----------------------------------------------------------------------
+# 캐시
+# ----------------------------------------------------------------------
+def _layout_cache_path(image_path):
+    return os.path.join(get_cache_dir(image_path), os.path.basename(image_path) + '.layout.json')
+
+
+def _load_cached_layout(cache_path, fingerprint):
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('version') != LAYOUT_VERSION or data.get('fingerprint') != fingerprint:
+        return None
+    return VolumeLayout(fingerprint, data['sector_size'], [Partition(**p) for p in data['partitions']])
+
+
+def _save_layout(cache_path, layout):
+    data = {
+        'version': LAYOUT_VERSION,
+        'fingerprint': layout.fingerprint,
+        'sector_size': layout.sector_size,
+        'partitions': [p._asdict() for p in layout.partitions],
+    }
+    temp_path = cache_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, cache_path)
+
+
+_layouts = {}
+_layouts_lock = threading.Lock()
+
+
+def get_volume_layout(image_path, img=None):
+    """이미지의 파티션 레이아웃을 반환 (지문이 같으면 캐시 재사용, img는 열려 있는 pytsk3 이미지 핸들)"""
+    fingerprint = image_fingerprint(image_path)
+    key = (os.path.abspath(image_path), fingerprint)
+    with _layouts_lock:
+        if key in _layouts:
+            return _layouts[key]
+
+        cache_path = _layout_cache_path(image_path)
+        layout = _load_cached_layout(cache_path, fingerprint)
+        if layout is None:
+            if img is not None:
+                sector_size, partitions = _tsk_partitions(img)
+            else:
+                sector_size, partitions = _cli_partitions(image_path)
+            layout = VolumeLayout(fingerprint, sector_size, partitions)
+            _save_layout(cache_path, layout)
+            print(f"파티션 레이아웃 분석 완료: {len(partitions)}개 파티션")
+        _layouts[key] = layout
+        return layout
+
+
+def ntfs_partitions(layout):
+    """레이아웃에서 NTFS 파티션만 반환"""
+    return [p for p in layout.partitions if p.fs_type == 'NTFS']
+
+
+def select_partition(layout, partition_type="Basic data partition"):
+    """분석 대상 파티션 선택: 설명이 일치하는 NTFS 파티션 > 첫 NTFS 파티션 > 설명만 일치하는 파티션"""
+    ntfs = ntfs_partitions(layout)
+    candidates = ([p for p in ntfs if partition_type in p.description] or ntfs
+                  or [p for p in layout.partitions if partition_type in p.description])
+    if not candidates:
+        return None
+    if len(candidates) > 1:
+        others = ', '.join(str(p.start) for p in candidates[1:])
+        print(f"대상 파티션이 {len(candidates)}개입니다. 첫 번째({candidates[0].start})를 사용합니다. (나머지: {others})")
+    return candidates[0]
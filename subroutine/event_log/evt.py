@@ -1,14 +1,44 @@
-import win32evtlog
-import win32evtlogutil
 import sys
 import csv
 import xml.etree.ElementTree as ET
 from xml.dom import minidom
 import os
-from datetime import datetime, timezone, timedelta
-import pywintypes
+import contextlib
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timezone, timedelta
 import xml.sax.saxutils as saxutils
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from image_session import get_session, get_first_disk_image_path
+from path_index import get_path_index
+from progress import report, report_total
+
+# 같은 폴더의 python-evtx(순수 Python EVTX 파서)를 사용 (win32evtlog 없이 모든 OS에서 동작)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'python-evtx'))
+import Evtx.Evtx as evtx
+
+# 이벤트 XML 네임스페이스
+EVENT_NS = '{http://schemas.microsoft.com/win/2004/08/events/event}'
+
+# CSV/XML 출력 폴더 (스크립트 폴더 기준)
+OUTPUT_DIR = os.path.join('..', '..', 'output', 'artifact', 'event_log')
+
+# 한국 시간대(KST)
+KST = timezone(timedelta(hours=9))
+
+# CSV 헤더 (앞의 네 컬럼은 csv_totaler와 evt_sus가 읽는 기존 형식 그대로)
+CSV_HEADER = ['로그 종류', '시간', '이벤트 ID', '이벤트 내용', '공급자', '채널', '레코드 번호']
+
+# 청크(64KB)는 서로 독립적이라 이 개수 이상이면 프로세스 풀에서 나눠 파싱
+PARALLEL_MIN_CHUNKS = 16
+
+DEFAULT_WORKERS = max(1, min(8, os.cpu_count() or 2))
+
+# 이벤트 레코드 하나: data는 EventData/UserData의 (이름, 값) 목록
+EventRecord = namedtuple('EventRecord', ['event_id', 'time', 'provider', 'channel', 'record_number', 'data'])
+
 def clean_event_message(message):
     """
     이벤트 메시지에서 불필요한 줄바꿈 및 공백을 제거하고,
@@ -22,111 +52,198 @@ def clean_event_message(message):
 
     # 불필요한 줄바꿈과 공백을 제거하고 XML 특수 문자를 처리
     cleaned_message = saxutils.escape(message.strip())
-    
+
     # 여러 줄로 나뉜 경우 하나로 병합
     cleaned_message = ' '.join(cleaned_message.splitlines())
-    
+
     return cleaned_message
 
-def read_event_logs(server, log_files):
-    # log_files는 로그 종류와 파일 경로의 딕셔너리 {"Application": "path_to_app.evtx", ...}
+def local_name(tag):
+    """네임스페이스를 뺀 XML 태그 이름"""
+    return tag.rsplit('}', 1)[-1]
 
-    # CSV 파일 준비
-    csv_file = open(r'..\..\output\artifact\event_log\event_logs.csv', 'w', newline='', encoding='utf-8')
-    csv_writer = csv.writer(csv_file)
-    csv_writer.writerow(['로그 종류', '시간', '이벤트 ID', '이벤트 내용'])
-    
-    # XML 파일 준비
-    root = ET.Element('EventLogs')
-    
-    for log_type, file_path in log_files.items():
-        if not os.path.exists(file_path):
-            print(f"{file_path} 파일이 존재하지 않습니다. 건너뜁니다.")
-            continue
+def event_data_fields(event):
+    """EventData의 Data 요소(이름이 없으면 순번) 또는 UserData 하위 요소를 (이름, 값) 목록으로 반환"""
+    fields = []
+    event_data = event.find(EVENT_NS + 'EventData')
+    if event_data is not None:
+        for index, data in enumerate(event_data):
+            fields.append((data.get('Name') or str(index), (data.text or '').strip()))
+        return fields
 
-        print(f"{log_type} 로그를 처리 중입니다...")
-        try:
-            # 백업된 이벤트 로그 파일 열기
-            log_handle = win32evtlog.OpenBackupEventLog(server, file_path)
-        except Exception as e:
-            print(f"{file_path} 파일을 여는 중 오류 발생: {e}")
-            continue
-    
-        flags = win32evtlog.EVENTLOG_FORWARDS_READ | win32evtlog.EVENTLOG_SEQUENTIAL_READ
-        total_records = win32evtlog.GetNumberOfEventLogRecords(log_handle)
-    
-        print(f"총 {total_records}개의 {log_type} 이벤트 로그가 있습니다.\n")
-    
-        events = True
-        while events:
-            events = win32evtlog.ReadEventLog(log_handle, flags, 0)
-            for event in events:
-                # 이벤트 발생 시간 가져오기
-                event_time = event.TimeGenerated  # pywintypes.datetime 객체
-
-                # 시간대 정보가 없으므로 UTC 시간대로 설정
-                event_time = event_time.replace(tzinfo=timezone.utc)
-
-                # 한국 시간대(KST)로 변환
-                kst_timezone = timezone(timedelta(hours=9))
-                event_time_kst = event_time.astimezone(kst_timezone)
-
-                # 시간을 문자열로 포맷팅
-                time_generated = event_time_kst.strftime('%Y-%m-%d %H:%M:%S')
-
-                event_id = event.EventID & 0xFFFF  # 이벤트 ID
-
-                # 이벤트 메시지 내용 가져오기
+    user_data = event.find(EVENT_NS + 'UserData')
+    if user_data is not None:
+        for container in user_data:
+            for data in container:
+                fields.append((local_name(data.tag), (data.text or '').strip()))
+    return fields
+
+def parse_record(record):
+    """python-evtx 레코드를 EventRecord로 변환 (시간은 레코드 헤더의 UTC 시간을 KST로)"""
+    event = ET.fromstring(record.xml())
+    system = event.find(EVENT_NS + 'System')
+    provider = system.find(EVENT_NS + 'Provider')
+    event_id = int(system.findtext(EVENT_NS + 'EventID') or 0) & 0xFFFF
+    time_generated = record.timestamp().astimezone(KST).strftime('%Y-%m-%d %H:%M:%S')
+    return EventRecord(event_id, time_generated, provider.get('Name', '') if provider is not None else '',
+                       system.findtext(EVENT_NS + 'Channel') or '', record.record_num(), event_data_fields(event))
+
+def format_event_message(record):
+    """메시지 DLL 없이 공급자와 EventData 필드로 이벤트 내용을 만듦 ('공급자: 이름=값, ...')"""
+    fields = ', '.join(f"{name}={value}" for name, value in record.data if value)
+    return f"{record.provider}: {fields}" if fields else record.provider
+
+def parse_chunks(file_path, first, last):
+    """.evtx 파일의 [first, last) 청크를 파싱해 (EventRecord 목록, 읽지 못한 레코드 수) 반환 (프로세스 풀 작업 단위)"""
+    records = []
+    errors = 0
+    with evtx.Evtx(file_path) as log:
+        for index, chunk in enumerate(log.chunks()):
+            if index < first:
+                continue
+            if index >= last:
+                break
+            for record in chunk.records():
                 try:
-                    event_message = win32evtlogutil.SafeFormatMessage(event, log_type)
-                    # 메시지를 정리하고, 깨진 문자 처리
-                    event_message = clean_event_message(event_message)
-                except Exception as e:
-                    event_message = f"메시지를 가져오는 중 오류 발생: {e}"
+                    records.append(parse_record(record))
+                except Exception:
+                    # 깨진 레코드(템플릿 손상 등)는 건너뜀
+                    errors += 1
+    return records, errors
+
+def chunk_ranges(chunk_count, workers):
+    """청크 번호를 작업자 수만큼 [first, last) 구간으로 나눔"""
+    step = max(1, -(-chunk_count // workers))
+    return [(first, min(first + step, chunk_count)) for first in range(0, chunk_count, step)]
+
+def iter_event_records(file_path, workers=DEFAULT_WORKERS):
+    """.evtx 파일의 이벤트를 청크 순서대로 돌려줌 (청크가 많으면 프로세스 풀에서 나눠 파싱)"""
+    with evtx.Evtx(file_path) as log:
+        header = log.get_file_header()
+        if not header.check_magic():
+            raise ValueError(f"EVTX 파일이 아닙니다: {file_path}")
+        chunk_count = sum(1 for _ in log.chunks())
+    report_total(chunk_count)
+
+    ranges = chunk_ranges(chunk_count, workers if chunk_count >= PARALLEL_MIN_CHUNKS else 1)
+    if len(ranges) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(parse_chunks, [file_path] * len(ranges),
+                                            [first for first, _ in ranges], [last for _, last in ranges]))
+        except (OSError, BrokenProcessPool) as e:
+            print(f"프로세스 풀을 사용할 수 없어 순차로 파싱합니다: {e}")
+        else:
+            report(advance=chunk_count)
+            yield from results
+            return
+
+    for first, last in chunk_ranges(chunk_count, 1):
+        records, errors = parse_chunks(file_path, first, last)
+        report(advance=last - first)
+        yield records, errors
+
+@contextlib.contextmanager
+def event_log_path(log_type, file_path, image_path=None):
+    """추출된 .evtx가 있으면 그 경로를, 없으면 이미지(image_path)에서 읽은 임시 파일 경로를 넘겨줌 (없으면 None)
+
+    python-evtx는 파일을 mmap으로 열기 때문에 원본 복사를 생략한 경우에만 임시 파일을 사용
+    """
+    if os.path.exists(file_path):
+        yield file_path
+        return
+
+    inode = None
+    if image_path:
+        session = get_session(image_path)
+        if session.partition_offset is not None:
+            inode = get_path_index(session).inode(rf"Windows\System32\winevt\Logs\{log_type}.evtx")
+    if inode is None:
+        yield None
+        return
+
+    print(f"{file_path} 대신 이미지에서 {log_type}.evtx를 읽습니다.")
+    with session.materialize(inode, '.evtx') as temp_path:
+        yield temp_path
+
+def read_event_log(log_type, file_path, csv_writer, root):
+    """.evtx 파일 하나를 python-evtx로 읽어서 CSV writer와 XML 루트에 기록"""
+    print(f"{log_type} 로그를 처리 중입니다...")
+    total_records = 0
+    total_errors = 0
+    try:
+        for records, errors in iter_event_records(file_path):
+            total_errors += errors
+            for record in records:
+                event_message = clean_event_message(format_event_message(record))
 
                 # 이벤트 내용이 비어있으면 로그에서 제외
                 if not event_message.strip():
-                    continue  # 비어있는 내용의 이벤트는 제외
+                    continue
 
                 # CSV 파일에 쓰기
-                csv_writer.writerow([log_type, time_generated, event_id, event_message])
+                csv_writer.writerow([log_type, record.time, record.event_id, event_message,
+                                     record.provider, record.channel, record.record_number])
 
                 # XML 파일에 쓰기
                 event_element = ET.SubElement(root, 'Event')
                 ET.SubElement(event_element, '로그종류').text = log_type
-                ET.SubElement(event_element, '시간').text = time_generated
-                ET.SubElement(event_element, '이벤트ID').text = str(event_id)
+                ET.SubElement(event_element, '시간').text = record.time
+                ET.SubElement(event_element, '이벤트ID').text = str(record.event_id)
                 ET.SubElement(event_element, '이벤트내용').text = event_message
+                total_records += 1
+    except (OSError, ValueError) as e:
+        print(f"{file_path} 파일을 여는 중 오류 발생: {e}")
+        return
+
+    print(f"총 {total_records}개의 {log_type} 이벤트 로그를 읽었습니다. (읽지 못한 레코드 {total_errors}개)\n")
+
+def read_event_logs(log_files, image_path=None, output_dir=OUTPUT_DIR):
+    """이벤트 로그를 CSV와 XML로 저장하고 XML 루트(EventLogs)를 반환 (다음 단계에 그대로 전달)"""
+    # log_files는 로그 종류와 파일 경로의 딕셔너리 {"Application": "path_to_app.evtx", ...}
+
+    # CSV 파일 준비
+    csv_file = open(os.path.join(output_dir, 'event_logs.csv'), 'w', newline='', encoding='utf-8')
+    csv_writer = csv.writer(csv_file)
+    csv_writer.writerow(CSV_HEADER)
+
+    # XML 파일 준비
+    root = ET.Element('EventLogs')
+
+    for log_type, file_path in log_files.items():
+        with event_log_path(log_type, file_path, image_path) as log_path:
+            if log_path is None:
+                print(f"{file_path} 파일이 존재하지 않습니다. 건너뜁니다.")
+                continue
+            read_event_log(log_type, log_path, csv_writer, root)
 
-        win32evtlog.CloseEventLog(log_handle)
-    
     # XML 문자열로 변환하고 들여쓰기 적용
     xml_str = ET.tostring(root, encoding='utf-8')
     parsed_xml = minidom.parseString(xml_str)
     pretty_xml_str = parsed_xml.toprettyxml(indent="  ")
-    
+
     # XML 파일 저장
-    with open(r'..\..\output\artifact\event_log\event_logs.xml', 'w', encoding='utf-8') as xml_file:
+    with open(os.path.join(output_dir, 'event_logs.xml'), 'w', encoding='utf-8') as xml_file:
         xml_file.write(pretty_xml_str)
-    
+
     csv_file.close()
+    return root
 
-if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print(f"사용법: {sys.argv[0]} <Application.evtx 경로> <System.evtx 경로> <Security.evtx 경로>")
-        sys.exit(1)
-    
-    # 명령행 인자로부터 파일 경로 받기
-    application_log_path = sys.argv[1]
-    system_log_path = sys.argv[2]
-    security_log_path = sys.argv[3]
-    
+def main(application_log_path, system_log_path, security_log_path, image_path=None):
+    """세 이벤트 로그를 읽어 CSV/XML로 저장하고 XML 루트를 반환 (추출본이 없으면 image_path에서 읽음)"""
     # 로그 종류와 파일 경로를 딕셔너리로 구성
     log_files = {
         "Application": application_log_path,
         "System": system_log_path,
         "Security": security_log_path
     }
-    
-    # 로컬 서버의 이벤트 로그 읽기
-    read_event_logs(None, log_files)
+
+    return read_event_logs(log_files, image_path)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print(f"사용법: {sys.argv[0]} <Application.evtx 경로> <System.evtx 경로> <Security.evtx 경로>")
+        sys.exit(1)
+
+    # 명령행 인자로부터 파일 경로 받기
+    main(sys.argv[1], sys.argv[2], sys.argv[3], get_first_disk_image_path(os.path.join('..', '..', 'image_here')))
@@ -1,50 +1,78 @@
-import subprocess
 import os
+import sys
+import argparse
 
 # 스크립트가 있는 디렉토리로 작업 디렉토리 변경
 script_dir = os.path.dirname(os.path.abspath(__file__))
 os.chdir(script_dir)
 
-def run_evt_parsing():
-    """Step 1: evt_parsing.py 실행, 파싱한 LNK파일을 저장"""
-    subprocess.run(['python', 'evt_parsing.py'], check=True)
+sys.path.append(os.path.join(script_dir, '..', 'common'))
+from image_session import get_first_disk_image_path
+from checkpoint import get_checkpoint
+from manifest import file_digest, stage_key
+from keyword_rules import rules_path
 
-def run_evt_analysis(App_path, Sys_path, Secu_path):
-    """Step 2: evt.py 실행, 리스트를 CSV와 xml 출력"""
-    subprocess.run(['python', 'evt.py', App_path, Sys_path, Secu_path], check=True)
+# 각 단계 스크립트를 모듈로 불러와 같은 프로세스에서 실행 (단계마다 python을 새로 띄우지 않음)
+# evt(python-evtx, hexdump 필요)와 CSV 복구(gspread)는 필요한 단계에서만 불러옴 (앞 단계는 모듈이 없어도 진행)
+import evt_parsing
+import evt_sus
 
-def run_evt_sus_analysis():
-    """Step 3: evt_sus.py 실행 후 의심스러운 리스트를 CSV와 xml 출력"""
-    subprocess.run(['python', 'evt_sus.py'], check=True)
+def run_evt_parsing(image_path):
+    """Step 1: evt_parsing 실행, 파싱한 LNK파일을 저장"""
+    evt_parsing.main(image_path)
+
+def run_evt_analysis(App_path, Sys_path, Secu_path, image_path):
+    """Step 2: evt 실행, python-evtx로 읽은 리스트를 CSV와 xml 출력 후 XML 루트 반환"""
+    import evt
+    return evt.main(App_path, Sys_path, Secu_path, image_path)
+
+def run_evt_sus_analysis(root):
+    """Step 3: evt_sus 실행 후 의심스러운 리스트를 CSV와 xml 출력 (root가 None이면 XML에서 읽음)"""
+    evt_sus.main(root)
 
 def run_evt_broken_recovery():
     """Step 4: 만일 csv가 깨졌다면 실행 (일반)"""
-    subprocess.run(['python', 'if_csv_broken_log.py'], check=True)
+    import if_csv_broken_log
+    if_csv_broken_log.main()
 
 def run_evt_S_broken_recovery():
     """Step 4: 만일 csv가 깨졌다면 실행 (suspect)"""
-    subprocess.run(['python', 'if_csv_broken_log_s.py'], check=True)
+    import if_csv_broken_log_s
+    if_csv_broken_log_s.main()
+
+def main(suspicious=True):
+    image_path = get_first_disk_image_path(os.path.join('..', '..', 'image_here'))
+    # 중지되거나 실패한 이전 실행이 있으면 완료된 단계는 건너뛰고 이어서 진행
+    checkpoint = get_checkpoint('event_log', image_path)
+    checkpoint.plan(['extract', 'parse', 'csv_recovery'] + (['suspicious', 'suspicious_csv_recovery'] if suspicious else []))
 
-def main():
     # 1. evt_parsing.py 실행, LNK 파싱
     output_dir = os.path.abspath(os.path.join('..', '..', 'output', 'artifact', 'event_log'))
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
-    run_evt_parsing()
+    checkpoint.run('extract', run_evt_parsing, image_path, key=file_digest('evt_parsing.py'))
 
     # 경로 설정: 절대 경로로 변환
-    App_path = os.path.abspath(r'..\..\output\artifact\event_log\Application.evtx')
-    Secu_path = os.path.abspath(r'..\..\output\artifact\event_log\Security.evtx')
-    Sys_path = os.path.abspath(r'..\..\output\artifact\event_log\System.evtx')
+    App_path = os.path.join(output_dir, 'Application.evtx')
+    Secu_path = os.path.join(output_dir, 'Security.evtx')
+    Sys_path = os.path.join(output_dir, 'System.evtx')
 
     # 파일이 실제로 존재하는지 절대 경로로 검증
     print(f"App_path: {App_path}")
     print(f"Secu_path: {Secu_path}")
     print(f"Sys_path: {Sys_path}")
 
-    if os.path.exists(App_path) and os.path.exists(Sys_path) and os.path.exists(Secu_path):
-        run_evt_analysis(App_path, Sys_path, Secu_path)
-        run_evt_broken_recovery()
+    # 원본 복사를 생략한 경우(DEFOHARI_ARCHIVE_RAW=0) evt.py가 이미지에서 바로 읽음
+    archive_skipped = os.environ.get('DEFOHARI_ARCHIVE_RAW', '1') == '0'
+    # 이벤트 XML 루트는 메모리로 의심 흔적 단계에 넘김 (건너뛴 경우 None이라 XML 파일을 읽음)
+    root = None
+    # 추출한 .evtx의 해시와 스크립트가 모두 같으면 이전 실행의 결과를 그대로 사용
+    parse_key = stage_key(file_digest('evt.py', os.path.join('python-evtx', 'Evtx')), checkpoint.input_key(output_dir))
+    if archive_skipped or (os.path.exists(App_path) and os.path.exists(Sys_path) and os.path.exists(Secu_path)):
+        root = checkpoint.run('parse', run_evt_analysis, App_path, Sys_path, Secu_path, image_path, key=parse_key,
+                              outputs=[os.path.join(output_dir, 'event_logs.csv'), os.path.join(output_dir, 'event_logs.xml')])
+        checkpoint.run('csv_recovery', run_evt_broken_recovery, key=stage_key(file_digest('if_csv_broken_log.py'), parse_key),
+                       outputs=[os.path.join(output_dir, 'evt_logs.xlsx')])
     else:
         if not os.path.exists(App_path):
             print(f"{App_path} 파일이 존재하지 않습니다.")
@@ -53,13 +81,24 @@ def main():
         if not os.path.exists(Secu_path):
             print(f"{Secu_path} 파일이 존재하지 않습니다.")
 
-    # 3. 의심가는 리스트 추출 (csv 생성)
-    csv_output_dir = os.path.abspath(os.path.join('..', '..', 'output', 'suspicious_artifact', 'event_log'))
-    if not os.path.exists(csv_output_dir):
-        os.makedirs(csv_output_dir)
+    if suspicious:
+        # 3. 의심가는 리스트 추출 (csv 생성)
+        csv_output_dir = os.path.abspath(os.path.join('..', '..', 'output', 'suspicious_artifact', 'event_log'))
+        if not os.path.exists(csv_output_dir):
+            os.makedirs(csv_output_dir)
+
+        sus_key = stage_key(file_digest('evt_sus.py', rules_path()), parse_key)
+        checkpoint.run('suspicious', run_evt_sus_analysis, root, key=sus_key,
+                       outputs=[os.path.join(csv_output_dir, 'anti_forensic_events.csv')])
+        checkpoint.run('suspicious_csv_recovery', run_evt_S_broken_recovery, key=stage_key(file_digest('if_csv_broken_log_s.py'), sus_key),
+                       outputs=[os.path.join(csv_output_dir, 'antiforensic_logs.xlsx')])
 
-    run_evt_sus_analysis()
-    run_evt_S_broken_recovery()
+    checkpoint.finish()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--suspicious', action='store_true', help="의심스러운 흔적 분석 단계까지 실행 (기본값)")
+    group.add_argument('--no-suspicious', action='store_true', help="의심스러운 흔적 분석 단계를 생략")
+    args = parser.parse_args()
+    main(not args.no_suspicious)
\ No newline at end of file
@@ -1,13 +1,14 @@
 import xml.etree.ElementTree as ET
 import csv
 import re
+import os
+import sys
 
-# 안티포렌식 키워드 목록 (정규 표현식)
-anti_forensic_keywords = [
-    r'(?i).*ccleaner.*', r'(?i).*cleaner.*', r'(?i).*eraser.*',
-    r'(?i).*wiper.*', r'(?i).*scrubber.*', r'(?i).*delete.*',
-    r'(?i).*remove.*', r'(?i).*destroy.*', r'(?i).*bleachbit.*'
-]
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from keyword_rules import get_matcher
+
+# 안티포렌식 키워드 규칙 (common/anti_forensic_rules.json)
+matcher = get_matcher()
 
 def read_cleaned_xml(file_path):
     """XML 파일을 읽고 특수 문자를 처리한 내용을 반환"""
@@ -17,16 +18,18 @@ def read_cleaned_xml(file_path):
     cleaned_content = re.sub(r'&(?!amp;)', '&amp;', content)
     return cleaned_content
 
-def evt_xml_file_to_csv(xml_file_path, csv_file_path):
+def evt_xml_file_to_csv(xml_file_path, csv_file_path, root=None):
+    """안티포렌식 이벤트만 CSV로 저장 (root가 있으면 XML 파일을 다시 읽지 않음)"""
     try:
-        # XML 파일 파싱
-        cleaned_xml = read_cleaned_xml(xml_file_path)
-        root = ET.fromstring(cleaned_xml)
+        if root is None:
+            # XML 파일 파싱
+            cleaned_xml = read_cleaned_xml(xml_file_path)
+            root = ET.fromstring(cleaned_xml)
 
         # CSV 파일 작성
         with open(csv_file_path, 'w', newline='', encoding='utf-8') as csv_file:
             writer = csv.writer(csv_file)
-            writer.writerow(['로그종류', '시간', '이벤트ID', '이벤트내용'])  # 헤더 작성
+            writer.writerow(['로그종류', '시간', '이벤트ID', '이벤트내용', '탐지규칙'])  # 헤더 작성
 
             # 각 이벤트를 순회
             for event in root.findall('Event'):
@@ -35,9 +38,10 @@ def evt_xml_file_to_csv(xml_file_path, csv_file_path):
                 event_id = event.find('이벤트ID').text
                 event_content = event.find('이벤트내용').text
 
-                # 안티포렌식 키워드가 포함된 이벤트만 추출
-                if any(re.search(keyword, event_content) for keyword in anti_forensic_keywords):
-                    writer.writerow([log_type, time, event_id, event_content])
+                # 안티포렌식 키워드가 포함된 이벤트만 걸린 규칙과 함께 추출
+                rule = matcher.match(event_content)
+                if rule:
+                    writer.writerow([log_type, time, event_id, event_content, rule])
 
         print(f"안티포렌식 이벤트 로그가 {csv_file_path}에 저장되었습니다.")
 
@@ -49,8 +53,12 @@ def evt_xml_file_to_csv(xml_file_path, csv_file_path):
         print(f"예기치 않은 오류가 발생했습니다: {e}")
 
 # XML 파일 경로와 CSV 파일 경로 설정
-xml_file_path = r'..\..\output\artifact\event_log\event_logs.xml'
-csv_file_path = r'..\..\output\suspicious_artifact\event_log\anti_forensic_events.csv'
+xml_file_path = os.path.join('..', '..', 'output', 'artifact', 'event_log', 'event_logs.xml')
+csv_file_path = os.path.join('..', '..', 'output', 'suspicious_artifact', 'event_log', 'anti_forensic_events.csv')
+
+def main(root=None):
+    # XML 파일을 CSV로 변환
+    evt_xml_file_to_csv(xml_file_path, csv_file_path, root)
 
-# XML 파일을 CSV로 변환
-evt_xml_file_to_csv(xml_file_path, csv_file_path)
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,76 @@
 # coding=UTF-8
-import subprocess
 import os
+import sys
+import argparse
 
 # 스크립트가 있는 디렉토리로 작업 디렉토리 변경
 script_dir = os.path.dirname(os.path.abspath(__file__))
 os.chdir(script_dir)
 
-def get_first_disk_image_path(image_directory):
-    # 디스크 이미지 파일 확장자 목록
-    disk_image_extensions = ['.e01']
-    
-    # 지정된 디렉토리에서 모든 파일을 검색
-    for filename in os.listdir(image_directory):
-        # 파일 확장자를 소문자로 변환하여 확인
-        if any(filename.lower().endswith(ext) for ext in disk_image_extensions):
-            # 첫 번째 이미지 파일을 찾으면 그 경로 반환
-            return os.path.join(image_directory, filename)
+sys.path.append(os.path.join(script_dir, '..', 'common'))
+from image_session import get_first_disk_image_path
+from checkpoint import get_checkpoint
+from manifest import file_digest, stage_key
+from keyword_rules import rules_path
 
-    # 이미지 파일이 없을 경우 None 반환
-    return None
+# 각 단계 스크립트를 모듈로 불러와 같은 프로세스에서 실행 (단계마다 python을 새로 띄우지 않음)
+import prefetch_parsing
+import prefetch_with_xml_reference_path
+import prefetch_csv
+import prefetch_sus_extract
 
 def run_prefetch_parsing(image_path, output_dir):
-    """Step 1: prefetch_parsing.py 실행, 파싱한 프리패치 파일을 저장"""
-    subprocess.run(['python', 'prefetch_parsing.py', image_path, output_dir], check=True)
+    """Step 1: prefetch_parsing 실행, 파싱한 프리패치 파일을 저장"""
+    prefetch_parsing.main(image_path, output_dir)
 
-def run_prefetch_analysis_with_xml(prefetch_dir):
-    """Step 2: prefetch_with_xml_reference_path.py 실행 후 XML로 결과 저장"""
-    subprocess.run(['python', 'prefetch_with_xml_reference_path.py', prefetch_dir], check=True)
+def run_prefetch_analysis(prefetch_dir, image_path):
+    """Step 2: prefetch_with_xml_reference_path 실행 후 실행/참조 파일/볼륨 테이블을 CSV/SQLite로 저장, Execution 목록 반환"""
+    return prefetch_with_xml_reference_path.main(prefetch_dir, image_path)
 
-def run_prefetch_csv(csv_output_dir):
-    """Step 3: prefetch_csv.py 실행 후 CSV 출력"""
-    subprocess.run(['python', 'prefetch_csv.py', csv_output_dir], check=True)
+def run_prefetch_sus_ext_analysis(executions):
+    """Step 3: prefetch_sus_extract 실행 후 의심스러운 프리패치 파일을 출력"""
+    prefetch_sus_extract.main(executions)
 
-def run_prefetch_sus_ext_analysis():
-    """Step 4: prefetch_sus.py 실행 후 의심스러운 프리패치 파일을 출력"""
-    subprocess.run(['python', 'prefetch_sus_extract.py'], check=True)
 
+def main(image_path, suspicious=True):
+    # 중지되거나 실패한 이전 실행이 있으면 완료된 단계는 건너뛰고 이어서 진행
+    checkpoint = get_checkpoint('prefetch', image_path)
+    checkpoint.plan(['extract', 'parse'] + (['suspicious'] if suspicious else []))
 
-def main(image_path):
     # 1. 프리패치 파싱 및 추출
     output_dir = os.path.join('..', '..', 'output', 'artifact', 'prefetch')  # 상대 경로로 설정
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
-    run_prefetch_parsing(image_path, output_dir)
-    
-    # 2. 파싱한 프리패치 분석 (XML 생성)
-    run_prefetch_analysis_with_xml(output_dir)
+    checkpoint.run('extract', run_prefetch_parsing, image_path, output_dir, key=file_digest('prefetch_parsing.py'))
     
-    # 3. 분석 결과를 CSV로 출력
-    csv_output_dir = os.path.join('..', '..', 'output', 'artifact', 'prefetch')  # CSV 파일 경로 변경
-    if not os.path.exists(csv_output_dir):
-        os.makedirs(csv_output_dir)
-    run_prefetch_csv(csv_output_dir)
+    # 2. 파싱한 프리패치를 정규화된 테이블로 한 번에 출력 (prefetch.csv, prefetch_files.csv, prefetch_volumes.csv, prefetch.db)
+    # 실행 기록은 메모리로 다음 단계에 넘김 (체크포인트로 건너뛴 경우 None이라 다음 단계가 prefetch.db를 읽음)
+    # 추출한 .pf 파일의 해시와 스크립트가 모두 같으면 이전 실행의 결과를 그대로 사용
+    parse_key = stage_key(file_digest('prefetch_with_xml_reference_path.py', 'prefetch_parser.py', 'prefetch_csv.py',
+                                      'win10de.py', 'xpress_huffman.py'),
+                          checkpoint.input_key(output_dir))
+    executions = checkpoint.run('parse', run_prefetch_analysis, output_dir, image_path, key=parse_key,
+                                outputs=prefetch_csv.output_paths(output_dir))
     
-    # 4. 의심스러운 프리패치 파일을 분석하여 CSV 및 .pf 파일 출력
-    sus_output_dir = os.path.join('..', '..', 'output', 'suspicious_artifact', 'prefetch')  # 의심스러운 파일 경로 변경
-    if not os.path.exists(sus_output_dir):
-        os.makedirs(sus_output_dir)
-    run_prefetch_sus_ext_analysis()
+    if suspicious:
+        # 3. 의심스러운 프리패치 파일을 분석하여 CSV 및 .pf 파일 출력
+        sus_output_dir = os.path.join('..', '..', 'output', 'suspicious_artifact', 'prefetch')  # 의심스러운 파일 경로 변경
+        if not os.path.exists(sus_output_dir):
+            os.makedirs(sus_output_dir)
+        checkpoint.run('suspicious', run_prefetch_sus_ext_analysis, executions,
+                       key=stage_key(file_digest('prefetch_sus_extract.py', rules_path()), parse_key),
+                       outputs=[os.path.join(sus_output_dir, 'prefetch_sus.csv')])
+
+    checkpoint.finish()
 
 if __name__ == "__main__":
-    image_path_directory = r"..\..\image_here"
+    parser = argparse.ArgumentParser()
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--suspicious', action='store_true', help="의심스러운 흔적 분석 단계까지 실행 (기본값)")
+    group.add_argument('--no-suspicious', action='store_true', help="의심스러운 흔적 분석 단계를 생략")
+    args = parser.parse_args()
+
+    image_path_directory = os.path.join('..', '..', 'image_here')
     first_disk_image_path = get_first_disk_image_path(image_path_directory)
-    main(first_disk_image_path)
+    main(first_disk_image_path, not args.no_suspicious)
@@ -1,42 +1,141 @@
 # -*- coding: euc-kr -*-
 import os
-import xml.etree.ElementTree as ET
 import csv
+import sqlite3
+from collections import namedtuple
 
-def xml_to_csv(xml_file, csv_file):
-    """XML  CSV Ϸ ȯϴ Լ"""
-    try:
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
-        
-        # CSV  
-        with open(csv_file, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(["exe_path", "last_launch_time", "executable", "RunCount"])  #  ۼ
-
-            for execution in root.findall('execution'):
-                exe_path = execution.find('exe_path').text
-                last_launch_time = execution.find('last_launch_time').text
-                executable = execution.find('executable').text
-                run_count = execution.find('RunCount').text
-                writer.writerow([exe_path, last_launch_time, executable, run_count])
-
-        print(f"CSV   Ǿϴ: {csv_file}")
-    
-    except ET.ParseError as e:
-        print(f"XML Ľ : {e}")
-    except Exception as e:
-        print(f"CSV ȯ   ߻: {e}")
+# Parquet  pyarrow ġ 쿡 ( CSV/SQLite )
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+except ImportError:
+    pyarrow = None
+    pq = None
 
-def main():
-    xml_file = r"..\..\output\artifact\prefetch\prefetch_analysis.xml"
-    csv_file = r"..\..\output\artifact\prefetch\prefetch.csv"
+# ġ ϳ     ( ð ִ 8, ֽż)
+MAX_RUN_TIMES = 8
+EXECUTION_COLUMNS = (['prefetch_id', 'prefetch_file', 'executable', 'prefetch_hash', 'version', 'run_count']
+                     + ['run_time_%d' % (index + 1) for index in range(MAX_RUN_TIMES)])
+
+# ġ   ( Ʈ ϳ  , MFT   17̸  )
+FILE_COLUMNS = ['prefetch_id', 'filename', 'mft_entry', 'mft_sequence']
+
+# ġ   (丮  '|' , Windows ο '|'   )
+VOLUME_COLUMNS = ['prefetch_id', 'device_path', 'serial', 'creation_time', 'directories']
+
+# ̺ ̸ -> ÷ (CSV  ̸ prefetch.csv, prefetch_files.csv, prefetch_volumes.csv)
+TABLES = {
+    'executions': EXECUTION_COLUMNS,
+    'files': FILE_COLUMNS,
+    'volumes': VOLUME_COLUMNS,
+}
+CSV_NAMES = {
+    'executions': 'prefetch.csv',
+    'files': 'prefetch_files.csv',
+    'volumes': 'prefetch_volumes.csv',
+}
+DB_NAME = 'prefetch.db'
+
+#  ܰ(ǽ м) ޸𸮷 ѱ   (run_times 'YYYY-MM-DD HH:MM:SS' ڿ )
+Execution = namedtuple('Execution', ['prefetch_id', 'prefetch_file', 'executable', 'prefetch_hash', 'version',
+                                     'run_count', 'run_times'])
+
+def output_paths(output_dir):
+    """ȭ ġ     (CSV 3 SQLite)"""
+    return [os.path.join(output_dir, CSV_NAMES[table]) for table in TABLES] + [os.path.join(output_dir, DB_NAME)]
+
+class PrefetchTableWriter:
+    """/ / ̺ prefetch_id  CSV, SQLite(, Parquet)   """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.executions = []
+        self.counts = dict.fromkeys(TABLES, 0)
+        self._files = {}
+        self._writers = {}
+        for table, columns in TABLES.items():
+            f = open(os.path.join(output_dir, CSV_NAMES[table]), 'w', newline='', encoding='utf-8')
+            self._files[table] = f
+            self._writers[table] = csv.writer(f)
+            self._writers[table].writerow(columns)
+
+        # ӽ DB  close() ü (߰ ص  DB ״)
+        self.db_path = os.path.join(output_dir, DB_NAME)
+        self._temp_db_path = self.db_path + '.tmp'
+        if os.path.exists(self._temp_db_path):
+            os.remove(self._temp_db_path)
+        self._conn = sqlite3.connect(self._temp_db_path)
+        for table, columns in TABLES.items():
+            self._conn.execute('CREATE TABLE %s (%s)' % (table, ', '.join(columns)))
 
-    if not os.path.exists(xml_file):
-        print(f"{xml_file}   ʽϴ.")
-        return
+        # Parquet ̺ ü ־   ־ pyarrow   ÷ 
+        self._columns = {table: {column: [] for column in columns} for table, columns in TABLES.items()} if pq else None
 
-    xml_to_csv(xml_file, csv_file)
+    def _write(self, table, rows):
+        """ ̺  ߰"""
+        if not rows:
+            return
+        self._writers[table].writerows(rows)
+        self._conn.executemany('INSERT INTO %s VALUES (%s)' % (table, ', '.join('?' * len(TABLES[table]))), rows)
+        if self._columns is not None:
+            for column, values in zip(TABLES[table], zip(*rows)):
+                self._columns[table][column].extend(values)
+        self.counts[table] += len(rows)
+
+    def add(self, prefetch_file, info, format_time):
+        """PrefetchInfo ϳ  ̺ ϰ Execution ȯ (format_time FILETIME -> ڿ)"""
+        prefetch_id = len(self.executions) + 1
+        run_times = [format_time(run_time) for run_time in info.run_times[:MAX_RUN_TIMES]]
+        execution = Execution(prefetch_id, prefetch_file, info.executable, '%08X' % info.prefetch_hash,
+                              info.version, info.run_count, run_times)
+        self.executions.append(execution)
+
+        self._write('executions', [list(execution[:-1]) + run_times + [None] * (MAX_RUN_TIMES - len(run_times))])
+        self._write('files', [(prefetch_id, metric.filename, metric.mft_entry, metric.mft_sequence)
+                              for metric in info.metrics])
+        self._write('volumes', [(prefetch_id, volume.device_path, '%08X' % volume.serial,
+                                 format_time(volume.creation_time), '|'.join(volume.directories))
+                                for volume in info.volumes])
+        return execution
+
+    def close(self):
+        """ ݰ ε  DB ü, pyarrow  Parquet """
+        for f in self._files.values():
+            f.close()
+        self._conn.execute('CREATE INDEX executions_executable ON executions (executable)')
+        self._conn.execute('CREATE INDEX files_prefetch_id ON files (prefetch_id)')
+        self._conn.execute('CREATE INDEX volumes_prefetch_id ON volumes (prefetch_id)')
+        self._conn.commit()
+        self._conn.close()
+        os.replace(self._temp_db_path, self.db_path)
+
+        if self._columns is not None:
+            for table, columns in self._columns.items():
+                parquet_path = os.path.join(self.output_dir, CSV_NAMES[table].replace('.csv', '.parquet'))
+                pq.write_table(pyarrow.table(columns), parquet_path)
+
+        print(f"ġ ̺  Ϸ:  {self.counts['executions']}, "
+              f"  {self.counts['files']},  {self.counts['volumes']} ({self.output_dir})")
+
+def read_executions(output_dir):
+    """prefetch.db  ̺ Execution   (DB  None)"""
+    db_path = os.path.join(output_dir, DB_NAME)
+    if not os.path.exists(db_path):
+        print(f"{db_path}   ʽϴ.")
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute('SELECT %s FROM executions ORDER BY prefetch_id' % ', '.join(EXECUTION_COLUMNS)).fetchall()
+    finally:
+        conn.close()
+    return [Execution(*row[:6], [run_time for run_time in row[6:] if run_time]) for row in rows]
+
+def main():
+    """ ġ ̺   """
+    output_dir = r"..\..\output\artifact\prefetch"
+    executions = read_executions(output_dir)
+    if executions is not None:
+        print(f"ġ   {len(executions)}: {os.path.join(output_dir, DB_NAME)}")
 
 if __name__ == "__main__":
     main()
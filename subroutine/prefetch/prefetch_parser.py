@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Prefetch(.pf) 버전별 파서
+
+파일을 한 번에 버퍼로 읽고 헤더의 버전(17: XP, 23: Vista/7, 26: 8.1, 30/31: 10/11)으로 레이아웃을 골라
+미리 컴파일한 struct.Struct로 memoryview 위에서 바로 해석한다 (파일 메트릭, 파일 이름 문자열 표, 볼륨 정보, 실행 시간 8개).
+MAM 압축(Win10/11)은 win10de.decompress로 먼저 해제하고, 파일이 많으면 프로세스 풀에서 나눠 파싱한다.
+"""
+import os
+import struct
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import win10de
+
+# 파일 헤더: 버전, 'SCCA', 알 수 없음, 파일 크기, 실행 파일 이름(UTF-16 60바이트), 프리패치 해시, 플래그
+HEADER = struct.Struct('<I4sII60sII')
+
+# 파일 정보 공통 부분 (헤더 바로 뒤): 메트릭 배열/트레이스 체인/파일 이름 문자열/볼륨 정보의 오프셋과 개수
+FILE_INFO = struct.Struct('<9I')
+
+# 파일 메트릭 항목: 버전 17은 20바이트, 23 이후는 평균 시간과 MFT 참조가 붙은 32바이트
+METRIC_V17 = struct.Struct('<5I')
+METRIC_V23 = struct.Struct('<6IQ')
+
+# 볼륨 정보 항목 앞부분: 장치 경로 오프셋/글자 수, 생성 시간, 시리얼, 파일 참조 오프셋/크기, 디렉토리 문자열 오프셋/개수
+VOLUME = struct.Struct('<IIQIIIII')
+
+FILETIME = struct.Struct('<Q')
+UINT32 = struct.Struct('<I')
+UINT16 = struct.Struct('<H')
+
+SIGNATURE = b'SCCA'
+
+# 버전별 레이아웃: (실행 시간 오프셋, 실행 시간 개수, 실행 횟수 오프셋, 메트릭 구조, 볼륨 항목 크기)
+Layout = namedtuple('Layout', ['run_times_offset', 'run_times_count', 'run_count_offset', 'metric', 'volume_size'])
+LAYOUTS = {
+    17: Layout(120, 1, 144, METRIC_V17, 40),
+    23: Layout(128, 1, 152, METRIC_V23, 104),
+    26: Layout(128, 8, 208, METRIC_V23, 104),
+    30: Layout(128, 8, 200, METRIC_V23, 96),
+    31: Layout(128, 8, 200, METRIC_V23, 96),
+}
+
+# 버전 30의 첫 형식(초기 Win10)은 파일 정보가 8바이트 길어 메트릭 배열이 0x130에서 시작하고 실행 횟수가 208에 있음
+V30_LONG_INFO_METRICS_OFFSET = 0x130
+
+# 이 개수 이상이면 프로세스 풀로 파싱 (적으면 프로세스 생성 비용이 더 큼)
+PARALLEL_MIN_FILES = 64
+
+DEFAULT_WORKERS = max(1, min(8, os.cpu_count() or 2))
+
+# 파일 메트릭 (참조된 파일 하나): 시간 값은 프리패치 원본 값, MFT 참조는 버전 17이면 None
+FileMetric = namedtuple('FileMetric', ['filename', 'start_time', 'duration', 'flags', 'mft_entry', 'mft_sequence'])
+
+# 볼륨 정보: 생성 시간은 FILETIME 정수, directories는 해당 볼륨에서 참조된 디렉토리 목록
+VolumeInfo = namedtuple('VolumeInfo', ['device_path', 'creation_time', 'serial', 'directories'])
+
+# 파싱 결과: run_times는 0이 아닌 실행 시간(FILETIME 정수, 최신순), filenames는 파일 이름 문자열 표 전체
+PrefetchInfo = namedtuple('PrefetchInfo', ['version', 'executable', 'prefetch_hash', 'run_count', 'run_times',
+                                           'metrics', 'filenames', 'volumes'])
+
+
+def _utf16(view, start, end):
+    """memoryview 구간을 UTF-16 문자열로 디코딩 (복사본을 만들지 않음)"""
+    return str(view[start:end], 'utf-16-le', 'ignore')
+
+
+def _check_range(view, offset, size, what):
+    """구간이 버퍼 안에 있는지 확인"""
+    if offset + size > len(view):
+        raise ValueError(f"{what} 영역이 파일 크기를 벗어납니다. (offset={offset}, size={size})")
+
+
+def _read_metrics(view, info, layout):
+    """파일 메트릭 배열을 FileMetric 목록으로 해석"""
+    metrics_offset, metrics_count = info[0], info[1]
+    strings_offset, strings_size = info[4], info[5]
+    metric = layout.metric
+    _check_range(view, metrics_offset, metrics_count * metric.size, "파일 메트릭")
+
+    metrics = []
+    for index in range(metrics_count):
+        fields = metric.unpack_from(view, metrics_offset + index * metric.size)
+        if metric is METRIC_V17:
+            start_time, duration, name_offset, name_chars, flags = fields
+            mft_entry = mft_sequence = None
+        else:
+            start_time, duration, _, name_offset, name_chars, flags, reference = fields
+            mft_entry, mft_sequence = reference & 0xFFFFFFFFFFFF, reference >> 48
+        if name_offset + name_chars * 2 > strings_size:
+            raise ValueError(f"파일 메트릭 {index}의 이름이 파일 이름 문자열 표를 벗어납니다.")
+        start = strings_offset + name_offset
+        filename = _utf16(view, start, start + name_chars * 2)
+        metrics.append(FileMetric(filename, start_time, duration, flags, mft_entry, mft_sequence))
+    return metrics
+
+
+def _read_volumes(view, info, layout):
+    """볼륨 정보 배열을 VolumeInfo 목록으로 해석"""
+    volumes_offset, volumes_count, volumes_size = info[6], info[7], info[8]
+    _check_range(view, volumes_offset, volumes_size, "볼륨 정보")
+    if volumes_count * layout.volume_size > volumes_size:
+        raise ValueError("볼륨 정보 항목 수가 볼륨 정보 크기를 벗어납니다.")
+
+    volumes = []
+    for index in range(volumes_count):
+        (path_offset, path_chars, creation_time, serial, _, _,
+         directories_offset, directories_count) = VOLUME.unpack_from(view, volumes_offset + index * layout.volume_size)
+        start = volumes_offset + path_offset
+        _check_range(view, start, path_chars * 2, "볼륨 장치 경로")
+        device_path = _utf16(view, start, start + path_chars * 2)
+
+        # 디렉토리 문자열: 글자 수(UInt16) + UTF-16 문자열 + NUL
+        directories = []
+        position = volumes_offset + directories_offset
+        for _ in range(directories_count):
+            _check_range(view, position, 2, "디렉토리 문자열")
+            chars = UINT16.unpack_from(view, position)[0]
+            position += 2
+            _check_range(view, position, chars * 2, "디렉토리 문자열")
+            directories.append(_utf16(view, position, position + chars * 2))
+            position += (chars + 1) * 2
+        volumes.append(VolumeInfo(device_path, creation_time, serial, directories))
+    return volumes
+
+
+def parse_prefetch_buffer(data):
+    """압축이 해제된 프리패치 버퍼를 버전에 맞게 해석해 PrefetchInfo 반환 (형식이 잘못되면 ValueError)"""
+    view = memoryview(data)
+    if len(view) < HEADER.size + FILE_INFO.size:
+        raise ValueError("프리패치 헤더보다 작은 파일입니다.")
+
+    version, signature, _, _, name, prefetch_hash, _ = HEADER.unpack_from(view)
+    if signature != SIGNATURE:
+        raise ValueError("SCCA 시그니처가 없습니다.")
+    layout = LAYOUTS.get(version)
+    if layout is None:
+        raise ValueError(f"지원하지 않는 프리패치 버전입니다: {version}")
+
+    info = FILE_INFO.unpack_from(view, HEADER.size)
+    run_count_offset = layout.run_count_offset
+    if version >= 30 and info[0] >= V30_LONG_INFO_METRICS_OFFSET:
+        run_count_offset = 208
+    _check_range(view, run_count_offset, UINT32.size, "실행 횟수")
+    _check_range(view, layout.run_times_offset, layout.run_times_count * FILETIME.size, "실행 시간")
+
+    executable = str(name, 'utf-16-le', 'ignore').split('\x00', 1)[0]
+    run_count = UINT32.unpack_from(view, run_count_offset)[0]
+    run_times = []
+    for index in range(layout.run_times_count):
+        run_time = FILETIME.unpack_from(view, layout.run_times_offset + index * FILETIME.size)[0]
+        if run_time:
+            run_times.append(run_time)
+
+    strings_offset, strings_size = info[4], info[5]
+    _check_range(view, strings_offset, strings_size, "파일 이름 문자열")
+    filenames = [filename for filename in _utf16(view, strings_offset, strings_offset + strings_size).split('\x00') if filename]
+
+    try:
+        metrics = _read_metrics(view, info, layout)
+        volumes = _read_volumes(view, info, layout)
+    except struct.error as e:
+        raise ValueError(f"프리패치 구조를 읽지 못했습니다: {e}")
+
+    return PrefetchInfo(version, executable, prefetch_hash, run_count, run_times, metrics, filenames, volumes)
+
+
+def parse_prefetch_data(data):
+    """프리패치 원본 버퍼(MAM 압축이면 메모리에서 해제)를 파싱해 PrefetchInfo 반환"""
+    if bytes(data[0:3]) == b'MAM':
+        data = win10de.decompress(data)
+    return parse_prefetch_buffer(data)
+
+
+def _parse_source(source):
+    """프로세스 풀 작업 단위: 파일 경로 또는 버퍼를 파싱해 (PrefetchInfo, 오류 메시지) 반환"""
+    try:
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                source = f.read()
+        return parse_prefetch_data(source), None
+    except (ValueError, OSError) as e:
+        return None, str(e)
+
+
+def parse_prefetch_sources(sources, workers=DEFAULT_WORKERS):
+    """파일 경로 또는 버퍼 목록을 순서대로 파싱해 [(PrefetchInfo 또는 None, 오류 메시지)] 반환 (많으면 프로세스 풀 사용)"""
+    sources = list(sources)
+    if workers > 1 and len(sources) >= PARALLEL_MIN_FILES:
+        chunksize = max(1, len(sources) // (workers * 4))
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(_parse_source, sources, chunksize=chunksize))
+        except (OSError, BrokenProcessPool) as e:
+            print(f"프로세스 풀을 사용할 수 없어 순차로 파싱합니다: {e}")
+    return [_parse_source(source) for source in sources]
@@ -1,110 +1,109 @@
-import xml.etree.ElementTree as ET
 import csv
 import os
 import shutil
+import argparse
+from collections import defaultdict
 from datetime import datetime, timedelta
-import re
-
-def xml_to_csv_and_extract(xml_file, csv_file, prefetch_dir, suspicious_artifact_dir):
-    try:
-        # XML 파일을 읽어서 분석
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
-    except ET.ParseError as e:
-        print(f"XML 파일에 오류가 있습니다: {e}")
-        return
-
-    # 안티 포렌식 키워드 목록 (정규 표현식)
-    anti_forensic_keywords = [
-        r'(?i).*ccleaner.*', r'(?i).*cleaner.*', r'(?i).*eraser.*',
-        r'(?i).*wiper.*', r'(?i).*scrubber.*', r'(?i).*delete.*',
-        r'(?i).*remove.*', r'(?i).*destroy.*', r'(?i).*bleachbit.*'
-    ]
-
-    processed_executables = set()  # 중복 방지를 위한 세트
-    extracted_executables = set()  # 추출된 파일 추적
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from keyword_rules import get_matcher
+from prefetch_csv import read_executions
+
+# 짧은 시간 안의 반복 실행(버스트) 기준: 이 시간 창 안에서 임계값 이상 실행되면 의심
+# 프리패치 하나에는 최근 실행 시간이 최대 8개(버전 17/23은 1개)만 남으므로 임계값은 8보다 작아야 함
+BURST_WINDOW_MINUTES = 10
+BURST_THRESHOLD = 5
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def group_run_times(executions):
+    """실행 파일별 실행 시간을 한 번에 모아 정렬한 {실행 파일: [datetime]} 반환"""
+    run_times = defaultdict(list)
+    for execution in executions:
+        for run_time in execution.run_times:
+            try:
+                # 'YYYY-MM-DD HH:MM:SS'는 ISO 형식이라 strptime보다 빠른 fromisoformat으로 해석
+                run_times[execution.executable].append(datetime.fromisoformat(run_time))
+            except ValueError:
+                print(f"잘못된 날짜 형식: {run_time}")
+    for times in run_times.values():
+        times.sort()
+    return run_times
+
+def find_burst(times, window):
+    """정렬된 실행 시간에서 window 안에 가장 많이 실행된 구간을 두 포인터로 찾아 (횟수, 시작, 끝) 반환"""
+    best = (0, None, None)
+    start = 0
+    for end, end_time in enumerate(times):
+        while end_time - times[start] > window:
+            start += 1
+        count = end - start + 1
+        if count > best[0]:
+            best = (count, times[start], end_time)
+    return best
+
+def build_prefetch_index(prefetch_dir):
+    """디렉토리를 한 번만 읽어 {실행 파일 이름(소문자): [.pf 파일 이름]} 색인을 만듦 (파일 이름은 '<실행 파일>-<해시>.pf')"""
+    index = defaultdict(list)
+    for name in os.listdir(prefetch_dir):
+        if name.lower().endswith('.pf'):
+            index[name[:-3].rsplit('-', 1)[0].lower()].append(name)
+    return index
+
+def extract_suspicious(executions, csv_file, prefetch_dir, suspicious_artifact_dir,
+                       window_minutes=BURST_WINDOW_MINUTES, threshold=BURST_THRESHOLD):
+    """실행 파일별로 짧은 시간 안에 threshold번 이상 실행된 의심 기록을 CSV로 저장하고 Prefetch 파일을 추출"""
+    window = timedelta(minutes=window_minutes)
+
+    # 안티 포렌식 키워드 규칙 (common/anti_forensic_rules.json)
+    matcher = get_matcher()
+
+    run_times = group_run_times(executions)
+    prefetch_index = build_prefetch_index(prefetch_dir)
 
     # CSV 파일을 열고 분석 결과를 기록
     with open(csv_file, 'w', newline='', encoding='utf-8') as file:
         writer = csv.writer(file)
+        writer.writerow(['Last Launch Time', 'Executable', 'Run Count', 'Path', 'Matched Rule'])
 
-        # CSV 파일이 비어 있으면 헤더 추가
-        if file.tell() == 0:
-            writer.writerow(['Last Launch Time', 'Executable', 'Run Count', 'Path'])
+        for executable, times in run_times.items():
+            rule = matcher.match(executable)
+            if not rule:
+                print(f"의심스러운 키워드와 일치하지 않음: {executable}")
+                continue
+
+            count, _, burst_end = find_burst(times, window)
+            if count < threshold:
+                continue
+            last_launch_time = burst_end.strftime(TIME_FORMAT)
+            print(f"{executable}가 {window_minutes}분 내에 {count}번 실행되었습니다.")
+
+            # 의심스러운 실행 파일일 경우 색인에서 Prefetch 파일을 찾아 추출
+            suspicious_files = prefetch_index.get(executable.lower(), [])
+            if not suspicious_files:
+                print(f"Prefetch 파일을 찾지 못했습니다: {executable}")
+                continue
 
-        # XML의 실행 파일 기록을 반복 처리
-        for execution in root.findall('execution'):
-            last_launch_time = execution.find('last_launch_time').text
-            executable = execution.find('executable').text
-            run_count = int(execution.find('RunCount').text)
-            exe_path = execution.find('exe_path').text  # 경로 포함된 exe_path 사용
+            for suspicious_file in suspicious_files:
+                prefetch_file_path = os.path.join(prefetch_dir, suspicious_file)
+                destination_file = os.path.join(suspicious_artifact_dir, suspicious_file)
+
+                print(f"추출하려는 Prefetch 파일: {prefetch_file_path}")
 
-            if not last_launch_time or last_launch_time.strip() == "":
-                last_launch_time = "No Time Information"
-            else:
                 try:
-                    last_launch_time_dt = datetime.strptime(last_launch_time, "%Y-%m-%d %H:%M:%S")
-                except ValueError:
-                    print(f"잘못된 날짜 형식: {last_launch_time}")
-                    continue
-
-            # 중복 실행 파일인지 확인
-            if executable in processed_executables:
-                continue  # 이미 처리된 파일은 건너뜀
-
-            # 실행 횟수와 시간 기반 필터링 (최근 10분간 실행 횟수)
-            execution_times = [exec.find('last_launch_time').text for exec in root.findall('execution') if exec.find('executable').text == executable]
-            valid_execution_times = []
-            for time_str in execution_times:
-                if time_str and time_str.strip() != "No Time Information":
-                    try:
-                        time_dt = datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S")
-                        valid_execution_times.append(time_dt)
-                    except ValueError:
-                        continue
-
-            if last_launch_time_dt:
-                start_time = last_launch_time_dt - timedelta(minutes=10)
-                count_in_short_time = sum(1 for time in valid_execution_times if start_time <= time <= last_launch_time_dt)
-            else:
-                count_in_short_time = 0
-
-            # 의심스러운 파일 처리 및 실행 횟수 출력
-            if count_in_short_time > 10 and any(re.match(keyword, executable) for keyword in anti_forensic_keywords):
-                print(f"{executable}가 10분 내에 {count_in_short_time}번 실행되었습니다.")
-
-                # 의심스러운 실행 파일일 경우 Prefetch 파일 추출
-                suspicious_files = [f for f in os.listdir(prefetch_dir) if executable.lower().replace('.exe', '') in f.lower() and f.endswith('.pf')]
-
-                if suspicious_files:
-                    for suspicious_file in suspicious_files:
-                        prefetch_file_path = os.path.join(prefetch_dir, suspicious_file)
-                        destination_file = os.path.join(suspicious_artifact_dir, suspicious_file)
-
-                        print(f"추출하려는 Prefetch 파일: {prefetch_file_path}")
-
-                        try:
-                            shutil.copy(prefetch_file_path, destination_file)
-                            # 모든 Prefetch 파일에 대해 추출 완료 메시지 출력
-                            print(f"의심스러운 파일 {suspicious_file} 추출 완료: {destination_file}")
-                            extracted_executables.add(executable)
-
-                            # CSV에 실행 경로 포함하여 기록
-                            writer.writerow([last_launch_time, executable, count_in_short_time, prefetch_file_path])
-                        except IOError as e:
-                            print(f"파일 복사 중 오류 발생: {e}")
-                else:
-                    print(f"Prefetch 파일을 찾지 못했습니다: {executable}")
-
-            else:
-                print(f"의심스러운 키워드와 일치하지 않음: {executable}")
+                    shutil.copy(prefetch_file_path, destination_file)
+                    print(f"의심스러운 파일 {suspicious_file} 추출 완료: {destination_file}")
 
-            # 중복 방지를 위해 파일을 처리 목록에 추가
-            processed_executables.add(executable)
+                    # CSV에 실행 경로 포함하여 기록
+                    writer.writerow([last_launch_time, executable, count, prefetch_file_path, rule])
+                except IOError as e:
+                    print(f"파일 복사 중 오류 발생: {e}")
 
-def main():
+def main(executions=None, window_minutes=BURST_WINDOW_MINUTES, threshold=BURST_THRESHOLD):
+    """의심스러운 프리패치 분석 (executions가 없으면 prefetch.db에서 읽음)"""
     # 경로 설정
-    output_dir = os.path.join('..', '..', 'output', 'artifact', 'prefetch')  # XML 파일이 있는 디렉토리
+    output_dir = os.path.join('..', '..', 'output', 'artifact', 'prefetch')  # prefetch.db가 있는 디렉토리
     prefetch_dir = output_dir  # Prefetch 파일들이 있는 디렉토리
     sus_file_dir = r'..\..\output\suspicious_file\prefetch'  # 의심스러운 파일이 저장될 디렉토리
     sus_csv = r'..\..\output\suspicious_artifact\prefetch\prefetch_sus.csv'  # 분석 결과가 저장될 CSV 파일
@@ -113,11 +112,18 @@ def main():
         if not os.path.exists(directory):
             os.makedirs(directory)
 
-    # XML 파일 경로
-    xml_file = os.path.join(output_dir, 'prefetch_analysis.xml')
+    # 이전 단계의 결과를 메모리로 받지 못했으면 정규화된 실행 테이블을 읽음
+    if executions is None:
+        executions = read_executions(output_dir)
+        if executions is None:
+            return
 
     # 분석 및 파일 추출 실행
-    xml_to_csv_and_extract(xml_file, sus_csv, prefetch_dir, sus_file_dir)
+    extract_suspicious(executions, sus_csv, prefetch_dir, sus_file_dir, window_minutes, threshold)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="짧은 시간 안에 반복 실행된 안티 포렌식 도구의 Prefetch 추출")
+    parser.add_argument("--window", type=float, default=BURST_WINDOW_MINUTES, help="버스트 시간 창 (분)")
+    parser.add_argument("--threshold", type=int, default=BURST_THRESHOLD, help="시간 창 안의 실행 횟수가 이 값 이상이면 의심")
+    args = parser.parse_args()
+    main(window_minutes=args.window, threshold=args.threshold)
@@ -1,33 +1,15 @@
 # -*- coding: utf-8 -*-
 import os
-import struct
+import sys
 from datetime import datetime, timedelta
 import pytz
-import xml.etree.ElementTree as ET
-import subprocess
-import re
 
-def uncomp_prefetch(prefetch_file):
-    """압축된 prefetch 파일을 해제"""
-    script_path = "./win10de.py"  # 현재 디렉토리 또는 전체 경로 지정
-    command = ["python", script_path, prefetch_file, prefetch_file]
-    
-    try:
-        with open(prefetch_file, 'rb') as f:
-            header = f.read(8)
-            if header[0:3] != b'MAM':  # 압축 파일 확인 (앞 3바이트 확인)
-                print("Not a compressed prefetch file.")
-                return None, None
-    except FileNotFoundError:
-        print("File not found:", prefetch_file)
-        return None, None
-
-    result = subprocess.run(command, shell=True, capture_output=True, text=True)
-
-    if result.stderr:
-        print("STDERR:", result.stderr)
-    if result.stdout:
-        print("STDOUT:", result.stdout)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from image_session import get_session, get_first_disk_image_path
+from path_index import get_path_index
+from progress import report, report_total
+from prefetch_parser import parse_prefetch_data, parse_prefetch_sources
+from prefetch_csv import PrefetchTableWriter
 
 def filetime_to_dt(filetime):
     """Windows FILETIME 값을 날짜 시간으로 변환"""
@@ -38,105 +20,87 @@ def filetime_to_dt(filetime):
     korea_time = utc_time.replace(tzinfo=pytz.utc).astimezone(korea_timezone)
     return korea_time if korea_time.year > 1601 else ""
 
-def parse_prefetch(prefetch_file):
-    """Prefetch 파일을 파싱하여 실행 정보 추출"""
-    try:
-        with open(prefetch_file, 'rb') as f:
-            filesize = os.path.getsize(prefetch_file)
-            f.seek(16)
-            executable_name = f.read(58).decode('utf-16le', errors='ignore').strip('\x00')
-
-            last_launch_times = []
-            f.seek(128)
-            for _ in range(8):
-                if f.tell() + 8 > filesize:
-                    raise ValueError("Attempt to read beyond file size.")
-                raw_time = f.read(8)
-                if len(raw_time) == 8:
-                    file_time = struct.unpack('<Q', raw_time)[0]
-                    last_launch_times.append(filetime_to_dt(file_time))
-
-            f.seek(200)
-            if f.tell() + 4 > filesize:
-                raise ValueError("Attempt to read beyond file size.")
-            run_count = struct.unpack('<I', f.read(4))[0]
-
-            # 실행 파일 경로 읽기
-            f.seek(0x64)
-            path_offset = struct.unpack('<I', f.read(4))[0]
-            f.seek(0x68)
-            path_length = struct.unpack('<I', f.read(4))[0]
-            f.seek(path_offset)
-            executable_path_bytes = f.read(path_length)
-            
-            try:
-                executable_path = executable_path_bytes.decode('utf-16le', errors='ignore').strip('\x00')
-            except UnicodeDecodeError:
-                try:
-                    executable_path = executable_path_bytes.decode('utf-8', errors='ignore').strip('\x00')
-                except UnicodeDecodeError:
-                    executable_path = executable_path_bytes.decode('latin1', errors='ignore').strip('\x00')
+def format_filetime(filetime):
+    """FILETIME 값을 'YYYY-MM-DD HH:MM:SS' 문자열로 변환 (값이 없으면 빈 문자열)"""
+    korea_time = filetime_to_dt(filetime)
+    if isinstance(korea_time, datetime):
+        return korea_time.strftime('%Y-%m-%d %H:%M:%S')
+    return ""
 
-            executable_paths = executable_path.split('\x00')
-            executable_paths = [path for path in executable_paths if path]
+def prefetch_summary(info):
+    """PrefetchInfo를 (실행 파일 이름, 실행 시간 목록, 실행 횟수, 참조 경로 목록)으로 변환"""
+    last_launch_times = [filetime_to_dt(run_time) for run_time in info.run_times]
+    return info.executable, last_launch_times, info.run_count, info.filenames
 
-            return executable_name, last_launch_times, run_count, executable_paths
-
-    except Exception as e:
+def parse_prefetch(prefetch_file):
+    """Prefetch 파일(경로 또는 이미지에서 읽은 bytes/memoryview)을 버전에 맞게 파싱하여 실행 정보 추출"""
+    try:
+        if not isinstance(prefetch_file, (bytes, bytearray, memoryview)):
+            with open(prefetch_file, 'rb') as f:
+                prefetch_file = f.read()
+        return prefetch_summary(parse_prefetch_data(prefetch_file))
+    except (ValueError, OSError) as e:
         print(f"Error parsing prefetch file: {e}")
         return None, None, None, None
 
-def escape_xml_characters(data):
-    """XML에서 특수 문자를 처리"""
-    return re.sub(r'[^\x09\x0A\x0D\x20-\x7E]', '', data)
-
-def generate_xml(last_launch_times, executable_name, run_count, executable_paths):
-    """XML 데이터를 생성"""
-    xml_output = ''
-    for last_launch_time in last_launch_times:
-        for executable_path in executable_paths:
-            xml_output += '  <execution>\n'
-            xml_output += '    <exe_path>%s</exe_path>\n' % escape_xml_characters(executable_path)
-            if isinstance(last_launch_time, datetime):
-                xml_output += '    <last_launch_time>%s</last_launch_time>\n' % last_launch_time.strftime('%Y-%m-%d %H:%M:%S')
-            else:
-                xml_output += '    <last_launch_time>%s</last_launch_time>\n' % last_launch_time
-            xml_output += '    <executable>%s</executable>\n' % escape_xml_characters(executable_name)
-            xml_output += '    <RunCount>%d</RunCount>\n' % run_count
-            xml_output += '  </execution>\n'
-    return xml_output
-
-def process_all_prefetch_files(prefetch_dir, output_xml_file):
-    """주어진 디렉토리에서 모든 .pf 파일을 처리하여 XML 파일로 출력"""
-    with open(output_xml_file, "w", encoding="utf-8") as file:
-        # XML 시작 태그 추가
-        file.write('<?xml version="1.0" encoding="UTF-8"?>\n<prefetch>\n')
-        print("XML 시작 태그 작성 완료")
-
-        for root, _, files in os.walk(prefetch_dir):
-            for pf_file in files:
-                if pf_file.endswith(".pf"):
-                    prefetch_file_path = os.path.join(root, pf_file)
-                    uncomp_prefetch(prefetch_file_path)
-                    executable_name, last_launch_times, run_count, executable_paths = parse_prefetch(prefetch_file_path)
-                    if executable_name and last_launch_times:
-                        xml_data = generate_xml(last_launch_times, executable_name, run_count, executable_paths)
-                        file.write(xml_data)
-                        print(f"{pf_file} 처리 완료 및 XML에 기록.")
-                    else:
-                        print(f"Failed to process {pf_file}")
-
-        # XML 종료 태그 추가
-        file.write('</prefetch>\n')
-        print("XML 종료 태그 작성 완료")
-
-def main(prefetch_dir):
-    # XML 파일로 출력할 경로 설정
-    output_xml_file = os.path.join(prefetch_dir, "prefetch_analysis.xml")
-    # 모든 .pf 파일 처리 및 XML 생성
-    process_all_prefetch_files(prefetch_dir, output_xml_file)
+def write_prefetch_tables(output_dir, names, results):
+    """파싱 결과를 실행/참조 파일/볼륨 테이블로 한 번에 기록하고 Execution 목록을 반환"""
+    writer = PrefetchTableWriter(output_dir)
+    for name, (info, error) in zip(names, results):
+        if info is None:
+            print(f"Failed to process {name}: {error}")
+            continue
+        writer.add(name, info, format_filetime)
+    writer.close()
+    return writer.executions
+
+def process_all_prefetch_files(prefetch_dir, output_dir):
+    """주어진 디렉토리에서 모든 .pf 파일을 (많으면 프로세스 풀로) 파싱하여 테이블로 출력하고 Execution 목록을 반환"""
+    paths = []
+    for root, _, files in os.walk(prefetch_dir):
+        paths += [os.path.join(root, pf_file) for pf_file in files if pf_file.endswith(".pf")]
+    results = parse_prefetch_sources(paths)
+    return write_prefetch_tables(output_dir, [os.path.basename(path) for path in paths], results)
+
+def process_prefetch_files_from_image(image_path, output_dir):
+    """원본 복사 없이 이미지의 Windows\\Prefetch\\*.pf 파일을 메모리로 읽어 (많으면 프로세스 풀로) 파싱하여 테이블로 출력 (실패하면 None)"""
+    session = get_session(image_path)
+    if session.partition_offset is None:
+        print("파티션 오프셋을 찾을 수 없습니다.")
+        return None
+    index = get_path_index(session)
+
+    # 이미지 읽기는 세션이 있는 이 프로세스에서, 압축 해제와 파싱은 작업 프로세스에서
+    records = list(index.glob(r"Windows\Prefetch\*.pf"))
+    report_total(len(records))
+    names, buffers = [], []
+    for record in records:
+        try:
+            data = bytes(session.read_buffer(record.inode))
+        except (ValueError, OSError) as e:
+            print(f"Failed to process {record.name}: {e}")
+            report(advance=1)
+            continue
+        names.append(record.name)
+        buffers.append(data)
+        report(advance=1, advance_bytes=len(data))
+    results = parse_prefetch_sources(buffers)
+    return write_prefetch_tables(output_dir, names, results)
+
+def main(prefetch_dir, image_path=None):
+    """Prefetch를 분석해서 실행/참조 파일/볼륨 테이블(prefetch.csv, prefetch_files.csv, prefetch_volumes.csv, prefetch.db)을 만들고 Execution 목록을 반환"""
+    os.makedirs(prefetch_dir, exist_ok=True)
+
+    # 이미지가 주어지면 .pf 파일을 이미지에서 바로 읽음 (추출된 복사본을 다시 읽지 않음)
+    if image_path:
+        executions = process_prefetch_files_from_image(image_path, prefetch_dir)
+        if executions is not None:
+            return executions
+
+    # 이미지가 없거나 읽지 못하면 추출된 .pf 파일 처리
+    return process_all_prefetch_files(prefetch_dir, prefetch_dir)
 
 if __name__ == "__main__":
     # Prefetch 파일이 저장된 디렉토리 경로
-    prefetch_dir = r"..\..\output\artifact\prefetch"
-    main(prefetch_dir)
+    prefetch_dir = os.path.join('..', '..', 'output', 'artifact', 'prefetch')
+    main(prefetch_dir, get_first_disk_image_path(os.path.join('..', '..', 'image_here')))
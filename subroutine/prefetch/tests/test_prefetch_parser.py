@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import struct
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import prefetch_parser
+
+# 버전별 헤더 오프셋: (실행 시간 오프셋, 실행 시간 개수, 실행 횟수 오프셋, 메트릭 크기, 볼륨 항목 크기, 파일 정보 끝)
+VERSION_OFFSETS = {
+    17: (120, 1, 144, 20, 40, 152),
+    23: (128, 1, 152, 32, 104, 240),
+    26: (128, 8, 208, 32, 104, 304),
+    30: (128, 8, 200, 32, 96, 296),
+}
+
+EXECUTABLE = 'CMD.EXE'
+PREFETCH_HASH = 0x1234ABCD
+RUN_COUNT = 42
+RUN_TIMES = [133000000000000000 + i * 600000000 for i in range(8)]
+FILES = ['\\VOLUME{01}\\WINDOWS\\SYSTEM32\\NTDLL.DLL', '\\VOLUME{01}\\WINDOWS\\SYSTEM32\\CMD.EXE']
+DIRECTORIES = ['\\VOLUME{01}\\WINDOWS', '\\VOLUME{01}\\WINDOWS\\SYSTEM32']
+# 볼륨 두 개 (두 번째 항목 위치로 볼륨 항목 크기를 확인): (장치 경로, 생성 시간, 시리얼)
+VOLUMES = [('\\VOLUME{01d0aaaa-1234}', 132000000000000000, 0xDEADBEEF),
+           ('\\VOLUME{01d0bbbb-5678}', 132100000000000000, 0x0BADF00D)]
+
+
+def build_prefetch(version, info_end=None, run_count_offset=None):
+    """버전별 오프셋대로 메트릭/파일 이름/볼륨 정보를 채운 압축되지 않은 프리패치 버퍼"""
+    run_times_offset, run_times_count, default_run_count_offset, metric_size, volume_size, default_info_end = VERSION_OFFSETS[version]
+    buf = bytearray(info_end or default_info_end)
+
+    strings = bytearray()
+    metrics = bytearray()
+    for index, filename in enumerate(FILES):
+        name_offset = len(strings)
+        strings += (filename + '\0').encode('utf-16-le')
+        if metric_size == 20:
+            metrics += struct.pack('<5I', 0, 0, name_offset, len(filename), 2)
+        else:
+            metrics += struct.pack('<6IQ', 0, 0, 0, name_offset, len(filename), 2, (7 << 48) | (1000 + index))
+    metrics_offset = len(buf)
+    buf += metrics
+    strings_offset = len(buf)
+    buf += strings
+    while len(buf) % 8:
+        buf.append(0)
+
+    # 볼륨 항목 배열 뒤에 장치 경로와 디렉토리 문자열 (오프셋은 볼륨 정보 시작 기준)
+    volumes_offset = len(buf)
+    volume_block = bytearray(volume_size * len(VOLUMES))
+    for index, (device_path, created, serial) in enumerate(VOLUMES):
+        path_offset = len(volume_block)
+        volume_block += (device_path + '\0').encode('utf-16-le')
+        directories_offset = len(volume_block)
+        for directory in DIRECTORIES:
+            volume_block += struct.pack('<H', len(directory)) + (directory + '\0').encode('utf-16-le')
+        struct.pack_into('<IIQIIIII', volume_block, index * volume_size, path_offset, len(device_path), created, serial,
+                         0, 0, directories_offset, len(DIRECTORIES))
+    buf += volume_block
+
+    struct.pack_into('<I4sII60sII', buf, 0, version, b'SCCA', 0, len(buf),
+                     EXECUTABLE.encode('utf-16-le'), PREFETCH_HASH, 0)
+    struct.pack_into('<9I', buf, 84, metrics_offset, len(FILES), 0, 0, strings_offset, len(strings),
+                     volumes_offset, len(VOLUMES), len(volume_block))
+    for index in range(run_times_count):
+        struct.pack_into('<Q', buf, run_times_offset + index * 8, RUN_TIMES[index])
+    struct.pack_into('<I', buf, run_count_offset or default_run_count_offset, RUN_COUNT)
+    return bytes(buf)
+
+
+@pytest.mark.parametrize('version', sorted(VERSION_OFFSETS))
+def test_header_offsets_per_version(version):
+    info = prefetch_parser.parse_prefetch_buffer(build_prefetch(version))
+    assert info.version == version
+    assert info.executable == EXECUTABLE
+    assert info.prefetch_hash == PREFETCH_HASH
+    assert info.run_count == RUN_COUNT
+    assert info.run_times == RUN_TIMES[:VERSION_OFFSETS[version][1]]
+    assert info.filenames == FILES
+
+
+@pytest.mark.parametrize('version', sorted(VERSION_OFFSETS))
+def test_metrics_and_volumes_per_version(version):
+    info = prefetch_parser.parse_prefetch_buffer(build_prefetch(version))
+    assert [metric.filename for metric in info.metrics] == FILES
+    if version == 17:
+        assert [metric.mft_entry for metric in info.metrics] == [None, None]
+    else:
+        assert [(metric.mft_entry, metric.mft_sequence) for metric in info.metrics] == [(1000, 7), (1001, 7)]
+    assert info.volumes == [prefetch_parser.VolumeInfo(device_path, created, serial, DIRECTORIES)
+                            for device_path, created, serial in VOLUMES]
+
+
+def test_version_30_long_file_info():
+    # 초기 Win10 형식: 파일 정보가 8바이트 길어 메트릭이 0x130에서 시작하고 실행 횟수는 208에 있음
+    info = prefetch_parser.parse_prefetch_buffer(build_prefetch(30, info_end=0x130, run_count_offset=208))
+    assert info.run_count == RUN_COUNT
+    assert info.run_times == RUN_TIMES
+    assert [metric.filename for metric in info.metrics] == FILES
+
+
+def test_bad_signature_and_version_raise():
+    data = bytearray(build_prefetch(30))
+    with pytest.raises(ValueError):
+        prefetch_parser.parse_prefetch_buffer(bytes(data[:4]) + b'XXXX' + bytes(data[8:]))
+    struct.pack_into('<I', data, 0, 99)
+    with pytest.raises(ValueError):
+        prefetch_parser.parse_prefetch_buffer(bytes(data))
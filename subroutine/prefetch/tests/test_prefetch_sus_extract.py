@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import csv
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import prefetch_sus_extract
+from prefetch_sus_extract import find_burst
+from prefetch_csv import Execution
+
+WINDOW = timedelta(minutes=10)
+BASE = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def test_empty_list():
+    assert find_burst([], WINDOW) == (0, None, None)
+
+
+def test_single_run():
+    assert find_burst([BASE], WINDOW) == (1, BASE, BASE)
+
+
+def test_equal_timestamps():
+    times = [BASE] * 4 + [BASE + timedelta(hours=1)]
+    assert find_burst(times, WINDOW) == (4, BASE, BASE)
+
+
+def test_exact_window_boundary_is_inclusive():
+    times = [BASE, BASE + WINDOW]
+    assert find_burst(times, WINDOW) == (2, BASE, BASE + WINDOW)
+
+
+def test_just_past_window_boundary():
+    times = [BASE, BASE + WINDOW + timedelta(seconds=1)]
+    assert find_burst(times, WINDOW)[0] == 1
+
+
+def test_densest_window_is_reported():
+    times = [BASE, BASE + timedelta(minutes=30)] + [BASE + timedelta(hours=2, minutes=i) for i in range(3)]
+    assert find_burst(times, WINDOW) == (3, BASE + timedelta(hours=2), BASE + timedelta(hours=2, minutes=2))
+
+
+def make_execution(executable, times):
+    run_times = [time.strftime(prefetch_sus_extract.TIME_FORMAT) for time in times]
+    return Execution(1, f"{executable}-1234ABCD.pf", executable, '1234ABCD', 30, len(run_times), run_times)
+
+
+def test_default_threshold_fires_on_single_prefetch_file(tmp_path):
+    # 프리패치 하나에 남는 최근 실행 시간 8개만으로도 기본 임계값에 걸려야 함
+    prefetch_dir = tmp_path / 'prefetch'
+    sus_dir = tmp_path / 'suspicious'
+    prefetch_dir.mkdir()
+    sus_dir.mkdir()
+    (prefetch_dir / 'CCLEANER64.EXE-1234ABCD.pf').write_bytes(b'SCCA')
+    (prefetch_dir / 'NOTEPAD.EXE-5678ABCD.pf').write_bytes(b'SCCA')
+    executions = [
+        make_execution('CCLEANER64.EXE', [BASE + timedelta(minutes=i) for i in range(8)]),
+        make_execution('NOTEPAD.EXE', [BASE + timedelta(minutes=i) for i in range(8)]),
+    ]
+    csv_file = tmp_path / 'prefetch_sus.csv'
+
+    prefetch_sus_extract.extract_suspicious(executions, str(csv_file), str(prefetch_dir), str(sus_dir))
+
+    with open(csv_file, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))[1:]
+    assert [(row[1], row[2], row[4]) for row in rows] == [('CCLEANER64.EXE', '8', 'ccleaner')]
+    assert os.listdir(sus_dir) == ['CCLEANER64.EXE-1234ABCD.pf']
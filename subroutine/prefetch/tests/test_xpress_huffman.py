@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import random
+import struct
+import binascii
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import xpress_huffman
+import win10de
+
+
+class BitWriter:
+    """MS-XCA 비트 스트림 기록기 (16비트 단위 자리를 미리 잡아 두고, 일치 길이 바이트는 그 사이에 씀)"""
+
+    def __init__(self, out):
+        self.out = out
+        self.bits = 0
+        self.count = 0
+        self.slot = len(out)
+        self.next_slot = self.slot + 2
+        out.extend(b'\0' * 4)
+
+    def write(self, length, value):
+        self.bits = (self.bits << length) | value
+        self.count += length
+        if self.count > 16:
+            self.count -= 16
+            struct.pack_into('<H', self.out, self.slot, (self.bits >> self.count) & 0xFFFF)
+            self.bits &= (1 << self.count) - 1
+            self.slot, self.next_slot = self.next_slot, len(self.out)
+            self.out.extend(b'\0\0')
+
+    def flush(self):
+        struct.pack_into('<H', self.out, self.slot, (self.bits << (16 - self.count)) & 0xFFFF)
+
+
+def compress(data):
+    """모든 기호를 9비트 부호로 쓰는 간단한 LZXPRESS Huffman 압축기 (일치는 3바이트 해시로 탐욕적으로 찾음)"""
+    out = bytearray()
+    last_seen = {}
+    for block_start in range(0, len(data), xpress_huffman.BLOCK_SIZE):
+        block_end = min(block_start + xpress_huffman.BLOCK_SIZE, len(data))
+        # 512개 기호 × 9비트면 정규 허프만 부호가 기호 번호 그대로
+        out += bytes([0x99]) * xpress_huffman.TABLE_SIZE
+        writer = BitWriter(out)
+        pos = block_start
+        while pos < block_end:
+            key = data[pos:pos + 3]
+            candidate = last_seen.get(key)
+            last_seen[key] = pos
+            length = 0
+            if candidate is not None and len(key) == 3 and pos - candidate < 0x10000:
+                while pos + length < block_end and data[candidate + length] == data[pos + length]:
+                    length += 1
+            if length < 3:
+                writer.write(9, data[pos])
+                pos += 1
+                continue
+
+            offset = pos - candidate
+            offset_bits = offset.bit_length() - 1
+            match_length = length - 3
+            writer.write(9, 256 + (offset_bits << 4) + min(match_length, 15))
+            if match_length >= 15:
+                if match_length - 15 < 255:
+                    out.append(match_length - 15)
+                else:
+                    out.append(255)
+                    out += struct.pack('<H', match_length)
+            writer.write(offset_bits, offset - (1 << offset_bits))
+            pos += length
+        writer.flush()
+    return bytes(out)
+
+
+def sample_data(size):
+    """무작위 바이트, 같은 바이트 반복(겹치는 일치), 멀리 떨어진 긴 반복이 섞인 데이터"""
+    rng = random.Random(0)
+    data = bytearray()
+    while len(data) < size:
+        kind = rng.randrange(3)
+        if kind == 0:
+            data += bytes(rng.randrange(256) for _ in range(rng.randrange(1, 200)))
+        elif kind == 1:
+            data += bytes([rng.randrange(256)]) * rng.randrange(3, 400)
+        elif len(data) > 1000:
+            start = rng.randrange(max(0, len(data) - 60000), len(data) - 500)
+            data += data[start:start + rng.randrange(3, 500)]
+    return bytes(data[:size])
+
+
+def test_round_trip_over_multiple_blocks():
+    data = sample_data(3 * xpress_huffman.BLOCK_SIZE + 1234)
+    assert xpress_huffman.decompress(compress(data), len(data)) == data
+
+
+def test_round_trip_long_match_crosses_block_window():
+    # 블록 경계 직후에도 이전 블록을 참조하는 일치와 255바이트가 넘는 일치 길이
+    rng = random.Random(1)
+    head = bytes(rng.randrange(256) for _ in range(40000))
+    data = head + head + b'\0' * 5000
+    assert len(data) > xpress_huffman.BLOCK_SIZE
+    assert xpress_huffman.decompress(compress(data), len(data)) == data
+
+
+def test_truncated_stream_raises():
+    data = sample_data(xpress_huffman.BLOCK_SIZE + 10)
+    with pytest.raises(ValueError):
+        xpress_huffman.decompress(compress(data)[:-300], len(data))
+
+
+def test_mam_container_with_crc():
+    data = sample_data(70000)
+    compressed = compress(data)
+    header = struct.pack('<LL', 0x004D414D | (xpress_huffman.COMPRESSION_FORMAT_XPRESS_HUFF << 24) | (1 << 28), len(data))
+    crc = binascii.crc32(compressed, binascii.crc32(b'\0' * 4, binascii.crc32(header)))
+    assert win10de.decompress(header + struct.pack('<L', crc) + compressed) == data
@@ -15,98 +15,126 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-"""Python Windows-only utility to decompress MAM compressed files."""
+"""Python utility to decompress MAM compressed files.
+
+Uses ntdll.RtlDecompressBufferEx on Windows and falls back to the
+pure-Python LZXPRESS Huffman decoder (xpress_huffman.py) elsewhere.
+"""
 
 import binascii
 import ctypes
 import struct
 import sys
 
+import xpress_huffman
+
 
 def tohex(val, nbits):
     """Utility to convert (signed) integer to hex."""
     return hex((val + (1 << nbits)) % (1 << nbits))
 
-def main():
-    """Utility core."""
-    if len(sys.argv) != 3:
-        sys.exit('Missing params [win10compressed.pf] [win10decompressed.pf]')
+def decompress(data):
+    """Decompress a MAM compressed buffer in memory and return the bytes.
+
+    Raises ValueError on a bad signature/CRC or a corrupted stream and
+    OSError when the Windows decompression API fails.
+    """
+    data = bytes(data)
+    header = data[:8]
+    compressed = data[8:]
+
+    signature, decompressed_size = struct.unpack('<LL', header)
+    calgo = (signature & 0x0F000000) >> 24
+    crcck = (signature & 0xF0000000) >> 28
+    magic = signature & 0x00FFFFFF
+    if magic != 0x004d414d :
+        raise ValueError('Wrong signature... wrong file?')
+
+    if crcck:
+        # I could have used RtlComputeCrc32.
+        file_crc = struct.unpack('<L', compressed[:4])[0]
+        crc = binascii.crc32(header)
+        crc = binascii.crc32(struct.pack('<L',0), crc)
+        compressed = compressed[4:]
+        crc = binascii.crc32(compressed, crc)          
+        if crc != file_crc:
+            raise ValueError('Wrong file CRC {0:x} - {1:x}!'.format(crc, file_crc))
+
+    # Windows 8+ has the native decompressor; anywhere else (or on older
+    # Windows) decode Xpress Huffman in pure Python.
+    try:
+        RtlDecompressBufferEx = ctypes.windll.ntdll.RtlDecompressBufferEx
+    except AttributeError:
+        if calgo != xpress_huffman.COMPRESSION_FORMAT_XPRESS_HUFF:
+            raise ValueError('Unsupported compression format {}'.format(calgo))
+        return xpress_huffman.decompress(compressed, decompressed_size)
 
-    NULL = ctypes.POINTER(ctypes.c_uint)()
-    SIZE_T = ctypes.c_uint
-    DWORD = ctypes.c_uint32
+    return _native_decompress(RtlDecompressBufferEx, calgo, compressed,
+                              decompressed_size)
+
+def _native_decompress(RtlDecompressBufferEx, calgo, compressed,
+                       decompressed_size):
+    """Decompress with ntdll.RtlDecompressBufferEx."""
     USHORT = ctypes.c_uint16
     UCHAR  = ctypes.c_ubyte
     ULONG = ctypes.c_uint32
 
-    # You must have at least Windows 8, or it should fail.
-    try:
-        RtlDecompressBufferEx = ctypes.windll.ntdll.RtlDecompressBufferEx
-    except AttributeError:
-        sys.exit('You must have Windows with version >=8.')
-
     RtlGetCompressionWorkSpaceSize = \
         ctypes.windll.ntdll.RtlGetCompressionWorkSpaceSize
 
+    compressed_size = len(compressed)
+
+    ntCompressBufferWorkSpaceSize = ULONG()
+    ntCompressFragmentWorkSpaceSize = ULONG()
+
+    ntstatus = RtlGetCompressionWorkSpaceSize(USHORT(calgo),
+        ctypes.byref(ntCompressBufferWorkSpaceSize),
+        ctypes.byref(ntCompressFragmentWorkSpaceSize))
+
+    if ntstatus:
+        raise OSError('Cannot get workspace size, err: {}'.format(
+            tohex(ntstatus, 32)))
+            
+    ntCompressed = (UCHAR * compressed_size).from_buffer_copy(compressed)
+    ntDecompressed = (UCHAR * decompressed_size)()
+    ntFinalUncompressedSize = ULONG()
+    ntWorkspace = (UCHAR * ntCompressFragmentWorkSpaceSize.value)()
+    
+    ntstatus = RtlDecompressBufferEx(
+        USHORT(calgo),
+        ctypes.byref(ntDecompressed),
+        ULONG(decompressed_size),
+        ctypes.byref(ntCompressed),
+        ULONG(compressed_size),
+        ctypes.byref(ntFinalUncompressedSize),
+        ctypes.byref(ntWorkspace))
+
+    if ntstatus:
+        raise OSError('Decompression failed, err: {}'.format(
+            tohex(ntstatus, 32)))
+
+    if ntFinalUncompressedSize.value != decompressed_size:
+        print('Decompressed with a different size than original!')
+
+    return bytes(ntDecompressed)
+
+def main():
+    """Utility core."""
+    if len(sys.argv) != 3:
+        sys.exit('Missing params [win10compressed.pf] [win10decompressed.pf]')
+
     with open(sys.argv[1], 'rb') as fin:
-        header = fin.read(8)
-        compressed = fin.read()
-
-        signature, decompressed_size = struct.unpack('<LL', header)
-        calgo = (signature & 0x0F000000) >> 24
-        crcck = (signature & 0xF0000000) >> 28
-        magic = signature & 0x00FFFFFF
-        if magic != 0x004d414d :
-            sys.exit('Wrong signature... wrong file?')
-
-        if crcck:
-            # I could have used RtlComputeCrc32.
-            file_crc = struct.unpack('<L', compressed[:4])[0]
-            crc = binascii.crc32(header)
-            crc = binascii.crc32(struct.pack('<L',0), crc)
-            compressed = compressed[4:]
-            crc = binascii.crc32(compressed, crc)          
-            if crc != file_crc:
-                sys.exit('Wrong file CRC {0:x} - {1:x}!'.format(crc, file_crc))
-
-        compressed_size = len(compressed)
-
-        ntCompressBufferWorkSpaceSize = ULONG()
-        ntCompressFragmentWorkSpaceSize = ULONG()
-
-        ntstatus = RtlGetCompressionWorkSpaceSize(USHORT(calgo),
-            ctypes.byref(ntCompressBufferWorkSpaceSize),
-            ctypes.byref(ntCompressFragmentWorkSpaceSize))
-
-        if ntstatus:
-            sys.exit('Cannot get workspace size, err: {}'.format(
-                tohex(ntstatus, 32)))
-                
-        ntCompressed = (UCHAR * compressed_size).from_buffer_copy(compressed)
-        ntDecompressed = (UCHAR * decompressed_size)()
-        ntFinalUncompressedSize = ULONG()
-        ntWorkspace = (UCHAR * ntCompressFragmentWorkSpaceSize.value)()
-        
-        ntstatus = RtlDecompressBufferEx(
-            USHORT(calgo),
-            ctypes.byref(ntDecompressed),
-            ULONG(decompressed_size),
-            ctypes.byref(ntCompressed),
-            ULONG(compressed_size),
-            ctypes.byref(ntFinalUncompressedSize),
-            ctypes.byref(ntWorkspace))
-
-        if ntstatus:
-            sys.exit('Decompression failed, err: {}'.format(
-                tohex(ntstatus, 32)))
-
-        if ntFinalUncompressedSize.value != decompressed_size:
-            print('Decompressed with a different size than original!')
-
-        with open(sys.argv[2], 'wb') as fout:
-            fout.write(bytearray(ntDecompressed))
-
-        print('Lucky man, you have your prefetch file ready to be parsed!')
+        data = fin.read()
+
+    try:
+        decompressed = decompress(data)
+    except (ValueError, OSError) as e:
+        sys.exit(str(e))
+
+    with open(sys.argv[2], 'wb') as fout:
+        fout.write(decompressed)
+
+    print('Lucky man, you have your prefetch file ready to be parsed!')
 
 if __name__ == "__main__":
     main()
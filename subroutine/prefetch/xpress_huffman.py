@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+LZXPRESS Huffman 압축 해제 모듈 (MS-XCA 2.2.4)
+
+Windows 10/11 프리패치(MAM 압축)가 쓰는 COMPRESSION_FORMAT_XPRESS_HUFF 형식을 순수 Python으로 해제한다.
+ntdll.RtlDecompressBufferEx가 없는 운영 체제(리눅스 작업자 등)에서도 프리패치를 메모리에서 바로 해제할 수 있다.
+
+압축 데이터는 출력 64KB 블록마다 256바이트 허프만 부호 길이 표(512개 기호 × 4비트)로 시작하고,
+비트 스트림은 16비트 리틀 엔디언 단위로 읽으며 긴 일치 길이는 스트림 중간의 바이트로 이어진다.
+"""
+import struct
+
+# COMPRESSION_FORMAT_XPRESS_HUFF (MAM 헤더의 압축 알고리즘 번호)
+COMPRESSION_FORMAT_XPRESS_HUFF = 4
+
+# 블록마다 출력하는 바이트 수
+BLOCK_SIZE = 65536
+
+# 허프만 부호 길이 표 크기 (512개 기호 × 4비트)
+TABLE_SIZE = 256
+
+# 부호의 최대 길이 (복호 표는 15비트 미리 보기)
+MAX_CODE_LENGTH = 15
+
+_MASK32 = 0xFFFFFFFF
+
+_u16 = struct.Struct('<H').unpack_from
+_u32 = struct.Struct('<I').unpack_from
+
+
+def build_decode_table(lengths_table):
+    """256바이트 부호 길이 표로 15비트 미리 보기 복호 표를 만듦 (값은 기호 << 4 | 부호 길이)"""
+    lengths = []
+    for value in lengths_table:
+        lengths.append(value & 0xF)
+        lengths.append(value >> 4)
+
+    table = [0] * (1 << MAX_CODE_LENGTH)
+    position = 0
+    # 정규 허프만 부호: (부호 길이, 기호) 순서로 부호가 1씩 커지므로 표의 구간을 차례로 채움
+    for length in range(1, MAX_CODE_LENGTH + 1):
+        span = 1 << (MAX_CODE_LENGTH - length)
+        for symbol, symbol_length in enumerate(lengths):
+            if symbol_length != length:
+                continue
+            if position + span > len(table):
+                raise ValueError("허프만 부호 길이 표가 잘못되었습니다.")
+            table[position:position + span] = [(symbol << 4) | length] * span
+            position += span
+    if position == 0:
+        raise ValueError("허프만 부호 길이 표가 비어 있습니다.")
+    return table
+
+
+def decompress(data, output_size):
+    """LZXPRESS Huffman 압축 데이터를 해제해 output_size 바이트의 bytes로 반환 (형식이 잘못되면 ValueError)"""
+    # 끝에서 비트 스트림을 미리 읽을 때를 위해 0을 덧붙임
+    src = bytes(data) + b'\0' * 8
+    input_size = len(src) - 8
+    out = bytearray()
+    ip = 0
+
+    while len(out) < output_size:
+        if ip + TABLE_SIZE > input_size:
+            raise ValueError("압축 데이터가 예상보다 일찍 끝났습니다.")
+        table = build_decode_table(src[ip:ip + TABLE_SIZE])
+        ip += TABLE_SIZE
+
+        bits = (_u16(src, ip)[0] << 16) | _u16(src, ip + 2)[0]
+        ip += 4
+        extra = 16
+        block_end = min(len(out) + BLOCK_SIZE, output_size)
+
+        while len(out) < block_end:
+            if ip > input_size:
+                raise ValueError("압축 데이터가 예상보다 일찍 끝났습니다.")
+            entry = table[bits >> (32 - MAX_CODE_LENGTH)]
+            length = entry & 0xF
+            if not length:
+                raise ValueError("허프만 부호를 해석할 수 없습니다.")
+            bits = (bits << length) & _MASK32
+            extra -= length
+            if extra < 0:
+                bits |= _u16(src, ip)[0] << -extra
+                ip += 2
+                extra += 16
+
+            symbol = entry >> 4
+            if symbol < 256:
+                out.append(symbol)
+                continue
+
+            # 일치: 하위 4비트는 길이, 상위 4비트는 거리 비트 수
+            symbol -= 256
+            match_length = symbol & 0xF
+            offset_bits = symbol >> 4
+            if match_length == 15:
+                match_length = src[ip]
+                ip += 1
+                if match_length == 255:
+                    match_length = _u16(src, ip)[0]
+                    ip += 2
+                    if match_length == 0:
+                        match_length = _u32(src, ip)[0]
+                        ip += 4
+                    if match_length < 15:
+                        raise ValueError("일치 길이가 잘못되었습니다.")
+                    match_length -= 15
+                match_length += 15
+            match_length += 3
+
+            offset = (bits >> (32 - offset_bits) if offset_bits else 0) + (1 << offset_bits)
+            bits = (bits << offset_bits) & _MASK32
+            extra -= offset_bits
+            if extra < 0:
+                bits |= _u16(src, ip)[0] << -extra
+                ip += 2
+                extra += 16
+
+            start = len(out) - offset
+            if start < 0:
+                raise ValueError("일치 거리가 출력 범위를 벗어났습니다.")
+            if offset >= match_length:
+                out += out[start:start + match_length]
+            else:
+                # 겹치는 복사는 offset 길이의 패턴 반복
+                out += (out[start:] * (match_length // offset + 1))[:match_length]
+
+    del out[output_size:]
+    return bytes(out)
@@ -0,0 +1,543 @@
+# -*- coding: utf-8 -*-
+"""
+브라우저 캐시/세션 파서
+
+모든 사용자/브라우저 프로필의 캐시와 세션 파일을 경로 인덱스에서 찾아, 프로필마다 작업 스레드 하나가 디코딩한다.
+- Chromium 캐시(Cache_Data): index 해시 테이블의 주소를 따라 data_0..3 블록 파일의 엔트리를 읽고,
+  HTTP 응답 헤더(스트림 0)에서 Content-Type과 응답 시각을 가져온다. 외부 파일(f_*)에 저장된 스트림은 그 파일에서 읽는다.
+  블록 파일은 web_parsing.py가 추출한 복사본이 있으면 mmap으로 열고, 없으면 이미지에서 한 번 읽은 버퍼를 쓴다.
+- Firefox 캐시(cache2/entries): 엔트리 파일 끝의 메타데이터(키, 마지막 가져온 시각, response-head)만 읽는다.
+- 세션: Chromium SNSS(Session_*, Tabs_*, Current/Last Session/Tabs)의 탭 이동 기록과
+  Firefox sessionstore(mozLz4 압축 JSON)의 열린 탭/닫은 탭을 읽는다.
+결과는 URL, 가져온 시각, Content-Type, 크기 기록으로 웹 기록 기록기(WebRecordWriter)에 스트리밍으로 쓴다.
+"""
+import os
+import sys
+import json
+import mmap
+import struct
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from image_session import get_session, get_first_disk_image_path
+from path_index import get_path_index
+from extractor import DEFAULT_WORKERS
+from browser_history import CHROMIUM_EPOCH_OFFSET, to_local_times
+from web_parsing import (BROWSER_CACHE_PATHS, BROWSER_PROFILE_PATHS, CHROMIUM_SESSION_FILES, FIREFOX_SESSION_FILES,
+                         OUTPUT_DIR, extraction_path)
+from web_record_writer import CACHE_XML_FIELDS, CACHE_CSV_HEADER, WebRecordWriter
+
+# 출력 경로 (XML, CSV)
+CACHE_XML_PATH = r'..\..\output\artifact\web\cache_output.xml'
+CACHE_CSV_PATH = r'..\..\output\artifact\web\cache_output.csv'
+
+# Chromium 블록 파일 캐시 형식
+CHROMIUM_INDEX_MAGIC = 0xC103CAC3
+CHROMIUM_INDEX_TABLE_OFFSET = 368
+CHROMIUM_BLOCK_HEADER_SIZE = 8192
+CHROMIUM_ENTRY_KEY_OFFSET = 96
+CHROMIUM_MAX_INTERNAL_KEY = 256 - CHROMIUM_ENTRY_KEY_OFFSET - 1
+
+# 캐시 주소: 최상위 비트는 초기화 여부, 28~30비트는 파일 종류 (0이면 외부 파일 f_xxxxxx)
+CACHE_ADDR_INITIALIZED = 0x80000000
+CACHE_ADDR_EXTERNAL = 0
+
+# 파일 종류별 블록 크기 (1: rankings, 2: 256바이트, 3: 1KB, 4: 4KB)
+CHROMIUM_BLOCK_SIZES = {1: 36, 2: 256, 3: 1024, 4: 4096}
+
+# 유닉스 시간 상한 (9999-12-31, 이보다 크면 잘못된 값)
+MAX_UNIX_MICROS = 253402300799 * 1000000
+
+# Firefox cache2 메타데이터의 청크 크기 (청크마다 2바이트 해시)
+FIREFOX_CHUNK_SIZE = 256 * 1024
+
+# Firefox sessionstore 압축 형식 (mozLz40\0 + 원본 크기 + LZ4 블록)
+MOZLZ4_MAGIC = b'mozLz40\0'
+
+# SNSS 명령 번호 (Session_* 파일: 세션 서비스, Tabs_* 파일: 탭 복원 서비스)
+SNSS_SESSION_NAVIGATION = 6
+SNSS_TAB_RESTORE_NAVIGATION = 1
+
+# browser: 브라우저 이름, username: 사용자 이름, kind: 'chromium_cache'/'firefox_cache'/'chromium_session'/'firefox_session',
+# path: 이미지 안의 경로 (캐시는 디렉토리, 세션은 파일), inode: 세션 파일의 inode (캐시는 None),
+# local_dir: web_parsing.py가 추출한 복사본 디렉토리 (없으면 None)
+CacheSource = namedtuple('CacheSource', ['browser', 'username', 'kind', 'path', 'inode', 'local_dir'])
+
+# 캐시/세션 기록 한 건 (fetch_time은 LOCAL_TIMEZONE 기준 datetime, 없으면 None)
+# source: 'cache'/'session'/'tab_restore'/'closed_tab', size: 본문 크기 (세션 기록은 None), detail: 외부 본문 파일, 탭 제목 등
+CacheRecord = namedtuple('CacheRecord', ['url', 'fetch_time', 'browser', 'username', 'source', 'content_type', 'size',
+                                         'detail'])
+
+_print_lock = threading.Lock()
+
+
+def _log(message):
+    with _print_lock:
+        print(message)
+
+
+# ----------------------------------------------------------------------
+# 캐시/세션 파일 찾기
+# ----------------------------------------------------------------------
+def find_cache_sources(index, output_dir=OUTPUT_DIR):
+    """경로 인덱스에서 모든 사용자/브라우저의 캐시 디렉토리와 세션 파일 목록을 찾음"""
+    sources = []
+    for browser, relative_paths in BROWSER_CACHE_PATHS.items():
+        kind = 'firefox_cache' if browser == 'Firefox' else 'chromium_cache'
+        seen = set()
+        for relative_path in relative_paths:
+            for record in index.glob(f"Users\\*\\{relative_path}"):
+                username = record.path.split('/')[1]
+                if not record.is_dir or username in seen:
+                    continue
+                seen.add(username)
+                local_dir = extraction_path(output_dir, 'Cache', username, browser)
+                sources.append(CacheSource(browser, username, kind, record.path, None,
+                                           local_dir if os.path.isdir(local_dir) else None))
+
+    for browser, profile_path in BROWSER_PROFILE_PATHS.items():
+        kind = 'firefox_session' if browser == 'Firefox' else 'chromium_session'
+        session_files = FIREFOX_SESSION_FILES if browser == 'Firefox' else CHROMIUM_SESSION_FILES
+        for session_file in session_files:
+            for record in index.glob(f"Users\\*\\{profile_path}\\{session_file}"):
+                if record.is_dir or not record.size:
+                    continue
+                username = record.path.split('/')[1]
+                local_dir = extraction_path(output_dir, 'Sessions', username, browser)
+                sources.append(CacheSource(browser, username, kind, record.path, record.inode,
+                                           local_dir if os.path.isdir(local_dir) else None))
+    return sources
+
+
+class FileBuffers:
+    """이름으로 파일 내용을 여는 캐시 (추출 복사본은 mmap, 없으면 이미지에서 읽은 버퍼)"""
+
+    def __init__(self, session, index, image_dir, local_dir):
+        self.session = session
+        self.index = index
+        self.image_dir = image_dir
+        self.local_dir = local_dir
+        self._buffers = {}
+        self._maps = []
+
+    def get(self, name):
+        """파일 내용 (없으면 None)"""
+        if name in self._buffers:
+            return self._buffers[name]
+        data = None
+        local_path = os.path.join(self.local_dir, name) if self.local_dir else None
+        if local_path and os.path.isfile(local_path):
+            with open(local_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._maps.append(data)
+                else:
+                    data = b''
+        else:
+            inode = self.index.inode(f"{self.image_dir}/{name}")
+            if inode is not None:
+                data = self.session.read_buffer(inode)
+        self._buffers[name] = data
+        return data
+
+    def close(self):
+        self._buffers = {}
+        for data in self._maps:
+            data.close()
+        self._maps = []
+
+
+# ----------------------------------------------------------------------
+# Chromium 캐시
+# ----------------------------------------------------------------------
+def _header_lines(headers):
+    """HTTP 응답 헤더(줄마다 NUL 또는 CRLF로 구분)에서 {소문자 이름: 값}"""
+    fields = {}
+    for line in headers.replace('\r\n', '\0').split('\0'):
+        name, sep, value = line.partition(':')
+        if sep and name and ' ' not in name:
+            fields.setdefault(name.strip().lower(), value.strip())
+    return fields
+
+
+class ChromiumCache:
+    """Chromium 블록 파일 캐시 하나 (index + data_N + f_*)"""
+
+    def __init__(self, files):
+        self.files = files
+
+    def _block(self, addr):
+        file_type = (addr >> 28) & 0x7
+        block_size = CHROMIUM_BLOCK_SIZES.get(file_type)
+        if block_size is None:
+            return None
+        data = self.files.get(f"data_{(addr >> 16) & 0xFF}")
+        if data is None:
+            return None
+        start = CHROMIUM_BLOCK_HEADER_SIZE + (addr & 0xFFFF) * block_size
+        # 블록은 작으므로 복사해서 반환 (mmap을 닫을 때 남아 있는 참조가 없도록)
+        return bytes(data[start:start + (((addr >> 24) & 0x3) + 1) * block_size])
+
+    def read_stream(self, addr, size):
+        """캐시 주소의 데이터 size바이트 (외부 파일 f_xxxxxx 포함, 읽을 수 없으면 None)"""
+        if not addr & CACHE_ADDR_INITIALIZED or size <= 0:
+            return None
+        if (addr >> 28) & 0x7 == CACHE_ADDR_EXTERNAL:
+            data = self.files.get(external_file_name(addr))
+            return None if data is None else bytes(data[:size])
+        block = self._block(addr)
+        return None if block is None else block[:size]
+
+    def iter_entries(self):
+        """index 해시 테이블과 충돌 체인(next)을 따라 (키, 생성 시각, 데이터 크기 4개, 데이터 주소 4개)를 반환"""
+        index = self.files.get('index')
+        if index is None or len(index) < CHROMIUM_INDEX_TABLE_OFFSET:
+            return
+        magic, = struct.unpack_from('<I', index, 0)
+        if magic != CHROMIUM_INDEX_MAGIC:
+            raise ValueError("Chromium 캐시 index 파일이 아닙니다.")
+        table_len, = struct.unpack_from('<i', index, 28)
+        table_len = min(table_len, (len(index) - CHROMIUM_INDEX_TABLE_OFFSET) // 4)
+        visited = set()
+        for head in struct.unpack_from(f'<{table_len}I', index, CHROMIUM_INDEX_TABLE_OFFSET):
+            addr = head
+            while addr & CACHE_ADDR_INITIALIZED and addr not in visited:
+                visited.add(addr)
+                entry = self._block(addr)
+                if entry is None or len(entry) < 256:
+                    break
+                next_addr, = struct.unpack_from('<I', entry, 4)
+                creation_time, key_len, long_key = struct.unpack_from('<QiI', entry, 24)
+                data_sizes = struct.unpack_from('<4i', entry, 40)
+                data_addrs = struct.unpack_from('<4I', entry, 56)
+                if 0 < key_len <= CHROMIUM_MAX_INTERNAL_KEY:
+                    key = bytes(entry[CHROMIUM_ENTRY_KEY_OFFSET:CHROMIUM_ENTRY_KEY_OFFSET + key_len])
+                else:
+                    key = self.read_stream(long_key, key_len) or b''
+                yield key.decode('utf-8', errors='replace'), creation_time, data_sizes, data_addrs
+                addr = next_addr
+
+    def response_info(self, size, addr):
+        """스트림 0(HttpResponseInfo)의 (응답 시각, 헤더 dict) (읽을 수 없으면 (None, {}))"""
+        data = self.read_stream(addr, size)
+        if not data or len(data) < 28:
+            return None, {}
+        # payload 크기, flags, request_time, response_time, 헤더 문자열(길이 + 내용)
+        response_time, headers_len = struct.unpack_from('<qi', data, 16)
+        headers = data[28:28 + max(headers_len, 0)].decode('latin-1')
+        return response_time, _header_lines(headers)
+
+
+def chromium_to_unix_micros(value):
+    """Chromium 시간(1601-01-01 기준 마이크로초)을 유닉스 시간 마이크로초로 (없거나 범위를 벗어나면 None)"""
+    if not value or not CHROMIUM_EPOCH_OFFSET < value < CHROMIUM_EPOCH_OFFSET + MAX_UNIX_MICROS:
+        return None
+    return value - CHROMIUM_EPOCH_OFFSET
+
+
+def external_file_name(addr):
+    return f"f_{addr & 0x0FFFFFFF:06x}"
+
+
+def cache_key_url(key):
+    """캐시 키의 URL (분할 캐시 키 '1/0/_dk_<사이트> <사이트> <URL>'은 마지막 URL)"""
+    return key.rsplit(' ', 1)[-1]
+
+
+def read_chromium_cache(source, session, index):
+    """Chromium 캐시 하나의 [(url, 유닉스 시간 마이크로초, source, content_type, size, detail)]"""
+    files = FileBuffers(session, index, source.path, source.local_dir)
+    rows = []
+    try:
+        cache = ChromiumCache(files)
+        for key, creation_time, data_sizes, data_addrs in cache.iter_entries():
+            response_time, headers = cache.response_info(data_sizes[0], data_addrs[0])
+            fetched = response_time or creation_time
+            # 본문(스트림 1)이 외부 파일에 있으면 그 파일 이름
+            detail = ''
+            if data_addrs[1] & CACHE_ADDR_INITIALIZED and (data_addrs[1] >> 28) & 0x7 == CACHE_ADDR_EXTERNAL:
+                detail = external_file_name(data_addrs[1])
+            rows.append((cache_key_url(key), chromium_to_unix_micros(fetched), 'cache',
+                         headers.get('content-type', ''), max(data_sizes[1], 0), detail))
+    finally:
+        files.close()
+    return rows
+
+
+# ----------------------------------------------------------------------
+# Firefox 캐시
+# ----------------------------------------------------------------------
+def parse_firefox_metadata(meta, body_size):
+    """cache2 엔트리 메타데이터의 (키, 마지막 가져온 시각(초), {요소 이름: 값})"""
+    # 메타데이터 해시(4) + 청크 해시(청크마다 2) 다음에 헤더 (big-endian)
+    pos = 4 + 2 * (-(-body_size // FIREFOX_CHUNK_SIZE))
+    version, _, last_fetched, _, _, _, key_size = struct.unpack_from('>7I', meta, pos)
+    pos += 28
+    if version >= 2:
+        pos += 4  # flags
+    key = bytes(meta[pos:pos + key_size]).decode('utf-8', errors='replace')
+    pos += key_size + 1
+    # 요소는 이름\0값\0 반복
+    parts = bytes(meta[pos:]).split(b'\0')
+    elements = {}
+    for i in range(0, len(parts) - 1, 2):
+        elements[parts[i].decode('utf-8', errors='replace')] = parts[i + 1].decode('utf-8', errors='replace')
+    return key, last_fetched, elements
+
+
+def firefox_key_url(key):
+    """cache2 키(':' 앞은 'a,', 'O^partitionKey=...,' 같은 태그)의 URL"""
+    return key.split(':', 1)[1] if ':' in key else key
+
+
+def read_firefox_cache(source, session, index):
+    """Firefox 캐시 하나의 [(url, 유닉스 시간 마이크로초, source, content_type, size, detail)]"""
+    rows = []
+    for record in index.list_dir(source.path):
+        if record.is_dir or not record.size or record.size < 4:
+            continue
+        try:
+            # 본문은 읽지 않고 파일 끝의 메타데이터만 읽음
+            with session.open_file(record.inode) as f:
+                f.seek(record.size - 4)
+                body_size, = struct.unpack('>I', f.read(4))
+                if body_size > record.size - 4:
+                    continue
+                f.seek(body_size)
+                meta = f.read(record.size - 4 - body_size)
+            key, last_fetched, elements = parse_firefox_metadata(meta, body_size)
+        except (OSError, struct.error, ValueError) as e:
+            _log(f"Firefox 캐시 엔트리를 읽을 수 없습니다: {record.path} - {e}")
+            continue
+        headers = _header_lines(elements.get('response-head', ''))
+        rows.append((firefox_key_url(key), last_fetched * 1000000 or None, 'cache',
+                     headers.get('content-type', ''), body_size, record.name))
+    return rows
+
+
+# ----------------------------------------------------------------------
+# 세션
+# ----------------------------------------------------------------------
+class PickleReader:
+    """Chromium base::Pickle 읽기 (필드는 4바이트 경계로 정렬)"""
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 4  # payload 크기
+
+    def _take(self, size):
+        start = self.pos
+        end = start + size
+        if end > len(self.data):
+            raise ValueError("Pickle 데이터가 예상보다 짧습니다.")
+        self.pos = start + ((size + 3) & ~3)
+        return self.data[start:end]
+
+    def int32(self):
+        return struct.unpack('<i', self._take(4))[0]
+
+    def int64(self):
+        return struct.unpack('<q', self._take(8))[0]
+
+    def string(self):
+        return bytes(self._take(max(self.int32(), 0))).decode('utf-8', errors='replace')
+
+    def string16(self):
+        return bytes(self._take(max(self.int32(), 0) * 2)).decode('utf-16le', errors='replace')
+
+
+def iter_snss_navigations(data, navigation_command):
+    """SNSS 파일의 탭 이동 기록 (tab_id, index, url, title, 시각(Chromium 시간, 없으면 None))"""
+    if bytes(data[:4]) != b'SNSS':
+        return
+    pos = 8
+    size_limit = len(data)
+    while pos + 2 <= size_limit:
+        size, = struct.unpack_from('<H', data, pos)
+        pos += 2
+        if size == 0 or pos + size > size_limit:
+            return
+        command = data[pos]
+        payload = data[pos + 1:pos + size]
+        pos += size
+        if command != navigation_command:
+            continue
+        reader = PickleReader(payload)
+        try:
+            tab_id, nav_index = reader.int32(), reader.int32()
+            url, title = reader.string(), reader.string16()
+        except ValueError:
+            continue
+        try:
+            # page_state, transition, type_mask, referrer, referrer_policy, original_request_url, user agent override, timestamp
+            reader.string()
+            reader.int32()
+            reader.int32()
+            reader.string()
+            reader.int32()
+            reader.string()
+            reader.int32()
+            timestamp = reader.int64() or None
+        except ValueError:
+            timestamp = None
+        yield tab_id, nav_index, url, title, timestamp
+
+
+def read_chromium_session(source, session, index):
+    """SNSS 세션 파일 하나의 [(url, 유닉스 시간 마이크로초, source, content_type, size, detail)] (탭/위치마다 마지막 기록)"""
+    files = FileBuffers(session, index, source.path.rsplit('/', 1)[0], source.local_dir)
+    name = source.path.rsplit('/', 1)[-1]
+    tab_restore = 'tabs' in name.lower()
+    navigations = {}
+    try:
+        data = files.get(name)
+        if data is None:
+            return []
+        command = SNSS_TAB_RESTORE_NAVIGATION if tab_restore else SNSS_SESSION_NAVIGATION
+        for tab_id, nav_index, url, title, timestamp in iter_snss_navigations(data, command):
+            navigations[(tab_id, nav_index)] = (url, timestamp, title)
+    finally:
+        files.close()
+    kind = 'tab_restore' if tab_restore else 'session'
+    return [(url, chromium_to_unix_micros(timestamp), kind, '', None, f"{name}: {title}")
+            for url, timestamp, title in navigations.values()]
+
+
+def lz4_block_decompress(src, size):
+    """LZ4 블록 하나를 압축 해제 (mozLz4 sessionstore용)"""
+    dst = bytearray()
+    pos = 0
+    end = len(src)
+    while pos < end:
+        token = src[pos]
+        pos += 1
+        literal = token >> 4
+        if literal == 15:
+            while True:
+                value = src[pos]
+                pos += 1
+                literal += value
+                if value != 255:
+                    break
+        dst += src[pos:pos + literal]
+        pos += literal
+        if pos >= end:
+            break
+        offset = src[pos] | (src[pos + 1] << 8)
+        pos += 2
+        match = token & 0xF
+        if match == 15:
+            while True:
+                value = src[pos]
+                pos += 1
+                match += value
+                if value != 255:
+                    break
+        match += 4
+        start = len(dst) - offset
+        if offset == 0 or start < 0:
+            raise ValueError("LZ4 블록의 역참조 위치가 잘못되었습니다.")
+        if offset >= match:
+            dst += dst[start:start + match]
+        else:
+            # 겹치는 복사는 offset 길이의 패턴 반복
+            dst += (dst[start:] * (match // offset + 1))[:match]
+    if len(dst) != size:
+        raise ValueError(f"LZ4 압축 해제 크기가 다릅니다 ({len(dst)} != {size})")
+    return bytes(dst)
+
+
+def _firefox_tab_rows(tab, kind, timestamp, name):
+    entries = tab.get('entries') or []
+    current = tab.get('index', len(entries)) - 1
+    rows = []
+    for i, entry in enumerate(entries):
+        url = entry.get('url')
+        if not url:
+            continue
+        # 탭의 시각은 현재 보고 있던 기록에만 붙임
+        rows.append((url, timestamp * 1000 if timestamp and i == current else None, kind, '', None,
+                     f"{name}: {entry.get('title', '')}"))
+    return rows
+
+
+def read_firefox_session(source, session, index):
+    """sessionstore(jsonlz4) 하나의 [(url, 유닉스 시간 마이크로초, source, content_type, size, detail)]"""
+    files = FileBuffers(session, index, source.path.rsplit('/', 1)[0], source.local_dir)
+    name = source.path.rsplit('/', 1)[-1]
+    try:
+        data = files.get(name)
+        if data is None or bytes(data[:8]) != MOZLZ4_MAGIC:
+            return []
+        size, = struct.unpack_from('<I', data, 8)
+        state = json.loads(lz4_block_decompress(bytes(data[12:]), size))
+    finally:
+        files.close()
+
+    rows = []
+    for window in (state.get('windows') or []) + (state.get('_closedWindows') or []):
+        for tab in window.get('tabs') or []:
+            rows += _firefox_tab_rows(tab, 'session', tab.get('lastAccessed'), name)
+        for closed in window.get('_closedTabs') or []:
+            rows += _firefox_tab_rows(closed.get('state') or {}, 'closed_tab', closed.get('closedAt'), name)
+    return rows
+
+
+SOURCE_READERS = {
+    'chromium_cache': read_chromium_cache,
+    'firefox_cache': read_firefox_cache,
+    'chromium_session': read_chromium_session,
+    'firefox_session': read_firefox_session,
+}
+
+
+def read_source(source, session, index):
+    """캐시/세션 하나의 CacheRecord 목록 (최근 순, 시각이 없는 기록은 뒤에)"""
+    _log(f"{source.browser} {source.kind} 파싱: {source.username} ({source.local_dir or source.path})")
+    try:
+        rows = SOURCE_READERS[source.kind](source, session, index)
+    except (OSError, ValueError, struct.error) as e:
+        _log(f"{source.browser} {source.kind}({source.username})를 읽는 중 오류 발생: {e}")
+        return []
+    rows.sort(key=lambda row: row[1] or 0, reverse=True)
+    times = to_local_times([row[1] or 0 for row in rows])
+    return [CacheRecord(url, fetch_time if micros else None, source.browser, source.username, kind, content_type, size,
+                        detail)
+            for (url, micros, kind, content_type, size, detail), fetch_time in zip(rows, times)]
+
+
+def iter_cache_records(session, sources, max_workers=None):
+    """프로필(캐시 디렉토리/세션 파일)마다 병렬로 디코딩해서 입력 순서대로 CacheRecord를 하나씩 반환"""
+    if not sources:
+        return
+    index = get_path_index(session)
+    with ThreadPoolExecutor(max_workers=min(max_workers or DEFAULT_WORKERS, len(sources))) as executor:
+        for records in executor.map(lambda source: read_source(source, session, index), sources):
+            yield from records
+
+
+def output_paths():
+    return [CACHE_XML_PATH, CACHE_CSV_PATH]
+
+
+def main(image_path, output_dir=OUTPUT_DIR):
+    """모든 사용자/브라우저의 캐시와 세션 기록을 XML/CSV로 저장하고 기록 수를 반환"""
+    session = get_session(image_path)
+    if session.partition_offset is None:
+        print("파티션 오프셋을 찾을 수 없습니다.")
+        return 0
+    sources = find_cache_sources(get_path_index(session), output_dir)
+    if not sources:
+        print("파싱할 브라우저 캐시/세션 파일이 없습니다.")
+
+    with WebRecordWriter(CACHE_XML_PATH, CACHE_CSV_PATH, root_tag='cache', item_tag='entry',
+                         fields=CACHE_XML_FIELDS, csv_header=CACHE_CSV_HEADER) as writer:
+        writer.write_all(iter_cache_records(session, sources))
+    print(f"브라우저 캐시/세션 기록 {writer.count}건을 {CACHE_CSV_PATH}에 저장했습니다.")
+    return writer.count
+
+
+if __name__ == "__main__":
+    main(get_first_disk_image_path(r"..\..\image_here"))
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+브라우저 히스토리 엔진
+
+web_parsing.py가 추출한 모든 사용자/브라우저/프로필의 히스토리 DB(History_<브라우저>_<사용자>, Profiles_Firefox_<사용자>\<프로필>\places.sqlite)를 찾아
+DB마다 작업 스레드 하나가 읽기 전용(immutable)으로 열고, 방문(visits/moz_historyvisits)과 다운로드 기록을
+시간 역순으로 정렬된 커서에서 BATCH_SIZE개씩 읽는다.
+기간(since/until)과 URL 키워드 조건은 SQL WHERE 절로 넘겨 방문 시간 인덱스로 필요한 구간만 읽는다.
+시간 값은 SQL에서 유닉스 시간(마이크로초)으로 맞춘 뒤 배치 단위로 한국 시간으로 변환하고,
+DB별 결과는 크기가 제한된 큐를 거쳐 heapq.merge로 합치므로 히스토리가 커도 전체를 메모리에 올리지 않는다.
+"""
+import os
+import sys
+import queue
+import heapq
+import itertools
+import sqlite3
+import pathlib
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import pytz
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from image_session import get_session
+from path_index import get_path_index
+from progress import report
+from web_parsing import BROWSER_HISTORY_PATHS, HISTORY_PROFILES_DIR
+
+# 커서에서 한 번에 읽는 행 수
+BATCH_SIZE = 5000
+
+# DB별로 미리 읽어 두는 배치 수 (합치는 쪽이 느리면 작업 스레드가 기다림)
+QUEUE_DEPTH = 4
+
+# 출력 시간대
+LOCAL_TIMEZONE = pytz.timezone('Asia/Seoul')
+
+UNIX_EPOCH = datetime(1970, 1, 1)
+
+# Chromium 시간(1601-01-01 기준 마이크로초)과 유닉스 시간(마이크로초)의 차이
+CHROMIUM_EPOCH_OFFSET = 11644473600000000
+
+# 히스토리 파일 이름별 스키마 종류 (추출 파일 이름은 <파일 이름>_<브라우저>_<사용자>)
+HISTORY_FILE_KINDS = {
+    'History': 'chromium',
+    'places.sqlite': 'firefox',
+}
+
+# event: 기록 종류, tables: FROM 절 (JOIN 포함), url_column/time_column/detail_column: URL, 시간(인덱스가 있는 열), 상세 열,
+# epoch_offset: 원본 시간 - 유닉스 시간(마이크로초), conditions: 항상 붙는 WHERE 조건
+TimelineQuery = namedtuple('TimelineQuery', ['event', 'tables', 'url_column', 'time_column', 'detail_column',
+                                             'epoch_offset', 'conditions'])
+
+# 스키마별 타임라인 쿼리
+# Chromium 계열(Chrome/Edge/Whale)은 1601-01-01 기준 마이크로초, Firefox는 유닉스 시간 마이크로초(PRTime)
+# visits.visit_time(visits_time_index)과 moz_historyvisits.visit_date(moz_historyvisits_dateindex)에는 인덱스가 있어
+# 기간 조건과 시간 역순 정렬을 정렬 없이 인덱스로 처리함
+TIMELINE_QUERIES = {
+    'chromium': [
+        TimelineQuery('visit', "visits v JOIN urls u ON u.id = v.url",
+                      'u.url', 'v.visit_time', "''", CHROMIUM_EPOCH_OFFSET, ()),
+        # 다운로드 URL은 리디렉션 체인의 첫 URL
+        TimelineQuery('download', "downloads d JOIN downloads_url_chains c ON c.id = d.id AND c.chain_index = 0",
+                      'c.url', 'd.start_time', 'd.target_path', CHROMIUM_EPOCH_OFFSET, ()),
+    ],
+    'firefox': [
+        TimelineQuery('visit', "moz_historyvisits v JOIN moz_places p ON p.id = v.place_id",
+                      'p.url', 'v.visit_date', "''", 0, ()),
+        # Firefox 다운로드는 저장 위치가 moz_annos 주석으로 남음
+        TimelineQuery('download', "moz_annos a JOIN moz_anno_attributes n ON n.id = a.anno_attribute_id "
+                                  "JOIN moz_places p ON p.id = a.place_id",
+                      'p.url', 'a.dateAdded', 'a.content', 0, ("n.name = 'downloads/destinationFileURI'",)),
+    ],
+}
+
+# browser: 브라우저 이름, username: 사용자 이름, kind: 스키마 종류, path: 추출된 파일 경로 (이미지에서 읽으면 None),
+# inode: 이미지 안의 inode (추출된 파일이면 None)
+HistorySource = namedtuple('HistorySource', ['browser', 'username', 'kind', 'path', 'inode'])
+
+# 타임라인 기록 한 건 (visit_time은 LOCAL_TIMEZONE 기준 datetime, event는 'visit'/'download', detail은 다운로드 저장 경로)
+HistoryVisit = namedtuple('HistoryVisit', ['url', 'visit_time', 'browser', 'username', 'event', 'detail'])
+
+# since/until: 기간 (datetime, since 이상 until 미만, None이면 제한 없음), keywords: URL에 포함되어야 하는 문자열 (하나라도)
+HistoryFilter = namedtuple('HistoryFilter', ['since', 'until', 'keywords'])
+
+NO_FILTER = HistoryFilter(None, None, ())
+
+_SENTINEL = object()
+
+
+def find_history_files(output_dir):
+    """output_dir에서 추출된 히스토리 DB 목록을 찾음"""
+    if not os.path.isdir(output_dir):
+        return []
+    sources = []
+    profiles_prefix = HISTORY_PROFILES_DIR + '_'
+    for name in sorted(os.listdir(output_dir)):
+        # 프로필별로 저장된 히스토리 (Profiles_<브라우저>_<사용자>\<프로필>\<파일 이름>)
+        profiles_dir = os.path.join(output_dir, name)
+        if name.startswith(profiles_prefix) and os.path.isdir(profiles_dir):
+            parts = name[len(profiles_prefix):].split('_', 1)
+            if len(parts) != 2 or not parts[1]:
+                continue
+            for profile in sorted(os.listdir(profiles_dir)):
+                for file_name, kind in HISTORY_FILE_KINDS.items():
+                    path = os.path.join(profiles_dir, profile, file_name)
+                    if os.path.isfile(path):
+                        sources.append(HistorySource(parts[0], parts[1], kind, path, None))
+            continue
+        for file_name, kind in HISTORY_FILE_KINDS.items():
+            prefix = file_name + '_'
+            if not name.startswith(prefix):
+                continue
+            # 사용자 이름에는 '_'가 있을 수 있으므로 브라우저 이름까지만 나눔
+            parts = name[len(prefix):].split('_', 1)
+            if len(parts) == 2 and parts[1]:
+                sources.append(HistorySource(parts[0], parts[1], kind, os.path.join(output_dir, name), None))
+    return sources
+
+
+def find_history_in_image(image_path):
+    """추출된 복사본이 없을 때 이미지의 경로 인덱스에서 모든 사용자의 히스토리 DB를 찾음"""
+    if not image_path:
+        return []
+    session = get_session(image_path)
+    if session.partition_offset is None:
+        return []
+    index = get_path_index(session)
+    sources = []
+    for browser, relative_path in BROWSER_HISTORY_PATHS.items():
+        kind = HISTORY_FILE_KINDS[relative_path.rsplit('\\', 1)[-1]]
+        # Firefox 프로필이 여러 개면 프로필마다 하나씩 (web_parsing.py와 동일)
+        for record in index.glob(f"Users\\*\\{relative_path}"):
+            sources.append(HistorySource(browser, record.path.split('/')[1], kind, None, record.inode))
+    return sources
+
+
+def open_history_db(source, image_path=None):
+    """히스토리 DB를 읽기 전용으로 연다 (추출된 파일은 immutable URI, 이미지 안의 파일은 메모리 DB)"""
+    if source.path is None:
+        return get_session(image_path).open_sqlite(source.inode)
+    # immutable=1: 잠금/저널 파일을 확인하지 않음 (원본 복사본을 바꾸지 않고, -wal 파일도 만들지 않음)
+    uri = pathlib.Path(os.path.abspath(source.path)).as_uri() + '?mode=ro&immutable=1'
+    return sqlite3.connect(uri, uri=True)
+
+
+def parse_time_arg(value, end=False):
+    """'YYYY-MM-DD' 또는 'YYYY-MM-DD HH:MM[:SS]'를 LOCAL_TIMEZONE 기준 datetime으로 변환
+    (end=True이고 날짜만 주면 그날 끝까지 포함하도록 다음 날 0시를 반환)"""
+    parsed = datetime.fromisoformat(value.strip())
+    if end and len(value.strip()) == 10:
+        parsed += timedelta(days=1)
+    if parsed.tzinfo is None:
+        parsed = LOCAL_TIMEZONE.localize(parsed)
+    return parsed
+
+
+def to_unix_micros(value):
+    """시간대가 있는 datetime을 유닉스 시간(마이크로초)으로 변환"""
+    return (value.astimezone(pytz.utc).replace(tzinfo=None) - UNIX_EPOCH) // timedelta(microseconds=1)
+
+
+def build_query(query, history_filter=NO_FILTER):
+    """타임라인 쿼리에 기간/키워드 조건을 붙여 (sql, params) 반환 (시간은 유닉스 시간 마이크로초로 변환해서 고름)"""
+    conditions = [f"{query.time_column} > 0"] + list(query.conditions)
+    params = []
+    # 기간 조건은 원본 시간 단위로 바꿔서 인덱스 열에 그대로 비교
+    if history_filter.since is not None:
+        conditions.append(f"{query.time_column} >= ?")
+        params.append(to_unix_micros(history_filter.since) + query.epoch_offset)
+    if history_filter.until is not None:
+        conditions.append(f"{query.time_column} < ?")
+        params.append(to_unix_micros(history_filter.until) + query.epoch_offset)
+    if history_filter.keywords:
+        # LIKE는 ASCII 대소문자를 구분하지 않음
+        conditions.append('(' + ' OR '.join(f"{query.url_column} LIKE ? ESCAPE '\\'" for _ in history_filter.keywords) + ')')
+        params += ['%' + keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                   for keyword in history_filter.keywords]
+    sql = (f"SELECT {query.url_column}, {query.time_column} - {query.epoch_offset}, {query.detail_column} "
+           f"FROM {query.tables} WHERE {' AND '.join(conditions)} ORDER BY {query.time_column} DESC")
+    return sql, params
+
+
+def to_local_times(values):
+    """유닉스 시간(마이크로초) 목록을 LOCAL_TIMEZONE 기준 datetime 목록으로 변환"""
+    fromutc = LOCAL_TIMEZONE.fromutc
+    epoch = UNIX_EPOCH
+    return [fromutc(epoch + timedelta(microseconds=value)) for value in values]
+
+
+def _iter_query_rows(conn, source, query, history_filter, batch_size):
+    """쿼리 하나의 결과를 (url, 유닉스 시간, 종류, 상세)로 하나씩 반환 (테이블이 없는 옛 스키마는 건너뜀)"""
+    sql, params = build_query(query, history_filter)
+    try:
+        cursor = conn.execute(sql, params)
+    except sqlite3.OperationalError as e:
+        print(f"{source.browser} 히스토리({source.username})에서 {query.event} 기록을 읽을 수 없습니다: {e}")
+        return
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        for url, micros, detail in rows:
+            yield url, micros, query.event, detail or ''
+
+
+def iter_history_batches(source, image_path=None, batch_size=BATCH_SIZE, history_filter=NO_FILTER):
+    """히스토리 DB 하나의 방문/다운로드 기록을 최근 순으로 batch_size개씩 [HistoryVisit] 배치로 반환"""
+    conn = open_history_db(source, image_path)
+    try:
+        # 방문과 다운로드는 각각 시간 역순이므로 합치기만 하면 됨
+        rows = heapq.merge(*[_iter_query_rows(conn, source, query, history_filter, batch_size)
+                             for query in TIMELINE_QUERIES[source.kind]],
+                           key=lambda row: row[1], reverse=True)
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            times = to_local_times([row[1] for row in batch])
+            yield [HistoryVisit(url, visit_time, source.browser, source.username, event, detail)
+                   for (url, _, event, detail), visit_time in zip(batch, times)]
+    finally:
+        conn.close()
+
+
+def _put(batches, item, stop_event):
+    """큐에 자리가 날 때까지 기다렸다 넣음 (중지되면 False)"""
+    while not stop_event.is_set():
+        try:
+            batches.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _read_source(source, image_path, history_filter, batches, stop_event):
+    """작업 스레드: DB 하나를 읽어 배치를 큐에 넣음 (마지막에 _SENTINEL)"""
+    try:
+        for batch in iter_history_batches(source, image_path, history_filter=history_filter):
+            if not _put(batches, batch, stop_event):
+                return
+    except (sqlite3.Error, OSError) as e:
+        print(f"{source.browser} 히스토리({source.username})를 읽는 중 오류 발생: {e}")
+    _put(batches, _SENTINEL, stop_event)
+
+
+def _drain(batches):
+    while True:
+        batch = batches.get()
+        if batch is _SENTINEL:
+            return
+        report(advance=len(batch))
+        yield from batch
+
+
+def stream_history(sources, image_path=None, history_filter=NO_FILTER):
+    """여러 히스토리 DB를 병렬로 읽어 최근 순으로 합친 HistoryVisit을 하나씩 반환 (history_filter 조건에 맞는 기록만)
+
+    DB마다 작업 스레드를 하나씩 둔다 (합칠 때 모든 DB의 다음 배치가 필요하므로 스레드 수를 제한하지 않음).
+    """
+    if not sources:
+        return
+    stop_event = threading.Event()
+    streams = []
+    for source in sources:
+        print(f"{source.browser} 히스토리 파싱: {source.username} ({source.path or '이미지'})")
+        batches = queue.Queue(maxsize=QUEUE_DEPTH)
+        thread = threading.Thread(target=_read_source, args=(source, image_path, history_filter, batches, stop_event), daemon=True)
+        thread.start()
+        streams.append(_drain(batches))
+    try:
+        yield from heapq.merge(*streams, key=lambda visit: visit.visit_time, reverse=True)
+    finally:
+        # 소비하는 쪽이 중간에 멈추면 작업 스레드도 멈춤
+        stop_event.set()
+
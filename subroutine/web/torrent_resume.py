@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+uTorrent resume.dat / dht.dat 파서
+
+bencode 문서를 memoryview 위에서 위치만 옮겨 가며 읽고, 토렌트마다 필요한 필드(캡션, 저장 경로, 추가/완료 시각,
+다운로드/업로드 바이트, 직접 만든 토렌트 여부, info 해시)만 값으로 만든다.
+조각 비트맵, 피어 목록 같은 큰 값은 길이만 읽고 건너뛰므로, 시드를 많이 하는 사용자의 수 MB짜리 resume.dat도
+전체 중첩 dict를 만들지 않고 토렌트 기록을 하나씩 내보낸다.
+토렌트 기록은 추가/완료 이벤트로 바꿔 웹 타임라인(HistoryVisit)에 합친다.
+"""
+import os
+import mmap
+from collections import namedtuple
+
+from browser_history import HistoryVisit, NO_FILTER, to_local_times
+
+# 타임라인에 표시할 프로그램 이름
+CLIENT_NAME = 'uTorrent'
+
+# 추출 파일 이름 (web_parsing.py: <파일 이름>_Torrent_<사용자>)
+TORRENT_FILE_PREFIX = '_Torrent_'
+
+# resume.dat에서 토렌트가 아닌 최상위 키
+RESUME_META_KEYS = (b'.fileguard', b'rec')
+
+# dht.dat의 노드 정보 크기 (노드 ID 20 + IPv4 4 + 포트 2)
+DHT_NODE_SIZE = 26
+
+# name: resume.dat의 키(.torrent 파일 이름), info_hash: info 해시(16진수, 없으면 ''),
+# added_on/completed_on: 유닉스 시간(초, 없거나 0이면 None), created: 직접 만들어 배포한 토렌트인지
+TorrentRecord = namedtuple('TorrentRecord', ['name', 'info_hash', 'caption', 'path', 'added_on', 'completed_on',
+                                             'downloaded', 'uploaded', 'created'])
+
+# node_id: DHT 노드 ID(16진수), saved_at: 저장 시각(유닉스 시간 초, 없으면 None), node_count: 저장된 노드 수
+DhtState = namedtuple('DhtState', ['node_id', 'saved_at', 'node_count'])
+
+# kind: 'resume' 또는 'dht', username: 사용자 이름, path: 추출된 파일 경로 (web_parsing.py가 항상 추출함)
+TorrentSource = namedtuple('TorrentSource', ['kind', 'username', 'path'])
+
+TORRENT_FILE_KINDS = {
+    'resume.dat': 'resume',
+    'dht.dat': 'dht',
+}
+
+
+class BencodeError(ValueError):
+    """bencode 형식이 잘못됨"""
+
+
+class BencodeReader:
+    """bencode 문서를 위치 단위로 읽는 리더 (값을 만들지 않고 건너뛸 수 있음)"""
+
+    def __init__(self, data):
+        self.view = memoryview(data)
+        self.size = len(self.view)
+
+    def release(self):
+        self.view.release()
+
+    def _byte(self, pos):
+        if pos >= self.size:
+            raise BencodeError(f"예상보다 일찍 끝났습니다 (위치 {pos})")
+        return self.view[pos]
+
+    def is_int(self, pos):
+        return self._byte(pos) == 0x69  # 'i'
+
+    def is_string(self, pos):
+        return 0x30 <= self._byte(pos) <= 0x39
+
+    def is_dict(self, pos):
+        return self._byte(pos) == 0x64  # 'd'
+
+    def _digits(self, pos, terminator):
+        # 숫자 필드는 짧으므로 구분자까지 한 바이트씩 확인
+        end = pos
+        while self._byte(end) != terminator:
+            end += 1
+        try:
+            return int(self.view[pos:end].tobytes()), end + 1
+        except ValueError:
+            raise BencodeError(f"잘못된 숫자입니다 (위치 {pos})")
+
+    def read_int(self, pos):
+        """i<숫자>e를 읽어 (값, 다음 위치) 반환"""
+        if self._byte(pos) != 0x69:  # 'i'
+            raise BencodeError(f"정수가 아닙니다 (위치 {pos})")
+        return self._digits(pos + 1, 0x65)  # 'e'
+
+    def string_span(self, pos):
+        """<길이>:<내용>의 (내용 시작, 내용 끝) 반환"""
+        length, start = self._digits(pos, 0x3a)  # ':'
+        end = start + length
+        if length < 0 or end > self.size:
+            raise BencodeError(f"문자열 길이가 잘못되었습니다 (위치 {pos})")
+        return start, end
+
+    def read_bytes(self, pos):
+        start, end = self.string_span(pos)
+        return self.view[start:end].tobytes(), end
+
+    def skip(self, pos):
+        """값 하나를 만들지 않고 건너뛴 다음 위치 (중첩은 깊이만 셈)"""
+        depth = 0
+        while True:
+            c = self._byte(pos)
+            if c == 0x69:  # 'i'
+                _, pos = self._digits(pos + 1, 0x65)
+            elif 0x30 <= c <= 0x39:
+                _, pos = self.string_span(pos)
+            elif c in (0x6c, 0x64):  # 'l', 'd'
+                depth += 1
+                pos += 1
+                continue
+            elif c == 0x65 and depth:  # 'e'
+                depth -= 1
+                pos += 1
+            else:
+                raise BencodeError(f"알 수 없는 값입니다 (위치 {pos})")
+            if depth == 0:
+                return pos
+
+    def decode(self, pos):
+        """값 하나를 파이썬 값으로 만들어 (값, 다음 위치) 반환 (작은 값에만 사용)"""
+        c = self._byte(pos)
+        if c == 0x69:
+            return self.read_int(pos)
+        if 0x30 <= c <= 0x39:
+            return self.read_bytes(pos)
+        if c == 0x6c:
+            items = []
+            pos += 1
+            while self._byte(pos) != 0x65:
+                item, pos = self.decode(pos)
+                items.append(item)
+            return items, pos + 1
+        if c == 0x64:
+            return dict(self.iter_dict(pos, decode=True)), self.skip(pos)
+        raise BencodeError(f"알 수 없는 값입니다 (위치 {pos})")
+
+    def iter_dict(self, pos, decode=False):
+        """사전의 (키, 값 위치)를 하나씩 반환 (decode=True면 값 위치 대신 값)"""
+        if self._byte(pos) != 0x64:
+            raise BencodeError(f"사전이 아닙니다 (위치 {pos})")
+        pos += 1
+        while self._byte(pos) != 0x65:
+            key, pos = self.read_bytes(pos)
+            if decode:
+                value, pos = self.decode(pos)
+                yield key, value
+            else:
+                yield key, pos
+                pos = self.skip(pos)
+
+
+def _text(value):
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return '' if value is None else str(value)
+
+
+def _timestamp(value):
+    return value if isinstance(value, int) and value > 0 else None
+
+
+def read_torrent(reader, name, pos):
+    """resume.dat의 토렌트 사전 하나에서 필요한 필드만 읽어 TorrentRecord 반환"""
+    fields = {}
+    for key, value_pos in reader.iter_dict(pos):
+        if key in (b'caption', b'path', b'info'):
+            fields[key] = reader.read_bytes(value_pos)[0] if reader.is_string(value_pos) else None
+        elif key in (b'added_on', b'completed_on', b'downloaded', b'uploaded', b'created_torrent'):
+            fields[key] = reader.read_int(value_pos)[0] if reader.is_int(value_pos) else None
+    info = fields.get(b'info')
+    return TorrentRecord(_text(name), info.hex() if isinstance(info, bytes) and len(info) == 20 else '',
+                         _text(fields.get(b'caption')), _text(fields.get(b'path')),
+                         _timestamp(fields.get(b'added_on')), _timestamp(fields.get(b'completed_on')),
+                         fields.get(b'downloaded') or 0, fields.get(b'uploaded') or 0,
+                         fields.get(b'created_torrent') == 1)
+
+
+def iter_resume_torrents(data):
+    """resume.dat 내용(bytes/mmap)에서 TorrentRecord를 하나씩 반환"""
+    if not data:
+        return
+    reader = BencodeReader(data)
+    try:
+        for key, pos in reader.iter_dict(0):
+            if key in RESUME_META_KEYS or not reader.is_dict(pos):
+                continue
+            yield read_torrent(reader, key, pos)
+    finally:
+        reader.release()
+
+
+def read_dht_state(data):
+    """dht.dat 내용에서 DhtState 반환 (노드 목록은 개수만 셈)"""
+    reader = BencodeReader(data)
+    try:
+        node_id = ''
+        saved_at = None
+        node_count = 0
+        for key, pos in reader.iter_dict(0):
+            if key == b'id' and reader.is_string(pos):
+                node_id = reader.read_bytes(pos)[0].hex()
+            elif key == b'age' and reader.is_int(pos):
+                saved_at = _timestamp(reader.read_int(pos)[0])
+            elif key == b'nodes' and reader.is_string(pos):
+                start, end = reader.string_span(pos)
+                node_count = (end - start) // DHT_NODE_SIZE
+        return DhtState(node_id, saved_at, node_count)
+    finally:
+        reader.release()
+
+
+def find_torrent_files(output_dir):
+    """output_dir에서 추출된 resume.dat/dht.dat 목록"""
+    if not os.path.isdir(output_dir):
+        return []
+    sources = []
+    for name in sorted(os.listdir(output_dir)):
+        for file_name, kind in TORRENT_FILE_KINDS.items():
+            prefix = file_name + TORRENT_FILE_PREFIX
+            if name.startswith(prefix) and len(name) > len(prefix):
+                sources.append(TorrentSource(kind, name[len(prefix):], os.path.join(output_dir, name)))
+    return sources
+
+
+def _read_source(source, parse):
+    # mmap으로 열어 파서가 건너뛰는 큰 값은 읽지 않음
+    with open(source.path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return parse(b'')
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return parse(data)
+
+
+def read_torrents(source):
+    """resume.dat 하나의 TorrentRecord 목록 (형식이 잘못되면 그 앞까지)"""
+    torrents = []
+
+    def parse(data):
+        try:
+            for torrent in iter_resume_torrents(data):
+                torrents.append(torrent)
+        except BencodeError as e:
+            print(f"{source.username}의 resume.dat를 읽는 중 오류 발생: {e}")
+        return torrents
+
+    return _read_source(source, parse)
+
+
+def read_dht(source):
+    """dht.dat 하나의 DhtState (형식이 잘못되면 None)"""
+    def parse(data):
+        try:
+            return read_dht_state(data) if data else None
+        except BencodeError as e:
+            print(f"{source.username}의 dht.dat를 읽는 중 오류 발생: {e}")
+            return None
+
+    return _read_source(source, parse)
+
+
+def torrent_rows(sources):
+    """resume.dat들의 토렌트 목록을 TORRENT_XML_FIELDS 순서의 튜플로 하나씩 반환"""
+    for source in sources:
+        if source.kind != 'resume':
+            continue
+        torrents = read_torrents(source)
+        added = to_local_times([(torrent.added_on or 0) * 1000000 for torrent in torrents])
+        completed = to_local_times([(torrent.completed_on or 0) * 1000000 for torrent in torrents])
+        for torrent, added_on, completed_on in zip(torrents, added, completed):
+            yield (torrent.info_hash, torrent.caption, torrent.path,
+                   added_on if torrent.added_on else '',
+                   completed_on if torrent.completed_on else 'Not completed',
+                   torrent.downloaded, torrent.uploaded,
+                   'Created and Distributed' if torrent.created else 'Downloaded',
+                   torrent.name, source.username)
+
+
+def magnet_uri(torrent):
+    """info 해시가 있으면 마그넷 URI, 없으면 캡션 (타임라인의 url 필드)"""
+    if torrent.info_hash:
+        return f"magnet:?xt=urn:btih:{torrent.info_hash}"
+    return torrent.caption or torrent.name
+
+
+def _matches(visit, history_filter):
+    if history_filter.since is not None and visit.visit_time < history_filter.since:
+        return False
+    if history_filter.until is not None and visit.visit_time >= history_filter.until:
+        return False
+    if history_filter.keywords:
+        url = visit.url.lower()
+        return any(keyword.lower() in url for keyword in history_filter.keywords)
+    return True
+
+
+def torrent_events(sources, history_filter=NO_FILTER):
+    """토렌트 추가/완료와 DHT 저장 시각을 최근 순 HistoryVisit 목록으로 반환 (history_filter 조건에 맞는 기록만)"""
+    events = []
+    for source in sources:
+        print(f"{CLIENT_NAME} {source.kind} 파싱: {source.username} ({source.path})")
+        if source.kind == 'resume':
+            for torrent in read_torrents(source):
+                url = magnet_uri(torrent)
+                if torrent.added_on:
+                    events.append((torrent.added_on, url, source.username, 'torrent_added', torrent.path))
+                if torrent.completed_on:
+                    event = 'torrent_created' if torrent.created else 'torrent_completed'
+                    events.append((torrent.completed_on, url, source.username, event, torrent.path))
+        else:
+            state = read_dht(source)
+            if state is not None and state.saved_at:
+                events.append((state.saved_at, f"dht:{state.node_id}", source.username, 'torrent_dht_saved',
+                               f"{state.node_count} nodes"))
+
+    times = to_local_times([seconds * 1000000 for seconds, _, _, _, _ in events])
+    visits = [HistoryVisit(url, visit_time, CLIENT_NAME, username, event, detail)
+              for (_, url, username, event, detail), visit_time in zip(events, times)]
+    visits = [visit for visit in visits if _matches(visit, history_filter)]
+    visits.sort(key=lambda visit: visit.visit_time, reverse=True)
+    return visits
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+사용자 목록 매니페스트 모듈
+
+추출한 SAM 하이브를 같은 프로세스에서 한 번만 파싱하고(web_find_user.get_user_info_from_sam),
+SOFTWARE 하이브의 ProfileList(SID → 프로필 경로)와 RID로 연결해서 사용자별 프로필 디렉토리를 찾는다.
+결과는 하이브 옆 users.json에 저장하고, 웹/LNK 모듈은 외부 스크립트를 다시 실행해 출력을 긁는 대신 이 파일을 읽는다.
+SAM/SOFTWARE는 하이브 목록(hives.json)의 깨끗한 하이브(더티면 로그를 적용한 복구본)를 읽는다.
+SAM/SOFTWARE 파일이 바뀌면(크기/수정 시각) 다시 만든다.
+"""
+import os
+import sys
+import ntpath
+from collections import namedtuple
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from checkpoint import write_json_atomic, load_json
+from hive_recovery import hive_path
+from registry_query import get_hive
+
+# 하이브 추출 디렉토리 (web_hive_parsing_Log_num.py의 출력, 작업 디렉토리와 관계없이 같은 위치)
+HIVES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'extracted_hives')
+
+# 매니페스트 파일 이름 (하이브 디렉토리 안)
+MANIFEST_NAME = 'users.json'
+
+# 매니페스트 형식이 바뀌면 올려서 기존 파일을 다시 만들게 함
+MANIFEST_VERSION = 1
+
+# 사용자 정보를 만드는 하이브 파일
+SOURCE_HIVES = ('SAM', 'SOFTWARE')
+
+PROFILE_LIST_KEY = "Microsoft\\Windows NT\\CurrentVersion\\ProfileList"
+
+# 사용자 계정 SID 접두어 (로컬/도메인 계정, Azure AD 계정). SYSTEM 등 서비스 계정 프로필은 제외
+USER_SID_PREFIXES = ('S-1-5-21-', 'S-1-12-1-')
+
+# SAM에서 사용자 이름을 읽지 못한 항목 (get_user_info_from_sam의 대체 값)
+UNKNOWN_USERNAMES = ('<Unknown>', '<V value not found>')
+
+# rid: SAM RID(16진수 8자리, 예: 000003E9), sid: ProfileList의 SID (없으면 None),
+# username: SAM 사용자 이름, last_logon: 마지막 로그온 시각 문자열,
+# profile_path: ProfileImagePath 값, profile_dir: 이미지의 Users 아래 프로필 디렉토리 이름 (프로필이 없으면 None)
+UserRecord = namedtuple('UserRecord', ['rid', 'sid', 'username', 'last_logon', 'profile_path', 'profile_dir'])
+
+_cache = {}
+
+
+def manifest_path(hives_dir=HIVES_DIR):
+    return os.path.join(hives_dir, MANIFEST_NAME)
+
+
+def _source_stats(hives_dir):
+    """매니페스트를 다시 만들어야 하는지 판단할 하이브 파일의 [크기, 수정 시각]"""
+    stats = {}
+    for name in SOURCE_HIVES:
+        path = hive_path(hives_dir, name)
+        if os.path.exists(path):
+            st = os.stat(path)
+            stats[name] = [st.st_size, int(st.st_mtime)]
+    return stats
+
+
+def read_profile_list(software_hive_path):
+    """SOFTWARE 하이브의 ProfileList에서 {RID(int): (SID, ProfileImagePath)} 반환"""
+    profiles = {}
+    profile_list = get_hive(software_hive_path).open(PROFILE_LIST_KEY)
+    if profile_list is None:
+        print("SOFTWARE 하이브에 ProfileList 키가 없습니다.")
+        return profiles
+
+    for sid_key in profile_list.subkeys():
+        sid = sid_key.name
+        if not sid.startswith(USER_SID_PREFIXES):
+            continue
+        value = sid_key.value("ProfileImagePath")
+        if value is None:
+            continue
+        profile_path = value.value
+        try:
+            rid = int(sid.rsplit('-', 1)[1])
+        except ValueError:
+            continue
+        profiles[rid] = (sid, profile_path.rstrip('\x00'))
+    return profiles
+
+
+def profile_dir_name(profile_path):
+    r"""ProfileImagePath(예: %SystemDrive%\Users\berm2)의 마지막 디렉토리 이름"""
+    if not profile_path:
+        return None
+    return ntpath.basename(profile_path.rstrip('\\')) or None
+
+
+def build_users(hives_dir=HIVES_DIR):
+    """SAM 사용자 목록과 ProfileList를 RID로 연결한 UserRecord 목록"""
+    from web_find_user import get_user_info_from_sam
+
+    sam_path = hive_path(hives_dir, 'SAM')
+    if not os.path.exists(sam_path):
+        print(f"SAM 하이브를 찾을 수 없습니다: {sam_path}")
+        return []
+
+    profiles = {}
+    software_path = hive_path(hives_dir, 'SOFTWARE')
+    if os.path.exists(software_path):
+        try:
+            profiles = read_profile_list(software_path)
+        except Exception as e:
+            print(f"ProfileList를 읽는 중 오류 발생: {e}")
+    else:
+        print("SOFTWARE 하이브가 없어 SAM 사용자 이름을 프로필 디렉토리 이름으로 사용합니다.")
+
+    has_profile_list = bool(profiles)
+    users = []
+    for user in get_user_info_from_sam(sam_path):
+        try:
+            rid = int(user['RID'], 16)
+        except ValueError:
+            continue
+        sid, profile_path = profiles.pop(rid, (None, None))
+        username = user['Username']
+        profile_dir = profile_dir_name(profile_path)
+        if profile_dir is None and not has_profile_list and username not in UNKNOWN_USERNAMES:
+            # ProfileList를 읽지 못하면 이전처럼 사용자 이름을 Users 아래 디렉토리 이름으로 간주
+            profile_dir = username
+        users.append(UserRecord(user['RID'], sid, username, user['LastLogon'], profile_path, profile_dir))
+
+    # SAM에 없는 프로필 (도메인/Microsoft/Azure AD 계정)
+    for rid, (sid, profile_path) in sorted(profiles.items()):
+        profile_dir = profile_dir_name(profile_path)
+        users.append(UserRecord(f"{rid:08X}", sid, profile_dir, "Never logged in", profile_path, profile_dir))
+    return users
+
+
+def load_users(hives_dir=HIVES_DIR, refresh=False):
+    """사용자 목록 (매니페스트가 최신이면 읽고, 아니면 하이브를 파싱해서 다시 저장)"""
+    hives_dir = os.path.abspath(hives_dir)
+    stats = _source_stats(hives_dir)
+    cached = _cache.get(hives_dir)
+    if not refresh and cached is not None and cached[0] == stats:
+        return cached[1]
+
+    path = manifest_path(hives_dir)
+    data = None if refresh else load_json(path)
+    if data and data.get('version') == MANIFEST_VERSION and data.get('sources') == stats:
+        users = [UserRecord(**user) for user in data['users']]
+    else:
+        users = build_users(hives_dir)
+        if users:
+            write_json_atomic(path, {
+                'version': MANIFEST_VERSION,
+                'sources': stats,
+                'users': [user._asdict() for user in users],
+            })
+            print(f"사용자 목록 {len(users)}명을 {path}에 저장했습니다.")
+    _cache[hives_dir] = (stats, users)
+    return users
+
+
+def profile_users(hives_dir=HIVES_DIR):
+    """프로필 디렉토리가 있는 사용자 {프로필 디렉토리 이름: UserRecord} (SAM 순서)"""
+    profiles = {}
+    for user in load_users(hives_dir):
+        if user.profile_dir and user.profile_dir not in profiles:
+            profiles[user.profile_dir] = user
+    return profiles
+
+
+def get_users_data(hives_dir=HIVES_DIR):
+    """{프로필 디렉토리 이름: 'RID 마지막 로그온'} (이전 외부 스크립트 출력 파싱 결과와 같은 형태)"""
+    return {name: f"{user.rid} {user.last_logon}" for name, user in profile_users(hives_dir).items()}
+
+
+def get_usernames(hives_dir=HIVES_DIR):
+    """프로필 디렉토리 이름 목록"""
+    return list(profile_users(hives_dir))
+
+
+if __name__ == "__main__":
+    for user in load_users(refresh=True):
+        print(f"{user.username}:{user.rid} {user.last_logon} {user.sid or '-'} {user.profile_dir or '-'}")
@@ -1,24 +1,26 @@
 # coding=UTF-8
-import subprocess
 import os
+import sys
+import argparse
 
 # 스크립트가 있는 디렉토리로 작업 디렉토리 변경
 script_dir = os.path.dirname(os.path.abspath(__file__))
 os.chdir(script_dir)
 
-def get_first_disk_image_path(image_directory):
-    # 디스크 이미지 파일 확장자 목록
-    disk_image_extensions = ['.e01']
-    
-    # 지정된 디렉토리에서 모든 파일을 검색
-    for filename in os.listdir(image_directory):
-        # 파일 확장자를 소문자로 변환하여 확인
-        if any(filename.lower().endswith(ext) for ext in disk_image_extensions):
-            # 첫 번째 이미지 파일을 찾으면 그 경로 반환
-            return os.path.join(image_directory, filename)
+sys.path.append(os.path.join(script_dir, '..', 'common'))
+from image_session import get_first_disk_image_path
+from checkpoint import get_checkpoint
+from manifest import file_digest, stage_key
+from keyword_rules import rules_path
 
-    # 이미지 파일이 없을 경우 None 반환
-    return None
+# 각 단계 스크립트를 모듈로 불러와 같은 프로세스에서 실행 (단계마다 python을 새로 띄우지 않음)
+import web_parsing
+import web_artifact
+import web_csv
+import web_sus_extract
+import browser_cache
+from browser_history import HistoryFilter, NO_FILTER, parse_time_arg
+from user_manifest import HIVES_DIR
 
 '''
 def run_hive(image_path):
@@ -26,30 +28,35 @@ def run_hive(image_path):
     subprocess.run(['python', 'web_hive_parsing_Log_num.py', image_path], check=True)
 '''
 
-def run_web_parsing():
-    """Step 1: web_parsing.py 실행, 파싱한 웹 아티팩트 파일을 저장"""
-    subprocess.run(['python', 'web_parsing.py'], check=True)
+def run_web_parsing(image_path):
+    """Step 1: web_parsing 실행, 파싱한 웹 아티팩트 파일을 저장"""
+    web_parsing.main(image_path, web_parsing.OUTPUT_DIR)
 
-def run_web_analysis_with_xml():
-    """Step 2: web_artifact.py 실행 후 XML로 결과 저장"""
-    subprocess.run(['python', 'web_artifact.py'], check=True)
+def run_web_analysis(history_filter, suspicious):
+    """Step 2: web_artifact 실행, 타임라인을 XML/CSV와 의심스러운 기록 CSV로 한 번에 저장"""
+    web_artifact.main(history_filter, suspicious)
 
 def run_web_csv():
-    """Step 3: web_csv.py 실행 후 CSV 출력"""
-    subprocess.run(['python', 'web_csv.py'], check=True)
+    """Step 3: web_csv 실행 후 resume.dat의 토렌트 목록을 XML/CSV로 출력"""
+    web_csv.torrent_to_csv()
 
+def run_browser_cache(image_path):
+    """Step 3-1: browser_cache 실행, 브라우저 캐시/세션 기록을 XML/CSV로 출력"""
+    browser_cache.main(image_path)
 
-def run_web_sus_analysis():
-    """Step 4: web_csv_sus.py 실행 후 의심스러운 로그를 CSV로 출력"""
-    subprocess.run(['python', 'web_csv_sus.py'], check=True)
+# 의심스러운 파일과 보고서(suspicious_downloads.csv)를 저장하는 디렉토리
+SUS_FILE_DIR = r"..\..\output\suspicious_file\web"
 
-def run_web_sus_ext_analysis():
-    """Step 4: web_sus_extract.py 실행 후 의심스러운 파일을 추출"""
-    subprocess.run(['python', 'web_sus_extract.py'], check=True)
+def run_web_sus_ext_analysis(image_path):
+    """Step 4: web_sus_extract 실행 후 의심스러운 파일을 추출"""
+    web_sus_extract.main(image_path, SUS_FILE_DIR)
 
 
-def main(image_path):
-    
+def main(image_path, suspicious=True, history_filter=NO_FILTER):
+    # 중지되거나 실패한 이전 실행이 있으면 완료된 단계는 건너뛰고 이어서 진행
+    checkpoint = get_checkpoint('web', image_path)
+    checkpoint.plan(['extract', 'parse', 'csv', 'cache'] + (['suspicious_extract'] if suspicious else []))
+
     '''
     # 1. 하이브 파일 파싱 (유저 정보 추출) <--- defohari로 이관
     output_dir = os.path.join('..', '..', 'output', 'artifact', 'web')  # 상대 경로로 설정
@@ -59,22 +66,48 @@ def main(image_path):
     '''
     
     # 2. 웹 아티팩트 분석
-    run_web_parsing()
-    run_web_analysis_with_xml()
-    
-    # 3. 분석 결과를 CSV로 출력
-    run_web_csv()
+    checkpoint.run('extract', run_web_parsing, image_path, key=file_digest('web_parsing.py'))
+
+    # 추출한 브라우저/토렌트 기록과 하이브의 해시 (스크립트와 함께 바뀌지 않았으면 이전 실행의 결과를 그대로 사용)
+    input_key = checkpoint.input_key(web_parsing.OUTPUT_DIR, HIVES_DIR)
+
+    # 타임라인 XML/CSV와 의심스러운 기록 CSV를 한 번에 씀 (기간/키워드 조건이나 의심 흔적 분석 여부가 바뀌면 다시 파싱)
+    checkpoint.run('parse', run_web_analysis, history_filter, suspicious,
+                   key=stage_key(file_digest('web_artifact.py', 'browser_history.py', 'torrent_resume.py', 'web_record_writer.py',
+                                             'web_csv_sus.py', rules_path()),
+                                 repr((tuple(history_filter), suspicious)), input_key),
+                   outputs=web_artifact.output_paths(suspicious))
     
-    # 4. 의심스러운 웹 흔적을 분석하여 CSV 및 파일 출력
-    sus_output_dir = os.path.join('..', '..', 'output', 'suspicious_artifact', 'web')
-    if not os.path.exists(sus_output_dir):
-        os.makedirs(sus_output_dir)   
-    run_web_sus_analysis()
+    # 3. 토렌트 목록을 XML/CSV로 출력
+    checkpoint.run('csv', run_web_csv, key=stage_key(file_digest('web_csv.py', 'torrent_resume.py', 'web_record_writer.py'), input_key),
+                   outputs=web_csv.torrent_output_paths())
+
+    # 3-1. 브라우저 캐시/세션 기록을 XML/CSV로 출력 (프로필마다 병렬로 디코딩)
+    checkpoint.run('cache', run_browser_cache, image_path,
+                   key=stage_key(file_digest('browser_cache.py', 'web_parsing.py', 'web_record_writer.py'), input_key),
+                   outputs=browser_cache.output_paths())
     
-    # 5. 의심스러운 파일 추출
-    run_web_sus_ext_analysis()
+    if suspicious:
+        # 4. 의심스러운 파일 추출
+        checkpoint.run('suspicious_extract', run_web_sus_ext_analysis, image_path,
+                       key=stage_key(file_digest('web_sus_extract.py', rules_path()), input_key),
+                       outputs=[os.path.join(SUS_FILE_DIR, web_sus_extract.REPORT_NAME)])
+
+    checkpoint.finish()
     
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--suspicious', action='store_true', help="의심스러운 흔적 분석 단계까지 실행 (기본값)")
+    group.add_argument('--no-suspicious', action='store_true', help="의심스러운 흔적 분석 단계를 생략")
+    parser.add_argument('--since', help="이 시각 이후의 기록만 (예: 2024-05-01 또는 '2024-05-01 13:00')")
+    parser.add_argument('--until', help="이 시각 이전의 기록만 (날짜만 주면 그날 끝까지 포함)")
+    parser.add_argument('--url-keyword', action='append', default=[], help="URL에 이 문자열이 있는 기록만 (여러 번 지정하면 하나라도)")
+    args = parser.parse_args()
+    history_filter = HistoryFilter(parse_time_arg(args.since) if args.since else None,
+                                   parse_time_arg(args.until, end=True) if args.until else None,
+                                   tuple(args.url_keyword))
+
     image_path_directory = r"..\..\image_here"
     first_disk_image_path = get_first_disk_image_path(image_path_directory)
-    main(first_disk_image_path)
+    main(first_disk_image_path, not args.no_suspicious, history_filter)
@@ -2,6 +2,16 @@ import xml.etree.ElementTree as ET
 import csv
 import chardet
 
+from web_record_writer import XML_FIELDS, CSV_HEADER, TORRENT_XML_FIELDS, TORRENT_CSV_HEADER, WebRecordWriter
+from torrent_resume import find_torrent_files, torrent_rows
+
+# XML 파일 경로와 CSV 파일 경로 설정
+his_xml_file_path = r'..\..\output\artifact\web\web_output.xml'
+his_csv_file_path = r'..\..\output\artifact\web\web_output.csv'
+torrent_dir = r'..\..\output\artifact\web'  # web_parsing.py가 resume.dat/dht.dat를 추출한 폴더
+tor_xml_file_path = r'..\..\output\artifact\web\torrent_output.xml'
+tor_csv_file_path = r'..\..\output\artifact\web\torrent_output.csv'
+
 def detect_encoding(file_path):
     with open(file_path, 'rb') as file:
         raw_data = file.read()
@@ -16,6 +26,7 @@ def read_cleaned_xml(file_path, encoding):
     return content
 
 def tor_xml_to_csv(xml_file_path, csv_file_path):
+    """이전 형식(<torrent hash=...>)의 토렌트 XML을 CSV로 변환"""
     try:
         # 인코딩 감지
         encoding = detect_encoding(xml_file_path)
@@ -51,28 +62,22 @@ def tor_xml_to_csv(xml_file_path, csv_file_path):
     except Exception as e:
         print(f"예기치 않은 오류가 발생했습니다: {e}")
 
+def iter_visits_from_xml(xml_file_path):
+    """web_output.xml의 타임라인을 (url, visit_time, browser, user, event, detail) 튜플로 하나씩 읽음
+    (web_record_writer가 이스케이프해서 썼으므로 인코딩 감지/특수 문자 정리 없이 스트리밍으로 파싱)"""
+    for _, element in ET.iterparse(xml_file_path):
+        if element.tag != 'visit':
+            continue
+        yield tuple(element.findtext(tag) or '' for tag in XML_FIELDS)
+        element.clear()
+
 def his_xml_file_to_csv(xml_file_path, csv_file_path):
+    """web_output.xml을 CSV로 변환 (web_artifact가 CSV를 같이 쓰므로 XML만 있을 때 사용)"""
     try:
-        # 인코딩 감지
-        encoding = detect_encoding(xml_file_path)
-
-        # XML 파일 정리 및 파싱
-        cleaned_xml = read_cleaned_xml(xml_file_path, encoding)
-        root = ET.fromstring(cleaned_xml)
-
-        # CSV 파일 작성
         with open(csv_file_path, 'w', newline='', encoding='utf-8') as csv_file:
             writer = csv.writer(csv_file)
-
-            # 헤더 작성
-            writer.writerow(['url', 'visit_time'])
-
-            # 각 방문 기록을 CSV에 작성
-            for visit in root.findall('visit'):
-                url = visit.find('url').text
-                visit_time_element = visit.find('visit_time')
-                visit_time = visit_time_element.text if visit_time_element is not None else ''
-                writer.writerow([url, visit_time])
+            writer.writerow(CSV_HEADER)
+            writer.writerows(iter_visits_from_xml(xml_file_path))
 
     except ET.ParseError as e:
         print(f"XML 파일을 파싱하는 중 오류가 발생했습니다: {e}")
@@ -81,17 +86,24 @@ def his_xml_file_to_csv(xml_file_path, csv_file_path):
     except Exception as e:
         print(f"예기치 않은 오류가 발생했습니다: {e}")
 
-
-# XML 파일 경로와 CSV 파일 경로 설정
-his_xml_file_path = r'..\..\output\artifact\web\web_output.xml'
-his_csv_file_path = r'..\..\output\artifact\web\web_output.csv'
-
-# XML 파일을 CSV로 변환
-his_xml_file_to_csv(his_xml_file_path, his_csv_file_path)
-
-# XML 파일 경로와 CSV 파일 경로 설정
-tor_xml_file_path = r'..\..\output\artifact\web\torrent_output.xml'
-tor_csv_file_path = r'..\..\output\artifact\web\torrent_output.csv'
-
-# XML 파일을 CSV로 변환
-tor_xml_to_csv(tor_xml_file_path, tor_csv_file_path)
+def torrent_output_paths():
+    return [tor_xml_file_path, tor_csv_file_path]
+
+def torrent_to_csv():
+    """추출된 resume.dat에서 토렌트 목록을 읽어 XML/CSV로 한 번에 저장하고 토렌트 수를 반환"""
+    sources = find_torrent_files(torrent_dir)
+    if not sources:
+        print("파싱할 uTorrent resume.dat가 없습니다.")
+    with WebRecordWriter(tor_xml_file_path, tor_csv_file_path, root_tag='torrents', item_tag='torrent',
+                         fields=TORRENT_XML_FIELDS, csv_header=TORRENT_CSV_HEADER) as writer:
+        writer.write_all(torrent_rows(sources))
+    print(f"토렌트 {writer.count}개를 {tor_csv_file_path}에 저장했습니다.")
+    return writer.count
+
+def main():
+    """방문 기록 XML을 CSV로 저장하고 토렌트 목록을 XML/CSV로 저장"""
+    his_xml_file_to_csv(his_xml_file_path, his_csv_file_path)
+    torrent_to_csv()
+
+if __name__ == "__main__":
+    main()
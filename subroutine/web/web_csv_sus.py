@@ -1,23 +1,12 @@
 import xml.etree.ElementTree as ET
 import csv
-import chardet
-import re
+import os
+import sys
 
-
-def detect_encoding(file_path):
-    with open(file_path, 'rb') as file:
-        raw_data = file.read()
-        result = chardet.detect(raw_data)
-        return result['encoding']
-
-
-def read_cleaned_xml(file_path):
-    with open(file_path, 'r', encoding='utf-8') as file:
-        content = file.read()
-    
-    # 특수 문자 처리
-    cleaned_content = re.sub(r'&(?!amp;)', '&amp;', content)
-    return cleaned_content
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from keyword_rules import get_matcher
+from web_record_writer import SUS_CSV_HEADER
+from web_csv import iter_visits_from_xml
 
 """
 def tor_xml_to_csv(xml_file_path, csv_file_path):
@@ -64,35 +53,35 @@ def tor_xml_to_csv(xml_file_path, csv_file_path):
         print(f"예기치 않은 오류가 발생했습니다: {e}")
 """
 
-def his_xml_file_to_csv(xml_file_path, csv_file_path):
-    try:
-        # XML 파일 정리 및 파싱
-        cleaned_xml = read_cleaned_xml(xml_file_path)
-        root = ET.fromstring(cleaned_xml)
+# 안티포렌식 키워드 규칙 (common/anti_forensic_rules.json)
+matcher = get_matcher()
 
-        # 안티포렌식 키워드 목록 (정규 표현식)
-        anti_forensic_keywords = [
-            r'(?i).*ccleaner.*', r'(?i).*cleaner.*', r'(?i).*eraser.*',
-            r'(?i).*wiper.*', r'(?i).*scrubber.*', r'(?i).*delete.*',
-            r'(?i).*remove.*', r'(?i).*destroy.*', r'(?i).*bleachbit.*'
-        ]
+def is_suspicious_url(url):
+    """URL에 걸린 안티포렌식 키워드 규칙 이름 (없으면 None)"""
+    return matcher.match(url)
 
-        # CSV 파일 작성
-        with open(csv_file_path, 'w', newline='', encoding='utf-8') as csv_file:
-            writer = csv.writer(csv_file)
+def is_suspicious_visit(visit):
+    """타임라인 기록 (url, visit_time, ...) 의 URL에 걸린 규칙 이름 (web_record_writer의 의심 CSV 필터)"""
+    return matcher.match(visit[0])
 
-            # 헤더 작성
-            writer.writerow(['URL', 'Visit Time'])
+def write_suspicious_visits(visits, csv_file_path):
+    """타임라인 (url, visit_time, browser, user, event, detail) 중 안티포렌식 키워드가 있는 URL만 CSV로 저장"""
+    with open(csv_file_path, 'w', newline='', encoding='utf-8') as csv_file:
+        writer = csv.writer(csv_file)
+
+        # 헤더 작성
+        writer.writerow(SUS_CSV_HEADER)
 
-            # 각 방문 기록을 CSV에 작성
-            for visit in root.findall('visit'):
-                url = visit.find('url').text
-                visit_time_element = visit.find('visit_time')
-                visit_time = visit_time_element.text if visit_time_element is not None else ''
+        for visit in visits:
+            # URL이 안티포렌식 키워드를 포함하는 경우만 규칙 이름과 함께 기록
+            rule = is_suspicious_visit(visit)
+            if rule:
+                writer.writerow(list(visit) + [rule])
 
-                # 정규 표현식을 사용하여 URL이 안티포렌식 키워드를 포함하는 경우만 처리
-                if any(re.match(keyword, url) for keyword in anti_forensic_keywords):
-                    writer.writerow([url, visit_time])
+def his_xml_file_to_csv(xml_file_path, csv_file_path):
+    """web_output.xml에서 의심스러운 기록만 CSV로 저장 (파이프라인에서는 web_artifact가 타임라인과 함께 씀)"""
+    try:
+        write_suspicious_visits(iter_visits_from_xml(xml_file_path), csv_file_path)
 
     except ET.ParseError as e:
         print(f"XML 파일을 파싱하는 중 오류가 발생했습니다: {e}")
@@ -110,5 +99,9 @@ tor_output_xml = r"torrent_output.xml"
 tor_csv_file_path = 'web_filtered.csv'
 """
 
-# XML 파일을 CSV로 변환
-his_xml_file_to_csv(his_xml_file_path, his_csv_file_path)
+def main():
+    """web_output.xml에서 의심스러운 방문 기록을 CSV로 저장"""
+    his_xml_file_to_csv(his_xml_file_path, his_csv_file_path)
+
+if __name__ == "__main__":
+    main()
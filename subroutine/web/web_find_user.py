@@ -1,6 +1,10 @@
-from Registry import Registry
+import os
+import sys
 from datetime import datetime, timedelta
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from registry_query import get_hive
+
 def clean_username(candidate):
     """
     비정상적인 문자들을 제거하는 함수
@@ -60,16 +64,19 @@ def get_user_info_from_sam(sam_hive_path):
     """
     SAM hive에서 RID와 Username, Last Logon 정보를 추출하는 함수
     """
-    sam = Registry.Registry(sam_hive_path)
+    sam = get_hive(sam_hive_path)
 
     # 사용자 정보가 있는 경로 (SAM\Domains\Account\Users)
     users_key = sam.open("SAM\\Domains\\Account\\Users")
 
     user_info = []
+    if users_key is None:
+        print("SAM 하이브에 Users 키가 없습니다.")
+        return user_info
     
     # 각 RID에 해당하는 정보를 순회
     for rid_key in users_key.subkeys():
-        rid = rid_key.name()  # 각 RID 값 (ex: 000001F4)
+        rid = rid_key.name  # 각 RID 값 (ex: 000001F4)
 
         # 'Names'와 같은 비-RID 키를 제외
         if rid == "Names":
@@ -78,9 +85,10 @@ def get_user_info_from_sam(sam_hive_path):
 
         print(f"Processing RID: {rid}")  # 디버깅 출력
 
-        try:
+        v_value = rid_key.value("V")
+        if v_value is not None:
             # 각 RID 하위의 V 값을 가져옴
-            user_data = rid_key.value("V").value()
+            user_data = v_value.raw
             print(f"Found 'V' value for RID: {rid}")  # 디버깅 출력
 
             # 여러 위치에서 사용자 이름을 찾기 위한 탐색
@@ -111,16 +119,17 @@ def get_user_info_from_sam(sam_hive_path):
             # Last Login Time을 F 값에서 추출
             last_logon_time = "Never logged in"
             try:
-                f_value = rid_key.value("F").value()
+                f_value = rid_key.value("F").raw
                 if len(f_value) >= 16:
                     filetime_value = int.from_bytes(f_value[8:16], byteorder='little')
                     last_logon_time = filetime_to_dt(filetime_value) or "Never logged in"
             except Exception as e:
                 print(f"Failed to extract Last Logon for {username}: {e}")
 
-        except KeyError:
+        else:
             # 'V' 값이 없을 경우 처리
             username = "<V value not found>"
+            last_logon_time = "Never logged in"
             print(f"No 'V' value for RID: {rid}")  # 디버깅 출력
 
         # 최종 출력 형식에 맞게 저장
@@ -132,17 +141,18 @@ def get_user_info_from_sam(sam_hive_path):
     
     return user_info
 
-# SAM 하이브 파일 경로 지정
-sam_hive_path = r"extracted_hives\SAM"
+if __name__ == "__main__":
+    # SAM 하이브 파일 경로 지정
+    sam_hive_path = r"extracted_hives\SAM"
 
-# SAM 하이브에서 사용자 정보 추출
-users_data = get_user_info_from_sam(sam_hive_path)
+    # SAM 하이브에서 사용자 정보 추출
+    users_data = get_user_info_from_sam(sam_hive_path)
 
-# 저장용 set에 Username:RID LastLogon 형식으로 저장
+    # 저장용 set에 Username:RID LastLogon 형식으로 저장
 
-for user in users_data:
-    users.add(f"{user['Username']}:{user['RID']} {user['LastLogon']}")
+    for user in users_data:
+        users.add(f"{user['Username']}:{user['RID']} {user['LastLogon']}")
 
-# 각 사용자에 대해 정보 출력 (Username_RID LastLogon)
-for user_entry in users:
-    print(user_entry)
\ No newline at end of file
+    # 각 사용자에 대해 정보 출력 (Username_RID LastLogon)
+    for user_entry in users:
+        print(user_entry)
\ No newline at end of file
@@ -1,164 +1,131 @@
 # -*- coding: utf-8 -*-
-import subprocess
 import os
 import sys
 import argparse
-import re
-
-# 파티션 오프셋을 가져오는 함수
-def get_partition_offset(image_path, partition_type="Basic data partition"):
-    """mmls 도구로 Basic data partition의 오프셋을 가져오는 함수"""
-    try:
-        command = ['mmls', image_path]
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        
-        lines = result.stdout.splitlines()
-        for line in lines:
-            if partition_type in line:
-                parts = line.split()
-                if len(parts) > 2:
-                    offset = parts[2]
-                    print(f"파티션 오프셋 찾음: {offset}")
-                    return int(offset)
-    except subprocess.CalledProcessError as e:
-        print(f"파티션 오프셋을 찾는 중 오류 발생: {e}")
-    return None
-
-# inode 번호를 가져오는 함수
-def get_inode_number(image_path, offset, file_name_pattern, inode=None):
-    """fls 도구로 파일 또는 디렉토리의 inode 번호를 가져오는 함수"""
-    try:
-        command = ['fls', '-f', 'ntfs', '-o', str(offset), image_path]
-        if inode:
-            command.append(str(inode))  # inode 번호를 문자열로 변환하여 전달
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-
-        found_files = []
-        pattern = re.compile(file_name_pattern)
-        for line in result.stdout.splitlines():
-            parts = line.strip().split(None, 2)
-            if len(parts) < 3:
-                continue
-            inode_info, file_type, name = parts
-            inode_number = line.split()[1].split(':')[0]
-            name = name.strip()
-            if pattern.fullmatch(name):
-                found_files.append((name, inode_number))
-                print(f"{name}의 inode 번호: {inode_number}")
-        return found_files
-    except subprocess.CalledProcessError as e:
-        print(f"inode 번호를 찾는 중 오류 발생: {e}")
-    return []
-
-# 디렉토리 inode 번호만 가져오는 함수
-def get_inode_number_for_directory(image_path, offset, dir_name, inode=None):
-    """fls 도구로 디렉토리의 inode 번호를 가져오는 함수"""
-    try:
-        command = ['fls', '-f', 'ntfs', '-D', '-o', str(offset), image_path]
-        if inode:
-            command.append(str(inode))
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-
-        for line in result.stdout.splitlines():
-            parts = line.strip().split(None, 2)
-            if len(parts) < 3:
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from image_session import get_session
+from path_index import get_path_index
+from extractor import extract_batch
+from hive_recovery import HiveEntry, recover_hive_file, load_hive_catalog, save_hive_catalog
+from user_manifest import load_users
+
+# 시스템 하이브 (이미지 루트 기준 경로)
+SYSTEM_HIVES = [
+    r"Windows\System32\config\SAM",
+    r"Windows\System32\config\SYSTEM",
+    r"Windows\System32\config\SECURITY",
+    r"Windows\System32\config\SOFTWARE",
+    r"Windows\System32\config\DEFAULT",
+    r"Windows\AppCompat\Programs\Amcache.hve",
+]
+
+# 사용자 하이브 (사용자 홈 기준 경로)
+USER_HIVES = [
+    r"NTUSER.DAT",
+    r"AppData\Local\Microsoft\Windows\UsrClass.dat",
+]
+
+# 로그를 적용한 하이브를 저장하는 디렉토리 (출력 디렉토리 안, 더티 하이브만)
+RECOVERED_DIR = 'recovered'
+
+# 사용자 하이브를 저장하는 디렉토리 (출력 디렉토리 안, 사용자별 하위 디렉토리)
+USERS_DIR = 'users'
+
+def find_hive_files(index):
+    """경로 인덱스에서 시스템 하이브와 모든 사용자 하이브, 각 하이브의 로그를 찾아 [(user, 하이브 FileRecord, [로그 FileRecord])] 반환"""
+    hives = []
+    for hive_path in SYSTEM_HIVES:
+        record = index.lookup(hive_path)
+        if record is None or record.deleted:
+            print(f"하이브를 찾을 수 없습니다: {hive_path}")
+            continue
+        hives.append((None, record, index.glob(f"{hive_path}.LOG*")))
+
+    for hive_path in USER_HIVES:
+        # 'Users\*\NTUSER.DAT'처럼 모든 사용자 홈에서 같은 상대 경로를 한 번에 검색
+        for record in index.glob(f"Users\\*\\{hive_path}"):
+            if record.is_dir:
                 continue
-            inode_info, file_type, name = parts
-            inode_number = line.split()[1].split(':')[0]
-            name = name.strip()
-            if name == dir_name:
-                print(f"{dir_name}의 inode 번호: {inode_number}")
-                return inode_number
-        return None
-    except subprocess.CalledProcessError as e:
-        print(f"inode 번호를 찾는 중 오류 발생: {e}")
-    return None
-	
-# 파일을 추출하는 함수
-def extract_file(image_path, offset, inode, output_dir, file_name):
-    """icat 도구로 파일을 추출하는 함수"""
-    try:
-        os.makedirs(output_dir, exist_ok=True)
-        output_file = os.path.join(output_dir, file_name)
-        command = ['icat', '-f', 'ntfs', '-o', str(offset), image_path, inode]
-        with open(output_file, 'wb') as f:
-            result = subprocess.run(command, stdout=f, check=True)
-        print(f"파일 추출 완료: {output_file}")
-    except subprocess.CalledProcessError as e:
-        print(f"파일 추출 중 오류 발생: {e}")
-
-
-# SAM 및 SYSTEM 하이브와 로그 파일들을 추출하는 함수
+            user = record.path.split('/')[1]
+            hives.append((user, record, index.glob(f"Users\\{user}\\{hive_path}.LOG*")))
+    return hives
+
+def hive_destination(output_dir, user, name):
+    """하이브(또는 로그) 추출 경로 (시스템 하이브는 출력 디렉토리 바로 아래, 사용자 하이브는 users\\<user> 아래)"""
+    if user is None:
+        return os.path.join(output_dir, name)
+    return os.path.join(output_dir, USERS_DIR, user, name)
+
+def recover_hives(hives, results, output_dir):
+    """추출한 하이브가 더티면 로그를 적용해 깨끗한 하이브를 만들고 HiveEntry 목록 반환 (원본/로그가 같으면 이전 복구본 재사용)"""
+    previous = {(entry.user, entry.name): entry for entry in load_hive_catalog(output_dir)}
+    entries = []
+    for (user, record, _), (hive_result, log_results) in zip(hives, results):
+        if hive_result.error is not None:
+            continue
+        logs = [r for r in log_results if r.error is None and r.bytes_written > 0]
+        raw_path = hive_result.destination
+        log_paths = [r.destination for r in logs]
+        log_sha256 = [r.sha256 for r in logs]
+
+        old = previous.get((user, record.name))
+        if (old is not None and old.sha256 == hive_result.sha256 and old.log_sha256 == log_sha256
+                and os.path.exists(old.path)):
+            entries.append(old._replace(raw_path=raw_path, log_paths=log_paths))
+            continue
+
+        recovered_path = os.path.join(output_dir, RECOVERED_DIR, os.path.relpath(raw_path, output_dir))
+        try:
+            path, result = recover_hive_file(raw_path, log_paths, recovered_path)
+        except ValueError as e:
+            print(f"하이브 로그를 적용하지 못했습니다: {raw_path} - {e}")
+            path, result = raw_path, None
+        if result is not None and result.dirty:
+            print(f"더티 하이브 복구: {raw_path} (로그 항목 {result.applied}개 적용) -> {path}")
+        entries.append(HiveEntry(record.name, user, path, raw_path, log_paths, hive_result.sha256, log_sha256,
+                                 bool(result and result.dirty), result.applied if result else 0))
+    return entries
+
+# 시스템/사용자 하이브와 로그 파일들을 추출하는 함수
 def extract_hives(image_path, output_dir):
-    """디스크 이미지에서 SAM 및 SYSTEM 하이브 파일을 추출"""
+    """디스크 이미지에서 시스템 하이브와 사용자별 NTUSER.DAT/UsrClass.dat를 로그와 함께 추출하고 로그를 적용한 뒤 사용자 목록 매니페스트를 만듦"""
 
-    # 파티션 오프셋을 가져옴
-    partition_offset = get_partition_offset(image_path)
+    session = get_session(image_path)
 
-    if partition_offset is None:
+    # 파티션 오프셋을 가져옴
+    if session.partition_offset is None:
         print("파티션 오프셋을 찾을 수 없습니다.")
         return
 
-    # Windows 디렉토리 inode 가져오기
-    windows_inodes = get_inode_number(image_path, partition_offset, r"Windows")
-
-    if not windows_inodes:
-        print("Windows 디렉토리를 찾을 수 없습니다.")
-        return
-
-    # Windows 디렉토리의 inode 번호 추출
-    windows_inode = windows_inodes[0][1]  # 첫 번째 결과의 inode 번호 사용
-
-    # System32 디렉토리 inode 가져오기
-    system32_inodes = get_inode_number(image_path, partition_offset, r"System32", windows_inode)
-
-    if not system32_inodes:
-        print("System32 디렉토리를 찾을 수 없습니다.")
-        return
-
-    # System32 디렉토리의 inode 번호 추출
-    system32_inode = system32_inodes[0][1]
-
-    # config 디렉토리 inode 가져오기
-    config_inode = get_inode_number_for_directory(image_path, partition_offset, "config", system32_inode)
-
-    if not config_inode:
-        print("config 디렉토리를 찾을 수 없습니다.")
+    # 이미지 경로 인덱스 (없으면 한 번 순회해서 생성)에서 하이브와 로그를 모두 찾음
+    index = get_path_index(session)
+    hives = find_hive_files(index)
+    if not hives:
+        print("하이브 파일을 찾을 수 없습니다.")
         return
 
-    # SAM 하이브 파일 및 로그 파일 inode 가져오기
-    sam_files = get_inode_number(image_path, partition_offset, r"SAM", config_inode)
-    sam_log_files = get_inode_number(image_path, partition_offset, r"SAM\.LOG\d*", config_inode)
-
-    # SYSTEM 하이브 파일 및 로그 파일 inode 가져오기
-    system_files = get_inode_number(image_path, partition_offset, r"SYSTEM", config_inode)
-    system_log_files = get_inode_number(image_path, partition_offset, r"SYSTEM\.LOG\d*", config_inode)
-
-    # SECURITY 하이브 파일 및 로그 파일 inode 가져오기
-    security_files = get_inode_number(image_path, partition_offset, r"SECURITY", config_inode)
-    security_log_files = get_inode_number(image_path, partition_offset, r"SECURITY\.LOG\d*", config_inode)
-
-    # SAM 및 SAM.LOG* 파일들 추출
-    for file_name, inode in sam_files:
-        extract_file(image_path, partition_offset, inode, output_dir, file_name)
-    for file_name, inode in sam_log_files:
-        extract_file(image_path, partition_offset, inode, output_dir, file_name)
+    # 모든 하이브와 로그 파일을 한 번에 병렬 추출
+    # (매니페스트에 기록된 파일은 이미지가 같으면 다시 추출하지 않음)
+    jobs = []
+    for user, record, logs in hives:
+        jobs.append((record.inode, hive_destination(output_dir, user, record.name)))
+        jobs += [(log.inode, hive_destination(output_dir, user, log.name)) for log in logs]
+    extracted = iter(extract_batch(session, jobs))
+    results = [(next(extracted), [next(extracted) for _ in logs]) for _, _, logs in hives]
 
-    # SYSTEM 및 SYSTEM.LOG* 파일들 추출
-    for file_name, inode in system_files:
-        extract_file(image_path, partition_offset, inode, output_dir, file_name)
-    for file_name, inode in system_log_files:
-        extract_file(image_path, partition_offset, inode, output_dir, file_name)
+    # 더티 하이브는 메모리에서 로그를 적용해 깨끗한 하이브로 저장하고 목록(hives.json)에 기록
+    entries = recover_hives(hives, results, output_dir)
+    save_hive_catalog(output_dir, entries)
+    dirty = sum(1 for entry in entries if entry.dirty)
+    print(f"하이브 {len(entries)}개 추출 (더티 하이브 {dirty}개 복구)")
 
-    # SECURITY 및 SECURITY.LOG* 파일들 추출
-    for file_name, inode in security_files:
-        extract_file(image_path, partition_offset, inode, output_dir, file_name)
-    for file_name, inode in security_log_files:
-        extract_file(image_path, partition_offset, inode, output_dir, file_name)
+    # SAM과 ProfileList를 한 번만 파싱해서 사용자 목록 매니페스트로 저장 (웹/LNK 단계는 이 파일을 읽음)
+    load_users(output_dir, refresh=True)
 
 # 스크립트 실행 부분
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="디스크 이미지에서 SAM, SYSTEM 및 SECURITY 하이브 파일 추출")
+    parser = argparse.ArgumentParser(description="디스크 이미지에서 시스템 하이브와 사용자 하이브(NTUSER.DAT, UsrClass.dat)를 로그와 함께 추출")
     parser.add_argument("image", help="디스크 이미지 파일 경로 (예: image.dd, image.E01)")
     parser.add_argument("-o", "--output", help="출력 디렉토리", default="extracted_hives")
     args = parser.parse_args()
@@ -170,4 +137,4 @@ if __name__ == "__main__":
         print(f"디스크 이미지 파일이 존재하지 않습니다: {image_path}")
         sys.exit(1)
 
-    extract_hives(image_path, output_dir)
\ No newline at end of file
+    extract_hives(image_path, output_dir)
@@ -1,207 +1,192 @@
-import subprocess
 import os
-
-# 파티션 오프셋을 가져오는 함수
-def get_partition_offset(image_path, partition_type="Basic data partition"):
-    """mmls 도구로 Basic data partition의 오프셋을 가져오는 함수"""
-    try:
-        command = ['mmls', image_path]
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        
-        lines = result.stdout.splitlines()
-        for line in lines:
-            if partition_type in line:
-                parts = line.split()
-                if len(parts) > 2:
-                    offset = parts[2]
-                    print(f"파티션 오프셋 찾음: {offset}")
-                    return int(offset)
-    except subprocess.CalledProcessError as e:
-        print(f"파티션 오프셋을 찾는 중 오류 발생: {e}")
-    return None
-
-# inode 번호를 가져오는 함수
-def get_inode_number(image_path, offset, file_name, inode=None):
-    """fls 도구로 파일 또는 디렉토리의 inode 번호를 가져오는 함수"""
-    try:
-        command = ['fls', '-f', 'ntfs', '-o', str(offset), image_path] if not inode else ['fls', '-f', 'ntfs', '-o', str(offset), image_path, inode]
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        
-        found_inodes = []
-        for line in result.stdout.splitlines():
-            if file_name in line:
-                inode_number = line.split()[1].split(':')[0]
-                found_inodes.append(inode_number)
-                print(f"{file_name}의 inode 번호: {inode_number}")
-        return found_inodes if found_inodes else None
-    except subprocess.CalledProcessError as e:
-        print(f"inode 번호를 찾는 중 오류 발생: {e}")
-    return None
-
-# 디렉토리 inode 번호만 가져오는 함수
-def get_directory_inode(image_path, offset, parent_inode, target_directory):
-    """특정 inode 아래에서 디렉토리 inode를 검색"""
-    command = ['fls', '-f', 'ntfs', '-o', str(offset), image_path, parent_inode]
-    result = subprocess.run(command, capture_output=True, text=True, check=True)
-    
-    for line in result.stdout.splitlines():
-        if target_directory in line:
-            inode_number = line.split()[1].split(':')[0]
-            print(f"{target_directory}의 inode 번호: {inode_number}")
-            return inode_number
-    return None
-
-# 외부 스크립트에서 사용자 정보 가져오기
-def get_users_from_external_script(script_path):
-    """외부 스크립트 실행 후 유효한 사용자 정보만 가져오기"""
-    try:
-        command = ['python', script_path]
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        users_data = {}
-        print("외부 스크립트 실행 결과:")
-        print(result.stdout)  # 스크립트의 출력 결과 출력
-
-        # 결과를 기반으로 사용자 데이터 파싱
-        for line in result.stdout.splitlines():
-            # 유효한 사용자 이름을 포함하는 줄만 처리 (숫자 및 알파벳, 한글 등으로 구성된 경우만)
-            if ":" in line and "Found valid username" not in line:
-                try:
-                    username, rest = line.split(":", 1)
-                    username = username.strip()
-                    # username에 실제 값이 있고 "Unknown"이 아닌 경우만 저장
-                    if username and "Unknown" not in username and "RID" not in username:
-                        users_data[username] = rest.strip()  # 유효한 Username: RID 저장
-                except ValueError:
-                    continue  # 잘못된 형식 무시
-        return users_data
-    except subprocess.CalledProcessError as e:
-        print(f"외부 스크립트를 실행하는 중 오류 발생: {e}")
-        return {}
-
-# 파일을 추출하는 함수 (History_{Browser}_{Username} 형식으로 저장)
-def extract_file(image_path, offset, inode, output_dir, file_name, username, category):
-    """icat 도구로 파일을 추출하는 함수, 파일 이름을 History_{Browser}_{Username} 형식으로 저장"""
-    try:
-        os.makedirs(output_dir, exist_ok=True)
-        output_file = os.path.join(output_dir, f"{file_name}_{category}_{username}")
-        command = ['icat', '-f', 'ntfs', '-o', str(offset), image_path, inode]
-        with open(output_file, 'wb') as f:
-            result = subprocess.run(command, stdout=f, check=True)
-        print(f"파일 추출 완료: {output_file}")
-    except subprocess.CalledProcessError as e:
-        print(f"파일 추출 중 오류 발생: {e}")
-
-def search_browser_history(image_path, partition_offset, output_dir):
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from image_session import get_session, get_first_disk_image_path
+from path_index import get_path_index
+from extractor import extract_batch, ARCHIVE_RAW_COPIES
+from user_manifest import get_users_data
+
+# 사용자 홈 디렉토리 기준 브라우저 히스토리 파일 경로 (Firefox 프로필은 'xxxx.default-release' 형태)
+BROWSER_HISTORY_PATHS = {
+    "Edge": r"AppData\Local\Microsoft\Edge\User Data\Default\History",
+    "Chrome": r"AppData\Local\Google\Chrome\User Data\Default\History",
+    "Whale": r"AppData\Local\Naver\Naver Whale\User Data\Default\History",
+    "Firefox": r"AppData\Roaming\Mozilla\Firefox\Profiles\*.default*\places.sqlite"
+}
+
+# 사용자 홈 디렉토리 기준 브라우저 캐시 디렉토리 (위에서부터 먼저 있는 경로, 예전 Chromium은 Cache 바로 아래)
+BROWSER_CACHE_PATHS = {
+    "Edge": [r"AppData\Local\Microsoft\Edge\User Data\Default\Cache\Cache_Data",
+             r"AppData\Local\Microsoft\Edge\User Data\Default\Cache"],
+    "Chrome": [r"AppData\Local\Google\Chrome\User Data\Default\Cache\Cache_Data",
+               r"AppData\Local\Google\Chrome\User Data\Default\Cache"],
+    "Whale": [r"AppData\Local\Naver\Naver Whale\User Data\Default\Cache\Cache_Data",
+              r"AppData\Local\Naver\Naver Whale\User Data\Default\Cache"],
+    "Firefox": [r"AppData\Local\Mozilla\Firefox\Profiles\*.default*\cache2\entries"],
+}
+
+# Chromium 캐시에서 추출하는 블록 파일 (f_* 본문 파일은 크므로 파서가 필요할 때 이미지에서 읽음)
+CHROMIUM_CACHE_FILES = ["index", "data_0", "data_1", "data_2", "data_3"]
+
+# 사용자 홈 디렉토리 기준 브라우저 프로필 디렉토리와 프로필 안의 세션 파일
+BROWSER_PROFILE_PATHS = {
+    "Edge": r"AppData\Local\Microsoft\Edge\User Data\Default",
+    "Chrome": r"AppData\Local\Google\Chrome\User Data\Default",
+    "Whale": r"AppData\Local\Naver\Naver Whale\User Data\Default",
+    "Firefox": r"AppData\Roaming\Mozilla\Firefox\Profiles\*.default*",
+}
+CHROMIUM_SESSION_FILES = [r"Sessions\Session_*", r"Sessions\Tabs_*",
+                          "Current Session", "Last Session", "Current Tabs", "Last Tabs"]
+FIREFOX_SESSION_FILES = ["sessionstore.jsonlz4", r"sessionstore-backups\*.jsonlz4"]
+
+# 프로필이 여러 개일 수 있는 브라우저(Firefox)의 히스토리 DB는 Profiles_{Browser}_{Username}\<프로필>\ 아래에 저장
+HISTORY_PROFILES_DIR = "Profiles"
+
+# 추출할 디렉토리 경로
+OUTPUT_DIR = r"..\..\output\artifact\web"
+
+# 추출 파일 경로를 만드는 함수 (History_{Browser}_{Username} 형식으로 저장)
+def extraction_path(output_dir, file_name, username, category):
+    """추출 파일 저장 경로를 History_{Browser}_{Username} 형식으로 반환"""
+    return os.path.join(output_dir, f"{file_name}_{category}_{username}")
+
+def history_extraction_path(output_dir, history_file, username, browser, record):
+    """히스토리 DB 저장 경로 (경로에 프로필 와일드카드가 있는 브라우저는 프로필 디렉토리마다 따로 저장)"""
+    if '*' not in BROWSER_HISTORY_PATHS[browser]:
+        return extraction_path(output_dir, history_file, username, browser)
+    profile = record.path.split('/')[-2]
+    return os.path.join(extraction_path(output_dir, HISTORY_PROFILES_DIR, username, browser), profile, history_file)
+
+def search_browser_history(session, output_dir, users_data=None):
     """각 사용자에 대해 브라우저 히스토리를 검색하고 추출하는 함수"""
-    # Users 디렉토리 inode 가져오기
-    users_inode = get_inode_number(image_path, partition_offset, "Users")
-    
-    if not users_inode:
-        print("Users 디렉토리를 찾을 수 없습니다.")
-        return
+    index = get_path_index(session)
 
-    users_data = get_users_from_external_script(script_path)
+    if users_data is None:
+        users_data = get_users_data()
 
     if not users_data:
         print("유효한 사용자 정보를 찾을 수 없습니다.")
         return
-    
-    # 각 사용자에 대해 브라우저 히스토리를 탐색
+
+    # 각 사용자에 대해 브라우저 히스토리를 탐색하고 추출 작업을 모아서 한 번에 병렬 추출
+    jobs = []
     for username, rid in users_data.items():
         print(f"사용자 이름: {username}")
-        
-        # 사용자 홈 디렉토리 inode 가져오기
-        user_inode = get_inode_number(image_path, partition_offset, username, users_inode[0])
-        
-        if not user_inode:
+
+        if index.inode(f"Users\\{username}") is None:
             print(f"사용자 {username}의 홈 디렉토리를 찾을 수 없습니다.")
             continue
-        
-        # 브라우저 관련 디렉토리 및 파일 탐색
-        browser_directories = {
-            "Edge": ("AppData", "Local", "Microsoft", "Edge", "User Data", "Default"),
-            "Chrome": ("AppData", "Local", "Google", "Chrome", "User Data", "Default"),
-            "Whale": ("AppData", "Local", "Naver", "Naver Whale", "User Data", "Default"),
-            "Firefox": ("AppData", "Roaming", "Mozilla", "Firefox", "Profiles", ".default")
-        }
-
-        browser_history_file = {
-            "Edge": "History",
-            "Chrome": "History",
-            "Whale": "History",
-            "Firefox": "places.sqlite"
-        }
-
-        for browser, directories in browser_directories.items():
-            current_inode = user_inode[0]  # Start from the user's home directory inode
-
-            for directory in directories:
-                current_inode = get_directory_inode(image_path, partition_offset, current_inode, directory)
-                if not current_inode:
-                    print(f"{browser} 브라우저의 '{directory}' 디렉토리를 찾을 수 없습니다.")
-                    break
+
+        for browser, relative_path in BROWSER_HISTORY_PATHS.items():
+            # 경로 인덱스에서 한 번에 조회 (디렉토리를 단계별로 fls 하지 않음)
+            records = index.glob(f"Users\\{username}\\{relative_path}")
+            if not records:
+                print(f"{browser} 브라우저의 히스토리 파일을 찾을 수 없습니다.")
+                continue
+            # Firefox 프로필이 여러 개면 모두 추출
+            history_file = relative_path.rsplit('\\', 1)[-1]
+            for record in records:
+                print(f"{history_file}의 inode 번호: {record.inode}")
+                jobs.append((record.inode, history_extraction_path(output_dir, history_file, username, browser, record)))
+
+    # web_artifact.py는 복사본이 없으면 이미지에서 바로 읽으므로 원본 복사는 보관용 (DEFOHARI_ARCHIVE_RAW=0이면 생략)
+    if not ARCHIVE_RAW_COPIES:
+        print("브라우저 히스토리 원본 복사를 생략합니다.")
+        return
+
+    extract_batch(session, jobs)
+
+# 브라우저 캐시 블록 파일과 세션 파일을 검색 및 추출하는 함수
+def search_browser_cache(session, output_dir, users_data=None):
+    """각 사용자에 대해 Chromium 캐시 블록 파일(index, data_0..3)과 세션 파일을 Cache_/Sessions_{Browser}_{Username} 폴더에 추출
+    (Firefox cache2 엔트리는 본문이 함께 있어 복사하지 않고 browser_cache.py가 이미지에서 메타데이터만 읽음)"""
+    index = get_path_index(session)
+
+    if users_data is None:
+        users_data = get_users_data()
+
+    if not users_data:
+        print("유효한 사용자 정보를 찾을 수 없습니다.")
+        return
+
+    # browser_cache.py는 복사본이 없으면 이미지에서 바로 읽으므로 원본 복사는 보관용 (DEFOHARI_ARCHIVE_RAW=0이면 생략)
+    if not ARCHIVE_RAW_COPIES:
+        print("브라우저 캐시/세션 원본 복사를 생략합니다.")
+        return
+
+    jobs = []
+    for username in users_data:
+        for browser, relative_paths in BROWSER_CACHE_PATHS.items():
+            if browser == "Firefox":
+                continue
+            for relative_path in relative_paths:
+                index_inode = index.inode(f"Users\\{username}\\{relative_path}\\index")
+                if index_inode is None:
+                    continue
+                cache_dir = extraction_path(output_dir, "Cache", username, browser)
+                for file_name in CHROMIUM_CACHE_FILES:
+                    inode = index.inode(f"Users\\{username}\\{relative_path}\\{file_name}")
+                    if inode:
+                        jobs.append((inode, os.path.join(cache_dir, file_name)))
+                break
             else:
-                # 브라우저의 히스토리 파일 탐색
-                history_inode = get_inode_number(image_path, partition_offset, browser_history_file[browser], current_inode)
-                if history_inode:
-                    extract_file(image_path, partition_offset, history_inode[0], output_dir, browser_history_file[browser], username, browser)
+                print(f"{username}의 {browser} 캐시를 찾을 수 없습니다.")
+
+        for browser, profile_path in BROWSER_PROFILE_PATHS.items():
+            session_files = FIREFOX_SESSION_FILES if browser == "Firefox" else CHROMIUM_SESSION_FILES
+            session_dir = extraction_path(output_dir, "Sessions", username, browser)
+            for session_file in session_files:
+                for record in index.glob(f"Users\\{username}\\{profile_path}\\{session_file}"):
+                    if not record.is_dir:
+                        jobs.append((record.inode, os.path.join(session_dir, record.name)))
+
+    extract_batch(session, jobs)
 
 # 토렌트 관련 파일을 검색 및 추출하는 함수
-def search_torrent_history(image_path, partition_offset, output_dir):
+def search_torrent_history(session, output_dir, users_data=None):
     """각 사용자에 대해 Torrent 히스토리를 검색하고 추출하는 함수"""
-    users_inode = get_inode_number(image_path, partition_offset, "Users")
-    
-    if not users_inode:
-        print("Users 디렉토리를 찾을 수 없습니다.")
-        return
+    index = get_path_index(session)
 
-    users_data = get_users_from_external_script(script_path)
+    if users_data is None:
+        users_data = get_users_data()
 
     if not users_data:
         print("유효한 사용자 정보를 찾을 수 없습니다.")
         return
-    
+
+    torrent_files = ("resume.dat", "dht.dat")
+    jobs = []
+
     for username, rid in users_data.items():
         print(f"사용자 이름: {username}")
-        
-        user_inode = get_inode_number(image_path, partition_offset, username, users_inode[0])
-        
-        if not user_inode:
-            print(f"사용자 {username}의 홈 디렉토리를 찾을 수 없습니다.")
-            continue
-        
-        torrent_directory = ("AppData", "Roaming", "utorrent")
 
-        torrent_files = ("resume.dat", "dht.dat")
+        torrent_directory = f"Users\\{username}\\AppData\\Roaming\\utorrent"
+        if index.inode(torrent_directory) is None:
+            print(f"{username}의 '{torrent_directory}' 디렉토리를 찾을 수 없습니다.")
+            continue
 
-        current_inode = user_inode[0]  # Start from the user's home directory inode
+        # 토렌트 관련 파일 탐색
+        for torrent_file in torrent_files:
+            torrent_inode = index.inode(f"{torrent_directory}\\{torrent_file}")
+            if torrent_inode:
+                jobs.append((torrent_inode, extraction_path(output_dir, torrent_file, username, "Torrent")))
 
-        for directory in torrent_directory:
-            current_inode = get_directory_inode(image_path, partition_offset, current_inode, directory)
-            if not current_inode:
-                print(f"{username}의 '{directory}' 디렉토리를 찾을 수 없습니다.")
-                break
-        else:
-            # 토렌트 관련 파일 탐색
-            for torrent_file in torrent_files:
-                torrent_inode = get_inode_number(image_path, partition_offset, torrent_file, current_inode)
-                if torrent_inode:
-                    extract_file(image_path, partition_offset, torrent_inode[0], output_dir, torrent_file, username, "Torrent")
-
-def get_first_disk_image_path(image_directory):
-    # 디스크 이미지 파일 확장자 목록
-    disk_image_extensions = ['.e01']
-    
-    # 지정된 디렉토리에서 모든 파일을 검색
-    for filename in os.listdir(image_directory):
-        # 파일 확장자를 소문자로 변환하여 확인
-        if any(filename.lower().endswith(ext) for ext in disk_image_extensions):
-            # 첫 번째 이미지 파일을 찾으면 그 경로 반환
-            return os.path.join(image_directory, filename)
+    extract_batch(session, jobs)
 
-    # 이미지 파일이 없을 경우 None 반환
-    return None
+def main(image_path, output_dir=OUTPUT_DIR, users_data=None):
+    """이미지에서 브라우저 히스토리/캐시/세션과 토렌트 히스토리를 추출 (users_data는 {프로필 디렉토리 이름: 'RID 마지막 로그온'}, 없으면 사용자 목록 매니페스트에서 읽음)"""
+    # 이미지 세션 열기 (파티션 오프셋은 세션에서 한 번만 계산)
+    session = get_session(image_path)
+    if session.partition_offset is None:
+        return
 
+    # 사용자 목록은 한 번만 조회해서 두 검색에 같이 사용
+    if users_data is None:
+        users_data = get_users_data()
+    search_browser_history(session, output_dir, users_data)
+    search_browser_cache(session, output_dir, users_data)
+    search_torrent_history(session, output_dir, users_data)
 
 # 메인 실행 로직
 if __name__ == "__main__":
@@ -210,13 +195,5 @@ if __name__ == "__main__":
     first_disk_image_path = get_first_disk_image_path(image_path_directory)
     
     #image_path = r"..\..\image_here\file_extract.E01"
-    
-    script_path = r"web_find_user.py"  # 외부 스크립트 경로
-    output_dir = r"..\..\output\artifact\web"  # 추출할 디렉토리 경로
 
-    # 파티션 오프셋 가져오기
-    partition_offset = get_partition_offset(first_disk_image_path)
-    
-    if partition_offset:
-        search_browser_history(first_disk_image_path, partition_offset, output_dir)
-        search_torrent_history(first_disk_image_path, partition_offset, output_dir)
+    main(first_disk_image_path)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+웹 기록 스트리밍 기록기
+
+방문/다운로드 기록을 하나씩 받아 XML(이스케이프 처리), CSV, 의심 기록 CSV에 한 번에 기록한다.
+문서를 문자열로 이어 붙이거나 XML을 다시 읽어 CSV로 바꾸지 않으므로 기록 수와 관계없이 메모리 사용량이 일정하다.
+"""
+import os
+import re
+import csv
+from xml.sax.saxutils import escape
+
+# XML 요소 이름 (기록 필드 순서와 같음)
+XML_FIELDS = ['url', 'visit_time', 'browser', 'user', 'event', 'detail']
+
+# CSV 헤더
+CSV_HEADER = ['url', 'visit_time', 'browser', 'user', 'event', 'detail']
+SUS_CSV_HEADER = ['URL', 'Visit Time', 'Browser', 'User', 'Event', 'Detail', 'Matched Rule']
+
+# 토렌트 목록 (torrent_output.xml/csv, 앞 8개 열은 이전 토렌트 CSV와 같음)
+TORRENT_XML_FIELDS = ['hash', 'caption', 'path', 'added_on', 'completed_on', 'downloaded', 'uploaded', 'created_torrent',
+                      'torrent_file', 'user']
+TORRENT_CSV_HEADER = ['Torrent Hash', 'Caption', 'Path', 'Added On', 'Completed On', 'Downloaded', 'Uploaded',
+                      'Distributor or Downloader', 'Torrent File', 'User']
+
+# 브라우저 캐시/세션 기록 (cache_output.xml/csv)
+CACHE_XML_FIELDS = ['url', 'fetch_time', 'browser', 'user', 'source', 'content_type', 'size', 'detail']
+CACHE_CSV_HEADER = ['URL', 'Fetch Time', 'Browser', 'User', 'Source', 'Content Type', 'Size', 'Detail']
+
+# XML 1.0에서 쓸 수 없는 제어 문자 (URL에 섞여 있으면 XML 파서가 실패함)
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# 파일 쓰기 버퍼 크기
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def xml_text(value):
+    """XML 텍스트로 쓸 수 있게 이스케이프 (None은 빈 문자열)"""
+    if value is None:
+        return ''
+    return escape(INVALID_XML_CHARS.sub('', str(value)))
+
+
+def _open_output(path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return open(path, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE)
+
+
+class WebRecordWriter:
+    """기록을 XML/CSV/의심 CSV에 한 번에 쓰는 기록기 (with 문으로 사용)
+
+    is_suspicious(record)가 맞은 규칙 이름을 돌려준 기록만 의심 CSV에 규칙 이름과 함께 쓰고,
+    sus_csv_path가 None이면 의심 CSV는 만들지 않는다.
+    """
+
+    def __init__(self, xml_path, csv_path, sus_csv_path=None, is_suspicious=None,
+                 root_tag='history', item_tag='visit', fields=XML_FIELDS, csv_header=CSV_HEADER):
+        self.item_tag = item_tag
+        self.fields = fields
+        self.is_suspicious = is_suspicious
+        self.count = 0
+        self.suspicious_count = 0
+        self._files = []
+
+        self._xml = self._open(xml_path)
+        self._xml.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<{root_tag}>\n')
+        self._root_tag = root_tag
+
+        self._csv = csv.writer(self._open(csv_path))
+        self._csv.writerow(csv_header)
+
+        self._sus_csv = None
+        if sus_csv_path is not None and is_suspicious is not None:
+            self._sus_csv = csv.writer(self._open(sus_csv_path))
+            self._sus_csv.writerow(SUS_CSV_HEADER)
+
+    def _open(self, path):
+        f = _open_output(path)
+        self._files.append(f)
+        return f
+
+    def write(self, record):
+        """기록 하나(필드 순서의 튜플)를 모든 출력에 씀"""
+        row = ['' if value is None else str(value) for value in record]
+        lines = [f'  <{self.item_tag}>\n']
+        lines += [f'    <{tag}>{xml_text(value)}</{tag}>\n' for tag, value in zip(self.fields, row)]
+        lines.append(f'  </{self.item_tag}>\n')
+        self._xml.write(''.join(lines))
+        self._csv.writerow(row)
+        if self._sus_csv is not None:
+            rule = self.is_suspicious(record)
+            if rule:
+                self._sus_csv.writerow(row + [rule])
+                self.suspicious_count += 1
+        self.count += 1
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+        return self.count
+
+    def close(self):
+        if not self._files:
+            return
+        self._xml.write(f'</{self._root_tag}>')
+        for f in self._files:
+            f.close()
+        self._files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
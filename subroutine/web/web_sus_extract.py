@@ -1,45 +1,41 @@
 import os
-import subprocess
+import sys
+import csv
 import re
-
-anti_forensic_keywords = [
-    r'(?i).*ccleaner.*', r'(?i).*cleaner.*', r'(?i).*eraser.*',
-    r'(?i).*wiper.*', r'(?i).*scrubber.*', r'(?i).*delete.*',
-    r'(?i).*remove.*', r'(?i).*destroy.*', r'(?i).*bleachbit.*'
+from collections import namedtuple
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from image_session import get_session, get_partition_sessions, get_first_disk_image_path
+from path_index import get_path_index, record_times
+from extractor import Extractor
+from keyword_rules import get_matcher
+from user_manifest import get_usernames
+
+# 안티포렌식 키워드 규칙 (common/anti_forensic_rules.json)
+matcher = get_matcher()
+
+# 검사 대상 확장자 (같은 규칙 파일의 download_extensions 규칙 집합)
+extension_matcher = get_matcher('download_extensions')
+
+# 사용자가 쓸 수 있는 검사 위치 (사용자 홈 기준, 하위 디렉토리까지 검사)
+SCAN_LOCATIONS = {
+    "Downloads": r"Downloads",
+    "Desktop": r"Desktop",
+    "AppData": r"AppData",
+}
+
+# AppData 안에서 따로 표시할 위치 (위에서부터 먼저 맞는 이름)
+SUB_LOCATIONS = [
+    ("Temp", r"AppData\Local\Temp"),
 ]
 
-def get_first_disk_image_path(image_directory):
-    # 디스크 이미지 파일 확장자 목록
-    disk_image_extensions = ['.e01']
-    
-    # 지정된 디렉토리에서 모든 파일을 검색
-    for filename in os.listdir(image_directory):
-        # 파일 확장자를 소문자로 변환하여 확인
-        if any(filename.lower().endswith(ext) for ext in disk_image_extensions):
-            # 첫 번째 이미지 파일을 찾으면 그 경로 반환
-            return os.path.join(image_directory, filename)
-
-    # 이미지 파일이 없을 경우 None 반환
-    return None
-
-
-
-def run_command(command, binary_mode=False):
-    """명령어 실행 및 결과 출력"""
-    print(f"Running command: {' '.join(command)}")
-    
-    if binary_mode:
-        # 바이너리 데이터를 처리하기 위한 모드
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if result.stderr:
-            print(f"Command error: {result.stderr.strip().decode('utf-8')}")
-        return result.stdout  # 바이너리 데이터를 반환
-    else:
-        # 일반적인 텍스트 처리
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        if result.stderr:
-            print(f"Command error: {result.stderr.strip()}")
-        return result.stdout.strip()
+# 검사 결과 보고서 (출력 디렉토리 안)
+REPORT_NAME = 'suspicious_downloads.csv'
+REPORT_HEADER = ['User', 'Location', 'Path', 'Size', 'Created', 'Modified', 'SHA256', 'MD5',
+                 'ZoneId', 'HostUrl', 'ReferrerUrl', 'Matched Rule', 'Extracted Path', 'Volume']
+
+# user: 프로필 디렉토리 이름, location: 검사 위치 이름, record: 경로 인덱스의 FileRecord, rule: 맞은 키워드 규칙
+SuspiciousFile = namedtuple('SuspiciousFile', ['user', 'location', 'record', 'rule'])
 
 def sanitize_file_name(file_name):
     """파일 이름에서 Windows에서 허용되지 않는 문자를 제거하고 공백, 탭을 정리"""
@@ -48,115 +44,118 @@ def sanitize_file_name(file_name):
     sanitized_name = sanitized_name.replace('\t', '').replace('\n', '').strip()  # 탭 및 개행 제거, 앞뒤 공백 제거
     return sanitized_name
 
-def extract_files(image_path, offset, suspicious_files, downloads_inode, destination_dir):
-    """의심스러운 파일을 추출하여 destination_dir로 복사"""
-    if not os.path.exists(destination_dir):
-        os.makedirs(destination_dir)
-
-    for file_entry in suspicious_files:
-        # 파일 이름 및 inode 번호 추출
-        try:
-            inode, file_name = file_entry.split(':', 1)
-            inode = inode.strip()  # 정확한 inode 번호만 사용
-            file_name = file_name.strip()  # 파일 이름 정리
-        except Exception as e:
-            print(f"파일 이름을 처리하는 중 오류 발생: {e}")
-            continue
-
-        # 파일 이름에서 비허용 문자 제거
-        sanitized_file_name = sanitize_file_name(file_name)
-
-        # icat 명령을 실행하여 파일 추출
-        command = ['icat', '-f', 'ntfs', '-o', str(offset), image_path, inode]
-        file_data = run_command(command, binary_mode=True)  # 바이너리 모드로 데이터 처리
+def location_name(user, location, path):
+    """파일 경로가 속한 검사 위치 이름 (AppData\\Local\\Temp 아래면 Temp)"""
+    path_lc = path.replace('\\', '/').lower()
+    for name, relative_path in SUB_LOCATIONS:
+        prefix = f"Users/{user}/{relative_path}/".replace('\\', '/').lower()
+        if path_lc.startswith(prefix):
+            return name
+    return location
+
+def search_suspicious_files(index, user):
+    """사용자 홈의 검사 위치 전체(하위 디렉토리 포함)에서 확장자와 키워드 규칙에 맞는 파일 검색"""
+    suspicious_files = []
 
-        # icat 명령어로 추출한 파일의 크기 확인
-        if not file_data or len(file_data) == 0:
-            print(f"icat 명령으로 {sanitized_file_name}에서 데이터를 추출할 수 없었습니다. 데이터가 없습니다.")
+    for location, relative_path in SCAN_LOCATIONS.items():
+        base_path = f"Users\\{user}\\{relative_path}"
+        if index.inode(base_path) is None:
+            print(f"사용자 {user}의 {location} 디렉토리를 찾지 못했습니다.")
             continue
 
-        print(f"추출한 데이터 크기: {len(file_data)} 바이트")
-
-        # 파일 저장 경로 설정 및 저장
-        destination_path = os.path.join(destination_dir, sanitized_file_name)  # 실제 파일 이름 사용
-        try:
-            with open(destination_path, 'wb') as f:  # 바이너리 모드로 파일 쓰기
-                f.write(file_data)
-            print(f"파일 추출 완료: {destination_path}")
-        except Exception as e:
-            print(f"파일 저장 중 오류 발생: {e}")
-
-def search_suspicious_files(image_path, offset, downloads_inode):
-    """Downloads 폴더에서 의심스러운 파일 검색"""
-    suspicious_files = []
-    command = ['fls', '-f', 'ntfs', '-o', str(offset), image_path, downloads_inode]
-    result = run_command(command)
-
-    for line in result.splitlines():
-        if line.startswith('r/'):  # 파일인 경우
-            try:
-                parts = line.split(None, 1)
-                inode = parts[1].split('-')[0]  # inode 번호만 추출
-                file_name = parts[1] if len(parts) > 1 else ''
-                if file_name.endswith(('.exe', '.msi', '.bat', '.cmd')) and any(re.search(keyword, file_name) for keyword in anti_forensic_keywords):
-                    suspicious_files.append(f"{inode}: {file_name}")
-                    print(f"의심스러운 파일 발견: {file_name}")
-            except Exception as e:
-                print(f"파일 검색 중 오류 발생: {e}")
+        # 확장자마다 경로 인덱스의 접두어 검색 한 번 ('**'는 하위 디렉토리까지 매칭)
+        for extension in extension_matcher.names:
+            for record in index.glob(f"{base_path}\\**{extension}"):
+                if record.is_dir:  # 파일인 경우만
+                    continue
+                rule = matcher.match(record.name)
+                if rule:
+                    suspicious_files.append(SuspiciousFile(user, location_name(user, location, record.path), record, rule))
+                    print(f"의심스러운 파일 발견: {record.path} (규칙: {rule})")
     return suspicious_files
 
-def get_partition_offset(image_path):
-    """mmls 도구로 Basic data partition의 오프셋을 가져오는 함수"""
+def read_zone_identifier(session, inode):
+    """Zone.Identifier ADS(인터넷에서 받은 파일 표시)의 {ZoneId, HostUrl, ReferrerUrl} (없으면 빈 dict)"""
+    stream = session.find_stream(inode, "Zone.Identifier")
+    if stream is None:
+        return {}
     try:
-        command = ['mmls', image_path]
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        lines = result.stdout.splitlines()
-        for line in lines:
-            if "Basic data partition" in line:
-                parts = line.split()
-                if len(parts) > 2:
-                    offset = parts[2]
-                    print(f"파티션 오프셋 찾음: {offset}")
-                    return int(offset)
-    except subprocess.CalledProcessError as e:
-        print(f"파티션 오프셋을 찾는 중 오류 발생: {e}")
-    return None
-
-def get_inode_number(image_path, offset, file_name, inode=None):
-    """fls 도구로 파일 또는 디렉토리의 inode 번호를 가져오는 함수"""
-    try:
-        # inode 값이 없다면 루트에서 검색, 있다면 해당 디렉토리 내에서 검색
-        command = ['fls', '-f', 'ntfs', '-o', str(offset), image_path] if not inode else ['fls', '-f', 'ntfs', '-o', str(offset), image_path, inode]
-        result = run_command(command)
-        
-        for line in result.splitlines():
-            # 파일 이름이 디렉토리인지, 그리고 정확히 일치하는지 확인
-            if file_name in line and line.startswith('d/d'):  # 디렉토리만 가져옴
-                inode_info = line.split()[1].split('-')[0]  # inode 번호만 추출
-                print(f"{file_name}의 inode 번호: {inode_info}")
-                return inode_info
-    except subprocess.CalledProcessError as e:
-        print(f"inode 번호를 찾는 중 오류 발생: {e}")
-    return None
-    
+        data = session.read_file(stream)
+    except Exception as e:
+        print(f"Zone.Identifier를 읽는 중 오류 발생: {e}")
+        return {}
+
+    if data.startswith((b'\xff\xfe', b'\xfe\xff')):
+        text = data.decode('utf-16', errors='replace')
+    else:
+        text = data.decode('utf-8-sig', errors='replace')
+    zone = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition('=')
+        if sep and key.strip() in ('ZoneId', 'HostUrl', 'ReferrerUrl'):
+            zone[key.strip()] = value.strip()
+    return zone
+
+def extraction_jobs(suspicious_files, destination_dir):
+    """사용자/위치별 저장 경로 목록 (같은 이름이 겹치면 inode를 붙임)"""
+    destinations = []
+    used = set()
+    for hit in suspicious_files:
+        file_name = sanitize_file_name(hit.record.name)
+        destination = os.path.join(destination_dir, hit.user, hit.location, file_name)
+        if destination.lower() in used:
+            stem, ext = os.path.splitext(file_name)
+            destination = os.path.join(destination_dir, hit.user, hit.location,
+                                       f"{stem}_{sanitize_file_name(hit.record.inode)}{ext}")
+        used.add(destination.lower())
+        destinations.append(destination)
+    return destinations
+
+def extract_files(session, suspicious_files, destination_dir, zone_identifier=True):
+    """의심스러운 파일을 작업자 풀에서 스트리밍 추출하면서 SHA-256/MD5를 계산하고 보고서 행 목록을 반환 (Volume은 파티션 시작 섹터)"""
+    destinations = extraction_jobs(suspicious_files, destination_dir)
+
+    # 파일은 청크 단위로 디스크에 바로 기록하고 해시도 같은 읽기에서 계산 (큰 설치 파일도 메모리에 올리지 않음)
+    results = Extractor(session, md5=True).run(
+        [(hit.record.inode, destination) for hit, destination in zip(suspicious_files, destinations)])
+
+    rows = []
+    for hit, result in zip(suspicious_files, results):
+        extracted = result.destination
+        if result.error is None and result.bytes_written == 0:
+            print(f"{os.path.basename(result.destination)}에서 데이터를 추출할 수 없었습니다. 데이터가 없습니다.")
+            os.remove(result.destination)
+            extracted = ''
+        elif result.error is not None:
+            extracted = ''
+
+        zone = read_zone_identifier(session, hit.record.inode) if zone_identifier else {}
+        created, _, modified = record_times(hit.record)
+        rows.append([hit.user, hit.location, hit.record.path, hit.record.size,
+                     created or '', modified or '', result.sha256 or '', result.md5 or '',
+                     zone.get('ZoneId', ''), zone.get('HostUrl', ''), zone.get('ReferrerUrl', ''),
+                     hit.rule, extracted, session.partition_offset])
+    return rows
+
+def write_report(rows, report_path):
+    """검사 결과를 CSV로 저장"""
+    with open(report_path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(REPORT_HEADER)
+        writer.writerows(rows)
+    print(f"의심스러운 파일 {len(rows)}개를 {report_path}에 기록했습니다.")
+
 def get_users_from_registry():
-    """subprocess를 사용해 web_find_user.py 실행 후 사용자 이름만 추출"""
-    command = ['python', 'web_find_user.py']  # 업로드된 스크립트 실행
-    result = run_command(command)
-
-    users = []
-    for line in result.splitlines():
-        if ':' in line and ('Never logged in' in line or re.search(r'\d{4}-\d{2}-\d{2}', line)):
-            username = line.split(':')[0].strip()  # 사용자 이름 부분만 추출
-            if '<Unknown>' not in username:  # <Unknown>은 제외
-                users.append(username)
+    """사용자 목록 매니페스트(SAM + ProfileList)에서 프로필 디렉토리 이름 목록을 가져옴"""
+    users = get_usernames()
     print(f"사용자 목록: {users}")
     return users
 
-def main(image_path, output_dir):
+def main(image_path, output_dir, zone_identifier=True):
+    session = get_session(image_path)
+
     # 파티션 오프셋 가져오기
-    partition_offset = get_partition_offset(image_path)
-    if not partition_offset:
+    if session.partition_offset is None:
         print("파티션 오프셋을 찾지 못했습니다.")
         return
 
@@ -166,31 +165,35 @@ def main(image_path, output_dir):
         print("사용자 정보를 가져오지 못했습니다.")
         return
 
-    for user in users:
-        # Users 디렉토리에서 해당 사용자 디렉토리 inode 찾기
-        users_inode = get_inode_number(image_path, partition_offset, 'Users')
-        if not users_inode:
-            print(f"Users 디렉토리를 찾지 못했습니다.")
-            continue
-
-        user_inode = get_inode_number(image_path, partition_offset, user, users_inode)
-        if not user_inode:
-            print(f"사용자 {user} 디렉토리를 찾지 못했습니다.")
-            continue
-
-        # Downloads 디렉토리 inode 찾기
-        downloads_inode = get_inode_number(image_path, partition_offset, 'Downloads', user_inode)
-        if not downloads_inode:
-            print(f"사용자 {user}의 Downloads 디렉토리를 찾지 못했습니다.")
-            continue
+    os.makedirs(output_dir, exist_ok=True)
+    rows = []
+
+    # 시스템 볼륨뿐 아니라 다른 NTFS 볼륨(데이터 파티션 등)에 있는 사용자 폴더도 검사
+    volumes = get_partition_sessions(image_path)
+    if session not in volumes:
+        volumes.insert(0, session)
+    for volume in volumes:
+        # 볼륨마다 이미지 경로 인덱스 (없으면 한 번 순회해서 생성)
+        index = get_path_index(volume)
+        system_volume = volume is session
+        volume_dir = output_dir if system_volume else os.path.join(output_dir, f"volume_{volume.partition_offset}")
+
+        # 모든 사용자의 검사 위치에서 의심스러운 파일을 모은 뒤 한 번에 병렬 추출
+        suspicious_files = []
+        for user in users:
+            # 다른 볼륨은 사용자 폴더가 있을 때만 검사
+            if not system_volume and index.inode(f"Users\\{user}") is None:
+                continue
+            user_files = search_suspicious_files(index, user)
+            if user_files:
+                print(f"{user}의 의심스러운 파일: {len(user_files)}개 발견 (볼륨 {volume.partition_offset})")
+            else:
+                print(f"{user}의 의심스러운 파일을 찾지 못했습니다. (볼륨 {volume.partition_offset})")
+            suspicious_files += user_files
 
-        # 의심스러운 파일 검색 및 추출
-        suspicious_files = search_suspicious_files(image_path, partition_offset, downloads_inode)
         if suspicious_files:
-            print(f"{user}의 의심스러운 파일: {len(suspicious_files)}개 발견")
-            extract_files(image_path, partition_offset, suspicious_files, downloads_inode, os.path.join(output_dir, user))
-        else:
-            print(f"{user}의 의심스러운 파일을 찾지 못했습니다.")
+            rows += extract_files(volume, suspicious_files, volume_dir, zone_identifier)
+    write_report(rows, os.path.join(output_dir, REPORT_NAME))
 
 if __name__ == "__main__":
     image_path_directory = r"..\..\image_here"